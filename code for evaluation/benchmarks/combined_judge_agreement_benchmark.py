@@ -0,0 +1,155 @@
+#Python Imports
+import sys
+import time
+import math
+from pathlib import Path
+
+#Allows running this file directly from the benchmarks folder.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+#Custom Imports
+from project import Project
+from segment_data import SegmentData
+from questions.question_data import QuestionData
+from questions.evaluation_data import EvaluationData
+from utilities import rate_limiter
+import evaluation_api as EvaluationAPI
+
+#Description
+"""
+Measures how closely the combined judge (one request per question) agrees with the per criterion few shot evaluations (six requests per question).
+The per criterion scores are taken from the project's existing evaluations, run Project.evaluate_all_segments first.
+Scores are compared on the 1 to 5 scale: mean absolute difference, exact agreement, agreement within one point and Pearson correlation.
+Run from the 'code for evaluation' folder: python benchmarks/combined_judge_agreement_benchmark.py <project name>
+"""
+
+#The combined judge is considered acceptable for a criterion if it meets both.
+m_minimum_within_one_agreement: float = 0.9
+m_maximum_mean_absolute_difference: float = 0.75
+
+#Which text each question type is evaluated against, the same as Project.evaluate_segment.
+m_question_type_texts: dict[str, str] = {
+    SegmentData.saqs_dict_key() : SegmentData.transcript_dict_key(),
+    SegmentData.mcqs_dict_key() : SegmentData.transcript_dict_key(),
+    SegmentData.gfqs_dict_key() : SegmentData.summary_dict_key(),
+    SegmentData.blqs_dict_key() : SegmentData.summary_dict_key(),
+}
+
+
+def run_benchmark(a_project_name: str, a_project_folder_location: Path = Path("../Projects-Data")) -> dict:
+    t_project = Project(a_name = a_project_name, a_transcript = "", a_project_folder_location = a_project_folder_location)
+
+    t_score_pairs: dict[str, list[tuple[float, float]]] = {t_criterion: [] for t_criterion in EvaluationAPI.m_combined_evaluation_criteria}
+    t_number_of_questions: int = 0
+    t_combined_seconds: float = 0
+    t_combined_prompt_tokens: int = 0
+
+    for i in range(t_project.get_number_of_segments()):
+        t_segment_data_dict = t_project.get_segment_data(i)
+
+        for t_question_type, t_text_key in m_question_type_texts.items():
+            for t_question_data in t_segment_data_dict.get(t_question_type, []):
+                t_question_evaluation = t_question_data.get(QuestionData.question_evaluation_dict_key(), {})
+                if (_has_all_criteria(t_question_evaluation) == False):
+                    continue
+
+                t_text = t_segment_data_dict[t_text_key]
+                t_ground_truth = ", ".join(t_segment_data_dict[SegmentData.question_type_keywords_dict_key(t_question_type)])
+                t_answer = _get_answer(t_question_type, t_question_data[QuestionData.answer_dict_key()])
+
+                t_start_time = time.time()
+                t_combined_results = EvaluationAPI.evaluate_combined(t_text, t_question_data[QuestionData.question_dict_key()], t_answer, t_ground_truth)
+                t_combined_seconds += time.time() - t_start_time
+                t_combined_prompt_tokens += rate_limiter.estimate_tokens(
+                    EvaluationAPI.m_combined_evaluation_few_shot.get_prompt(0, EvaluationAPI.m_combined_evaluation_few_shot.suffix_templates[0].format(text = t_text, question = t_question_data[QuestionData.question_dict_key()], answer = t_answer, ground_truth = t_ground_truth))
+                )
+                t_number_of_questions += 1
+
+                for t_criterion in EvaluationAPI.m_combined_evaluation_criteria:
+                    t_combined_score = t_combined_results[t_criterion][EvaluationData.score_dict_key()]
+                    t_per_criterion_score = t_question_evaluation[t_criterion][EvaluationData.score_dict_key()]
+                    if (float(t_combined_score) > 0):
+                        t_score_pairs[t_criterion].append((_to_five_point_scale(t_per_criterion_score), _to_five_point_scale(t_combined_score)))
+
+    t_results = {
+        "questions" : t_number_of_questions,
+        "requests_per_question" : {"per_criterion" : len(EvaluationAPI.m_combined_evaluation_criteria), "combined" : 1},
+        "combined_seconds_per_question" : round(t_combined_seconds / t_number_of_questions, 3) if t_number_of_questions > 0 else 0,
+        "combined_prompt_tokens_per_question" : round(t_combined_prompt_tokens / t_number_of_questions) if t_number_of_questions > 0 else 0,
+        "criteria" : {t_criterion: _get_agreement(t_pairs) for t_criterion, t_pairs in t_score_pairs.items()}
+    }
+
+    print(f"\nCombined judge agreement for {a_project_name} over {t_number_of_questions} questions:")
+    for t_criterion, t_agreement in t_results["criteria"].items():
+        print(
+            f"{t_criterion}: mean absolute difference {t_agreement['mean_absolute_difference']}, exact {t_agreement['exact_agreement']}, "
+            f"within one {t_agreement['within_one_agreement']}, correlation {t_agreement['correlation']}, acceptable {t_agreement['acceptable']}"
+        )
+
+    return t_results
+
+
+def _has_all_criteria(a_question_evaluation: dict) -> bool:
+    for t_criterion in EvaluationAPI.m_combined_evaluation_criteria:
+        t_criterion_evaluation = a_question_evaluation.get(t_criterion, None)
+        if (isinstance(t_criterion_evaluation, dict) == False or float(t_criterion_evaluation.get(EvaluationData.score_dict_key(), -1)) <= 0):
+            return False
+
+    return True
+
+
+def _get_answer(a_question_type: str, a_answer) -> str:
+    #The same answer clean up as Project.evaluate_segment.
+    if (a_question_type == SegmentData.mcqs_dict_key()):
+        return a_answer.split(", ")[0] if isinstance(a_answer, str) == True else a_answer[0]
+    if (isinstance(a_answer, list) == True):
+        return ", ".join(a_answer)
+
+    return a_answer
+
+
+def _to_five_point_scale(a_score) -> float:
+    #Stored scores are normalised by dividing by 5, see evaluation_api._get_evaluation_data_dict.
+    return round(float(a_score) * 5, 2)
+
+
+def _get_agreement(a_score_pairs: list[tuple[float, float]]) -> dict:
+    if (len(a_score_pairs) == 0):
+        return {"pairs" : 0, "mean_absolute_difference" : None, "exact_agreement" : None, "within_one_agreement" : None, "correlation" : None, "acceptable" : False}
+
+    t_differences = [abs(t_per_criterion - t_combined) for t_per_criterion, t_combined in a_score_pairs]
+    t_mean_absolute_difference = sum(t_differences) / len(t_differences)
+    t_within_one_agreement = sum(1 for t_difference in t_differences if t_difference <= 1) / len(t_differences)
+
+    return {
+        "pairs" : len(a_score_pairs),
+        "mean_absolute_difference" : round(t_mean_absolute_difference, 3),
+        "exact_agreement" : round(sum(1 for t_difference in t_differences if t_difference == 0) / len(t_differences), 3),
+        "within_one_agreement" : round(t_within_one_agreement, 3),
+        "correlation" : _get_correlation(a_score_pairs),
+        "acceptable" : t_within_one_agreement >= m_minimum_within_one_agreement and t_mean_absolute_difference <= m_maximum_mean_absolute_difference
+    }
+
+
+def _get_correlation(a_score_pairs: list[tuple[float, float]]) -> float | None:
+    t_count = len(a_score_pairs)
+    t_mean_x = sum(t_x for t_x, t_y in a_score_pairs) / t_count
+    t_mean_y = sum(t_y for t_x, t_y in a_score_pairs) / t_count
+
+    t_covariance = sum((t_x - t_mean_x) * (t_y - t_mean_y) for t_x, t_y in a_score_pairs)
+    t_deviation_x = math.sqrt(sum((t_x - t_mean_x) ** 2 for t_x, t_y in a_score_pairs))
+    t_deviation_y = math.sqrt(sum((t_y - t_mean_y) ** 2 for t_x, t_y in a_score_pairs))
+
+    #Constant scores on either side.
+    if (t_deviation_x == 0 or t_deviation_y == 0):
+        return None
+
+    return round(t_covariance / (t_deviation_x * t_deviation_y), 3)
+
+
+if (__name__ == "__main__"):
+    if (len(sys.argv) < 2):
+        print("Usage: python benchmarks/combined_judge_agreement_benchmark.py <project name>")
+        sys.exit(1)
+
+    run_benchmark(sys.argv[1])
@@ -0,0 +1,78 @@
+#Python Imports
+import sys
+import timeit
+from pathlib import Path
+
+#Allows running this file directly from the benchmarks folder.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+#External Imports
+from langchain.prompts import FewShotPromptTemplate
+
+#Custom Imports
+from utilities.few_shot_request_data import FewShotRequestData
+
+#Description
+"""
+Measures the per request cost of assembling a few shot prompt.
+Before: a FewShotPromptTemplate is built and the examples are re-formatted on every request.
+After: the prefix + examples block is rendered once per (prefix index, suffix index) and only the suffix is appended.
+Run from the 'code for evaluation' folder: python benchmarks/prompt_assembly_benchmark.py
+"""
+
+m_number_of_requests: int = 2000
+m_question: str = "Who coined the term machine learning and when?"
+m_text: str = "The term machine learning was coined in 1959 by Arthur Samuel, an IBM employee and pioneer in the field of computer gaming and artificial intelligence."
+
+
+def _assemble_prompt_before(a_few_shot_request_data: FewShotRequestData, a_suffix: str) -> str:
+    #The previous FewShotRequestData.send_request assembly.
+    t_request = FewShotPromptTemplate(
+        prefix = a_few_shot_request_data.prefix_strings[0],
+        example_prompt = FewShotRequestData.examples_prompt,
+        examples = a_few_shot_request_data.get_formatted_examples(),
+        suffix = a_suffix,
+        input_variables = []
+    )
+    return t_request.format()
+
+
+def _assemble_prompt_after(a_few_shot_request_data: FewShotRequestData, a_suffix: str) -> str:
+    return a_few_shot_request_data.get_prompt(0, a_suffix)
+
+
+def run_benchmark(a_guidance_data_folder_path: Path, a_files_prefix: str, a_suffix_variables_names: list[str]) -> dict:
+    t_few_shot_request_data = FewShotRequestData(
+        a_guidance_data_folder_path = a_guidance_data_folder_path,
+        a_files_prefix = a_files_prefix,
+        a_suffix_variables_names = a_suffix_variables_names
+    )
+    t_suffix = t_few_shot_request_data.suffix_templates[0].format(question = m_question, text = m_text)
+
+    if (_assemble_prompt_before(t_few_shot_request_data, t_suffix) != _assemble_prompt_after(t_few_shot_request_data, t_suffix)):
+        print("Warning, the precompiled prompt differs from the FewShotPromptTemplate prompt!")
+
+    t_before_seconds = timeit.timeit(lambda: _assemble_prompt_before(t_few_shot_request_data, t_suffix), number = m_number_of_requests)
+    t_after_seconds = timeit.timeit(lambda: _assemble_prompt_after(t_few_shot_request_data, t_suffix), number = m_number_of_requests)
+
+    t_results = {
+        "requests" : m_number_of_requests,
+        "before_microseconds_per_request" : round(t_before_seconds / m_number_of_requests * 1e6, 2),
+        "after_microseconds_per_request" : round(t_after_seconds / m_number_of_requests * 1e6, 2),
+        "speedup" : round(t_before_seconds / t_after_seconds, 1) if t_after_seconds > 0 else 0
+    }
+
+    print(f"\nPrompt assembly for {a_files_prefix} over {m_number_of_requests} requests:")
+    print(f"Before: {t_results['before_microseconds_per_request']} us per request")
+    print(f"After: {t_results['after_microseconds_per_request']} us per request")
+    print(f"Speedup: {t_results['speedup']}x")
+
+    return t_results
+
+
+if (__name__ == "__main__"):
+    run_benchmark(
+        a_guidance_data_folder_path = Path(__file__).resolve().parent.parent.parent / "prompt" / "Evaluation" / "Relevance",
+        a_files_prefix = "Relevance",
+        a_suffix_variables_names = ["text", "question"]
+    )
@@ -0,0 +1,312 @@
+#Python Imports
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Callable
+from contextlib import nullcontext
+from dataclasses import asdict, replace
+
+#Custom Imports
+from project import Project
+import project
+from project_settings import ProjectSettings
+import project_settings
+from utilities import file_manager
+from utilities import llm_concurrency
+
+#Description
+"""
+Creates a project for every transcript file of a folder or archive, e.g. all videos of a course, instead of one create-project request each.
+Every project gets the same settings and is named after its file's path in the folder, e.g. week-1/intro.txt becomes week-1-intro.
+Files that would get the same name are numbered, e.g. week-1-intro.txt next to week-1/intro.txt becomes week-1-intro-2.
+A name that is already taken by a project fails that transcript, unless the ingestion is resumed, then the project is continued.
+The projects are initialised side by side and then run the chosen run_all stages. At most --max-concurrent-projects projects are worked on
+at a time, and the LLM requests of all projects share the global and per provider limits of utilities/llm_concurrency.py.
+Prints a report with the timings and failures of every project at the end, and writes it to --report-file.
+Run from the 'code for evaluation' folder: python bulk_ingestion.py <transcripts folder or archive> --stages summaries,transcript_keywords
+The project API runs the same ingestion as a job, see bulk-create-projects in project_api.py.
+"""
+
+m_transcript_file_suffixes: list[str] = [".txt"]
+
+
+def is_archive(a_source_path: Path) -> bool:
+    return get_archive_format(a_source_path) != ""
+
+
+def get_archive_format(a_source_path: Path) -> str:
+    #The shutil unpack format of the archive's extension, "" if it is not an archive.
+    for t_format, t_extensions, t_description in shutil.get_unpack_formats():
+        for t_extension in t_extensions:
+            if (a_source_path.name.lower().endswith(t_extension) == True):
+                return t_format
+
+    return ""
+
+
+def is_valid_stages(a_stages: list[str]) -> bool:
+    #New projects have no results yet, so every stage's dependencies have to run too.
+    for t_stage in a_stages:
+        if (t_stage not in project.m_pipeline_stage_dependencies):
+            print(f"There is no stage called {t_stage}. All stages: {', '.join(project.m_pipeline_stage_dependencies)}")
+            return False
+
+        t_missing_stages = [t_dependency for t_dependency in project.m_pipeline_stage_dependencies[t_stage] if t_dependency not in a_stages]
+        if (len(t_missing_stages) > 0):
+            print(f"The {t_stage} stage needs {', '.join(t_missing_stages)} to run too.")
+            return False
+
+    return True
+
+
+def get_transcript_files(a_folder_path: Path) -> dict[str, Path]:
+    #Project name -> transcript file, for every transcript file in the folder and its sub folders.
+    #week-1/intro.txt and week-1-intro.txt both make week-1-intro, the later one in path order, week-1-intro.txt, becomes week-1-intro-2.
+    t_transcript_files = {}
+    for t_file_path in sorted(a_folder_path.rglob("*")):
+        if (t_file_path.is_file() == False or t_file_path.suffix.lower() not in m_transcript_file_suffixes):
+            continue
+
+        t_relative_path = t_file_path.relative_to(a_folder_path).with_suffix("")
+        t_project_name = "-".join(t_relative_path.parts)
+
+        t_number = 2
+        while (t_project_name in t_transcript_files):
+            t_project_name = f"{'-'.join(t_relative_path.parts)}-{t_number}"
+            t_number += 1
+
+        t_transcript_files[t_project_name] = t_file_path
+
+    return t_transcript_files
+
+
+def extract_archive(a_archive_path: Path, a_folder_path: Path) -> None:
+    #Tar members that would be written outside of the folder, or are links or devices, are refused. shutil's zip unpacking
+    #skips such names itself and takes no filter.
+    t_format = get_archive_format(a_archive_path)
+    if (t_format == "zip"):
+        shutil.unpack_archive(a_archive_path, a_folder_path, t_format)
+    else:
+        shutil.unpack_archive(a_archive_path, a_folder_path, t_format, filter = "data")
+
+
+async def aingest_transcripts(
+        a_source_path: Path,
+        a_projects_folder_path: Path,
+        a_settings: ProjectSettings = project_settings.default,
+        a_stages: list[str] = None,
+        a_max_concurrent_projects: int = 4,
+        a_progress_callback: Callable[[int, int], None] = None,
+        a_resume: bool = False,
+        a_lock_project: Callable = None
+    ) -> dict | None:
+    #a_source_path is a folder or an archive of transcript files. Without a_stages the projects are only initialised.
+    #With a_resume, existing projects of the same names are continued and the stages skip what the projects' run journals
+    #have as done, e.g. after the ingestion was stopped. Without it, a name that is already taken fails that transcript.
+    #a_progress_callback is called with (projects done, projects total), it may stop the ingestion by raising.
+    #a_lock_project is called with a project name and returns an async context manager held while the project is worked on,
+    #so the project API's other requests and jobs for the same project wait for it.
+    #Returns the ingestion report, or None if the source, the stages or the concurrency are not valid.
+    a_stages = a_stages or []
+    if (is_valid_stages(a_stages) == False):
+        return None
+
+    if (a_max_concurrent_projects < 1):
+        print(f"The maximum number of concurrent projects has to be at least 1, not {a_max_concurrent_projects}.")
+        return None
+
+    if (a_source_path.exists() == False):
+        print(f"There is no transcripts folder or archive at {a_source_path}.")
+        return None
+
+    if (a_source_path.is_file() == True and is_archive(a_source_path) == False):
+        print(f"{a_source_path} is not a folder or an archive. Archive formats: {', '.join(t_format[0] for t_format in shutil.get_unpack_formats())}")
+        return None
+
+    file_manager.create_folder_if_not_exist(a_projects_folder_path)
+
+    with tempfile.TemporaryDirectory() as t_extract_folder_name:
+        t_transcripts_folder_path = a_source_path
+        if (a_source_path.is_file() == True):
+            print(f"Extracting {a_source_path}...")
+            t_transcripts_folder_path = Path(t_extract_folder_name)
+            await asyncio.to_thread(extract_archive, a_source_path, t_transcripts_folder_path)
+
+        t_transcript_files = get_transcript_files(t_transcripts_folder_path)
+        print(f"Ingesting {len(t_transcript_files)} transcripts into {a_projects_folder_path}...")
+
+        return await _aingest_transcript_files(
+            t_transcript_files, t_transcripts_folder_path, a_projects_folder_path, a_settings, a_stages, a_max_concurrent_projects, a_progress_callback, a_resume,
+            a_lock_project or (lambda a_project_name: nullcontext())
+        )
+
+
+async def _aingest_transcript_files(
+        a_transcript_files: dict[str, Path],
+        a_transcripts_folder_path: Path,
+        a_projects_folder_path: Path,
+        a_settings: ProjectSettings,
+        a_stages: list[str],
+        a_max_concurrent_projects: int,
+        a_progress_callback: Callable[[int, int], None],
+        a_resume: bool,
+        a_lock_project: Callable
+    ) -> dict:
+    t_semaphore = asyncio.Semaphore(a_max_concurrent_projects)
+    t_start_time = time.time()
+
+    async def _aingest_project(a_project_name: str, a_transcript_file_path: Path) -> dict:
+        async with t_semaphore:
+            async with a_lock_project(a_project_name):
+                return await _aingest_transcript(a_project_name, a_transcript_file_path, a_transcripts_folder_path, a_projects_folder_path, a_settings, a_stages, a_resume)
+
+    t_asyncio_tasks = [
+        asyncio.ensure_future(_aingest_project(t_project_name, t_transcript_file_path))
+        for t_project_name, t_transcript_file_path in a_transcript_files.items()
+    ]
+
+    t_project_reports = []
+    try:
+        if (a_progress_callback != None):
+            a_progress_callback(0, len(t_asyncio_tasks))
+
+        for t_done_asyncio_task in asyncio.as_completed(t_asyncio_tasks):
+            t_project_reports.append(await t_done_asyncio_task)
+            if (a_progress_callback != None):
+                a_progress_callback(len(t_project_reports), len(t_asyncio_tasks))
+    except BaseException:
+        #The projects done so far stay saved.
+        for t_asyncio_task in t_asyncio_tasks:
+            t_asyncio_task.cancel()
+        await asyncio.gather(*t_asyncio_tasks, return_exceptions = True)
+        raise
+
+    return get_ingestion_report(sorted(t_project_reports, key = lambda a_report: a_report["project"]), time.time() - t_start_time)
+
+
+async def _aingest_transcript(
+        a_project_name: str,
+        a_transcript_file_path: Path,
+        a_transcripts_folder_path: Path,
+        a_projects_folder_path: Path,
+        a_settings: ProjectSettings,
+        a_stages: list[str],
+        a_resume: bool
+    ) -> dict:
+    #A failing project is reported instead of stopping the other projects.
+    t_project_report = {
+        "project" : a_project_name,
+        "transcript_file" : a_transcript_file_path.relative_to(a_transcripts_folder_path).as_posix(),
+        "status" : "completed",
+        "error" : "",
+        "segments" : 0,
+        "initialise_seconds" : 0,
+        "stages_seconds" : 0,
+        "seconds" : 0,
+        "failed_tasks" : {}
+    }
+    t_start_time = time.time()
+
+    try:
+        t_transcript = a_transcript_file_path.read_text(encoding = "utf8")
+        if (t_transcript.strip() == ""):
+            raise ValueError("The transcript file is empty.")
+
+        #Checked under the project's lock, so no other request creates it in between.
+        if (a_resume == False and (a_projects_folder_path / a_project_name).exists() == True):
+            raise FileExistsError(f"A project called {a_project_name} already exists.")
+
+        t_project = Project(a_name = a_project_name, a_transcript = t_transcript, a_settings = a_settings, a_project_folder_location = a_projects_folder_path)
+        await asyncio.to_thread(t_project.initialise)
+        t_project_report["segments"] = t_project.get_number_of_segments()
+        t_project_report["initialise_seconds"] = round(time.time() - t_start_time, 3)
+
+        if (len(a_stages) > 0):
+            #Opened by name, so run_all does not initialise it again.
+            t_stages_start_time = time.time()
+            t_project = Project(a_name = a_project_name, a_transcript = "", a_settings = a_settings, a_project_folder_location = a_projects_folder_path)
+            t_run_report = await t_project.arun_all(a_stages = a_stages, a_resume = a_resume)
+            t_project_report["failed_tasks"] = t_run_report["pipeline"]["failures"]
+            t_project_report["stages_seconds"] = round(time.time() - t_stages_start_time, 3)
+    except Exception as e:
+        print(f"Ingesting {a_project_name} failed: {e}")
+        t_project_report["status"] = "failed"
+        t_project_report["error"] = repr(e)
+
+    t_project_report["seconds"] = round(time.time() - t_start_time, 3)
+    print(f"Ingested {a_project_name} in {t_project_report['seconds']} seconds, {t_project_report['status']}.")
+
+    return t_project_report
+
+
+def get_ingestion_report(a_project_reports: list[dict], a_wall_seconds: float) -> dict:
+    #Projects with failed stage tasks are completed, their failed tasks are listed per project.
+    t_completed_reports = [t_project_report for t_project_report in a_project_reports if t_project_report["status"] == "completed"]
+
+    return {
+        "projects" : len(a_project_reports),
+        "completed" : len(t_completed_reports),
+        "failed" : len(a_project_reports) - len(t_completed_reports),
+        "projects_with_failed_tasks" : len([t_project_report for t_project_report in t_completed_reports if len(t_project_report["failed_tasks"]) > 0]),
+        "wall_seconds" : round(a_wall_seconds, 3),
+        "mean_project_seconds" : round(sum(t_project_report["seconds"] for t_project_report in a_project_reports) / len(a_project_reports), 3) if len(a_project_reports) > 0 else 0,
+        "failures" : {t_project_report["project"]: t_project_report["error"] for t_project_report in a_project_reports if t_project_report["status"] == "failed"},
+        "project_reports" : a_project_reports
+    }
+
+
+def print_ingestion_report(a_report: dict) -> None:
+    print(f"\nIngested {a_report['completed']} of {a_report['projects']} projects in {a_report['wall_seconds']} seconds, {a_report['failed']} failed.")
+    for t_project_report in a_report["project_reports"]:
+        t_failed_tasks_text = f", {len(t_project_report['failed_tasks'])} failed tasks" if len(t_project_report["failed_tasks"]) > 0 else ""
+        t_error_text = f", {t_project_report['error']}" if t_project_report["error"] != "" else ""
+        print(
+            f"{t_project_report['project']}: {t_project_report['status']}, {t_project_report['segments']} segments, "
+            f"initialise {t_project_report['initialise_seconds']}s, stages {t_project_report['stages_seconds']}s{t_failed_tasks_text}{t_error_text}"
+        )
+
+
+if (__name__ == "__main__"):
+    t_parser = argparse.ArgumentParser(description = "Creates a project for every transcript file of a folder or archive and runs the chosen stages.")
+    t_parser.add_argument("source", type = Path, help = "A folder or archive (zip, tar, tar.gz, ...) of .txt transcript files.")
+    t_parser.add_argument("--projects-folder", type = Path, default = Path("../Projects-Data"))
+    t_parser.add_argument("--settings-file", type = Path, default = None, help = "A project settings.json every project gets, the default settings otherwise.")
+    t_parser.add_argument("--llm", default = "", help = "The model of every project, instead of the settings' one.")
+    t_parser.add_argument("--stages", default = "", help = f"Comma separated stages run after initialising: {', '.join(project.m_pipeline_stages)}")
+    t_parser.add_argument("--max-concurrent-projects", type = int, default = 4)
+    t_parser.add_argument("--max-concurrent-requests", type = int, default = None, help = "Maximum LLM requests in flight over all projects and providers.")
+    t_parser.add_argument("--provider-limits", default = "", help = "Maximum requests in flight per provider, e.g. openai=8,together=4")
+    t_parser.add_argument("--resume", action = "store_true", help = "Skips the stage work the projects' run journals have as done.")
+    t_parser.add_argument("--report-file", type = Path, default = None)
+    t_arguments = t_parser.parse_args()
+
+    t_settings = project_settings.default
+    if (t_arguments.settings_file != None):
+        t_settings = ProjectSettings.dict_to_object(file_manager.load_json_file_data(t_arguments.settings_file))
+    if (t_arguments.llm != ""):
+        t_settings = replace(t_settings, llm_name = t_arguments.llm)
+
+    llm_concurrency.set_limits(
+        a_global_limit = t_arguments.max_concurrent_requests,
+        a_provider_limits = llm_concurrency.get_provider_limits_from_text(t_arguments.provider_limits)
+    )
+
+    t_report = asyncio.run(aingest_transcripts(
+        a_source_path = t_arguments.source,
+        a_projects_folder_path = t_arguments.projects_folder,
+        a_settings = t_settings,
+        a_stages = [t_stage.strip() for t_stage in t_arguments.stages.split(",") if t_stage.strip() != ""],
+        a_max_concurrent_projects = t_arguments.max_concurrent_projects,
+        a_resume = t_arguments.resume
+    ))
+
+    if (t_report == None):
+        sys.exit(1)
+
+    print_ingestion_report(t_report)
+    if (t_arguments.report_file != None):
+        file_manager.create_json_file(t_arguments.report_file, {**t_report, "settings" : asdict(t_settings), "stages" : t_arguments.stages})
@@ -1,22 +1,37 @@
 #Python Imports
+import os
+import json
+import math
+import hashlib
+import asyncio
+import threading
 from pathlib import Path
 from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
 
 #External Imports
-from fastapi import FastAPI
-import json
-
-from langchain_openai import ChatOpenAI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
 from datasets import Dataset 
+import ragas
 from ragas.metrics import context_utilization
 from ragas import evaluate
+from ragas.llms import llm_factory
+from ragas.run_config import RunConfig
 
 from dotenv import load_dotenv
 
 #Custom Imports
 from utilities.few_shot_request_data import FewShotRequestData
+from utilities import langchain_llm
+from utilities import json_repair
+from utilities import rate_limiter
+from utilities import structured_output
+from utilities import file_manager
 from questions.evaluation_data import EvaluationData
+from questions import evaluation_data
 
 
 #Setup
@@ -29,7 +44,13 @@ api = FastAPI(
 
 #Evaluation Variables
 m_chatGPT_model_name = "gpt-4o-mini"
-m_evaluation_generation_llm = ChatOpenAI(model = m_chatGPT_model_name, max_tokens = "1024", temperature = 0.45)
+#Time a metric gets once it has started, the judge client cuts its requests off after the same time.
+m_metric_timeout_seconds: float = float(os.getenv("EVALUATION_METRIC_TIMEOUT_SECONDS", "120"))
+m_evaluation_generation_llm = langchain_llm.get_llm("openai", m_chatGPT_model_name, langchain_llm.LLmType.Evaluation, 0.45, 1024, a_timeout_seconds = m_metric_timeout_seconds)
+
+
+#The plain functions are the evaluations, in-process callers such as QuestionEvaluationData run them on their own threads.
+#The routes run them with asyncio.to_thread, so a request waiting on the judge does not hold up the event loop.
 
 
 #Criteria Based Evaluation with FewShot
@@ -38,7 +59,6 @@ m_relevance_evaluation_few_shot = FewShotRequestData(
     a_files_prefix = "Relevance",
     a_suffix_variables_names = ["text", "question"]
 )
-@api.post("/evaluate-relevance")
 def evaluate_relevance(
     a_question: str,
     a_text: str
@@ -48,13 +68,19 @@ def evaluate_relevance(
 
     return t_result
 
+@api.post("/evaluate-relevance")
+async def aevaluate_relevance(
+    a_question: str,
+    a_text: str
+) -> dict: 
+    return await asyncio.to_thread(evaluate_relevance, a_question, a_text)
+
 
 m_reading_comprehension_few_shot = FewShotRequestData(
     a_guidance_data_folder_path = Path("../Guidance-Data/Reading-Comprehension"),
     a_files_prefix = "Reading-Comprehension",
     a_suffix_variables_names = ["question"]
 )
-@api.post("/evaluate-reading-comprehension")
 def evaluate_reading_comprehension(
     a_question: str
 ) -> dict: 
@@ -63,13 +89,18 @@ def evaluate_reading_comprehension(
 
     return t_result
 
+@api.post("/evaluate-reading-comprehension")
+async def aevaluate_reading_comprehension(
+    a_question: str
+) -> dict: 
+    return await asyncio.to_thread(evaluate_reading_comprehension, a_question)
+
 
 m_question_difficulty_few_shot = FewShotRequestData(
     a_guidance_data_folder_path = Path("../Guidance-Data/Question-Difficulty-Evaluation"),
     a_files_prefix = "Question-Difficulty",
     a_suffix_variables_names = ["text", "question"]
 )
-@api.post("/evaluate-question-difficulty")
 def evaluate_question_difficulty(
     a_question: str,
     a_text: str
@@ -79,13 +110,19 @@ def evaluate_question_difficulty(
 
     return t_result
 
+@api.post("/evaluate-question-difficulty")
+async def aevaluate_question_difficulty(
+    a_question: str,
+    a_text: str
+) -> dict: 
+    return await asyncio.to_thread(evaluate_question_difficulty, a_question, a_text)
+
 
 m_question_clarity_few_shot = FewShotRequestData(
     a_guidance_data_folder_path = Path("../Guidance-Data/Question-Clarity-Evaluation"),
     a_files_prefix = "Question-Clarity",
     a_suffix_variables_names = ["question"]
 )
-@api.post("/evaluate-question-clarity")
 def evaluate_question_clarity(
     a_question: str,
 ) -> dict: 
@@ -94,13 +131,18 @@ def evaluate_question_clarity(
 
     return t_result
 
+@api.post("/evaluate-question-clarity")
+async def aevaluate_question_clarity(
+    a_question: str,
+) -> dict: 
+    return await asyncio.to_thread(evaluate_question_clarity, a_question)
+
 
 m_answer_relevancy_few_shot = FewShotRequestData(
     a_guidance_data_folder_path = Path("../Guidance-Data/Answer-Relevancy-Evaluation"),
     a_files_prefix = "Answer-Relevancy",
     a_suffix_variables_names = ["answer", "ground_truth"]
 )
-@api.post("/evaluate-answer-relevancy")
 def evaluate_answer_relevancy(
     a_answer: str,
     a_ground_truth: str
@@ -110,48 +152,499 @@ def evaluate_answer_relevancy(
 
     return t_result
 
+@api.post("/evaluate-answer-relevancy")
+async def aevaluate_answer_relevancy(
+    a_answer: str,
+    a_ground_truth: str
+) -> dict: 
+    return await asyncio.to_thread(evaluate_answer_relevancy, a_answer, a_ground_truth)
+
 
 m_answer_correctness_few_shot = FewShotRequestData(
     a_guidance_data_folder_path = Path("../Guidance-Data/Answer-Correctness-Evaluation"),
     a_files_prefix = "Answer-Correctness",
     a_suffix_variables_names = ["text", "question", "answer"]
 )
-@api.post("/evaluate-answer-correctness")
 def evaluate_answer_correctness(
     a_text: str,
     a_question: str, 
     a_answer: str,
-) -> dict:
+) -> dict: 
     t_suffix = m_answer_correctness_few_shot.suffix_templates[0].format(answer = a_answer, question = a_question, text = a_text)
     t_result: dict = _generate_evaluation(m_answer_correctness_few_shot, t_suffix)
-    
+
     return t_result
 
+@api.post("/evaluate-answer-correctness")
+async def aevaluate_answer_correctness(
+    a_text: str,
+    a_question: str, 
+    a_answer: str,
+) -> dict: 
+    return await asyncio.to_thread(evaluate_answer_correctness, a_text, a_question, a_answer)
+
+
+#Combined judge, scores the six criteria above in one request per question instead of six.
+m_combined_evaluation_criteria: list[str] = evaluation_data.m_custom_criteria
+m_combined_evaluation_few_shot = FewShotRequestData(
+    a_guidance_data_folder_path = Path("../Guidance-Data/Combined-Evaluation"),
+    a_files_prefix = "Combined-Evaluation",
+    a_suffix_variables_names = ["text", "question", "answer", "ground_truth"]
+)
+
+def evaluate_combined(
+    a_text: str,
+    a_question: str,
+    a_answer: str,
+    a_ground_truth: str
+) -> dict[str, dict]:
+    t_suffix = m_combined_evaluation_few_shot.suffix_templates[0].format(text = a_text, question = a_question, answer = a_answer, ground_truth = a_ground_truth)
+
+    t_number_of_tries: int = int(2)
+    for i in range(t_number_of_tries):
+        t_generation_result: str = m_combined_evaluation_few_shot.send_request(
+            a_prefix_index = 0,
+            a_suffix = t_suffix,
+            a_llm = m_evaluation_generation_llm,
+            a_bypass_cache = i > 0
+        )
+
+        t_generation_result = _parse_combined_evaluation_response(t_generation_result, i, t_number_of_tries)
+        if (t_generation_result != None):
+            break
+
+    return _get_combined_evaluation_data_dicts(t_generation_result)
+
+
+@api.post("/evaluate-combined")
+async def aevaluate_combined(
+    a_text: str,
+    a_question: str,
+    a_answer: str,
+    a_ground_truth: str
+) -> dict[str, dict]:
+    return await asyncio.to_thread(evaluate_combined, a_text, a_question, a_answer, a_ground_truth)
+
+
+def _get_combined_evaluation_data_dicts(a_generation_result: dict | None) -> dict[str, dict]:
+    #Same dicts of EvaluationData as the single criteria evaluations, keyed by criterion.
+    t_results: dict[str, dict] = {}
+    for t_criterion in m_combined_evaluation_criteria:
+        if (a_generation_result == None):
+            t_results[t_criterion] = _get_evaluation_data_dict(None)
+        else:
+            t_results[t_criterion] = _get_evaluation_data_dict({"response" : a_generation_result["response"][t_criterion]})
+
+    return t_results
+
+
+#Segment batched evaluation, scores all questions of a segment for one criterion in a single request so the text is only sent once.
+m_batch_evaluation_few_shots: dict[str, FewShotRequestData] = {
+    "relevance" : m_relevance_evaluation_few_shot,
+    "reading_comprehension" : m_reading_comprehension_few_shot,
+    "question_difficulty" : m_question_difficulty_few_shot,
+    "question_clarity" : m_question_clarity_few_shot,
+    "answer_relevance" : m_answer_relevancy_few_shot,
+    "answer_correctness" : m_answer_correctness_few_shot,
+}
+#Replaces the single question suffix, the criterion's prefix and examples stay the same. Its fingerprint is part of the batched
+#results' cache identity, like the criterion's.
+m_batch_evaluation_suffix_templates: list[str] = file_manager.load_text_file_into_list(Path("../Guidance-Data/Batch-Evaluation/Batch-Evaluation-suffix-templates.txt"))
+m_batch_evaluation_fingerprint: str = hashlib.sha256(json.dumps(m_batch_evaluation_suffix_templates).encode("utf8")).hexdigest()
+
+#A batch is split in half when its prompt or its expected response would be too long.
+m_batch_evaluation_max_prompt_tokens: int = int(os.getenv("EVALUATION_BATCH_MAX_PROMPT_TOKENS", "6000"))
+m_batch_evaluation_max_items: int = int(os.getenv("EVALUATION_BATCH_MAX_ITEMS", "8"))
+
+def evaluate_batch(
+    a_criterion: str,
+    a_text: str,
+    a_items: list[dict]
+) -> list[dict]:
+    #a_items are dicts with "question", "answer" and "ground_truth", returns the EvaluationData dicts in the same order.
+    if (a_criterion not in m_batch_evaluation_few_shots):
+        print(f"There is no batched evaluation for the criterion: {a_criterion}. Returning empty EvaluationData dicts!")
+        return [asdict(EvaluationData()) for t_item in a_items]
+
+    if (len(a_items) == 0):
+        return []
+
+    t_few_shot_request = m_batch_evaluation_few_shots[a_criterion]
+
+    #A single item uses the normal prompt.
+    if (len(a_items) == 1):
+        return [_generate_evaluation(t_few_shot_request, _get_single_evaluation_suffix(t_few_shot_request, a_text, a_items[0]))]
+
+    t_suffix = _get_batch_evaluation_suffix(t_few_shot_request, a_text, a_items)
+    t_prompt_tokens = rate_limiter.estimate_tokens(t_few_shot_request.get_prompt(0, t_suffix))
+    if (len(a_items) > m_batch_evaluation_max_items or t_prompt_tokens > m_batch_evaluation_max_prompt_tokens):
+        return _split_batch_evaluation(a_criterion, a_text, a_items)
+
+    t_generation_result: str = t_few_shot_request.send_request(
+        a_prefix_index = 0,
+        a_suffix = t_suffix,
+        a_llm = m_evaluation_generation_llm,
+        a_request_name = t_few_shot_request.name + "-Batch"
+    )
+
+    t_results = _get_batch_evaluation_data_dicts(a_criterion, t_generation_result, len(a_items))
+    for i, t_result in enumerate(t_results):
+        if (t_result == None):
+            t_results[i] = _generate_evaluation(t_few_shot_request, _get_single_evaluation_suffix(t_few_shot_request, a_text, a_items[i]))
+
+    return t_results
+
+
+def _split_batch_evaluation(a_criterion: str, a_text: str, a_items: list[dict]) -> list[dict]:
+    #Only for batches that are too large up front, so the number of halves is bounded by the batch size.
+    t_middle_index = len(a_items) // 2
+    return evaluate_batch(a_criterion, a_text, a_items[:t_middle_index]) + evaluate_batch(a_criterion, a_text, a_items[t_middle_index:])
+
+
+class BatchEvaluationItem(BaseModel):
+    question: str
+    answer: str | list[str]
+    ground_truth: str
+
+class BatchEvaluationRequest(BaseModel):
+    criterion: str
+    text: str
+    items: list[BatchEvaluationItem]
+
+@api.post("/evaluate-batch")
+async def aevaluate_batch(
+    a_request: BatchEvaluationRequest
+) -> list[dict]:
+    #Same item limit as /evaluate-items.
+    if (len(a_request.items) > m_items_max_per_request):
+        raise HTTPException(status_code = 413, detail = f"{len(a_request.items)} items is more than the limit of {m_items_max_per_request} per request.")
+
+    return await asyncio.to_thread(evaluate_batch, a_request.criterion, a_request.text, [dict(t_item) for t_item in a_request.items])
+
+
+def _get_batch_evaluation_suffix(a_few_shot_request: FewShotRequestData, a_text: str, a_items: list[dict]) -> str:
+    t_item_variables_names = [t_name for t_name in a_few_shot_request.suffix_variables_names if t_name != "text"]
+
+    t_item_lines = []
+    for i, t_item in enumerate(a_items):
+        t_item_parts = [f'{t_name.replace("_", " ")}: "{t_item[t_name]}"' for t_name in t_item_variables_names]
+        t_item_lines.append(f"Item {i + 1}: " + ", ".join(t_item_parts))
+
+    t_text_part = ""
+    if ("text" in a_few_shot_request.suffix_variables_names):
+        t_text_part = f' Evaluate them against this text: "{a_text}"'
+
+    #The template is a single line, the items go on their own lines.
+    t_suffix = m_batch_evaluation_suffix_templates[0].format(text_part = t_text_part, items = "\n" + "\n".join(t_item_lines) + "\n")
+
+    #The suffix is formatted once more when the prompt is assembled, so all of its braces are escaped.
+    return t_suffix.replace("{", "{{").replace("}", "}}")
+
+
+def _get_single_evaluation_suffix(a_few_shot_request: FewShotRequestData, a_text: str, a_item: dict) -> str:
+    t_values = {"text" : a_text, **a_item}
+    return a_few_shot_request.suffix_templates[0].format(**{t_name: t_values[t_name] for t_name in a_few_shot_request.suffix_variables_names})
+
+
+def _get_batch_evaluation_data_dicts(a_criterion: str, a_generation_result: str, a_number_of_items: int) -> list[dict | None]:
+    #None for the items the response has no valid result for. Those are evaluated one by one with the normal prompt, splitting
+    #the batch again on a bad response could cost about twice as many requests as there are items.
+    t_batch_results = _parse_batch_evaluation_response(a_generation_result, a_number_of_items)
+
+    t_number_of_missing_results = t_batch_results.count(None)
+    if (t_number_of_missing_results > 0):
+        print(f"The batched {a_criterion} evaluation did not return a valid result for {t_number_of_missing_results} of {a_number_of_items} items. Evaluating those one by one...")
+
+    return [_get_evaluation_data_dict({"response" : t_batch_result}) if t_batch_result != None else None for t_batch_result in t_batch_results]
+
+
+def _parse_batch_evaluation_response(a_generation_result: str, a_number_of_items: int) -> list[dict | None]:
+    t_generation_result = json_repair.parse_json_object(a_generation_result)
+    if (t_generation_result == None or isinstance(t_generation_result.get("response", None), list) == False):
+        return [None] * a_number_of_items
+
+    #Matched by item number, falling back to the position in the list.
+    t_batch_results: list[dict | None] = [None] * a_number_of_items
+    for i, t_item_result in enumerate(t_generation_result["response"]):
+        if (isinstance(t_item_result, dict) == False or "score" not in t_item_result or "reasoning" not in t_item_result):
+            continue
+
+        try:
+            t_item_index = int(t_item_result.get("item", i + 1)) - 1
+        except (TypeError, ValueError):
+            t_item_index = i
+
+        if (0 <= t_item_index < a_number_of_items):
+            t_batch_results[t_item_index] = t_item_result
+
+    return t_batch_results
+
+
+#Ragas evaluation setup, created once and shared by every context utilisation run.
+m_ragas_run_config = RunConfig(
+    max_workers = int(os.getenv("RAGAS_MAX_WORKERS", "16")),
+    timeout = int(os.getenv("RAGAS_TIMEOUT_SECONDS", "180"))
+)
+#Rows per evaluate() run in the project level batch.
+m_ragas_batch_size: int = int(os.getenv("RAGAS_BATCH_SIZE", "200"))
+
+m_ragas_evaluator_llm = None
+m_ragas_evaluator_llm_lock = threading.Lock()
+
+def _get_ragas_evaluator_llm():
+    #llm_factory is ragas' default judge, so the scores stay the same as when ragas created it on every call.
+    global m_ragas_evaluator_llm
+
+    with m_ragas_evaluator_llm_lock:
+        if (m_ragas_evaluator_llm == None):
+            m_ragas_evaluator_llm = llm_factory()
+
+    return m_ragas_evaluator_llm
+
 
-@api.post("/evaluate-context-utilisation")
 def evaluate_context_utilisation(
     a_text: str,
     a_question: str,
     a_answer: str
 ) -> dict:
-    if (isinstance(a_answer, list) == True):
-        a_answer = ", ".join(a_answer)
-    elif (isinstance(a_answer, bool) == True):
-        a_answer = str(a_answer)
-
     t_evaluation_data = {
         "question" : [a_question],
-        "answer" : [a_answer],
+        "answer" : [_get_ragas_answer(a_answer)],
         "contexts" : [[a_text]]
     }
 
     t_evaluation_dataset = Dataset.from_dict(t_evaluation_data)
-    t_evaluation_score = evaluate(t_evaluation_dataset, metrics = [context_utilization])
+    t_evaluation_score = evaluate(
+        t_evaluation_dataset, 
+        metrics = [context_utilization], 
+        llm = _get_ragas_evaluator_llm(), 
+        run_config = m_ragas_run_config
+    )
 
     t_evaluation = EvaluationData(score = round(t_evaluation_score["context_utilization"], 2), reasoning = "")
     return asdict(t_evaluation)
 
 
+def evaluate_context_utilisation_batch(
+    a_items: list[dict]
+) -> list[dict]:
+    #a_items are dicts with "text", "question" and "answer", returns the EvaluationData dicts in the same order.
+    #Scoring many rows per evaluate() run lets ragas run them concurrently instead of setting up a run per question.
+    t_results: list[dict] = []
+
+    for t_batch_start_index in range(0, len(a_items), m_ragas_batch_size):
+        t_batch_items = a_items[t_batch_start_index:t_batch_start_index + m_ragas_batch_size]
+        print(f"\nEvaluating context utilisation of {len(t_batch_items)} questions...")
+
+        t_evaluation_data = {
+            "question" : [t_item["question"] for t_item in t_batch_items],
+            "answer" : [_get_ragas_answer(t_item["answer"]) for t_item in t_batch_items],
+            "contexts" : [[t_item["text"]] for t_item in t_batch_items]
+        }
+
+        try:
+            t_evaluation_result = evaluate(
+                Dataset.from_dict(t_evaluation_data), 
+                metrics = [context_utilization], 
+                llm = _get_ragas_evaluator_llm(), 
+                run_config = m_ragas_run_config,
+                raise_exceptions = False
+            )
+            t_scores = t_evaluation_result.to_pandas()["context_utilization"].tolist()
+        except Exception as e:
+            print(f"The context utilisation batch evaluation failed: {e}. Returning empty EvaluationData dicts for the batch!")
+            t_scores = [None] * len(t_batch_items)
+
+        for t_score in t_scores:
+            #Rows that failed inside ragas come back as NaN.
+            if (t_score == None or math.isnan(t_score) == True):
+                t_results.append(asdict(EvaluationData()))
+            else:
+                t_results.append(asdict(EvaluationData(score = round(t_score, 2), reasoning = "")))
+
+    return t_results
+
+
+#Ragas runs its own event loop inside evaluate(), so it has to be run on a worker thread like the routes above.
+@api.post("/evaluate-context-utilisation")
+async def aevaluate_context_utilisation(
+    a_text: str,
+    a_question: str,
+    a_answer: str
+) -> dict:
+    return await asyncio.to_thread(evaluate_context_utilisation, a_text, a_question, a_answer)
+
+
+class ContextUtilisationBatchItem(BaseModel):
+    text: str
+    question: str
+    answer: str | list[str]
+
+@api.post("/evaluate-context-utilisation-batch")
+async def aevaluate_context_utilisation_batch(
+    a_items: list[ContextUtilisationBatchItem]
+) -> list[dict]:
+    #Same item limit as /evaluate-items.
+    if (len(a_items) > m_items_max_per_request):
+        raise HTTPException(status_code = 413, detail = f"{len(a_items)} items is more than the limit of {m_items_max_per_request} per request.")
+
+    return await asyncio.to_thread(evaluate_context_utilisation_batch, [dict(t_item) for t_item in a_items])
+
+
+def _get_ragas_answer(a_answer) -> str:
+    if (isinstance(a_answer, list) == True):
+        return ", ".join(a_answer)
+    elif (isinstance(a_answer, bool) == True):
+        return str(a_answer)
+
+    return a_answer
+
+
+#Dataset evaluation, scores many items with any of the metrics above in one HTTP request.
+#Every item is a dict with "text", "question", "answer" and "ground_truth", each metric only reads the ones it needs.
+#The metrics of an item are evaluated side by side and cached like a project's questions, see QuestionEvaluationData.
+m_item_metrics: list[str] = m_combined_evaluation_criteria + ["context_utilisation"]
+
+#Shared by all requests so the number of items evaluated at once is bounded for the whole server.
+m_items_evaluation_executor = ThreadPoolExecutor(
+    max_workers = int(os.getenv("EVALUATION_ITEMS_MAX_WORKERS", "16")),
+    thread_name_prefix = "items-evaluation"
+)
+#Items of one request in flight at once, so one large request does not take every worker.
+m_items_max_concurrent_per_request: int = int(os.getenv("EVALUATION_ITEMS_MAX_CONCURRENT_PER_REQUEST", "8"))
+#Per request limits, larger requests are rejected before anything is evaluated. The body size is checked while it is read,
+#so a large body is neither held in memory nor parsed.
+m_items_max_per_request: int = int(os.getenv("EVALUATION_ITEMS_MAX_PER_REQUEST", "1000"))
+m_items_max_request_bytes: int = int(os.getenv("EVALUATION_ITEMS_MAX_REQUEST_BYTES", "4000000"))
+
+@api.post("/evaluate-items")
+async def evaluate_items(
+    a_request: Request
+) -> StreamingResponse:
+    #Streams one NDJSON line per item as soon as it finishes, {"index": <item index>, "results": {<metric>: <EvaluationData dict>}},
+    #in completion order, followed by a last line with the totals. No metrics means the six custom criteria.
+    #The request body is {"a_items": [...], "a_metrics": [...]}.
+    t_body = await _read_items_request_body(a_request)
+
+    try:
+        t_body_dict = json.loads(t_body)
+    except ValueError:
+        raise HTTPException(status_code = 422, detail = "The request body is not valid JSON.")
+
+    t_items = t_body_dict.get("a_items", None) if isinstance(t_body_dict, dict) == True else None
+    t_metrics = t_body_dict.get("a_metrics", []) if isinstance(t_body_dict, dict) == True else None
+    if (isinstance(t_items, list) == False or any(isinstance(t_item, dict) == False for t_item in t_items)):
+        raise HTTPException(status_code = 422, detail = "a_items has to be a list of item objects.")
+    if (isinstance(t_metrics, list) == False or any(isinstance(t_metric, str) == False for t_metric in t_metrics)):
+        raise HTTPException(status_code = 422, detail = "a_metrics has to be a list of metric names.")
+
+    if (len(t_metrics) == 0):
+        t_metrics = m_combined_evaluation_criteria
+
+    t_unknown_metrics = [t_metric for t_metric in t_metrics if t_metric not in m_item_metrics]
+    if (len(t_unknown_metrics) > 0):
+        raise HTTPException(status_code = 422, detail = f"Unknown metrics: {', '.join(t_unknown_metrics)}. Valid metrics: {', '.join(m_item_metrics)}")
+
+    if (len(t_items) > m_items_max_per_request):
+        raise HTTPException(status_code = 413, detail = f"{len(t_items)} items is more than the limit of {m_items_max_per_request} per request.")
+
+    return StreamingResponse(_stream_items_evaluation(t_items, t_metrics), media_type = "application/x-ndjson")
+
+
+async def _read_items_request_body(a_request: Request) -> bytes:
+    #Content-Length rejects a large body up front, counting the streamed chunks also covers chunked requests without one.
+    t_content_length = a_request.headers.get("content-length", None)
+    if (t_content_length != None and t_content_length.isdigit() == True and int(t_content_length) > m_items_max_request_bytes):
+        raise HTTPException(status_code = 413, detail = f"The request body is {t_content_length} bytes, more than the limit of {m_items_max_request_bytes} per request.")
+
+    t_body = bytearray()
+    async for t_chunk in a_request.stream():
+        t_body.extend(t_chunk)
+        if (len(t_body) > m_items_max_request_bytes):
+            raise HTTPException(status_code = 413, detail = f"The request body is more than the limit of {m_items_max_request_bytes} bytes per request.")
+
+    return bytes(t_body)
+
+
+async def _stream_items_evaluation(a_items: list[dict], a_metrics: list[str]):
+    #Async generator, so waiting for the next item does not hold a worker thread.
+    t_pending_items = iter(enumerate(a_items))
+    t_futures = {}
+    t_failed_items_count = 0
+
+    def _submit_next_item() -> None:
+        t_next_item = next(t_pending_items, None)
+        if (t_next_item != None):
+            t_futures[asyncio.wrap_future(m_items_evaluation_executor.submit(_evaluate_item, t_next_item[1], a_metrics))] = t_next_item[0]
+
+    try:
+        for i in range(m_items_max_concurrent_per_request):
+            _submit_next_item()
+
+        while (len(t_futures) > 0):
+            t_done_futures, t_not_done_futures = await asyncio.wait(t_futures, return_when = asyncio.FIRST_COMPLETED)
+            for t_future in t_done_futures:
+                t_item_index = t_futures.pop(t_future)
+                try:
+                    t_line = {"index" : t_item_index, "results" : t_future.result()}
+                except Exception as e:
+                    t_failed_items_count += 1
+                    t_line = {"index" : t_item_index, "error" : str(e)}
+
+                yield json.dumps(t_line) + "\n"
+                _submit_next_item()
+
+        yield json.dumps({"done" : True, "items" : len(a_items), "failed" : t_failed_items_count}) + "\n"
+    finally:
+        #The client disconnected, items not started yet are dropped.
+        for t_future in t_futures:
+            t_future.cancel()
+
+
+def _evaluate_item(a_item: dict, a_metrics: list[str]) -> dict[str, dict]:
+    #Imported here, question_evaluation_data imports this module.
+    from questions.question_evaluation_data import QuestionEvaluationData
+
+    t_missing_fields = [t_field for t_field in ["text", "question", "answer", "ground_truth"] if t_field not in a_item]
+    if (len(t_missing_fields) > 0):
+        raise ValueError(f"The item is missing: {', '.join(t_missing_fields)}")
+
+    #Failed metrics come back as empty EvaluationData dicts.
+    t_evaluation_data = QuestionEvaluationData.evaluate_question(
+        a_text = a_item["text"],
+        a_ground_truth = _get_ground_truth(a_item["ground_truth"]),
+        a_question = a_item["question"],
+        a_answer = _get_ragas_answer(a_item["answer"]),
+        a_do_context_utilisation = "context_utilisation" in a_metrics,
+        a_metrics = a_metrics
+    )
+
+    return {t_metric: asdict(getattr(t_evaluation_data, t_metric)) for t_metric in a_metrics}
+
+
+def _get_ground_truth(a_ground_truth) -> str:
+    if (isinstance(a_ground_truth, list) == True):
+        return ", ".join(map(str, a_ground_truth))
+
+    return a_ground_truth
+
+
+def get_metric_cache_identity(a_metric_name: str, a_batched: bool = False) -> tuple[str, str]:
+    #The judge model and the prompt fingerprint a metric's cached results are keyed on, see utilities/evaluation_cache.py.
+    if (a_metric_name in m_batch_evaluation_few_shots and a_batched == True):
+        t_prompt_fingerprint = hashlib.sha256((m_batch_evaluation_few_shots[a_metric_name].fingerprint + m_batch_evaluation_fingerprint).encode("utf8")).hexdigest()
+        return structured_output.get_model_name(m_evaluation_generation_llm), t_prompt_fingerprint
+    elif (a_metric_name in m_batch_evaluation_few_shots):
+        return structured_output.get_model_name(m_evaluation_generation_llm), m_batch_evaluation_few_shots[a_metric_name].fingerprint
+    elif (a_metric_name == "combined"):
+        return structured_output.get_model_name(m_evaluation_generation_llm), m_combined_evaluation_few_shot.fingerprint
+    elif (a_metric_name == "context_utilisation"):
+        t_ragas_llm = _get_ragas_evaluator_llm()
+        return structured_output.get_model_name(getattr(t_ragas_llm, "langchain_llm", t_ragas_llm)), "ragas-" + ragas.__version__ + "-context_utilization"
+
+    return "", ""
+
+
 def _generate_evaluation(
         a_few_shot_request: FewShotRequestData,
         a_suffix: str, 
@@ -163,23 +656,66 @@ def _generate_evaluation(
         t_generation_result: str = a_few_shot_request.send_request(
             a_prefix_index = 0,
             a_suffix = a_suffix,
-            a_llm = a_generation_llm
-        ).replace("```json", "").replace("```", "")
+            a_llm = a_generation_llm,
+            a_bypass_cache = i > 0
+        )
 
-        try:
-            t_generation_result = json.loads(t_generation_result)
+        t_generation_result = _parse_evaluation_response(t_generation_result, i, t_number_of_tries)
+        if (t_generation_result != None):
             break
-        except:
-            print("The evaluation text generation did not return a valid json format!")
-            print(f"The generated evaluation text:\n{t_generation_result}")
 
-            if (i < t_number_of_tries):
-                print("Retrying...")
-            else:
-                print("Returning an empty EvaluationData dict!")
-                return asdict(EvaluationData())
+    return _get_evaluation_data_dict(t_generation_result)
+
+
+def _parse_evaluation_response(a_generation_result: str, a_try_index: int, a_number_of_tries: int) -> dict | None:
+    #Text around the json, code fences, trailing commas and quote issues are repaired locally instead of re-sending the request.
+    t_generation_result = json_repair.parse_json_object(a_generation_result)
+
+    if (t_generation_result != None and isinstance(t_generation_result.get("response", None), dict) == True):
+        if ("score" in t_generation_result["response"] and "reasoning" in t_generation_result["response"]):
+            return t_generation_result
+
+    print("The evaluation text generation did not return a valid json format!")
+    print(f"The generated evaluation text:\n{a_generation_result}")
+
+    if (a_try_index < a_number_of_tries - 1):
+        print("Retrying...")
+    else:
+        print("Returning an empty EvaluationData dict!")
+
+    return None
+
+
+def _parse_combined_evaluation_response(a_generation_result: str, a_try_index: int, a_number_of_tries: int) -> dict | None:
+    t_generation_result = json_repair.parse_json_object(a_generation_result)
+
+    if (t_generation_result != None and isinstance(t_generation_result.get("response", None), dict) == True):
+        t_is_valid = True
+        for t_criterion in m_combined_evaluation_criteria:
+            t_criterion_result = t_generation_result["response"].get(t_criterion, None)
+            if (isinstance(t_criterion_result, dict) == False or "score" not in t_criterion_result or "reasoning" not in t_criterion_result):
+                t_is_valid = False
+                break
+
+        if (t_is_valid == True):
+            return t_generation_result
+
+    print("The combined evaluation did not return a valid json format with all criteria!")
+    print(f"The generated evaluation text:\n{a_generation_result}")
+
+    if (a_try_index < a_number_of_tries - 1):
+        print("Retrying...")
+    else:
+        print("Returning empty EvaluationData dicts!")
+
+    return None
+
+
+def _get_evaluation_data_dict(a_generation_result: dict | None) -> dict:
+    if (a_generation_result == None):
+        return asdict(EvaluationData())
 
-    t_evaluation_data = EvaluationData(score = t_generation_result["response"]["score"], reasoning = t_generation_result["response"]["reasoning"])
+    t_evaluation_data = EvaluationData(score = a_generation_result["response"]["score"], reasoning = a_generation_result["response"]["reasoning"])
 
     if (isinstance(t_evaluation_data.score, str) == True):
         if t_evaluation_data.score.startswith("T"):
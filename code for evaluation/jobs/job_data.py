@@ -0,0 +1,103 @@
+#Python Imports
+from dataclasses import dataclass, field
+
+
+#Job statuses
+m_queued_status: str = "queued"
+m_running_status: str = "running"
+m_completed_status: str = "completed"
+m_failed_status: str = "failed"
+m_cancelled_status: str = "cancelled"
+
+m_finished_statuses: list[str] = [m_completed_status, m_failed_status, m_cancelled_status]
+
+
+@dataclass
+class JobData:
+    id: str
+    operation: str
+    project_name: str
+    arguments: dict = field(default_factory = dict)
+
+    status: str = m_queued_status
+    segments_done: int = 0
+    segments_total: int = 0
+    cancel_requested: bool = False
+
+    result: object = None
+    error: str = ""
+
+    created_time: float = -1
+    started_time: float = -1
+    finished_time: float = -1
+
+    def is_finished(self) -> bool:
+        return self.status in m_finished_statuses
+
+    def get_status_dict(self) -> dict:
+        #Everything but the result, which can be large.
+        return {
+            JobData.id_dict_key() : self.id,
+            JobData.operation_dict_key() : self.operation,
+            JobData.project_name_dict_key() : self.project_name,
+            JobData.status_dict_key() : self.status,
+            JobData.segments_done_dict_key() : self.segments_done,
+            JobData.segments_total_dict_key() : self.segments_total,
+            JobData.error_dict_key() : self.error,
+            JobData.created_time_dict_key() : self.created_time,
+            JobData.started_time_dict_key() : self.started_time,
+            JobData.finished_time_dict_key() : self.finished_time,
+        }
+
+    @staticmethod
+    def dict_to_object(a_dict: dict):
+        try:
+            return JobData(**a_dict)
+        except Exception as t_exception:
+            print("The dictionary provided to convert to a JobData object is not valid! Returning None...")
+            print(f"Exception:\n{t_exception}")
+            return None
+
+    @classmethod
+    def id_dict_key(cls) -> str:
+        return "id"
+
+    @classmethod
+    def operation_dict_key(cls) -> str:
+        return "operation"
+
+    @classmethod
+    def project_name_dict_key(cls) -> str:
+        return "project_name"
+
+    @classmethod
+    def status_dict_key(cls) -> str:
+        return "status"
+
+    @classmethod
+    def segments_done_dict_key(cls) -> str:
+        return "segments_done"
+
+    @classmethod
+    def segments_total_dict_key(cls) -> str:
+        return "segments_total"
+
+    @classmethod
+    def result_dict_key(cls) -> str:
+        return "result"
+
+    @classmethod
+    def error_dict_key(cls) -> str:
+        return "error"
+
+    @classmethod
+    def created_time_dict_key(cls) -> str:
+        return "created_time"
+
+    @classmethod
+    def started_time_dict_key(cls) -> str:
+        return "started_time"
+
+    @classmethod
+    def finished_time_dict_key(cls) -> str:
+        return "finished_time"
@@ -0,0 +1,226 @@
+#Python Imports
+import time
+import uuid
+import threading
+from pathlib import Path
+from collections import deque
+from typing import Callable
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor
+
+#Custom Imports
+from utilities import file_manager
+from jobs.job_data import JobData
+from jobs import job_data
+
+
+class JobCancelledError(Exception):
+    pass
+
+
+class JobManager:
+    #Runs long operations in the background on a bounded pool. Every job is saved to its own json file, so jobs that were
+    #queued or running when the server stopped are started again by resume().
+    #An operation is called with (JobData, progress callback) and returns the job's result. It reports its progress by calling
+    #the callback with (segments done, segments total), which raises JobCancelledError once the job has been cancelled.
+    #Jobs of the same project run one after the other, in the order they were submitted, so one job never overwrites another's
+    #results. Jobs of different projects run side by side.
+    #Finished jobs are kept for a_retention_seconds, then their files are deleted when jobs are submitted or resumed.
+
+    def __init__(
+            self,
+            a_jobs_folder_path: Path,
+            a_operations: dict[str, Callable],
+            a_max_workers: int = 2,
+            a_max_queued_jobs: int = 100,
+            a_retention_seconds: float = 7 * 24 * 60 * 60
+        ):
+        self.jobs_folder_path: Path = a_jobs_folder_path
+        self.operations: dict[str, Callable] = a_operations
+        self.max_queued_jobs: int = a_max_queued_jobs
+        self.retention_seconds: float = a_retention_seconds
+
+        self.executor = ThreadPoolExecutor(max_workers = a_max_workers, thread_name_prefix = "job")
+        self.jobs: dict[str, JobData] = {}
+        self.futures: dict = {}
+        #Projects with a job in the pool, and per project the ids of the queued jobs waiting for it to finish.
+        self.active_projects: set[str] = set()
+        self.waiting_jobs: dict[str, deque[str]] = {}
+        self.lock = threading.Lock()
+
+        file_manager.create_folder_if_not_exist(self.jobs_folder_path)
+
+    def submit(self, a_operation: str, a_project_name: str, a_arguments: dict = None) -> JobData | None:
+        if (a_operation not in self.operations):
+            print(f"There is no job operation called {a_operation}. Valid operations: {', '.join(self.operations)}")
+            return None
+
+        self.prune()
+
+        with self.lock:
+            t_queued_jobs_count = sum(1 for t_job in self.jobs.values() if t_job.status == job_data.m_queued_status)
+            if (t_queued_jobs_count >= self.max_queued_jobs):
+                print(f"There are already {t_queued_jobs_count} queued jobs. Not submitting the {a_operation} job.")
+                return None
+
+            t_job = JobData(
+                id = uuid.uuid4().hex,
+                operation = a_operation,
+                project_name = a_project_name,
+                arguments = a_arguments or {},
+                created_time = time.time()
+            )
+            self.jobs[t_job.id] = t_job
+            self._save(t_job)
+            self._start(t_job)
+
+        print(f"Submitted the {a_operation} job {t_job.id} for {a_project_name}.")
+        return t_job
+
+    def resume(self) -> int:
+        #Loads the saved jobs and starts the unfinished ones again, returns how many were started.
+        #Started in the order they were submitted, the file names are random ids, so a project's jobs keep their order.
+        t_jobs = []
+        for t_job_file_path in self.jobs_folder_path.glob("*.json"):
+            t_job = JobData.dict_to_object(file_manager.load_json_file_data(t_job_file_path))
+            if (t_job != None):
+                t_jobs.append(t_job)
+
+        t_resumed_jobs_count = 0
+        for t_job in sorted(t_jobs, key = lambda a_job: a_job.created_time):
+            with self.lock:
+                if (t_job.id in self.jobs):
+                    continue
+                self.jobs[t_job.id] = t_job
+
+                if (t_job.is_finished() == True):
+                    continue
+
+                #A job that was running is started over, the operations save their work per segment and with a_resume
+                #skip the segments their run journal has as done.
+                t_job.status = job_data.m_queued_status
+                t_job.arguments["a_resume"] = True
+                t_job.started_time = -1
+                self._save(t_job)
+                self._start(t_job)
+                t_resumed_jobs_count += 1
+
+        if (t_resumed_jobs_count > 0):
+            print(f"Resumed {t_resumed_jobs_count} unfinished jobs.")
+
+        self.prune()
+        return t_resumed_jobs_count
+
+    def prune(self) -> int:
+        #Deletes the jobs that finished more than retention_seconds ago, returns how many were deleted.
+        t_oldest_finished_time = time.time() - self.retention_seconds
+
+        with self.lock:
+            t_expired_jobs = [
+                t_job for t_job in self.jobs.values()
+                if (t_job.is_finished() == True and t_job.finished_time < t_oldest_finished_time)
+            ]
+            for t_job in t_expired_jobs:
+                del self.jobs[t_job.id]
+                (self.jobs_folder_path / (t_job.id + ".json")).unlink(missing_ok = True)
+
+        if (len(t_expired_jobs) > 0):
+            print(f"Deleted {len(t_expired_jobs)} jobs that finished more than {self.retention_seconds} seconds ago.")
+
+        return len(t_expired_jobs)
+
+    def get_job(self, a_job_id: str) -> JobData | None:
+        with self.lock:
+            return self.jobs.get(a_job_id, None)
+
+    def cancel(self, a_job_id: str) -> bool:
+        #Queued jobs are dropped straight away, running jobs stop at their next progress report.
+        with self.lock:
+            t_job = self.jobs.get(a_job_id, None)
+            if (t_job == None or t_job.is_finished() == True):
+                return False
+
+            t_job.cancel_requested = True
+            t_future = self.futures.get(a_job_id, None)
+            t_waiting_jobs = self.waiting_jobs.get(t_job.project_name, deque())
+            if (t_job.status == job_data.m_queued_status and a_job_id in t_waiting_jobs):
+                t_waiting_jobs.remove(a_job_id)
+                self._finish(t_job, job_data.m_cancelled_status)
+            elif (t_job.status == job_data.m_queued_status and t_future != None and t_future.cancel() == True):
+                self._finish(t_job, job_data.m_cancelled_status)
+                self._start_next(t_job.project_name)
+            else:
+                self._save(t_job)
+
+        return True
+
+    def _start(self, a_job: JobData) -> None:
+        #Called with the lock held. Waits for the project's job in the pool to finish first.
+        if (a_job.project_name in self.active_projects):
+            self.waiting_jobs.setdefault(a_job.project_name, deque()).append(a_job.id)
+            return
+
+        self.active_projects.add(a_job.project_name)
+        self.futures[a_job.id] = self.executor.submit(self._run, a_job.id)
+
+    def _start_next(self, a_project_name: str) -> None:
+        #Called with the lock held, once the project's job in the pool is finished.
+        self.active_projects.discard(a_project_name)
+
+        t_waiting_jobs = self.waiting_jobs.get(a_project_name, deque())
+        if (len(t_waiting_jobs) > 0):
+            self._start(self.jobs[t_waiting_jobs.popleft()])
+        if (len(t_waiting_jobs) == 0):
+            self.waiting_jobs.pop(a_project_name, None)
+
+    def _run(self, a_job_id: str) -> None:
+        with self.lock:
+            t_job = self.jobs[a_job_id]
+            if (t_job.cancel_requested == True):
+                self._finish(t_job, job_data.m_cancelled_status)
+                self._start_next(t_job.project_name)
+                return
+
+            t_job.status = job_data.m_running_status
+            t_job.started_time = time.time()
+            self._save(t_job)
+
+        t_result = None
+        t_error = ""
+        try:
+            t_result = self.operations[t_job.operation](t_job, lambda a_done, a_total: self._report_progress(a_job_id, a_done, a_total))
+            t_status = job_data.m_completed_status
+        except JobCancelledError:
+            t_status = job_data.m_cancelled_status
+        except Exception as e:
+            print(f"The {t_job.operation} job {a_job_id} failed: {e}")
+            t_status = job_data.m_failed_status
+            t_error = str(e)
+
+        with self.lock:
+            t_job.result = t_result
+            t_job.error = t_error
+            self._finish(t_job, t_status)
+            self._start_next(t_job.project_name)
+
+    def _report_progress(self, a_job_id: str, a_segments_done: int, a_segments_total: int) -> None:
+        with self.lock:
+            t_job = self.jobs[a_job_id]
+            t_job.segments_done = a_segments_done
+            t_job.segments_total = a_segments_total
+            self._save(t_job)
+
+            if (t_job.cancel_requested == True):
+                raise JobCancelledError(f"The job {a_job_id} was cancelled.")
+
+    def _finish(self, a_job: JobData, a_status: str) -> None:
+        #Called with the lock held.
+        a_job.status = a_status
+        a_job.finished_time = time.time()
+        self.futures.pop(a_job.id, None)
+        self._save(a_job)
+
+        print(f"The {a_job.operation} job {a_job.id} for {a_job.project_name} is {a_status}.")
+
+    def _save(self, a_job: JobData) -> None:
+        file_manager.create_json_file(self.jobs_folder_path / (a_job.id + ".json"), asdict(a_job))
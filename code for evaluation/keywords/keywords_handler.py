@@ -8,6 +8,7 @@ from langchain.output_parsers import CommaSeparatedListOutputParser
 from segment_data import SegmentData
 from utilities.few_shot_request_data import FewShotRequestData
 from utilities import langchain_llm
+from utilities import structured_output
 
 
 m_few_shot_generation_guidance_data_folder_path = Path("../Guidance-Data/Keywords-Generation")
@@ -33,30 +34,29 @@ def generate(
         a_llm_name: str,
         a_prefix_index: int = 0,
         a_suffix_index: int = 0,
+        a_structured_output: bool = False,
     ) -> list[str]:
     
     #Generating
-    t_generation_suffix_template = m_few_shot_generation_request.suffix_templates[a_suffix_index]
-    t_generation_suffix = t_generation_suffix_template.format(
-        text = a_text, 
-        number_of_keywords = a_number_of_keywords
-    )
+    t_generation_llm = langchain_llm.get_generation_llm(a_llm_name, langchain_llm.LLmType.Transcript)
     t_generation_response = m_few_shot_generation_request.send_request (
         a_prefix_index = a_prefix_index,
-        a_suffix = t_generation_suffix,
-        a_llm = langchain_llm.get_generation_llm(a_llm_name, langchain_llm.LLmType.Transcript)
+        a_suffix = _get_generation_suffix(a_text, a_number_of_keywords, a_suffix_index, a_structured_output),
+        a_llm = _get_generation_llm(t_generation_llm, a_structured_output)
     )
 
     #print(f"\nRaw Keywords Response: {t_generation_response}")
 
+    #Single pass, the formatting request is only the fallback.
+    if (a_structured_output == True):
+        t_keywords = _get_keywords_from_structured_response(t_generation_llm, t_generation_response)
+        if (t_keywords != None):
+            return get_words_frequency_from_text(t_keywords, a_text, a_number_of_keywords)
+
     #Formatting
-    t_formatting_suffix_template = m_few_shot_formatting_request.suffix_templates[a_suffix_index]
-    t_formatting_suffix = t_formatting_suffix_template.format(
-        text = t_generation_response, 
-    )
     t_formatted_response = m_few_shot_formatting_request.send_request (
         a_prefix_index = a_prefix_index,
-        a_suffix = t_formatting_suffix,
+        a_suffix = _get_formatting_suffix(t_generation_response, a_suffix_index),
         a_llm = langchain_llm.keywords_formatting_llm
     )
 
@@ -64,6 +64,76 @@ def generate(
     return  get_words_frequency_from_text(m_output_parser.parse(t_formatted_response), a_text, a_number_of_keywords)
 
 
+async def agenerate( 
+        a_text: str,
+        a_number_of_keywords: int,
+        a_llm_name: str,
+        a_prefix_index: int = 0,
+        a_suffix_index: int = 0,
+        a_structured_output: bool = False,
+    ) -> list[str]:
+    
+    #Generating
+    t_generation_llm = langchain_llm.get_generation_llm(a_llm_name, langchain_llm.LLmType.Transcript)
+    t_generation_response = await m_few_shot_generation_request.asend_request (
+        a_prefix_index = a_prefix_index,
+        a_suffix = _get_generation_suffix(a_text, a_number_of_keywords, a_suffix_index, a_structured_output),
+        a_llm = _get_generation_llm(t_generation_llm, a_structured_output)
+    )
+
+    if (a_structured_output == True):
+        t_keywords = _get_keywords_from_structured_response(t_generation_llm, t_generation_response)
+        if (t_keywords != None):
+            return get_words_frequency_from_text(t_keywords, a_text, a_number_of_keywords)
+
+    #Formatting
+    t_formatted_response = await m_few_shot_formatting_request.asend_request (
+        a_prefix_index = a_prefix_index,
+        a_suffix = _get_formatting_suffix(t_generation_response, a_suffix_index),
+        a_llm = langchain_llm.keywords_formatting_llm
+    )
+
+    return  get_words_frequency_from_text(m_output_parser.parse(t_formatted_response), a_text, a_number_of_keywords)
+
+
+def _get_generation_suffix(a_text: str, a_number_of_keywords: int, a_suffix_index: int, a_structured_output: bool = False) -> str:
+    t_generation_suffix_template = m_few_shot_generation_request.suffix_templates[a_suffix_index]
+    t_generation_suffix = t_generation_suffix_template.format(
+        text = a_text, 
+        number_of_keywords = a_number_of_keywords
+    )
+
+    if (a_structured_output == True):
+        t_generation_suffix += structured_output.m_keywords_json_instruction
+
+    return t_generation_suffix
+
+
+def _get_generation_llm(a_generation_llm, a_structured_output: bool):
+    if (a_structured_output == True):
+        return structured_output.get_structured_llm(a_generation_llm, langchain_llm.get_llm_provider(a_generation_llm))
+
+    return a_generation_llm
+
+
+def _get_keywords_from_structured_response(a_generation_llm, a_generation_response: str) -> list[str] | None:
+    t_keywords = structured_output.parse_keywords(a_generation_response)
+    structured_output.record_result(
+        a_model_name = structured_output.get_model_name(a_generation_llm),
+        a_stage = "keywords",
+        a_used_fallback = t_keywords == None
+    )
+
+    return t_keywords
+
+
+def _get_formatting_suffix(a_generation_response: str, a_suffix_index: int) -> str:
+    t_formatting_suffix_template = m_few_shot_formatting_request.suffix_templates[a_suffix_index]
+    return t_formatting_suffix_template.format(
+        text = a_generation_response, 
+    )
+
+
 #TODO Check for count using similarity and not exact match
 def get_words_frequency_from_text(a_keywords: list[str], a_text: str, a_max_number_of_keywords: int)-> dict:
 
@@ -0,0 +1,231 @@
+#Python Imports
+import sys
+import shutil
+import asyncio
+import argparse
+from pathlib import Path
+from dataclasses import replace
+
+#External Imports
+import pandas
+
+#Custom Imports
+from project import Project
+import project
+from project_settings import ProjectSettings
+import project_settings
+from utilities import file_manager
+from utilities import langchain_llm
+from utilities import llm_cache
+from utilities import llm_concurrency
+from utilities import simulated_llm
+
+#Description
+"""
+Runs one transcript through several generation models, a number of runs each, the way data/<LLM>/<LLM>-<run>.xlsx were made by hand.
+Every (model, run) cell is its own project and the cells run side by side. The LLM requests of all cells share the per provider
+concurrency limits of utilities/llm_concurrency.py, which can be changed with --provider-limits.
+The transcript is segmented once and the segments are copied into every cell. Stages given with --shared-stages are model
+independent for the comparison: they are run once, with --shared-model, and copied too, so only the later stages differ between cells.
+Every cell has its own LLM and evaluation cache scope, so the runs of a model sample their own responses and scores instead of
+replaying the first run's. Running the matrix again replays each cell's cached results, clear the caches to sample again.
+Writes <output folder>/<LLM>/<LLM>-<run>.xlsx for every cell and <output folder>/comparison_table.csv with the average of every metric
+per model and question type, the table read by the scripts in 'code for comparison result'.
+Run from the 'code for evaluation' folder: python model_matrix_runner.py <transcript file> <output folder> --models chatgpt,claude --runs 3
+"""
+
+#The folder and file names used in data/.
+m_model_display_names: dict[str, str] = {
+    "chatgpt" : "ChatGPT",
+    "claude" : "Claude",
+    "gemma" : "Gemma",
+    "mistral" : "Mistral",
+    "llama" : "Llama",
+    "wizard" : "Wizard",
+    "databricks" : "Databricks",
+    "gryphe" : "Gryphe",
+    "upstage" : "Upstage",
+    "qwen" : "Qwen",
+    "deep_seek" : "DeepSeek",
+}
+
+m_comparison_metrics: list[str] = [
+    "relevance",
+    "reading_comprehension",
+    "question_difficulty",
+    "question_clarity",
+    "answer_relevancy",
+    "answer_correctness",
+    "context_utilisation",
+    "generation_time"
+]
+
+m_shared_project_name: str = "Shared"
+
+
+def get_model_display_name(a_model_name: str) -> str:
+    return m_model_display_names.get(a_model_name, a_model_name.title())
+
+
+def get_cells(a_model_names: list[str], a_runs: int) -> list[tuple[str, int]]:
+    #Runs are numbered from 1, as in data/.
+    return [(t_model_name, t_run) for t_model_name in a_model_names for t_run in range(1, a_runs + 1)]
+
+
+def is_valid_shared_stages(a_shared_stages: list[str]) -> bool:
+    #A shared stage's dependencies have to be shared too.
+    for t_stage in a_shared_stages:
+        if (t_stage not in project.m_pipeline_stage_dependencies):
+            print(f"There is no stage called {t_stage}. All stages: {', '.join(project.m_pipeline_stage_dependencies)}")
+            return False
+
+        t_missing_stages = [t_dependency for t_dependency in project.m_pipeline_stage_dependencies[t_stage] if t_dependency not in a_shared_stages]
+        if (len(t_missing_stages) > 0):
+            print(f"The {t_stage} stage can only be shared if {', '.join(t_missing_stages)} is shared too.")
+            return False
+
+    return True
+
+
+async def arun_matrix(
+        a_transcript: str,
+        a_output_folder_path: Path,
+        a_cells: list[tuple[str, int]],
+        a_settings: ProjectSettings = project_settings.default,
+        a_shared_stages: list[str] = None,
+        a_shared_model_name: str = "",
+        a_max_concurrent_cells: int = 4
+    ) -> pandas.DataFrame | None:
+    #Returns the comparison table, or None if the shared stages are not valid.
+    a_shared_stages = a_shared_stages or []
+    if (is_valid_shared_stages(a_shared_stages) == False):
+        return None
+
+    t_projects_folder_path = a_output_folder_path / "Projects"
+    file_manager.create_folder_if_not_exist(a_output_folder_path)
+    file_manager.create_folder_if_not_exist(t_projects_folder_path)
+
+    #Segmentation does not use an LLM, so it is always shared.
+    t_shared_project = Project(
+        a_name = m_shared_project_name,
+        a_transcript = a_transcript,
+        a_settings = replace(a_settings, llm_name = a_shared_model_name or a_settings.llm_name),
+        a_project_folder_location = t_projects_folder_path
+    )
+    if (len(a_shared_stages) > 0):
+        print(f"Running the shared stages with {t_shared_project.settings.llm_name}: {', '.join(a_shared_stages)}")
+        await t_shared_project.arun_all(a_stages = a_shared_stages)
+    else:
+        await asyncio.to_thread(t_shared_project.initialise)
+
+    t_cell_stages = [t_stage for t_stage in project.m_pipeline_stages if t_stage not in a_shared_stages]
+    t_semaphore = asyncio.Semaphore(a_max_concurrent_cells)
+
+    async def _arun_cell(a_model_name: str, a_run: int) -> pandas.DataFrame:
+        async with t_semaphore:
+            t_cell_name = f"{get_model_display_name(a_model_name)}-{a_run}"
+            #Each cell runs in its own task, so the scope stays with the cell's requests, including the evaluation threads.
+            llm_cache.set_cache_scope(f"model-matrix/{t_cell_name}")
+            t_project = _create_cell_project(t_shared_project, t_cell_name, replace(a_settings, llm_name = a_model_name), t_projects_folder_path)
+
+            print(f"Running {t_cell_name}...")
+            t_report = await t_project.arun_all(a_stages = t_cell_stages)
+            print(f"Finished {t_cell_name} in {t_report['pipeline']['wall_seconds']} seconds.")
+
+            t_cell_data: pandas.DataFrame = await asyncio.to_thread(t_project.get_project_data_as_csv)
+            _write_spreadsheet(t_cell_data, a_output_folder_path / get_model_display_name(a_model_name) / (t_cell_name + ".xlsx"))
+            return t_cell_data
+
+    t_results = await asyncio.gather(*[_arun_cell(t_model_name, t_run) for t_model_name, t_run in a_cells], return_exceptions = True)
+
+    t_cells_data: list[pandas.DataFrame] = []
+    for (t_model_name, t_run), t_result in zip(a_cells, t_results):
+        if (isinstance(t_result, BaseException) == True):
+            print(f"{get_model_display_name(t_model_name)}-{t_run} failed: {t_result}")
+            continue
+
+        t_cells_data.append(t_result.assign(LLM = get_model_display_name(t_model_name), run = t_run))
+
+    t_comparison_table = get_comparison_table(t_cells_data)
+    t_comparison_table.to_csv(a_output_folder_path / "comparison_table.csv", index = False)
+    print(f"\nFinished {len(t_cells_data)} of {len(a_cells)} runs. Comparison table: {a_output_folder_path / 'comparison_table.csv'}")
+
+    return t_comparison_table
+
+
+def _create_cell_project(a_shared_project: Project, a_cell_name: str, a_settings: ProjectSettings, a_projects_folder_path: Path) -> Project:
+    #The cell starts from a copy of the shared segment files, replacing the files of an earlier matrix run.
+    t_project = Project(a_name = a_cell_name, a_transcript = "", a_settings = a_settings, a_project_folder_location = a_projects_folder_path)
+
+    if (t_project.files_schema.segments_folder_path.exists() == True):
+        shutil.rmtree(t_project.files_schema.segments_folder_path)
+    file_manager.create_folder_if_not_exist(t_project.files_schema.project_folder_path)
+    file_manager.create_folder_if_not_exist(t_project.files_schema.keywords_history_folder_path)
+    shutil.copytree(a_shared_project.files_schema.segments_folder_path, t_project.files_schema.segments_folder_path)
+    t_project.save_settings()
+
+    return t_project
+
+
+def _write_spreadsheet(a_data: pandas.DataFrame, a_file_path: Path) -> None:
+    file_manager.create_folder_if_not_exist(a_file_path.parent)
+    try:
+        a_data.to_excel(a_file_path, index = False)
+    except ImportError:
+        #pandas writes xlsx files with openpyxl, which is optional.
+        print(f"openpyxl is not installed, writing {a_file_path.with_suffix('.csv')} instead.")
+        a_data.to_csv(a_file_path.with_suffix(".csv"), index = False)
+
+
+def get_comparison_table(a_cells_data: list[pandas.DataFrame]) -> pandas.DataFrame:
+    #One row per model, question type and metric with the average over all of the model's runs and questions.
+    t_columns = ["LLM", "Question Type", "Metrics", "Average"]
+    if (len(a_cells_data) == 0):
+        return pandas.DataFrame(columns = t_columns)
+
+    t_data = pandas.concat(a_cells_data, ignore_index = True)
+    for t_metric in m_comparison_metrics:
+        t_data[t_metric] = pandas.to_numeric(t_data[t_metric], errors = "coerce")
+
+    t_averages = t_data.groupby(["LLM", "questions_type"], sort = False)[m_comparison_metrics].mean().reset_index()
+    t_comparison_table = t_averages.melt(id_vars = ["LLM", "questions_type"], var_name = "Metrics", value_name = "Average")
+    t_comparison_table = t_comparison_table.rename(columns = {"questions_type" : "Question Type"})
+    t_comparison_table["Average"] = t_comparison_table["Average"].round(2)
+
+    return t_comparison_table.sort_values(["LLM", "Question Type"], kind = "stable")[t_columns].reset_index(drop = True)
+
+
+if (__name__ == "__main__"):
+    t_parser = argparse.ArgumentParser(description = "Runs a transcript through several models, a number of runs each, and writes the comparison spreadsheets.")
+    t_parser.add_argument("transcript_file", type = Path)
+    t_parser.add_argument("output_folder", type = Path)
+    t_parser.add_argument("--models", default = ",".join(langchain_llm.m_generation_models), help = "Comma separated model names, all models by default.")
+    t_parser.add_argument("--runs", type = int, default = 3)
+    t_parser.add_argument("--shared-stages", default = "", help = f"Comma separated stages run once and copied into every run: {', '.join(project.m_pipeline_stage_dependencies)}")
+    t_parser.add_argument("--shared-model", default = "chatgpt", help = "The model the shared stages are run with.")
+    t_parser.add_argument("--max-concurrent-runs", type = int, default = 4)
+    t_parser.add_argument("--provider-limits", default = "", help = "Maximum requests in flight per provider, e.g. openai=8,together=4")
+    t_arguments = t_parser.parse_args()
+
+    t_model_names = [t_model_name.strip() for t_model_name in t_arguments.models.split(",") if t_model_name.strip() != ""]
+    t_unknown_model_names = [
+        t_model_name for t_model_name in t_model_names
+        if (t_model_name not in langchain_llm.m_generation_models and simulated_llm.is_simulated_model_name(t_model_name) == False)
+    ]
+    if (len(t_unknown_model_names) > 0):
+        print(f"Unknown models: {', '.join(t_unknown_model_names)}. All models: {', '.join(langchain_llm.m_generation_models)}")
+        sys.exit(1)
+
+    llm_concurrency.set_limits(a_provider_limits = llm_concurrency.get_provider_limits_from_text(t_arguments.provider_limits))
+
+    t_comparison_table = asyncio.run(arun_matrix(
+        a_transcript = t_arguments.transcript_file.read_text(encoding = "utf8"),
+        a_output_folder_path = t_arguments.output_folder,
+        a_cells = get_cells(t_model_names, t_arguments.runs),
+        a_shared_stages = [t_stage.strip() for t_stage in t_arguments.shared_stages.split(",") if t_stage.strip() != ""],
+        a_shared_model_name = t_arguments.shared_model,
+        a_max_concurrent_cells = t_arguments.max_concurrent_runs
+    ))
+
+    if (t_comparison_table is None):
+        sys.exit(1)
@@ -1,11 +1,23 @@
 import pandas
 
 #Python Imports
+import os
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Awaitable, Callable
 from dataclasses import asdict
 from pathlib import Path
 
 #Utility 
 from utilities import file_manager
+from utilities import progress_events
+from utilities.pipeline_executor import PipelineExecutor, PipelineTask
+from utilities.run_journal import RunJournal
+from utilities import run_journal
 
 #Data structure classes
 from project_files_schema import ProjectFilesSchema
@@ -20,7 +32,27 @@ import project_settings
 from keywords import keywords_handler
 from transcript import transcription_handler
 from questions import questions_handler
-
+from questions import local_scorers
+import evaluation_api as EvaluationAPI
+
+
+#Maximum number of run_all tasks running at the same time, over all segments and stages.
+m_pipeline_max_concurrent_tasks: int = int(os.getenv("PIPELINE_MAX_CONCURRENT_TASKS", "8"))
+#The stages of run_all, in dependency order.
+m_pipeline_stages: list[str] = ["summaries", "transcript_keywords", "summary_keywords", "questions", "evaluation", "context_utilisation"]
+#The stages each run_all stage needs the results of.
+m_pipeline_stage_dependencies: dict[str, list[str]] = {
+    "summaries" : [],
+    "transcript_keywords" : [],
+    "summary_keywords" : ["summaries"],
+    "questions" : ["transcript_keywords", "summary_keywords"],
+    "evaluation" : ["questions"],
+    "context_utilisation" : ["evaluation"],
+}
+
+#Held while a segment file is read, changed and written, so tasks of the same segment do not overwrite each other's fields.
+m_segment_locks: dict[Path, threading.Lock] = {}
+m_segment_locks_lock = threading.Lock()
 
 class Project:
 
@@ -32,6 +64,9 @@ class Project:
 
             a_project_folder_location: Path = Path("../Projects-Data"),
         ):
+
+        #Called with (segments done, segments total) by the long operations, see _report_progress.
+        self.progress_callback = None
         
         #If path invalid, exit.
         if (a_project_folder_location.exists() == False):
@@ -116,15 +151,64 @@ class Project:
 
 
     #Transcript section*
+    @progress_events.stage("summaries")
     def generate_segments_summaries(self) -> None:
-        for t_segment_file_path in self._get_all_segment_file_paths():
-            t_segment_data_dict = file_manager.load_json_file_data(t_segment_file_path)
-            t_segment_data_dict[SegmentData.summary_dict_key()] = transcription_handler.generate_segment_summary(
-                a_transcript = t_segment_data_dict[SegmentData.transcript_dict_key()], 
-                a_word_limit = self.settings.summaries_word_limit, 
-                a_llm_name = self.settings.llm_name
-            )
-            file_manager.create_segment_file(t_segment_file_path, t_segment_data_dict)
+        #With more than one summaries worker the segments are summarised side by side, see _run_segments_in_parallel.
+        t_segments_count = len(self._get_all_segment_file_paths())
+        if (self.settings.summaries_workers > 1):
+            self._run_segments_in_parallel(self.generate_segment_summary, t_segments_count, self.settings.summaries_workers)
+            return
+
+        self._report_progress(0, t_segments_count)
+        for i in range(t_segments_count):
+            self.generate_segment_summary(i)
+            self._report_progress(i + 1, t_segments_count)
+
+
+    @progress_events.stage("summaries")
+    async def agenerate_segments_summaries(self) -> None:
+        t_segments_count = len(self._get_all_segment_file_paths())
+        if (self.settings.summaries_workers > 1):
+            await self._arun_segments_concurrently(self.agenerate_segment_summary, t_segments_count, self.settings.summaries_workers)
+            return
+
+        self._report_progress(0, t_segments_count)
+        for i in range(t_segments_count):
+            await self.agenerate_segment_summary(i)
+            self._report_progress(i + 1, t_segments_count)
+
+
+    def generate_segment_summary(self, a_segment_index: int) -> None:
+        t_segment_file_path = self.files_schema.get_segment_file_path(a_segment_index)
+        t_summary = transcription_handler.generate_segment_summary(
+            a_transcript = file_manager.load_json_file_data(t_segment_file_path)[SegmentData.transcript_dict_key()], 
+            a_word_limit = self.settings.summaries_word_limit, 
+            a_llm_name = self.settings.llm_name,
+            a_structured_output = self.settings.structured_generation
+        )
+
+        self._save_summary(t_segment_file_path, t_summary)
+
+
+    async def agenerate_segment_summary(self, a_segment_index: int) -> None:
+        t_segment_file_path = self.files_schema.get_segment_file_path(a_segment_index)
+        t_summary = await transcription_handler.agenerate_segment_summary(
+            a_transcript = file_manager.load_json_file_data(t_segment_file_path)[SegmentData.transcript_dict_key()], 
+            a_word_limit = self.settings.summaries_word_limit, 
+            a_llm_name = self.settings.llm_name,
+            a_structured_output = self.settings.structured_generation
+        )
+
+        #Saved on a worker thread, waiting for the segment's lock must not hold up the event loop.
+        await asyncio.to_thread(self._save_summary, t_segment_file_path, t_summary)
+
+
+    def _save_summary(self, a_segment_file_path: Path, a_summary: str) -> None:
+        #Loaded again, other tasks of this segment may have saved it while the summary was generated.
+        with self._get_segment_lock(a_segment_file_path):
+            t_segment_data_dict = file_manager.load_json_file_data(a_segment_file_path)
+            t_segment_data_dict[SegmentData.summary_dict_key()] = a_summary
+            file_manager.create_segment_file(a_segment_file_path, t_segment_data_dict)
 
 
     def get_full_transcript(self)-> str:
@@ -140,38 +224,111 @@ class Project:
             a_number_of_keywords: int
         ) -> None:
 
+        if (self._is_keywords_storage_dict_key_valid(a_keywords_storage_dict_key) == False):
+            return
+
+        t_segments_count = len(self._get_all_segment_file_paths())
+        self._report_progress(0, t_segments_count)
+
+        for i in range(t_segments_count):
+            self._generate_segment_keywords(i, a_text_dict_key, a_keywords_storage_dict_key, a_number_of_keywords)
+            self._report_progress(i + 1, t_segments_count)
+
+
+    def _generate_segment_keywords(
+            self, 
+            a_segment_index: int,
+            a_text_dict_key: str, 
+            a_keywords_storage_dict_key: str,
+            a_number_of_keywords: int
+        ) -> None:
+
+        #Generate keywords
+        t_keywords = keywords_handler.generate(
+            a_text = self.get_segment_data(a_segment_index)[a_text_dict_key],
+            a_number_of_keywords = a_number_of_keywords,
+            a_llm_name = self.settings.llm_name,
+            a_prefix_index = self.settings.saq_prefix_index,
+            a_suffix_index = self.settings.saq_suffix_index,
+            a_structured_output = self.settings.structured_generation
+        )
+
+        self._save_keywords(a_segment_index, a_keywords_storage_dict_key, t_keywords)
+
+
+    async def _agenerate_keywords(
+            self, 
+            a_text_dict_key: str, 
+            a_keywords_storage_dict_key: str,
+            a_number_of_keywords: int
+        ) -> None:
+
+        if (self._is_keywords_storage_dict_key_valid(a_keywords_storage_dict_key) == False):
+            return
+
+        t_segments_count = len(self._get_all_segment_file_paths())
+        self._report_progress(0, t_segments_count)
+
+        for i in range(t_segments_count):
+            await self._agenerate_segment_keywords(i, a_text_dict_key, a_keywords_storage_dict_key, a_number_of_keywords)
+            self._report_progress(i + 1, t_segments_count)
+
+
+    async def _agenerate_segment_keywords(
+            self, 
+            a_segment_index: int,
+            a_text_dict_key: str, 
+            a_keywords_storage_dict_key: str,
+            a_number_of_keywords: int
+        ) -> None:
+
+        t_keywords = await keywords_handler.agenerate(
+            a_text = self.get_segment_data(a_segment_index)[a_text_dict_key],
+            a_number_of_keywords = a_number_of_keywords,
+            a_llm_name = self.settings.llm_name,
+            a_prefix_index = self.settings.saq_prefix_index,
+            a_suffix_index = self.settings.saq_suffix_index,
+            a_structured_output = self.settings.structured_generation
+        )
+
+        #Saved on a worker thread, waiting for the segment's lock must not hold up the event loop.
+        await asyncio.to_thread(self._save_keywords, a_segment_index, a_keywords_storage_dict_key, t_keywords)
+
+
+    def _save_keywords(self, a_segment_index: int, a_keywords_storage_dict_key: str, a_keywords) -> None:
+        #Loaded again, other tasks of this segment may have saved it while the keywords were generated.
+        t_segment_file_path = self.files_schema.get_segment_file_path(a_segment_index)
+        with self._get_segment_lock(t_segment_file_path):
+            self._store_keywords(a_segment_index, t_segment_file_path, file_manager.load_json_file_data(t_segment_file_path), a_keywords_storage_dict_key, a_keywords)
+
+
+    def _is_keywords_storage_dict_key_valid(self, a_keywords_storage_dict_key: str) -> bool:
         if (a_keywords_storage_dict_key != SegmentData.generated_summary_keywords_dict_key() and a_keywords_storage_dict_key != SegmentData.generated_transcript_keywords_dict_key()):
             print(f"The keyword storage dict key given is not for generated summary nor generate transcript keywords! Aborting. Given: {a_keywords_storage_dict_key}")
-            return
+            return False
 
-        t_segment_file_paths = self._get_all_segment_file_paths()
-        for i, t_segment_file_path in enumerate(t_segment_file_paths):
-            t_segment_data_dict: dict = self.get_segment_data(i)
-
-            #Generate keywords
-            t_keywords = keywords_handler.generate(
-                a_text = t_segment_data_dict[a_text_dict_key],
-                a_number_of_keywords = a_number_of_keywords,
-                a_llm_name = self.settings.llm_name,
-                a_prefix_index = self.settings.saq_prefix_index,
-                a_suffix_index = self.settings.saq_suffix_index
-            )
-            t_segment_data_dict[a_keywords_storage_dict_key] = t_keywords
-            
-            if (a_keywords_storage_dict_key == SegmentData.generated_summary_keywords_dict_key()):
-                t_segment_data_dict[SegmentData.blqs_keywords_dict_key()] = t_keywords
-                t_segment_data_dict[SegmentData.gfqs_keywords_dict_key()] = t_keywords
-            elif (a_keywords_storage_dict_key == SegmentData.generated_transcript_keywords_dict_key()):
-                t_segment_data_dict[SegmentData.saqs_keywords_dict_key()] = t_keywords
-                t_segment_data_dict[SegmentData.mcqs_keywords_dict_key()] = t_keywords
+        return True
 
-            #Debugging
-            print(f"Generated {a_keywords_storage_dict_key} for {self.files_schema.get_segment_file_name(i)}.")
-            print(f"Keywords: {t_segment_data_dict[a_keywords_storage_dict_key]}")
 
-            file_manager.create_segment_file(t_segment_file_path, t_segment_data_dict)
+    def _store_keywords(self, a_segment_index: int, a_segment_file_path: Path, a_segment_data_dict: dict, a_keywords_storage_dict_key: str, a_keywords) -> None:
+        #The generated keywords and the question types' keywords made from them are saved in a single write.
+        a_segment_data_dict[a_keywords_storage_dict_key] = a_keywords
+        
+        if (a_keywords_storage_dict_key == SegmentData.generated_summary_keywords_dict_key()):
+            a_segment_data_dict[SegmentData.blqs_keywords_dict_key()] = a_keywords
+            a_segment_data_dict[SegmentData.gfqs_keywords_dict_key()] = a_keywords
+        elif (a_keywords_storage_dict_key == SegmentData.generated_transcript_keywords_dict_key()):
+            a_segment_data_dict[SegmentData.saqs_keywords_dict_key()] = a_keywords
+            a_segment_data_dict[SegmentData.mcqs_keywords_dict_key()] = a_keywords
 
+        #Debugging
+        print(f"Generated {a_keywords_storage_dict_key} for {self.files_schema.get_segment_file_name(a_segment_index)}.")
+        print(f"Keywords: {a_segment_data_dict[a_keywords_storage_dict_key]}")
 
+        file_manager.create_segment_file(a_segment_file_path, a_segment_data_dict)
+
+
+    @progress_events.stage("transcript_keywords")
     def generate_transcript_keywords(self) -> None:
         self._generate_keywords(
             a_text_dict_key = SegmentData.transcript_dict_key(),
@@ -180,6 +337,7 @@ class Project:
         )
 
 
+    @progress_events.stage("summary_keywords")
     def generate_summary_keywords(self) -> None:
         self._generate_keywords(
             a_text_dict_key = SegmentData.summary_dict_key(),
@@ -187,6 +345,54 @@ class Project:
             a_number_of_keywords = self.settings.number_of_summary_keywords
         )
 
+
+    @progress_events.stage("transcript_keywords")
+    async def agenerate_transcript_keywords(self) -> None:
+        await self._agenerate_keywords(
+            a_text_dict_key = SegmentData.transcript_dict_key(),
+            a_keywords_storage_dict_key = SegmentData.generated_transcript_keywords_dict_key(),
+            a_number_of_keywords = self.settings.number_of_transcript_keywords
+        )
+
+
+    @progress_events.stage("summary_keywords")
+    async def agenerate_summary_keywords(self) -> None:
+        await self._agenerate_keywords(
+            a_text_dict_key = SegmentData.summary_dict_key(),
+            a_keywords_storage_dict_key = SegmentData.generated_summary_keywords_dict_key(),
+            a_number_of_keywords = self.settings.number_of_summary_keywords
+        )
+
+
+    def generate_all_keywords(self) -> None:
+        asyncio.run(self.agenerate_all_keywords())
+
+
+    @progress_events.stage("keywords")
+    async def agenerate_all_keywords(self) -> None:
+        #Transcript and summary keywords of every segment in one pass instead of two, keywords_workers segments at a time with
+        #both kinds of a segment in flight together. Segments without a summary get one first.
+        t_segments_count = len(self._get_all_segment_file_paths())
+        await self._arun_segments_concurrently(self._agenerate_segment_all_keywords, t_segments_count, max(1, self.settings.keywords_workers))
+
+
+    async def _agenerate_segment_all_keywords(self, a_segment_index: int) -> None:
+        async def _agenerate_summary_keywords() -> None:
+            if (self.get_segment_data(a_segment_index)[SegmentData.summary_dict_key()] == ""):
+                await self.agenerate_segment_summary(a_segment_index)
+
+            await self._agenerate_segment_keywords(a_segment_index, SegmentData.summary_dict_key(), SegmentData.generated_summary_keywords_dict_key(), self.settings.number_of_summary_keywords)
+
+        #Both kinds are saved under the segment's lock, so one never overwrites the other.
+        t_results = await asyncio.gather(
+            self._agenerate_segment_keywords(a_segment_index, SegmentData.transcript_dict_key(), SegmentData.generated_transcript_keywords_dict_key(), self.settings.number_of_transcript_keywords),
+            _agenerate_summary_keywords(),
+            return_exceptions = True
+        )
+        for t_result in t_results:
+            if (isinstance(t_result, BaseException) == True):
+                raise t_result
+
     
     def remove_keyword_from_segment(self, a_segment_index: int, a_user_keywords_type: str, a_keyword: str) -> bool:
         t_segment_data: dict = self.get_segment_data(a_segment_index)
@@ -219,35 +425,69 @@ class Project:
 
 
     #Question section*
-    def generate_questions_of_type(self, a_question_type: str) -> list:
+    @progress_events.stage("questions")
+    def generate_questions_of_type(self, a_question_type: str, a_resume: bool = False) -> list:
+        #With a_resume, the segments the run journal has as done since the last run of this question type are skipped.
         if (SegmentData.does_question_type_exist(a_question_type = a_question_type) == False):
             print(f"\nThe provided question type dict key does not exist! All question types dict keys: {', '.join(SegmentData.question_types())}. Aborting...")
             return []
 
+        t_journal = self._start_run_journal("questions", [a_question_type], a_resume)
         t_segment_file_paths = self._get_all_segment_file_paths()
+        self._report_progress(0, len(t_segment_file_paths))
+
+        t_questions_dict_list = []
         for i, t_segment_file_path in enumerate(t_segment_file_paths):
             t_segment_data = file_manager.load_json_file_data(t_segment_file_path)
+            if (self._is_unit_completed(t_journal, t_segment_data, "questions", i, a_question_type) == True):
+                t_questions_dict_list = t_segment_data[a_question_type]
+                self._report_progress(i + 1, len(t_segment_file_paths))
+                continue
+
             t_questions_generation_request_data = self._get_questions_generation_request_data(
                 a_segment_data = t_segment_data, 
                 a_question_type = a_question_type
             )
             t_questions_data_list = questions_handler.generate(t_questions_generation_request_data)
-            
-            t_questions_dict_list = []
-            for t_question_data in t_questions_data_list:
-                t_question_dict = asdict(t_question_data)
-                t_questions_dict_list.append(t_question_dict)
+            t_questions_dict_list = self._save_questions(t_segment_file_path, a_question_type, t_questions_data_list)
+            self._record_unit(t_journal, self.get_segment_data(i), "questions", i, a_question_type)
+            self._report_progress(i + 1, len(t_segment_file_paths))
+        
+        return t_questions_dict_list
+    
+    @progress_events.stage("questions")
+    async def agenerate_questions_of_type(self, a_question_type: str, a_resume: bool = False) -> list:
+        #With a_resume, the segments the run journal has as done since the last run of this question type are skipped.
+        if (SegmentData.does_question_type_exist(a_question_type = a_question_type) == False):
+            print(f"\nThe provided question type dict key does not exist! All question types dict keys: {', '.join(SegmentData.question_types())}. Aborting...")
+            return []
 
-            t_segment_data[a_question_type] = t_questions_dict_list
+        t_journal = self._start_run_journal("questions", [a_question_type], a_resume)
+        t_segment_file_paths = self._get_all_segment_file_paths()
+        self._report_progress(0, len(t_segment_file_paths))
 
-            #Debugging
-            #print(f"\nGenerated {a_question_type} for segment-{i}.")
-            #print(f"{a_question_type}: {t_segment_data[a_question_type]}")
-        
-            file_manager.create_segment_file(t_segment_file_paths[i], t_segment_data)
+        t_questions_dict_list = []
+        for i, t_segment_file_path in enumerate(t_segment_file_paths):
+            t_segment_data = file_manager.load_json_file_data(t_segment_file_path)
+            if (self._is_unit_completed(t_journal, t_segment_data, "questions", i, a_question_type) == True):
+                t_questions_dict_list = t_segment_data[a_question_type]
+                self._report_progress(i + 1, len(t_segment_file_paths))
+                continue
+
+            t_questions_generation_request_data = self._get_questions_generation_request_data(
+                a_segment_data = t_segment_data, 
+                a_question_type = a_question_type
+            )
+            t_questions_data_list = await questions_handler.agenerate(t_questions_generation_request_data)
+
+            #Saved on a worker thread, waiting for the segment's lock must not hold up the event loop.
+            t_questions_dict_list = await asyncio.to_thread(self._save_questions, t_segment_file_path, a_question_type, t_questions_data_list)
+            self._record_unit(t_journal, self.get_segment_data(i), "questions", i, a_question_type)
+            self._report_progress(i + 1, len(t_segment_file_paths))
         
         return t_questions_dict_list
     
+    @progress_events.stage("segment_questions")
     def generate_segment_questions_of_type(self, a_segment_id: int, a_question_type: str) -> list:
         if (SegmentData.does_question_type_exist(a_question_type = a_question_type) == False):
             print(f"\nThe provided question type dict key does not exist! All question types dict keys: {', '.join(SegmentData.question_types())}. Aborting...")
@@ -266,19 +506,50 @@ class Project:
             a_question_type = a_question_type
         )
         t_questions_data_list = questions_handler.generate(t_questions_generation_request_data)
+        return self._save_questions(t_segment_file_path, a_question_type, t_questions_data_list)
+
+    @progress_events.stage("segment_questions")
+    async def agenerate_segment_questions_of_type(self, a_segment_id: int, a_question_type: str) -> list:
+        if (SegmentData.does_question_type_exist(a_question_type = a_question_type) == False):
+            print(f"\nThe provided question type dict key does not exist! All question types dict keys: {', '.join(SegmentData.question_types())}. Aborting...")
+            return []
+        
+        t_segment_file_paths = self._get_all_segment_file_paths()
+        if (t_segment_file_paths == []):
+            print("No segments to generate questions for.")
+            return []
         
+        t_segment_file_path = t_segment_file_paths[a_segment_id]
+        t_segment_data = file_manager.load_json_file_data(t_segment_file_path)
+
+        t_questions_generation_request_data = self._get_questions_generation_request_data(
+            a_segment_data = t_segment_data, 
+            a_question_type = a_question_type
+        )
+        t_questions_data_list = await questions_handler.agenerate(t_questions_generation_request_data)
+
+        #Saved on a worker thread, waiting for the segment's lock must not hold up the event loop.
+        return await asyncio.to_thread(self._save_questions, t_segment_file_path, a_question_type, t_questions_data_list)
+
+    def _save_questions(self, a_segment_file_path: Path, a_question_type: str, a_questions_data_list: list[QuestionData]) -> list[dict]:
+        #Loaded again, other tasks of this segment may have saved it while the questions were generated.
+        with self._get_segment_lock(a_segment_file_path):
+            t_segment_data = file_manager.load_json_file_data(a_segment_file_path)
+            return self._store_questions(a_segment_file_path, t_segment_data, a_question_type, a_questions_data_list)
+
+    def _store_questions(self, a_segment_file_path: Path, a_segment_data: dict, a_question_type: str, a_questions_data_list: list[QuestionData]) -> list[dict]:
         t_questions_dict_list = []
-        for t_question_data in t_questions_data_list:
+        for t_question_data in a_questions_data_list:
             t_question_dict = asdict(t_question_data)
             t_questions_dict_list.append(t_question_dict)
 
-        t_segment_data[a_question_type] = t_questions_dict_list
+        a_segment_data[a_question_type] = t_questions_dict_list
+        self._set_questions_fingerprints(a_segment_data, a_question_type)
 
         #Debugging
-        #print(f"\nGenerated {a_question_type} for segment-{i}.")
-        #print(f"{a_question_type}: {t_segment_data[a_question_type]}")
+        #print(f"{a_question_type}: {a_segment_data[a_question_type]}")
     
-        file_manager.create_segment_file(t_segment_file_path, t_segment_data)
+        file_manager.create_segment_file(a_segment_file_path, a_segment_data)
         
         return t_questions_dict_list
 
@@ -334,7 +605,8 @@ class Project:
             a_number_of_question = self.settings.number_of_questions,
             a_llm_name = self.settings.llm_name,
             a_prefix_index = t_prefix,
-            a_suffix_index = t_suffix
+            a_suffix_index = t_suffix,
+            a_structured_output = self.settings.structured_generation
         )
 
         return t_questions_generation_request_data
@@ -342,18 +614,86 @@ class Project:
 
 
     #Evaluation*
+    @progress_events.stage("evaluation")
     def evaluate_all_segments(
             self,
             a_do_saqs: bool = True, 
             a_do_mcqs: bool = True, 
             a_do_gfqs: bool = True, 
             a_do_blqs: bool = True,
-        ) -> None:
+            a_only_changed: bool = False,
+            a_resume: bool = False,
+        ) -> dict:
+        #With a_resume, the (segment, question type) evaluations the run journal has as done since the last run are skipped.
+        t_evaluation_report = self._get_empty_evaluation_report()
+
+        t_question_types = [
+            t_question_type for t_question_type, t_do_question_type in [
+                (SegmentData.saqs_dict_key(), a_do_saqs),
+                (SegmentData.mcqs_dict_key(), a_do_mcqs),
+                (SegmentData.gfqs_dict_key(), a_do_gfqs),
+                (SegmentData.blqs_dict_key(), a_do_blqs),
+            ]
+            if (t_do_question_type == True)
+        ]
+        t_journal = self._start_run_journal("evaluation", t_question_types, a_resume)
+        t_resumed_units_count = 0
+        t_tier_counts = local_scorers.start_run_tier_counts()
+
         t_segments_count = len(self._get_all_segment_file_paths())
+        self._report_progress(0, t_segments_count)
+
         for i in range(t_segments_count):
-            self.evaluate_segment(i, a_do_saqs, a_do_mcqs, a_do_gfqs, a_do_blqs)
+            t_segment_report, t_skipped_units_count = self._evaluate_segment_with_journal(t_journal, i, t_question_types, a_only_changed)
+            t_resumed_units_count += t_skipped_units_count
+            self._add_to_evaluation_report(t_evaluation_report, t_segment_report)
+            self._report_progress(i + 1, t_segments_count)
+
+        #Ragas is run once over the whole project after all segments are evaluated.
+        if (self.settings.batched_context_utilisation == True):
+            self.evaluate_context_utilisation(list(range(t_segments_count)), a_do_saqs, a_do_mcqs, a_do_gfqs, a_do_blqs, a_only_missing = a_only_changed)
+
+        print(f"\nEvaluated {t_evaluation_report['evaluated']} questions, skipped {t_evaluation_report['skipped']} unchanged questions.")
+        if (a_resume == True):
+            t_evaluation_report["resumed_units"] = t_resumed_units_count
+
+        if (self.settings.tiered_evaluation == True):
+            t_evaluation_report["tiers"] = local_scorers.get_tier_report(t_tier_counts)
+
+        return t_evaluation_report
     
 
+    def _evaluate_segment_with_journal(self, a_journal: RunJournal, a_segment_index: int, a_question_types: list[str], a_only_changed: bool) -> tuple[dict, int]:
+        #Evaluates the question types the journal does not have as done for the segment, then records the ones whose
+        #questions all got every criterion scored. Returns the segment's report and how many question types were skipped.
+        t_segment_data_dict = self.get_segment_data(a_segment_index)
+        t_question_types_to_evaluate = [
+            t_question_type for t_question_type in a_question_types
+            if (self._is_unit_completed(a_journal, t_segment_data_dict, "evaluation", a_segment_index, t_question_type) == False)
+        ]
+        if (len(t_question_types_to_evaluate) == 0):
+            return self._get_empty_evaluation_report(), len(a_question_types)
+
+        t_segment_report = self.evaluate_segment(
+            a_segment_index,
+            a_do_saqs = SegmentData.saqs_dict_key() in t_question_types_to_evaluate,
+            a_do_mcqs = SegmentData.mcqs_dict_key() in t_question_types_to_evaluate,
+            a_do_gfqs = SegmentData.gfqs_dict_key() in t_question_types_to_evaluate,
+            a_do_blqs = SegmentData.blqs_dict_key() in t_question_types_to_evaluate,
+            a_do_context_utilisation_batch = False,
+            a_only_changed = a_only_changed
+        )
+
+        t_segment_data_dict = self.get_segment_data(a_segment_index)
+        for t_question_type in t_question_types_to_evaluate:
+            t_question_evaluations = [t_question_data[QuestionData.question_evaluation_dict_key()] for t_question_data in t_segment_data_dict[t_question_type]]
+            if (all(self._is_evaluation_complete(t_question_evaluation) for t_question_evaluation in t_question_evaluations) == True):
+                self._record_unit(a_journal, t_segment_data_dict, "evaluation", a_segment_index, t_question_type)
+
+        return t_segment_report, len(a_question_types) - len(t_question_types_to_evaluate)
+
+
+    @progress_events.stage("segment_evaluation")
     def evaluate_segment(
             self, 
             a_segment_index: int, 
@@ -361,92 +701,414 @@ class Project:
             a_do_mcqs: bool = True, 
             a_do_gfqs: bool = True, 
             a_do_blqs: bool = True,
-        ) -> None:
+            a_do_context_utilisation_batch: bool = True,
+            a_only_changed: bool = False,
+        ) -> dict:
+        #With a_only_changed, questions whose fingerprint matches the one they were last evaluated at are skipped.
+        t_evaluation_report = self._get_empty_evaluation_report()
 
         t_segment_data_dict: dict = self.get_segment_data(a_segment_index)
         if (t_segment_data_dict == {}):
             print(f"No segment data at the given index: {a_segment_index}.")
-            return False
+            return t_evaluation_report
 
         t_segment_file_path: Path = self._get_all_segment_file_paths()[a_segment_index]
-        
-        #SAQs Evaluation
-        print("\nEvaluating SAQs...")
-        if (a_do_saqs == True):
-            t_saqs: list[dict] = t_segment_data_dict[SegmentData.saqs_dict_key()]
-            for t_saq_question_data in t_saqs:
-                t_saq_question_data[QuestionData.question_evaluation_dict_key()] = asdict(QuestionEvaluationData.evaluate_question(
-                    a_text = t_segment_data_dict[SegmentData.transcript_dict_key()],
-                    a_ground_truth = ", ".join(t_segment_data_dict[SegmentData.saqs_keywords_dict_key()]),
-                    a_question = t_saq_question_data[QuestionData.question_dict_key()],
-                    a_answer = t_saq_question_data[QuestionData.answer_dict_key()]
-                ))
-            t_segment_data_dict[SegmentData.saqs_dict_key()] = t_saqs
-
-        #Save changes
-        file_manager.create_segment_file(t_segment_file_path, t_segment_data_dict)
-
-        #MCQs Evaluation
-        print("\nEvaluating MCQs...")
-        if (a_do_mcqs == True):
-            t_mcqs: list[dict] = t_segment_data_dict[SegmentData.mcqs_dict_key()]
-            for t_mcq_question_data in t_mcqs:
-                #Check Answer formatting
-                t_mcq_answer = t_mcq_question_data[QuestionData.answer_dict_key()]
-                if (isinstance(t_mcq_answer, str) == True): 
-                    t_mcq_answer = t_mcq_answer.split(", ")[0]
+        t_changed_question_types: list[str] = []
+
+        t_question_types_to_evaluate = [
+            (SegmentData.saqs_dict_key(), "SAQs", a_do_saqs),
+            (SegmentData.mcqs_dict_key(), "MCQs", a_do_mcqs),
+            (SegmentData.gfqs_dict_key(), "GFQs", a_do_gfqs),
+            (SegmentData.blqs_dict_key(), "BLQs", a_do_blqs),
+        ]
+        for t_question_type, t_question_type_name, t_do_question_type in t_question_types_to_evaluate:
+            print(f"\nEvaluating {t_question_type_name}...")
+            if (t_do_question_type == False):
+                continue
+
+            t_questions: list[dict] = t_segment_data_dict[t_question_type]
+            t_text = self._get_evaluation_text(t_segment_data_dict, t_question_type)
+            t_ground_truth = ", ".join(t_segment_data_dict[SegmentData.question_type_keywords_dict_key(t_question_type)])
+
+            #Keywords or the summary may have changed since the questions were generated.
+            if (self._set_questions_fingerprints(t_segment_data_dict, t_question_type) == True):
+                t_changed_question_types.append(t_question_type)
+
+            t_questions_to_evaluate = [
+                t_question_data for t_question_data in t_questions
+                if (a_only_changed == False or t_question_data.get(QuestionData.evaluated_fingerprint_dict_key(), "") != t_question_data[QuestionData.fingerprint_dict_key()])
+            ]
+            t_evaluation_report["question_types"][t_question_type]["evaluated"] += len(t_questions_to_evaluate)
+            t_evaluation_report["question_types"][t_question_type]["skipped"] += len(t_questions) - len(t_questions_to_evaluate)
+            if (len(t_questions_to_evaluate) == 0):
+                print(f"No new or changed {t_question_type_name} to evaluate.")
+                continue
+
+            self._evaluate_questions(
+                a_questions = t_questions_to_evaluate,
+                a_answers = self._get_evaluation_answers(t_question_type, t_questions_to_evaluate),
+                a_text = t_text,
+                a_ground_truth = t_ground_truth,
+                a_question_type = t_question_type
+            )
+
+            #Questions with a failed criterion stay changed, so they are picked up again.
+            for t_question_data in t_questions_to_evaluate:
+                if (self._is_evaluation_complete(t_question_data[QuestionData.question_evaluation_dict_key()]) == True):
+                    t_question_data[QuestionData.evaluated_fingerprint_dict_key()] = t_question_data[QuestionData.fingerprint_dict_key()]
+            if (t_question_type not in t_changed_question_types):
+                t_changed_question_types.append(t_question_type)
+
+        #Save changes once for all question types.
+        if (len(t_changed_question_types) > 0):
+            self._save_evaluated_questions(t_segment_file_path, t_segment_data_dict, t_changed_question_types)
+
+        for t_question_type_report in t_evaluation_report["question_types"].values():
+            t_evaluation_report["evaluated"] += t_question_type_report["evaluated"]
+            t_evaluation_report["skipped"] += t_question_type_report["skipped"]
+
+        if (self.settings.batched_context_utilisation == True and a_do_context_utilisation_batch == True):
+            self.evaluate_context_utilisation([a_segment_index], a_do_saqs, a_do_mcqs, a_do_gfqs, a_do_blqs, a_only_missing = a_only_changed)
+
+        return t_evaluation_report
+
+
+    @progress_events.stage("context_utilisation")
+    def evaluate_context_utilisation(
+            self,
+            a_segment_indexes: list[int] = None,
+            a_do_saqs: bool = True, 
+            a_do_mcqs: bool = True, 
+            a_do_gfqs: bool = True, 
+            a_do_blqs: bool = True,
+            a_only_missing: bool = False,
+        ) -> None:
+        #Scores the ragas context utilisation of every question of the given segments (all if None) in a few large runs.
+        #With a_only_missing, questions that already have a context utilisation score are skipped.
+        if (a_segment_indexes == None):
+            a_segment_indexes = list(range(self.get_number_of_segments()))
+
+        t_question_types = [
+            t_question_type for t_question_type, t_do_question_type in [
+                (SegmentData.saqs_dict_key(), a_do_saqs),
+                (SegmentData.mcqs_dict_key(), a_do_mcqs),
+                (SegmentData.gfqs_dict_key(), a_do_gfqs),
+                (SegmentData.blqs_dict_key(), a_do_blqs),
+            ] if t_do_question_type == True
+        ]
+
+        #Collect every (question, answer, text), remembering where each one came from.
+        t_segments_data: dict[int, dict] = {}
+        t_items: list[dict] = []
+        t_item_locations: list[tuple[int, str, int]] = []
+        for t_segment_index in a_segment_indexes:
+            t_segment_data_dict = self.get_segment_data(t_segment_index)
+            if (t_segment_data_dict == {}):
+                continue
+            t_segments_data[t_segment_index] = t_segment_data_dict
+
+            for t_question_type in t_question_types:
+                t_questions: list[dict] = t_segment_data_dict[t_question_type]
+                t_text = self._get_evaluation_text(t_segment_data_dict, t_question_type)
+
+                for t_question_index, (t_question_data, t_answer) in enumerate(zip(t_questions, self._get_evaluation_answers(t_question_type, t_questions))):
+                    if (a_only_missing == True and self._has_context_utilisation_score(t_question_data) == True):
+                        continue
+
+                    t_items.append({
+                        "text" : t_text,
+                        "question" : t_question_data[QuestionData.question_dict_key()],
+                        "answer" : t_answer
+                    })
+                    t_item_locations.append((t_segment_index, t_question_type, t_question_index))
+
+        if (len(t_items) == 0):
+            print("No questions to evaluate the context utilisation of.")
+            return
+
+        t_results = EvaluationAPI.evaluate_context_utilisation_batch(t_items)
+
+        #Write the scores back into each question's evaluation.
+        for (t_segment_index, t_question_type, t_question_index), t_result in zip(t_item_locations, t_results):
+            t_question_data = t_segments_data[t_segment_index][t_question_type][t_question_index]
+            t_question_evaluation = t_question_data.get(QuestionData.question_evaluation_dict_key(), None)
+            if (isinstance(t_question_evaluation, dict) == False):
+                t_question_evaluation = asdict(QuestionEvaluationData())
+
+            t_question_evaluation[QuestionEvaluationData.context_utilisation_dict_key()] = t_result
+            t_question_data[QuestionData.question_evaluation_dict_key()] = t_question_evaluation
+
+        t_segment_file_paths = self._get_all_segment_file_paths()
+        for t_segment_index, t_segment_data_dict in t_segments_data.items():
+            self._save_evaluated_questions(t_segment_file_paths[t_segment_index], t_segment_data_dict, t_question_types)
+
+
+    def _save_evaluated_questions(self, a_segment_file_path: Path, a_evaluated_segment_data_dict: dict, a_question_types: list[str]) -> None:
+        #Loaded again under the segment's lock, other tasks of this segment may have saved it while the questions were evaluated.
+        #Only the questions themselves are taken from the evaluated data. A question that was regenerated in the meantime keeps
+        #the saved version, it is evaluated again the next time.
+        with self._get_segment_lock(a_segment_file_path):
+            t_segment_data_dict = file_manager.load_json_file_data(a_segment_file_path)
+
+            for t_question_type in a_question_types:
+                for i, (t_saved_question_data, t_evaluated_question_data) in enumerate(zip(t_segment_data_dict[t_question_type], a_evaluated_segment_data_dict[t_question_type])):
+                    if (
+                        t_saved_question_data[QuestionData.question_dict_key()] == t_evaluated_question_data[QuestionData.question_dict_key()] and
+                        t_saved_question_data[QuestionData.answer_dict_key()] == t_evaluated_question_data[QuestionData.answer_dict_key()]
+                    ):
+                        t_segment_data_dict[t_question_type][i] = t_evaluated_question_data
+
+            file_manager.create_segment_file(a_segment_file_path, t_segment_data_dict)
+
+
+    def _evaluate_questions(self, a_questions: list[dict], a_answers: list, a_text: str, a_ground_truth: str, a_question_type: str = "") -> None:
+        #Stores the evaluation into each question data dict.
+        t_do_context_utilisation = self.settings.batched_context_utilisation == False
+
+        if (self.settings.batched_evaluation == True):
+            t_items = [
+                {
+                    "question" : t_question_data[QuestionData.question_dict_key()],
+                    "answer" : t_answer,
+                    "ground_truth" : a_ground_truth,
+                    "raw_answer" : t_question_data[QuestionData.answer_dict_key()]
+                }
+                for t_question_data, t_answer in zip(a_questions, a_answers)
+            ]
+            t_evaluations_data = QuestionEvaluationData.evaluate_questions_batch(
+                a_text = a_text, 
+                a_items = t_items, 
+                a_do_context_utilisation = t_do_context_utilisation,
+                a_tiered = self.settings.tiered_evaluation,
+                a_question_type = a_question_type
+            )
+
+            for t_question_data, t_evaluation_data in zip(a_questions, t_evaluations_data):
+                t_question_data[QuestionData.question_evaluation_dict_key()] = asdict(t_evaluation_data)
+            return
+
+        for t_question_data, t_answer in zip(a_questions, a_answers):
+            t_question_data[QuestionData.question_evaluation_dict_key()] = asdict(QuestionEvaluationData.evaluate_question(
+                a_text = a_text,
+                a_ground_truth = a_ground_truth,
+                a_question = t_question_data[QuestionData.question_dict_key()],
+                a_answer = t_answer,
+                a_combined_judge = self.settings.combined_evaluation,
+                a_do_context_utilisation = t_do_context_utilisation,
+                a_tiered = self.settings.tiered_evaluation,
+                a_question_type = a_question_type,
+                a_raw_answer = t_question_data[QuestionData.answer_dict_key()]
+            ))
+
+
+    def _set_questions_fingerprints(self, a_segment_data_dict: dict, a_question_type: str) -> bool:
+        #Returns True if any fingerprint changed.
+        t_text = self._get_evaluation_text(a_segment_data_dict, a_question_type)
+        t_ground_truth = ", ".join(a_segment_data_dict.get(SegmentData.question_type_keywords_dict_key(a_question_type), []))
+        t_has_changes = False
+
+        for t_question_data in a_segment_data_dict[a_question_type]:
+            t_fingerprint = QuestionData.get_fingerprint(
+                a_question = t_question_data[QuestionData.question_dict_key()], 
+                a_answer = t_question_data[QuestionData.answer_dict_key()], 
+                a_text = t_text, 
+                a_ground_truth = t_ground_truth
+            )
+            if (t_question_data.get(QuestionData.fingerprint_dict_key(), "") != t_fingerprint):
+                t_question_data[QuestionData.fingerprint_dict_key()] = t_fingerprint
+                t_has_changes = True
+
+        return t_has_changes
+
+
+    def _is_evaluation_complete(self, a_question_evaluation: dict) -> bool:
+        #Context utilisation is left out as it may be scored later for the whole project.
+        for t_criterion in EvaluationAPI.m_combined_evaluation_criteria:
+            t_criterion_evaluation = a_question_evaluation.get(t_criterion, {})
+            if (float(t_criterion_evaluation.get(EvaluationData.score_dict_key(), -1)) == -1):
+                return False
+
+        return True
+
+
+    def _has_context_utilisation_score(self, a_question_data: dict) -> bool:
+        t_question_evaluation = a_question_data.get(QuestionData.question_evaluation_dict_key(), {})
+        if (isinstance(t_question_evaluation, dict) == False):
+            return False
+
+        t_context_utilisation = t_question_evaluation.get(QuestionEvaluationData.context_utilisation_dict_key(), {})
+        return float(t_context_utilisation.get(EvaluationData.score_dict_key(), -1)) != -1
+
+
+    def _get_empty_evaluation_report(self) -> dict:
+        return {
+            "evaluated" : 0,
+            "skipped" : 0,
+            "question_types" : {t_question_type: {"evaluated" : 0, "skipped" : 0} for t_question_type in SegmentData.question_types()}
+        }
+
+
+    def _add_to_evaluation_report(self, a_evaluation_report: dict, a_segment_report: dict) -> None:
+        a_evaluation_report["evaluated"] += a_segment_report["evaluated"]
+        a_evaluation_report["skipped"] += a_segment_report["skipped"]
+        for t_question_type, t_question_type_report in a_segment_report["question_types"].items():
+            a_evaluation_report["question_types"][t_question_type]["evaluated"] += t_question_type_report["evaluated"]
+            a_evaluation_report["question_types"][t_question_type]["skipped"] += t_question_type_report["skipped"]
+
+
+    def _get_evaluation_text(self, a_segment_data_dict: dict, a_question_type: str) -> str:
+        #SAQs and MCQs are evaluated against the transcript, GFQs and BLQs against the summary.
+        if (a_question_type == SegmentData.saqs_dict_key() or a_question_type == SegmentData.mcqs_dict_key()):
+            return a_segment_data_dict[SegmentData.transcript_dict_key()]
+
+        return a_segment_data_dict[SegmentData.summary_dict_key()]
+
+
+    def _get_evaluation_answers(self, a_question_type: str, a_questions: list[dict]) -> list:
+        t_answers = []
+
+        for t_question_data in a_questions:
+            t_answer = t_question_data[QuestionData.answer_dict_key()]
+
+            #Check Answer formatting
+            if (a_question_type == SegmentData.mcqs_dict_key()):
+                #The first option is the correct one.
+                if (isinstance(t_answer, str) == True): 
+                    t_answer = t_answer.split(", ")[0]
                 else:
-                    t_mcq_answer = t_mcq_answer[0]
+                    t_answer = t_answer[0]
+            elif (a_question_type == SegmentData.gfqs_dict_key()):
+                if (isinstance(t_answer, list) == True): 
+                    t_answer = ", ".join(t_answer)
 
-                t_mcq_question_data[QuestionData.question_evaluation_dict_key()] = asdict(QuestionEvaluationData.evaluate_question(
-                    a_text = t_segment_data_dict[SegmentData.transcript_dict_key()],
-                    a_ground_truth = ", ".join(t_segment_data_dict[SegmentData.mcqs_keywords_dict_key()]),
-                    a_question = t_mcq_question_data[QuestionData.question_dict_key()],
-                    a_answer = t_mcq_answer
-                ))
-            t_segment_data_dict[SegmentData.mcqs_dict_key()] = t_mcqs
-
-        #Save changes
-        file_manager.create_segment_file(t_segment_file_path, t_segment_data_dict)
-
-        #GFQs Evaluation
-        print("\nEvaluating GFQs...")
-        if (a_do_gfqs == True):
-            t_gfqs: list[dict] = t_segment_data_dict[SegmentData.gfqs_dict_key()]
-            for t_gfq_question_data in t_gfqs:
-                #Check Answer formatting
-                t_gfq_answer = t_gfq_question_data[QuestionData.answer_dict_key()]
-                if (isinstance(t_gfq_answer, list) == True): 
-                    t_gfq_answer = ", ".join(t_gfq_answer)
-
-                t_gfq_question_data[QuestionData.question_evaluation_dict_key()] = asdict(QuestionEvaluationData.evaluate_question(
-                    a_text = t_segment_data_dict[SegmentData.summary_dict_key()],
-                    a_ground_truth = ", ".join(t_segment_data_dict[SegmentData.gfqs_keywords_dict_key()]),
-                    a_question = t_gfq_question_data[QuestionData.question_dict_key()],
-                    a_answer = t_gfq_answer
-                ))
-            t_segment_data_dict[SegmentData.gfqs_dict_key()] = t_gfqs
-
-        #Save changes
-        file_manager.create_segment_file(t_segment_file_path, t_segment_data_dict)
-
-        #BLQs Evaluation
-        print("\nEvaluating BLQs...")
-        if (a_do_blqs == True):
-            t_blqs: list[dict] = t_segment_data_dict[SegmentData.blqs_dict_key()]
-            for t_blq_question_data in t_blqs:
-                t_blq_question_data[QuestionData.question_evaluation_dict_key()] = asdict(QuestionEvaluationData.evaluate_question(
-                    a_text = t_segment_data_dict[SegmentData.summary_dict_key()],
-                    a_ground_truth = ", ".join(t_segment_data_dict[SegmentData.blqs_keywords_dict_key()]),
-                    a_question = t_blq_question_data[QuestionData.question_dict_key()],
-                    a_answer = t_blq_question_data[QuestionData.answer_dict_key()]
-                ))
-            t_segment_data_dict[SegmentData.blqs_dict_key()] = t_blqs
-        
-        #Save changes
-        file_manager.create_segment_file(t_segment_file_path, t_segment_data_dict)
+            t_answers.append(t_answer)
+
+        return t_answers
     
 
+    #Pipeline*
+    def run_all(self, a_only_changed: bool = False, a_stages: list[str] = None, a_resume: bool = False) -> dict:
+        return asyncio.run(self.arun_all(a_only_changed, a_stages, a_resume))
+
+
+    @progress_events.stage("pipeline")
+    async def arun_all(self, a_only_changed: bool = False, a_stages: list[str] = None, a_resume: bool = False) -> dict:
+        #Runs every stage for every segment as one graph. A task only waits for the tasks of its own segment it needs, e.g.
+        #segment 3's GFQs only wait for segment 3's summary keywords, so the stages of different segments overlap instead of
+        #each stage waiting for the slowest segment of the previous one. PIPELINE_MAX_CONCURRENT_TASKS tasks run at a time.
+        #a_stages limits the run to some of m_pipeline_stages, the segment files must already have the other stages' results.
+        #With a_resume, the segment tasks the run journal has as done since the last run are skipped.
+        #Returns the pipeline report, with the per stage utilisation, and the evaluation report.
+
+        #Projects opened by name have no transcript, their segment files already exist.
+        if (self.raw_transcript != ""):
+            await asyncio.to_thread(self.initialise)
+
+        t_segments_count = self.get_number_of_segments()
+        t_evaluation_report = self._get_empty_evaluation_report()
+        t_stages = m_pipeline_stages if a_stages == None else a_stages
+
+        #Context utilisation is one project wide task, it is not journaled.
+        t_journal = run_journal.get_run_journal(self.files_schema.run_journal_path)
+        for t_stage in t_stages:
+            if (t_stage != "context_utilisation"):
+                self._start_run_journal(t_stage, SegmentData.question_types() if t_stage in ["questions", "evaluation"] else [""], a_resume)
+        t_resumed_units_count = 0
+        #Set before the tasks are created, they copy the context.
+        t_tier_counts = local_scorers.start_run_tier_counts()
+
+        def _journaled(a_stage: str, a_segment_index: int, a_question_type: str, a_run: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+            async def _arun() -> None:
+                nonlocal t_resumed_units_count
+                if (self._is_unit_completed(t_journal, self.get_segment_data(a_segment_index), a_stage, a_segment_index, a_question_type) == True):
+                    t_resumed_units_count += 1
+                    return
+
+                await a_run()
+                self._record_unit(t_journal, self.get_segment_data(a_segment_index), a_stage, a_segment_index, a_question_type)
+            return _arun
+
+        async def _aevaluate_segment(a_segment_index: int) -> None:
+            nonlocal t_resumed_units_count
+            t_segment_report, t_skipped_units_count = await asyncio.to_thread(
+                self._evaluate_segment_with_journal, t_journal, a_segment_index, SegmentData.question_types(), a_only_changed
+            )
+            t_resumed_units_count += t_skipped_units_count
+            self._add_to_evaluation_report(t_evaluation_report, t_segment_report)
+
+        t_pipeline = PipelineExecutor(m_pipeline_max_concurrent_tasks)
+
+        def _add_task(a_name: str, a_stage: str, a_run, a_dependencies: list[str] = None) -> None:
+            #The tasks of stages that are not run are not waited for, their results are already saved.
+            if (a_stage in t_stages):
+                t_pipeline.add_task(a_name, a_stage, a_run, [t_name for t_name in (a_dependencies or []) if t_name in t_pipeline.tasks])
+
+        for i in range(t_segments_count):
+            _add_task(f"summary:{i}", "summaries", _journaled("summaries", i, "", functools.partial(self.agenerate_segment_summary, i)))
+            _add_task(
+                f"transcript_keywords:{i}",
+                "transcript_keywords",
+                _journaled("transcript_keywords", i, "", functools.partial(
+                    self._agenerate_segment_keywords, i, SegmentData.transcript_dict_key(), SegmentData.generated_transcript_keywords_dict_key(), self.settings.number_of_transcript_keywords
+                ))
+            )
+            _add_task(
+                f"summary_keywords:{i}",
+                "summary_keywords",
+                _journaled("summary_keywords", i, "", functools.partial(
+                    self._agenerate_segment_keywords, i, SegmentData.summary_dict_key(), SegmentData.generated_summary_keywords_dict_key(), self.settings.number_of_summary_keywords
+                )),
+                [f"summary:{i}"]
+            )
+
+            #SAQs and MCQs are generated from the transcript keywords, GFQs and BLQs from the summary keywords.
+            for t_question_type in SegmentData.question_types():
+                t_keywords_task_name = f"transcript_keywords:{i}"
+                if (t_question_type == SegmentData.gfqs_dict_key() or t_question_type == SegmentData.blqs_dict_key()):
+                    t_keywords_task_name = f"summary_keywords:{i}"
+                _add_task(
+                    f"{t_question_type}:{i}",
+                    "questions",
+                    _journaled("questions", i, t_question_type, functools.partial(self.agenerate_segment_questions_of_type, i, t_question_type)),
+                    [t_keywords_task_name]
+                )
+
+            _add_task(f"evaluation:{i}", "evaluation", functools.partial(_aevaluate_segment, i), [f"{t_question_type}:{i}" for t_question_type in SegmentData.question_types()])
+
+        #Ragas is run once over the whole project after all segments are evaluated.
+        if (self.settings.batched_context_utilisation == True):
+            _add_task(
+                "context_utilisation",
+                "context_utilisation",
+                functools.partial(asyncio.to_thread, self.evaluate_context_utilisation, list(range(t_segments_count)), a_only_missing = a_only_changed),
+                [f"evaluation:{i}" for i in range(t_segments_count)]
+            )
+
+        t_finished_segments_count = 0
+        def _on_task_done(a_task: PipelineTask) -> None:
+            nonlocal t_finished_segments_count
+
+            progress_events.publish(self.name, "task_" + a_task.status, {"stage" : "pipeline", "task" : a_task.name, "error" : a_task.error})
+
+            if (a_task.stage == "evaluation"):
+                t_finished_segments_count += 1
+                self._report_progress(t_finished_segments_count, t_segments_count, a_in_order = False)
+
+        self._report_progress(0, t_segments_count, a_in_order = False)
+        t_pipeline_report = await t_pipeline.run(_on_task_done)
+
+        print(f"\nRan {len(t_pipeline.tasks)} tasks in {t_pipeline_report['wall_seconds']} seconds, {len(t_pipeline_report['failures'])} failed or skipped.")
+        if (a_resume == True):
+            print(f"Resumed {t_resumed_units_count} units the run journal had as done.")
+            t_pipeline_report["resumed_units"] = t_resumed_units_count
+
+        if (self.settings.tiered_evaluation == True):
+            t_evaluation_report["tiers"] = local_scorers.get_tier_report(t_tier_counts)
+
+        return {"pipeline" : t_pipeline_report, "evaluation" : t_evaluation_report}
+
+
+
     def get_project_data_as_csv(self):
         t_all_segment_data: list[dict] = self._get_all_segments_data()
 
@@ -591,14 +1253,164 @@ class Project:
 
     
     #Utility*
+    def _run_segments_in_parallel(self, a_function: Callable[[int], None], a_segments_count: int, a_workers: int) -> None:
+        #Calls a_function with every segment index on a_workers threads, the LLM calls spend their time waiting on the provider.
+        #a_function saves its segment's result itself as soon as it is done, each segment has its own file so their order is kept.
+        #A failed segment does not stop the others, the first error is raised once they are all done.
+        self._report_progress(0, a_segments_count, a_in_order = False)
+
+        t_errors: list[Exception] = []
+        t_executor = ThreadPoolExecutor(max_workers = a_workers, thread_name_prefix = "segments")
+        try:
+            #Each segment runs in a copy of this context, so its events and LLM calls belong to the running stage.
+            t_futures = [t_executor.submit(contextvars.copy_context().run, self._run_segment, a_function, i) for i in range(a_segments_count)]
+            for t_segments_done, t_future in enumerate(as_completed(t_futures), 1):
+                if (t_future.exception() != None):
+                    t_errors.append(t_future.exception())
+                self._report_progress(t_segments_done, a_segments_count, a_in_order = False)
+        finally:
+            #If the progress callback stopped the operation, the queued segments are dropped and the running ones finish.
+            t_executor.shutdown(wait = True, cancel_futures = True)
+
+        if (len(t_errors) > 0):
+            raise t_errors[0]
+
+
+    async def _arun_segments_concurrently(self, a_function: Callable[[int], Awaitable], a_segments_count: int, a_workers: int) -> None:
+        #The async version of _run_segments_in_parallel, at most a_workers segments are awaited at the same time.
+        self._report_progress(0, a_segments_count, a_in_order = False)
+        t_semaphore = asyncio.Semaphore(a_workers)
+
+        async def _arun_segment(a_segment_index: int) -> Exception | None:
+            async with t_semaphore:
+                try:
+                    await self._arun_segment(a_function, a_segment_index)
+                except Exception as e:
+                    return e
+            return None
+
+        t_errors: list[Exception] = []
+        t_tasks = [asyncio.ensure_future(_arun_segment(i)) for i in range(a_segments_count)]
+        try:
+            for t_segments_done, t_task in enumerate(asyncio.as_completed(t_tasks), 1):
+                t_error = await t_task
+                if (t_error != None):
+                    t_errors.append(t_error)
+                self._report_progress(t_segments_done, a_segments_count, a_in_order = False)
+        finally:
+            for t_task in t_tasks:
+                t_task.cancel()
+            await asyncio.gather(*t_tasks, return_exceptions = True)
+
+        if (len(t_errors) > 0):
+            raise t_errors[0]
+
+
+    def _run_segment(self, a_function: Callable[[int], None], a_segment_index: int) -> None:
+        progress_events.report_segment_event("segment_started", a_segment_index)
+        t_start_time = time.time()
+        try:
+            a_function(a_segment_index)
+        except Exception as e:
+            print(f"Segment {a_segment_index} failed: {e}")
+            progress_events.report_segment_event("segment_failed", a_segment_index, {"error" : repr(e), "seconds" : round(time.time() - t_start_time, 3)})
+            raise
+
+        progress_events.report_segment_event("segment_finished", a_segment_index, {"seconds" : round(time.time() - t_start_time, 3)})
+
+
+    async def _arun_segment(self, a_function: Callable[[int], Awaitable], a_segment_index: int) -> None:
+        progress_events.report_segment_event("segment_started", a_segment_index)
+        t_start_time = time.time()
+        try:
+            await a_function(a_segment_index)
+        except Exception as e:
+            print(f"Segment {a_segment_index} failed: {e}")
+            progress_events.report_segment_event("segment_failed", a_segment_index, {"error" : repr(e), "seconds" : round(time.time() - t_start_time, 3)})
+            raise
+
+        progress_events.report_segment_event("segment_finished", a_segment_index, {"seconds" : round(time.time() - t_start_time, 3)})
+
+
+    def _start_run_journal(self, a_stage: str, a_question_types: list[str], a_resume: bool) -> RunJournal:
+        #Stages without question types are journaled with the question type "".
+        t_journal = run_journal.get_run_journal(self.files_schema.run_journal_path)
+        t_resumed_units_count = t_journal.start(a_stage, a_question_types, a_resume)
+
+        if (a_resume == True):
+            print(f"Resuming {a_stage} {' '.join(a_question_types)}, the run journal has {t_resumed_units_count} units as done.")
+            progress_events.publish(self.name, "run_resumed", {"stage" : a_stage, "question_types" : a_question_types, "journaled_units" : t_resumed_units_count})
+
+        return t_journal
+
+    def _is_unit_completed(self, a_journal: RunJournal, a_segment_data_dict: dict, a_stage: str, a_segment_index: int, a_question_type: str = "") -> bool:
+        #Only while the segment file still holds the output the journal recorded, a lost write or a changed segment is done again.
+        t_recorded_fingerprint = a_journal.get_recorded_fingerprint(a_stage, a_segment_index, a_question_type)
+        if (t_recorded_fingerprint == None or a_segment_data_dict == {}):
+            return False
+
+        return t_recorded_fingerprint == self._get_unit_fingerprint(a_segment_data_dict, a_stage, a_question_type)
+
+    def _record_unit(self, a_journal: RunJournal, a_segment_data_dict: dict, a_stage: str, a_segment_index: int, a_question_type: str = "") -> None:
+        #Called once the unit's output is saved to the segment file.
+        a_journal.record(a_stage, a_segment_index, a_question_type, self._get_unit_fingerprint(a_segment_data_dict, a_stage, a_question_type))
+
+    def _get_unit_fingerprint(self, a_segment_data_dict: dict, a_stage: str, a_question_type: str) -> str:
+        #The unit's inputs and its own output, so a unit is done again when an earlier stage changed what it was made from.
+        #Later stages add to the saved questions, so the questions unit's output is only the questions and answers, and the
+        #evaluation unit's output leaves out context utilisation, which may be scored later for the whole project.
+        t_inputs = [a_segment_data_dict[SegmentData.transcript_dict_key()]]
+        t_output = None
+
+        if (a_stage == "summaries"):
+            t_output = a_segment_data_dict[SegmentData.summary_dict_key()]
+        elif (a_stage == "transcript_keywords"):
+            t_output = a_segment_data_dict[SegmentData.generated_transcript_keywords_dict_key()]
+        elif (a_stage == "summary_keywords"):
+            t_inputs = [a_segment_data_dict[SegmentData.summary_dict_key()]]
+            t_output = a_segment_data_dict[SegmentData.generated_summary_keywords_dict_key()]
+        elif (a_stage == "questions" or a_stage == "evaluation"):
+            t_questions_and_answers = [
+                [t_question_data[QuestionData.question_dict_key()], t_question_data[QuestionData.answer_dict_key()]]
+                for t_question_data in a_segment_data_dict[a_question_type]
+            ]
+            t_inputs = [self._get_evaluation_text(a_segment_data_dict, a_question_type), sorted(a_segment_data_dict.get(SegmentData.question_type_keywords_dict_key(a_question_type), {}))]
+            t_output = t_questions_and_answers
+
+            if (a_stage == "evaluation"):
+                t_inputs.append(t_questions_and_answers)
+                t_output = [
+                    {
+                        t_criterion : t_evaluation for t_criterion, t_evaluation in t_question_data[QuestionData.question_evaluation_dict_key()].items()
+                        if (t_criterion != QuestionEvaluationData.context_utilisation_dict_key())
+                    }
+                    for t_question_data in a_segment_data_dict[a_question_type]
+                ]
+
+        return run_journal.get_fingerprint([t_inputs, t_output])
+
+    def _get_segment_lock(self, a_segment_file_path: Path) -> threading.Lock:
+        #Shared by all Project objects of the process, the API opens a new one per request.
+        with m_segment_locks_lock:
+            return m_segment_locks.setdefault(a_segment_file_path, threading.Lock())
+
+    def _report_progress(self, a_segments_done: int, a_segments_total: int, a_in_order: bool = True) -> None:
+        #Segments that finish out of order publish their own segment events, see _run_segment.
+        if (a_in_order == True):
+            progress_events.report_segments_progress(a_segments_done, a_segments_total)
+
+        #The callback may stop the operation by raising, e.g. when its job is cancelled. The segments done so far stay saved.
+        if (self.progress_callback != None):
+            self.progress_callback(a_segments_done, a_segments_total)
+
     def _get_all_segment_file_paths(self) -> list[Path]:
         t_segments_folder_paths: list[Path] = file_manager.get_folder_file_paths_list(self.files_schema.segments_folder_path)
 
         t_file_paths = []
-        for i, t_path in enumerate(t_segments_folder_paths):
-            #No point check if its not a json file, which they always should be.
+        for t_path in t_segments_folder_paths:
+            #Skips the temporary files of writes in progress.
             if (t_path.suffix == ".json"):
-                t_file_paths.append(self.files_schema.get_segment_file_path(i))
+                t_file_paths.append(self.files_schema.get_segment_file_path(len(t_file_paths)))
 
         return t_file_paths
     
@@ -616,10 +1428,8 @@ class Project:
             print(f"The given index ({a_index}) for retrieving segment data is too small. Given index.")
             return {}
         
-        t_segments_folder_path = self.files_schema.segments_folder_path
-        t_segments_folder_list = file_manager.get_folder_file_paths_list(t_segments_folder_path)
-
-        if (a_index >= len(t_segments_folder_list)):
+        #Only the json files, a write in progress has a temporary file next to them.
+        if (a_index >= len(self._get_all_segment_file_paths())):
             print(f"The given index ({a_index}) for retrieving segment data is out of bounds, too large.")
             return {}
         
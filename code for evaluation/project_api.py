@@ -1,11 +1,32 @@
+#Python Imports
+import os
+import asyncio
+import uuid
+import shutil
+import threading
+import functools
+from pathlib import Path
+from typing import Callable
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
 #External imports
-from dataclasses import asdict
-from fastapi import FastAPI, Form
+from dataclasses import asdict, replace
+from fastapi import FastAPI, Form, Request, UploadFile, File
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 #Custom Imports
 from project import Project
+import project
 from project_settings import ProjectSettings
+import project_settings
+import bulk_ingestion
+from segment_data import SegmentData
+from jobs.job_manager import JobManager, JobCancelledError
+from jobs.job_data import JobData
+from utilities import progress_events
+from utilities import file_manager
 
 
 api = FastAPI(
@@ -20,6 +41,24 @@ api.add_middleware(
     allow_headers = ["*"],
 )
 
+#Generation routes are async and await the async LLM path. Work with no async path, such as evaluation and the CSV export, runs on
+#this pool instead of Starlette's, so the cheap read routes, which stay plain functions on Starlette's pool, never queue behind it.
+m_blocking_work_executor = ThreadPoolExecutor(
+    max_workers = int(os.getenv("PROJECT_API_MAX_BLOCKING_WORKERS", "4")),
+    thread_name_prefix = "project-api-work"
+)
+
+#Held while a route or a job changes a project. The atomic writes keep every file whole, but two requests that both load,
+#change and save a project's files would otherwise lose one of the updates. Job threads take it too, so it is a threading lock.
+m_project_locks: dict[str, threading.Lock] = {}
+m_project_locks_lock = threading.Lock()
+#Requests wait for a project lock on these threads instead of asyncio's default pool, the request holding the lock still needs
+#that pool for its to_thread calls. Waiting there, enough waiting requests would keep the holder from finishing.
+m_project_lock_waiting_executor = ThreadPoolExecutor(
+    max_workers = int(os.getenv("PROJECT_API_MAX_WAITING_REQUESTS", "256")),
+    thread_name_prefix = "project-lock"
+)
+
 
 
 #Project*
@@ -35,7 +74,7 @@ def does_valid_project_exist(a_project_name: str) -> dict:
 
 
 @api.post("/create-project/")
-def create_project(
+async def create_project(
     a_project_name: str = Form(...), 
     a_project_transcript: str = Form(...),
     a_transcript_chunk_size: int = Form(...),
@@ -43,7 +82,14 @@ def create_project(
     a_number_of_transcript_keywords: int = Form(...),
     a_number_of_summary_keywords: int = Form(...),
     a_number_of_questions: int = Form(...),
-    a_llm_name: str = Form(...)
+    a_llm_name: str = Form(...),
+    a_structured_generation: bool = Form(False),
+    a_combined_evaluation: bool = Form(False),
+    a_batched_evaluation: bool = Form(False),
+    a_batched_context_utilisation: bool = Form(False),
+    a_tiered_evaluation: bool = Form(False),
+    a_summaries_workers: int = Form(1),
+    a_keywords_workers: int = Form(1)
 ):
     print("Creating Project...")
     print(f"Project name: {a_project_name}")
@@ -54,6 +100,16 @@ def create_project(
     print(f"Number of Summary Keywords: {a_number_of_summary_keywords}")
     print(f"Number of questions: {a_number_of_questions}")
     print(f"LLM: {a_llm_name}")
+    print(f"Structured Generation: {a_structured_generation}")
+    print(f"Combined Evaluation: {a_combined_evaluation}")
+    print(f"Batched Evaluation: {a_batched_evaluation}")
+    print(f"Batched Context Utilisation: {a_batched_context_utilisation}")
+    print(f"Tiered Evaluation: {a_tiered_evaluation}")
+    print(f"Summaries Workers: {a_summaries_workers}")
+    print(f"Keywords Workers: {a_keywords_workers}")
+
+    if (a_combined_evaluation == True and a_batched_evaluation == True):
+        return _output_custom("Combined and batched evaluation cannot both be on. Cannot create the project!")
 
     t_project_settings: ProjectSettings = ProjectSettings(
         summaries_word_limit = a_summary_size,
@@ -73,7 +129,15 @@ def create_project(
         blq_prefix_index = 0,
         blq_suffix_index = 0,
         mcq_prefix_index = 0,
-        mcq_suffix_index = 0
+        mcq_suffix_index = 0,
+
+        structured_generation = a_structured_generation,
+        combined_evaluation = a_combined_evaluation,
+        batched_evaluation = a_batched_evaluation,
+        batched_context_utilisation = a_batched_context_utilisation,
+        tiered_evaluation = a_tiered_evaluation,
+        summaries_workers = a_summaries_workers,
+        keywords_workers = a_keywords_workers
     )
 
     t_project = Project (
@@ -85,7 +149,8 @@ def create_project(
     if (t_project == None):
         return _output_false()
 
-    t_project.initialise() 
+    async with _alock_project(a_project_name):
+        await _run_blocking(t_project.initialise)
     print(f"Created project with the name {t_project.name}")
 
     return _output_true()
@@ -133,7 +198,7 @@ def get_number_of_segments(a_project_name: str) -> dict:
 
 #Transcript*
 @api.post("/generate-segment-summaries/{a_project_name}")
-def generate_segment_summaries(a_project_name: str):
+async def generate_segment_summaries(a_project_name: str):
 
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
@@ -142,14 +207,15 @@ def generate_segment_summaries(a_project_name: str):
     t_project = _open_project(a_project_name)
 
     print("Generating Summaries...")
-    t_project.generate_segments_summaries()
+    async with _alock_project(a_project_name):
+        await t_project.agenerate_segments_summaries()
     return _output_true()
 
 
 
 #Keywords*
 @api.post("/generate-transcript-keywords/{a_project_name}")
-def generate_transcript_keywords(a_project_name: str):
+async def generate_transcript_keywords(a_project_name: str):
 
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
@@ -158,12 +224,13 @@ def generate_transcript_keywords(a_project_name: str):
     t_project = _open_project(a_project_name)
 
     print("Generating Transcript Keywords...")
-    t_project.generate_transcript_keywords()
+    async with _alock_project(a_project_name):
+        await t_project.agenerate_transcript_keywords()
     return _output_true()
 
 
 @api.post("/generate-summary-keywords/{a_project_name}")
-def generate_summary_keywords(a_project_name: str):
+async def generate_summary_keywords(a_project_name: str):
     
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
@@ -172,7 +239,23 @@ def generate_summary_keywords(a_project_name: str):
     t_project = _open_project(a_project_name)
 
     print("Generating Summary Keywords...")
-    t_project.generate_summary_keywords()
+    async with _alock_project(a_project_name):
+        await t_project.agenerate_summary_keywords()
+    return _output_true()
+
+
+@api.post("/generate-all-keywords/{a_project_name}")
+async def generate_all_keywords(a_project_name: str):
+
+    #Check if project exists and is valid.
+    if (_does_valid_project_exist(a_project_name) == False):
+        return _output_custom("Project does not exist. Cannot retrieve segment data!")
+    
+    t_project = _open_project(a_project_name)
+
+    print("Generating Transcript and Summary Keywords...")
+    async with _alock_project(a_project_name):
+        await t_project.agenerate_all_keywords()
     return _output_true()
 
 
@@ -184,11 +267,12 @@ def remove_keyword_from_segment(a_project_name: str, a_segment_index: int, a_use
         return _output_custom("Project does not exist. Cannot retrieve segment data!")
 
     t_project = _open_project(a_project_name)
-    t_outcome = t_project.remove_keyword_from_segment(
-        a_segment_index = a_segment_index,
-        a_user_keywords_type = a_user_keywords_type,
-        a_keyword = a_keyword
-    )
+    with _get_project_lock(a_project_name):
+        t_outcome = t_project.remove_keyword_from_segment(
+            a_segment_index = a_segment_index,
+            a_user_keywords_type = a_user_keywords_type,
+            a_keyword = a_keyword
+        )
 
     print(f"The outcome for removing the keyword <{a_keyword}> from the project <{a_project_name}> in segment index <{a_segment_index}>, of type <{a_user_keywords_type}> was {t_outcome}")
     return _output_custom(t_outcome)
@@ -203,11 +287,12 @@ def add_keyword_to_segment(a_project_name: str, a_segment_index: int, a_user_key
 
     t_project = _open_project(a_project_name)
     
-    t_outcome = t_project.add_keyword_to_segment(
-        a_segment_index = a_segment_index,
-        a_user_keywords_type = a_user_keywords_type,
-        a_keyword = a_keyword
-    )
+    with _get_project_lock(a_project_name):
+        t_outcome = t_project.add_keyword_to_segment(
+            a_segment_index = a_segment_index,
+            a_user_keywords_type = a_user_keywords_type,
+            a_keyword = a_keyword
+        )
     
     print(f"The outcome for adding the keyword <{a_keyword}> to the project <{a_project_name}> in segment index <{a_segment_index}>, of type <{a_user_keywords_type}> was {t_outcome}")
     return _output_custom(t_outcome)
@@ -216,26 +301,28 @@ def add_keyword_to_segment(a_project_name: str, a_segment_index: int, a_user_key
 
 #Questions*
 @api.post("/generate-questions-of-type/{a_project_name}/{a_question_type}")
-def generate_questions_of_type(a_project_name: str, a_question_type: str):
+async def generate_questions_of_type(a_project_name: str, a_question_type: str):
     
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
         return _output_custom("Project does not exist. Cannot retrieve segment data!")
 
     t_project = _open_project(a_project_name)
-    t_outcome = t_project.generate_questions_of_type(a_question_type)
+    async with _alock_project(a_project_name):
+        t_outcome = await t_project.agenerate_questions_of_type(a_question_type)
     return _output_custom(t_outcome)
 
 
 @api.get("/generate-segment-questions-of-type/{a_project_name}/{a_segment_id}/{a_question_type}")
-def generate_segment_questions_of_type(a_project_name: str, a_segment_id: int, a_question_type: str):
+async def generate_segment_questions_of_type(a_project_name: str, a_segment_id: int, a_question_type: str):
     
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
         return _output_custom("Project does not exist. Cannot retrieve segment data!")
 
     t_project = _open_project(a_project_name)
-    t_outcome = t_project.generate_segment_questions_of_type(a_segment_id, a_question_type)
+    async with _alock_project(a_project_name):
+        t_outcome = await t_project.agenerate_segment_questions_of_type(a_segment_id, a_question_type)
     print(f"{a_question_type} questions generated for segment {a_segment_id}:\n{t_outcome}")
     return _output_custom(t_outcome)
 
@@ -255,45 +342,249 @@ def get_all_questions_of_type(a_project_name: str, a_question_type: str):
 
 #Evaluation*
 @api.get("/evaluate-all_segments/{a_project_name}")
-def evaluate_all_segments(a_project_name: str) -> dict:
+async def evaluate_all_segments(a_project_name: str, a_only_changed: bool = False) -> dict:
 
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
         return _output_custom("Project does not exist. Cannot retrieve segment data!")
     
     t_project: Project = _open_project(a_project_name)
-    t_project.evaluate_all_segments()
-    return _output_true()
+    async with _alock_project(a_project_name):
+        t_evaluation_report = await _run_blocking(t_project.evaluate_all_segments, a_only_changed = a_only_changed)
+    return {**_output_true(), "evaluation_report" : t_evaluation_report}
 
 
 @api.get("/evaluate-segment/{a_project_name}/{a_segment_index}")
-def evaluate_segment(a_project_name: str, a_segment_index: int) -> dict:
+async def evaluate_segment(a_project_name: str, a_segment_index: int, a_only_changed: bool = False) -> dict:
     
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
         return _output_custom("Project does not exist. Cannot retrieve segment data!")
     
     t_project: Project = _open_project(a_project_name)
-    t_project.evaluate_segment(a_segment_index)
+    async with _alock_project(a_project_name):
+        t_evaluation_report = await _run_blocking(t_project.evaluate_segment, a_segment_index, a_only_changed = a_only_changed)
+    return {**_output_true(), "evaluation_report" : t_evaluation_report}
+
+
+@api.get("/evaluate-context-utilisation/{a_project_name}")
+async def evaluate_context_utilisation(a_project_name: str) -> dict:
+
+    #Check if project exists and is valid.
+    if (_does_valid_project_exist(a_project_name) == False):
+        return _output_custom("Project does not exist. Cannot retrieve segment data!")
+    
+    t_project: Project = _open_project(a_project_name)
+    async with _alock_project(a_project_name):
+        await _run_blocking(t_project.evaluate_context_utilisation)
     return _output_true()
 
 
 
 #Project CSV Data
 @api.get("/get-csv/{a_project_name}")
-def get_csv(a_project_name: str):
+async def get_csv(a_project_name: str):
 
     #Check if project exists and is valid.
     if (_does_valid_project_exist(a_project_name) == False):
         return _output_custom("Project does not exist. Cannot retrieve segment data!")
     
     t_project: Project = _open_project(a_project_name)
-    t_project.get_project_data_as_csv()
+    await _run_blocking(t_project.get_project_data_as_csv)
 
     return _output_true()
 
 
 
+#Jobs*
+#Long operations that can be run as background jobs, called with the project and the job's arguments.
+m_project_job_operations: dict[str, Callable] = {
+    "generate-segment-summaries" : lambda a_project, a_arguments: a_project.generate_segments_summaries(),
+    "generate-transcript-keywords" : lambda a_project, a_arguments: a_project.generate_transcript_keywords(),
+    "generate-summary-keywords" : lambda a_project, a_arguments: a_project.generate_summary_keywords(),
+    "generate-all-keywords" : lambda a_project, a_arguments: a_project.generate_all_keywords(),
+    "generate-questions-of-type" : lambda a_project, a_arguments: a_project.generate_questions_of_type(a_arguments["a_question_type"], a_resume = a_arguments.get("a_resume", False)),
+    "evaluate-all-segments" : lambda a_project, a_arguments: a_project.evaluate_all_segments(a_only_changed = a_arguments.get("a_only_changed", False), a_resume = a_arguments.get("a_resume", False)),
+    "run-all" : lambda a_project, a_arguments: a_project.run_all(a_only_changed = a_arguments.get("a_only_changed", False), a_resume = a_arguments.get("a_resume", False)),
+}
+
+def _run_project_job(a_job: JobData, a_report_progress: Callable):
+    t_project = _open_project(a_job.project_name)
+    t_project.progress_callback = a_report_progress
+    with _get_project_lock(a_job.project_name):
+        return m_project_job_operations[a_job.operation](t_project, a_job.arguments)
+
+def _run_bulk_ingestion_job(a_job: JobData, a_report_progress: Callable):
+    #Progress is reported per project. Each project is ingested under its project lock, so it waits for the project's other jobs.
+    #The uploaded archive is kept until the job has finished or was cancelled, a resumed job reads it again and after a failure
+    #it can still be ingested with bulk_ingestion.py --resume.
+    t_archive_path = Path(a_job.arguments["a_archive_path"])
+    try:
+        t_report = asyncio.run(bulk_ingestion.aingest_transcripts(
+            a_source_path = t_archive_path,
+            a_projects_folder_path = m_projects_folder_path,
+            a_settings = ProjectSettings.dict_to_object(a_job.arguments["a_settings"]),
+            a_stages = a_job.arguments["a_stages"],
+            a_max_concurrent_projects = a_job.arguments["a_max_concurrent_projects"],
+            a_progress_callback = a_report_progress,
+            a_resume = a_job.arguments.get("a_resume", False),
+            a_lock_project = _alock_project
+        ))
+    except JobCancelledError:
+        t_archive_path.unlink(missing_ok = True)
+        raise
+    except Exception:
+        print(f"The bulk ingestion job {a_job.id} failed, its archive is kept at {t_archive_path}.")
+        raise
+
+    if (t_report == None):
+        raise ValueError(f"The archive {a_job.project_name} could not be ingested, it is kept at {t_archive_path}.")
+
+    t_archive_path.unlink(missing_ok = True)
+    return t_report
+
+#Bulk ingested projects are created where Project opens projects by default.
+m_projects_folder_path: Path = Path("../Projects-Data")
+
+#Jobs are saved in PROJECT_JOBS_FOLDER, so the queue survives a restart. Finished jobs are deleted after PROJECT_JOBS_RETENTION_DAYS.
+m_job_manager = JobManager(
+    a_jobs_folder_path = Path(os.getenv("PROJECT_JOBS_FOLDER", "../Jobs-Data")),
+    a_operations = {**{t_operation: _run_project_job for t_operation in m_project_job_operations}, "bulk-ingest" : _run_bulk_ingestion_job},
+    a_max_workers = int(os.getenv("PROJECT_JOBS_MAX_WORKERS", "2")),
+    a_max_queued_jobs = int(os.getenv("PROJECT_JOBS_MAX_QUEUED", "100")),
+    a_retention_seconds = float(os.getenv("PROJECT_JOBS_RETENTION_DAYS", "7")) * 24 * 60 * 60
+)
+
+@api.on_event("startup")
+def resume_jobs() -> None:
+    m_job_manager.resume()
+
+
+@api.post("/submit-job/{a_project_name}/{a_operation}")
+def submit_job(a_project_name: str, a_operation: str, a_question_type: str = "", a_only_changed: bool = False, a_resume: bool = False) -> dict:
+    #Returns the job id straight away, the job's progress and result are read with the routes below.
+    #a_resume continues an operation that was stopped, skipping what the project's run journal has as done.
+
+    #Check if project exists and is valid.
+    if (_does_valid_project_exist(a_project_name) == False):
+        return _output_custom("Project does not exist. Cannot submit the job!")
+
+    if (a_operation not in m_project_job_operations):
+        return _output_custom(f"Invalid operation. All operations: {', '.join(m_project_job_operations)}")
+
+    if (a_operation == "generate-questions-of-type" and SegmentData.does_question_type_exist(a_question_type) == False):
+        return _output_custom("Invalid question type.")
+
+    t_job = m_job_manager.submit(a_operation, a_project_name, {"a_question_type" : a_question_type, "a_only_changed" : a_only_changed, "a_resume" : a_resume})
+    if (t_job == None):
+        return _output_custom("The job queue is full, try again later.")
+
+    return {**_output_true(), "job_id" : t_job.id}
+
+
+@api.get("/get-job-status/{a_job_id}")
+def get_job_status(a_job_id: str) -> dict:
+    t_job = m_job_manager.get_job(a_job_id)
+    if (t_job == None):
+        return _output_custom("Job does not exist.")
+
+    return _output_custom(t_job.get_status_dict())
+
+
+@api.get("/get-job-result/{a_job_id}")
+def get_job_result(a_job_id: str) -> dict:
+    t_job = m_job_manager.get_job(a_job_id)
+    if (t_job == None):
+        return _output_custom("Job does not exist.")
+
+    if (t_job.is_finished() == False):
+        return {**_output_custom("Job is not finished."), "status" : t_job.get_status_dict()}
+
+    return {**_output_custom(t_job.result), "status" : t_job.get_status_dict()}
+
+
+@api.post("/cancel-job/{a_job_id}")
+def cancel_job(a_job_id: str) -> dict:
+    return _output_custom(m_job_manager.cancel(a_job_id))
+
+
+@api.post("/bulk-create-projects/")
+async def bulk_create_projects(
+    a_transcripts_archive: UploadFile = File(...),
+    a_settings_project_name: str = Form(""),
+    a_llm_name: str = Form(""),
+    a_stages: str = Form(""),
+    a_max_concurrent_projects: int = Form(4)
+) -> dict:
+    #Creates a project for every .txt transcript in the archive and runs the comma separated run_all stages, see bulk_ingestion.py.
+    #Every project gets the settings of a_settings_project_name, or the default settings, with a_llm_name as the model if given.
+    #Runs as a job, its progress is counted in projects and its result is the ingestion report.
+    print(f"Bulk creating projects from {a_transcripts_archive.filename}...")
+
+    if (bulk_ingestion.is_archive(Path(a_transcripts_archive.filename or "")) == False):
+        return _output_custom("The transcripts file is not an archive. Cannot create the projects!")
+
+    t_stages = [t_stage.strip() for t_stage in a_stages.split(",") if t_stage.strip() != ""]
+    if (bulk_ingestion.is_valid_stages(t_stages) == False):
+        return _output_custom(f"Invalid stages. All stages: {', '.join(project.m_pipeline_stages)}")
+
+    if (a_max_concurrent_projects < 1):
+        return _output_custom("The maximum number of concurrent projects has to be at least 1. Cannot create the projects!")
+
+    t_settings = project_settings.default
+    if (a_settings_project_name != ""):
+        if (_does_valid_project_exist(a_settings_project_name) == False):
+            return _output_custom("The settings project does not exist. Cannot create the projects!")
+        t_settings = _open_project(a_settings_project_name).get_saved_settings()
+    if (a_llm_name != ""):
+        t_settings = replace(t_settings, llm_name = a_llm_name)
+
+    #Saved next to the jobs, so a job resumed after a restart still has it.
+    t_archive_path = m_job_manager.jobs_folder_path / "Uploads" / (uuid.uuid4().hex + "-" + Path(a_transcripts_archive.filename).name)
+    await _run_blocking(_save_upload, a_transcripts_archive, t_archive_path)
+
+    t_job = m_job_manager.submit("bulk-ingest", a_transcripts_archive.filename, {
+        "a_archive_path" : str(t_archive_path),
+        "a_settings" : asdict(t_settings),
+        "a_stages" : t_stages,
+        "a_max_concurrent_projects" : a_max_concurrent_projects
+    })
+    if (t_job == None):
+        t_archive_path.unlink(missing_ok = True)
+        return _output_custom("The job queue is full, try again later.")
+
+    return {**_output_true(), "job_id" : t_job.id}
+
+
+
+#Progress*
+@api.get("/stream-progress/{a_project_name}")
+async def stream_progress(a_project_name: str, a_request: Request, a_last_event_id: int = 0):
+    #Server-Sent Events of the project's stages, segments and LLM calls, see utilities/progress_events.py.
+    #A reconnecting EventSource sends the Last-Event-ID header and gets the events it missed.
+
+    #Check if project exists and is valid.
+    if (_does_valid_project_exist(a_project_name) == False):
+        return _output_custom("Project does not exist. Cannot stream its progress!")
+
+    t_last_event_id = a_last_event_id
+    if (a_request.headers.get("last-event-id", "").isdigit() == True):
+        t_last_event_id = int(a_request.headers["last-event-id"])
+
+    async def _stream_events():
+        async for t_event in progress_events.subscribe(a_project_name, t_last_event_id):
+            if (await a_request.is_disconnected() == True):
+                break
+            yield progress_events.to_server_sent_event(t_event)
+
+    return StreamingResponse(
+        _stream_events(),
+        media_type = "text/event-stream",
+        headers = {"Cache-Control" : "no-cache", "X-Accel-Buffering" : "no"}
+    )
+
+
+
 #Project Settings Data
 @api.get("/get-project-settings/{a_project_name}")
 def get_project_settings(a_project_name: str):
@@ -308,7 +599,7 @@ def get_project_settings(a_project_name: str):
 
 
 @api.get("/hi/")
-def hi():
+async def hi():
     return f"Hello!"
 
 
@@ -322,6 +613,35 @@ def _output_true() -> dict:
 def _output_false() -> dict:
     return _output_custom(False)
 
+async def _run_blocking(a_function, *a_args, **a_kwargs):
+    return await asyncio.get_running_loop().run_in_executor(m_blocking_work_executor, functools.partial(a_function, *a_args, **a_kwargs))
+
+def _get_project_lock(a_project_name: str) -> threading.Lock:
+    with m_project_locks_lock:
+        return m_project_locks.setdefault(a_project_name, threading.Lock())
+
+@asynccontextmanager
+async def _alock_project(a_project_name: str):
+    #Waits for the lock on a worker thread, so the event loop keeps serving other requests meanwhile.
+    t_lock = _get_project_lock(a_project_name)
+    t_future = asyncio.get_running_loop().run_in_executor(m_project_lock_waiting_executor, t_lock.acquire)
+    try:
+        await asyncio.shield(t_future)
+    except asyncio.CancelledError:
+        #The waiting thread still gets the lock, it is released as soon as it does.
+        t_future.add_done_callback(lambda a_future: t_lock.release() if (a_future.cancelled() == False and a_future.exception() == None) else None)
+        raise
+
+    try:
+        yield
+    finally:
+        t_lock.release()
+
+def _save_upload(a_upload: UploadFile, a_file_path: Path) -> None:
+    file_manager.create_folder_if_not_exist(a_file_path.parent)
+    with open(a_file_path, "wb") as t_file:
+        shutil.copyfileobj(a_upload.file, t_file)
+
 def _open_project(a_project_name: str) -> Project:
     return Project(a_name = a_project_name, a_transcript = "")
 
@@ -12,6 +12,7 @@ class ProjectFilesSchema:
         self.segments_folder_path: Path = self.project_folder_path / "Segments"
         self.keywords_history_folder_path: Path = self.project_folder_path / "Keywords-History"
         self.project_settings_path: Path = self.project_folder_path / "settings.json"
+        self.run_journal_path: Path = self.project_folder_path / "run-journal.jsonl"
     
     @staticmethod
     def get_segment_file_name(a_segment_number: int) -> str:
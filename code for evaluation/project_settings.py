@@ -20,6 +20,32 @@ class ProjectSettings:
     mcq_prefix_index: int
     mcq_suffix_index: int
 
+    #Ask the generation LLM for JSON directly and only use the formatting LLM when it does not validate.
+    structured_generation: bool = False
+
+    #Score the six custom evaluation criteria with one judge request per question instead of one per criterion.
+    combined_evaluation: bool = False
+
+    #Score all questions of a segment and type for a criterion in one judge request, the segment text is then only sent once.
+    #Cannot be combined with combined_evaluation, which asks for all criteria of one question in a request instead.
+    batched_evaluation: bool = False
+
+    #Score the ragas context utilisation of all questions in a few large runs after evaluating, instead of a run per question.
+    batched_context_utilisation: bool = False
+
+    #Settle obviously good or broken questions with local scorers and only send the uncertain metrics to the judge.
+    tiered_evaluation: bool = False
+
+    #Number of segments summarised at the same time, each summary is saved as soon as it is done. 1 summarises them one by one.
+    summaries_workers: int = 1
+
+    #Number of segments whose transcript and summary keywords are generated at the same time by generate_all_keywords.
+    keywords_workers: int = 1
+
+    def __post_init__(self):
+        if (self.combined_evaluation == True and self.batched_evaluation == True):
+            raise ValueError("combined_evaluation and batched_evaluation cannot both be on.")
+
     def dict_to_object(a_dict: dict):
         try: 
             return ProjectSettings (
@@ -38,7 +64,16 @@ class ProjectSettings:
                 blq_prefix_index = a_dict["blq_prefix_index"],
                 blq_suffix_index = a_dict["blq_suffix_index"],
                 mcq_prefix_index = a_dict["mcq_prefix_index"],
-                mcq_suffix_index = a_dict["mcq_suffix_index"]
+                mcq_suffix_index = a_dict["mcq_suffix_index"],
+
+                #Older saved settings do not have it.
+                structured_generation = a_dict.get("structured_generation", False),
+                combined_evaluation = a_dict.get("combined_evaluation", False),
+                batched_evaluation = a_dict.get("batched_evaluation", False),
+                batched_context_utilisation = a_dict.get("batched_context_utilisation", False),
+                tiered_evaluation = a_dict.get("tiered_evaluation", False),
+                summaries_workers = a_dict.get("summaries_workers", 1),
+                keywords_workers = a_dict.get("keywords_workers", 1)
             )
         
         except:
@@ -64,5 +99,13 @@ default: ProjectSettings = ProjectSettings(
     blq_prefix_index = 0,
     blq_suffix_index = 0,
     mcq_prefix_index = 0,
-    mcq_suffix_index = 0
+    mcq_suffix_index = 0,
+
+    structured_generation = False,
+    combined_evaluation = False,
+    batched_evaluation = False,
+    batched_context_utilisation = False,
+    tiered_evaluation = False,
+    summaries_workers = 1,
+    keywords_workers = 1
 )
\ No newline at end of file
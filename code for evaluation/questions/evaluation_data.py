@@ -1,5 +1,16 @@
 from dataclasses import dataclass
 
+
+#The criteria our own judge prompts score, named like the QuestionEvaluationData fields. The ragas metrics are not included.
+m_custom_criteria: list[str] = [
+    "relevance",
+    "reading_comprehension",
+    "question_difficulty",
+    "question_clarity",
+    "answer_relevance",
+    "answer_correctness",
+]
+
 @dataclass
 class EvaluationData:
     score: float = -1
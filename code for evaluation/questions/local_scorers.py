@@ -0,0 +1,306 @@
+#Python Imports
+import re
+import math
+import threading
+import contextvars
+from collections import Counter
+from typing import Callable
+
+#Custom Imports
+from questions.evaluation_data import EvaluationData
+
+
+#First evaluation tier, cheap local scorers that settle obviously good or obviously broken questions without the LLM judge.
+#A scorer returns an EvaluationData when it is confident, or None to escalate the metric to the next scorer and finally the judge.
+#Scorers are called with (a_metric_name, a_question_type, a_text, a_ground_truth, a_question, a_answer), where a_answer is the
+#answer as stored in the segment data, so MCQs still have all of their options.
+
+#The SegmentData question type keys, segment_data is not imported as it imports the evaluation data, which imports this module.
+m_mcqs_type: str = "mcqs"
+m_gfqs_type: str = "gfqs"
+m_blqs_type: str = "blqs"
+
+m_question_metrics: list[str] = ["relevance", "reading_comprehension", "question_difficulty", "question_clarity"]
+m_answer_metrics: list[str] = ["answer_relevance", "answer_correctness"]
+
+#Registered scorers in the order they are tried: (scorer name, metric names, scorer).
+m_local_scorers: list[tuple[str, list[str], Callable]] = []
+
+#A settled question gets the score the judge gave most often to the questions of data/ (27k questions) the rule settles, so
+#settling does not move the averages of the comparison table. local_scorers_unittest checks them against data/.
+
+#TF-IDF cosine similarity between the question and the closest window of m_relevance_window_sentences sentences of the text.
+#At or above it the question shares the key terms of a passage. Against the whole text a question about one passage is
+#diluted by the rest, 0.5 settled 2.6% of the questions in data/.
+#The window and threshold settle 16% of the questions, the judge scored 52% of them 4, 32% 5 and 17% 3 or lower.
+m_relevance_settle_similarity: float = 0.4
+m_relevance_settle_score: int = 4
+m_relevance_window_sentences: int = 2
+#Questions with at least this many content words and none of them in the text are unrelated to it.
+#Settles 4% of the questions, the judge scored 61% of them 1 and 26% 4 or 5.
+m_relevance_minimum_content_words: int = 3
+m_relevance_unrelated_score: int = 1
+
+#Flesch reading ease at or above which a well formed question is settled as easy to read.
+#Settles 16% of the questions, the judge scored 87% of them 5 (85% of all questions) and 1% 3 or lower.
+m_reading_ease_settle_score: float = 70
+m_reading_comprehension_settle_score: int = 5
+m_reading_comprehension_maximum_words: int = 25
+
+m_blank_pattern = re.compile(r"_{3,}")
+m_word_pattern = re.compile(r"[a-z0-9']+")
+m_stop_words: set[str] = {
+    "a", "an", "the", "and", "or", "but", "if", "of", "to", "in", "on", "at", "by", "for", "with", "from", "as", "into", "about",
+    "is", "are", "was", "were", "be", "been", "being", "do", "does", "did", "has", "have", "had", "can", "could", "will", "would",
+    "should", "may", "might", "what", "which", "who", "whom", "whose", "when", "where", "why", "how", "that", "this", "these",
+    "those", "it", "its", "they", "their", "there", "than", "then", "not", "no", "true", "false"
+}
+
+
+def register_local_scorer(a_scorer_name: str, a_metric_names: list[str], a_scorer: Callable) -> None:
+    m_local_scorers.append((a_scorer_name, a_metric_names, a_scorer))
+
+
+def has_local_scorers(a_metric_name: str) -> bool:
+    return any(a_metric_name in t_metric_names for t_scorer_name, t_metric_names, t_scorer in m_local_scorers)
+
+
+def score_locally(a_metric_name: str, a_question_type: str, a_text: str, a_ground_truth, a_question: str, a_answer) -> EvaluationData | None:
+    #Returns None when the metric has to be escalated to the LLM judge.
+    if (has_local_scorers(a_metric_name) == False):
+        return None
+
+    for t_scorer_name, t_metric_names, t_scorer in m_local_scorers:
+        if (a_metric_name not in t_metric_names):
+            continue
+
+        try:
+            t_result: EvaluationData | None = t_scorer(a_metric_name, a_question_type, a_text, a_ground_truth, a_question, a_answer)
+        except Exception as e:
+            print(f"The local {t_scorer_name} scorer failed for {a_metric_name}: {e}. Escalating.")
+            t_result = None
+
+        _record_result(a_metric_name, t_scorer_name, t_result != None)
+        if (t_result != None):
+            _record_result(a_metric_name, "local", True)
+            return t_result
+
+    _record_result(a_metric_name, "local", False)
+    return None
+
+
+
+#Scorers*
+def score_structure(a_metric_name: str, a_question_type: str, a_text: str, a_ground_truth, a_question: str, a_answer) -> EvaluationData | None:
+    #Broken questions get the lowest score on the metrics the problem affects.
+    for t_problem, t_metric_names in get_structural_problems(a_question_type, a_question, a_answer):
+        if (a_metric_name in t_metric_names):
+            return _get_local_evaluation_data(1, t_problem)
+
+    return None
+
+
+def get_structural_problems(a_question_type: str, a_question: str, a_answer) -> list[tuple[str, list[str]]]:
+    t_problems = []
+
+    if (isinstance(a_question, str) == False or a_question.strip() == ""):
+        t_problems.append(("The question is empty.", m_question_metrics + m_answer_metrics))
+        return t_problems
+
+    if (_is_answer_empty(a_answer) == True):
+        if (a_question_type == m_blqs_type):
+            t_problems.append(("The true or false answer could not be parsed.", m_answer_metrics))
+        else:
+            t_problems.append(("The answer is empty.", m_answer_metrics))
+
+    if (a_question_type == m_mcqs_type and _is_answer_empty(a_answer) == False):
+        #The same split as QuestionsGenerationRequestData._format_mcqs_answer.
+        t_options = a_answer if isinstance(a_answer, list) == True else a_answer.strip().split(", ")
+        t_options = [str(t_option).strip().lower() for t_option in t_options]
+        if (len(t_options) < 4):
+            t_problems.append((f"The MCQ only has {len(t_options)} options instead of 4.", ["question_difficulty", "question_clarity"]))
+        elif (len(set(t_options)) < len(t_options)):
+            t_problems.append(("The MCQ has repeated options.", ["question_clarity"]))
+
+    if (a_question_type == m_gfqs_type and m_blank_pattern.search(a_question) == None):
+        t_problems.append(("The gap fill question has no blank to fill.", ["question_difficulty", "question_clarity"]))
+
+    return t_problems
+
+
+def score_relevance(a_metric_name: str, a_question_type: str, a_text: str, a_ground_truth, a_question: str, a_answer) -> EvaluationData | None:
+    t_question = a_question
+    #The blanks hide the key terms, so they are filled in with the answers.
+    if (a_question_type == m_gfqs_type):
+        t_question += " " + (" ".join(map(str, a_answer)) if isinstance(a_answer, list) == True else str(a_answer))
+
+    t_question_words = _get_content_words(t_question)
+    t_similarity = get_tf_idf_similarity(t_question, a_text, m_relevance_window_sentences)
+
+    if (t_similarity >= m_relevance_settle_similarity):
+        return _get_local_evaluation_data(m_relevance_settle_score, f"The question shares the key terms of a passage of the text (TF-IDF cosine similarity {round(t_similarity, 3)}).")
+    if (t_similarity == 0 and len(t_question_words) >= m_relevance_minimum_content_words):
+        return _get_local_evaluation_data(m_relevance_unrelated_score, "None of the question's content words appear in the text.")
+
+    return None
+
+
+def score_reading_comprehension(a_metric_name: str, a_question_type: str, a_text: str, a_ground_truth, a_question: str, a_answer) -> EvaluationData | None:
+    #Only short, simple and well formed questions are settled, anything else needs the judge to check the grammar.
+    t_question = m_blank_pattern.sub("blank", a_question).strip()
+    t_words = re.findall(r"[A-Za-z0-9']+", t_question)
+
+    if (len(t_words) < 4 or len(t_words) > m_reading_comprehension_maximum_words):
+        return None
+    if (t_question[0].isupper() == False or t_question[-1] not in ".?"):
+        return None
+    if (any(t_word.lower() == t_next_word.lower() for t_word, t_next_word in zip(t_words, t_words[1:])) == True):
+        return None
+
+    t_reading_ease = get_flesch_reading_ease(t_question)
+    if (t_reading_ease >= m_reading_ease_settle_score):
+        return _get_local_evaluation_data(m_reading_comprehension_settle_score, f"The question is short, well formed and easy to read (Flesch reading ease {round(t_reading_ease, 1)}).")
+
+    return None
+
+
+
+#Text statistics*
+def get_tf_idf_similarity(a_query: str, a_text: str, a_window_sentences: int | None = None) -> float:
+    #The sentences of the text are the documents the inverse document frequencies are computed over.
+    #With a_window_sentences, the similarity to the closest run of that many sentences, otherwise to the whole text.
+    t_sentences = [t_sentence for t_sentence in re.split(r"(?<=[.!?])\s+", a_text) if t_sentence.strip() != ""]
+    t_sentences_words = [_get_content_words(t_sentence) for t_sentence in t_sentences]
+
+    t_query_counts = Counter(_get_content_words(a_query))
+    if (len(t_query_counts) == 0 or sum(len(t_sentence_words) for t_sentence_words in t_sentences_words) == 0):
+        return 0
+
+    t_document_frequencies = Counter(t_word for t_sentence_words in t_sentences_words for t_word in set(t_sentence_words))
+    def _get_idf(a_word: str) -> float:
+        return math.log((1 + len(t_sentences)) / (1 + t_document_frequencies[a_word])) + 1
+
+    t_query_vector = {t_word: t_count * _get_idf(t_word) for t_word, t_count in t_query_counts.items()}
+    t_query_norm = math.sqrt(sum(t_weight ** 2 for t_weight in t_query_vector.values()))
+
+    t_windows = [t_sentences_words]
+    if (a_window_sentences != None and len(t_sentences_words) > a_window_sentences):
+        t_windows = [t_sentences_words[i:i + a_window_sentences] for i in range(len(t_sentences_words) - a_window_sentences + 1)]
+
+    t_best_similarity = 0
+    for t_window in t_windows:
+        t_window_counts = Counter(t_word for t_sentence_words in t_window for t_word in t_sentence_words)
+        if (len(t_window_counts) == 0):
+            continue
+
+        t_window_vector = {t_word: t_count * _get_idf(t_word) for t_word, t_count in t_window_counts.items()}
+        t_dot_product = sum(t_weight * t_window_vector.get(t_word, 0) for t_word, t_weight in t_query_vector.items())
+        t_window_norm = math.sqrt(sum(t_weight ** 2 for t_weight in t_window_vector.values()))
+        t_best_similarity = max(t_best_similarity, t_dot_product / (t_query_norm * t_window_norm))
+
+    return t_best_similarity
+
+
+def get_flesch_reading_ease(a_text: str) -> float:
+    t_words = re.findall(r"[A-Za-z']+", a_text)
+    if (len(t_words) == 0):
+        return 0
+
+    t_sentences_count = max(1, len(re.findall(r"[.!?]+", a_text)))
+    t_syllables_count = sum(_count_syllables(t_word) for t_word in t_words)
+
+    return 206.835 - 1.015 * (len(t_words) / t_sentences_count) - 84.6 * (t_syllables_count / len(t_words))
+
+
+def _count_syllables(a_word: str) -> int:
+    #Vowel groups, without a silent final "e".
+    t_word = a_word.lower().strip("'")
+    t_syllables_count = len(re.findall(r"[aeiouy]+", t_word))
+    if (t_word.endswith("e") == True and t_word.endswith("le") == False and t_syllables_count > 1):
+        t_syllables_count -= 1
+
+    return max(1, t_syllables_count)
+
+
+def _get_content_words(a_text: str) -> list[str]:
+    return [t_word for t_word in m_word_pattern.findall(a_text.lower()) if t_word not in m_stop_words]
+
+
+def _is_answer_empty(a_answer) -> bool:
+    if (a_answer == None):
+        return True
+    if (isinstance(a_answer, list) == True):
+        return all(str(t_answer).strip() == "" for t_answer in a_answer)
+
+    return str(a_answer).strip() == ""
+
+
+def _get_local_evaluation_data(a_score: int, a_reasoning: str) -> EvaluationData:
+    #Normalised the same way as the judge's scores, see EvaluationAPI._get_evaluation_data_dict.
+    return EvaluationData(score = round(a_score / 5, 3), reasoning = "Local check: " + a_reasoning)
+
+
+register_local_scorer("structure", m_question_metrics + m_answer_metrics, score_structure)
+register_local_scorer("tf_idf", ["relevance"], score_relevance)
+register_local_scorer("readability", ["reading_comprehension"], score_reading_comprehension)
+
+
+
+#Tier tracking*
+#metric name -> tier name -> {"checked", "settled"}, counted since the server started.
+m_tier_counts: dict[str, dict[str, dict[str, int]]] = {}
+m_tier_counts_lock = threading.Lock()
+
+#The counts of the running evaluation run, so concurrent runs of other projects are not counted in its report.
+#Context variables follow asyncio tasks and asyncio.to_thread, pool submits have to copy the context, see QuestionEvaluationData.
+m_run_tier_counts: contextvars.ContextVar[dict | None] = contextvars.ContextVar("run_tier_counts", default = None)
+
+
+def start_run_tier_counts() -> dict:
+    #Counts the results of the current context and the tasks and threads started from it from now on.
+    t_run_tier_counts = {}
+    m_run_tier_counts.set(t_run_tier_counts)
+
+    return t_run_tier_counts
+
+
+def _record_result(a_metric_name: str, a_tier_name: str, a_settled: bool) -> None:
+    with m_tier_counts_lock:
+        for t_counts in [m_tier_counts, m_run_tier_counts.get()]:
+            if (t_counts == None):
+                continue
+
+            t_tier_counts = t_counts.setdefault(a_metric_name, {}).setdefault(a_tier_name, {"checked" : 0, "settled" : 0})
+            t_tier_counts["checked"] += 1
+            if (a_settled == True):
+                t_tier_counts["settled"] += 1
+
+
+def get_tier_report(a_tier_counts: dict = None) -> dict:
+    #Per metric: how many questions the local tier and each of its scorers settled, and how many went on to the LLM judge.
+    #Reports the counts of a run from start_run_tier_counts, or all counts since the server started.
+    t_tier_report = {}
+
+    with m_tier_counts_lock:
+        for t_metric_name, t_tiers in (m_tier_counts if a_tier_counts == None else a_tier_counts).items():
+            t_tier_report[t_metric_name] = {}
+            for t_tier_name, t_counts in t_tiers.items():
+                t_escalated = t_counts["checked"] - t_counts["settled"]
+                t_tier_report[t_metric_name][t_tier_name] = {
+                    "checked" : t_counts["checked"],
+                    "settled" : t_counts["settled"],
+                    "escalated" : t_escalated,
+                    "settle_rate" : round(t_counts["settled"] / t_counts["checked"], 3),
+                    "escalate_rate" : round(t_escalated / t_counts["checked"], 3)
+                }
+
+            #Everything the local tier escalates is settled by the judge.
+            if ("local" in t_tiers):
+                t_tier_report[t_metric_name]["llm_judge"] = {"settled" : t_tier_report[t_metric_name]["local"]["escalated"]}
+
+    return t_tier_report
+
+
+def reset_tier_report() -> None:
+    with m_tier_counts_lock:
+        m_tier_counts.clear()
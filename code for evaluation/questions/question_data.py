@@ -1,4 +1,6 @@
 #Python Imports
+import json
+import hashlib
 from dataclasses import dataclass, field
 
 #Custom Imports
@@ -10,6 +12,15 @@ class QuestionData:
     answer: str | list[str] | bool | dict = ""
     question_evaluation: QuestionEvaluationData = field(default_factory=lambda: QuestionEvaluationData())
 
+    #Fingerprint of the question, answer and the inputs it is evaluated against, and the fingerprint it was last evaluated at.
+    fingerprint: str = ""
+    evaluated_fingerprint: str = ""
+
+    @staticmethod
+    def get_fingerprint(a_question: str, a_answer, a_text: str, a_ground_truth: str) -> str:
+        t_fingerprint_text = json.dumps([a_question, a_answer, a_text, a_ground_truth], default = str)
+        return hashlib.sha256(t_fingerprint_text.encode("utf8")).hexdigest()
+
     @classmethod
     def question_dict_key(cls) -> str:
         return "question"
@@ -21,3 +32,11 @@ class QuestionData:
     @classmethod
     def question_evaluation_dict_key(cls) -> str:
         return "question_evaluation"
+    
+    @classmethod
+    def fingerprint_dict_key(cls) -> str:
+        return "fingerprint"
+    
+    @classmethod
+    def evaluated_fingerprint_dict_key(cls) -> str:
+        return "evaluated_fingerprint"
@@ -1,11 +1,57 @@
 #Python Imports
+import os
 import time
-from dataclasses import dataclass, field
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass, field, asdict
 
 #Custom Imports
 from questions.evaluation_data import EvaluationData
+from utilities import evaluation_cache
+from questions import local_scorers
 import evaluation_api as EvaluationAPI
 
+
+#The metrics are independent requests, so they run side by side. Shared by all questions so concurrent evaluations queue instead of piling up threads.
+m_evaluation_executor = ThreadPoolExecutor(
+    max_workers = int(os.getenv("EVALUATION_MAX_WORKERS", "14")),
+    thread_name_prefix = "question-evaluation"
+)
+#Counted from when a worker starts the metric, not from when it was queued. The judge client is created with the same
+#timeout, so a request that runs over is also ended and does not keep holding a worker.
+m_metric_timeout_seconds: float = EvaluationAPI.m_metric_timeout_seconds
+m_queue_poll_seconds: float = 1.0
+
+def _submit_evaluation(a_function, *args):
+    #Runs in a copy of the caller's context, so the requests are still reported to the project's progress events.
+    t_start_times: list[float] = []
+
+    def _run_evaluation():
+        t_start_times.append(time.time())
+        return a_function(*args)
+
+    t_future = m_evaluation_executor.submit(contextvars.copy_context().run, _run_evaluation)
+    t_future.start_times = t_start_times
+    return t_future
+
+def _get_evaluation_result(a_future, a_timeout_seconds: float):
+    #Raises TimeoutError once the evaluation has run for a_timeout_seconds, time spent in the queue does not count.
+    while (True):
+        if (len(a_future.start_times) == 0):
+            t_wait_seconds = m_queue_poll_seconds
+        else:
+            t_wait_seconds = a_future.start_times[0] + a_timeout_seconds - time.time()
+
+        try:
+            return a_future.result(timeout = max(0, t_wait_seconds))
+        except TimeoutError:
+            #The metric itself raised TimeoutError, result() raises it again instead of waiting.
+            if (a_future.done() == True):
+                return a_future.result()
+
+            if (len(a_future.start_times) > 0 and time.time() >= a_future.start_times[0] + a_timeout_seconds):
+                raise
+
 @dataclass
 class QuestionEvaluationData:
     #Our custom metrics
@@ -27,38 +73,277 @@ class QuestionEvaluationData:
         a_ground_truth: list[str],
         a_question: str,
         a_answer: str,
+        a_combined_judge: bool = False,
+        a_do_context_utilisation: bool = True,
+        a_tiered: bool = False,
+        a_question_type: str = "",
+        a_raw_answer = None,
+        a_metrics: list[str] = None,
     ):
+        #With a_tiered, the local scorers settle the confident cases first and only the rest is sent to the judge.
+        #a_raw_answer is the answer as stored in the segment data, for the structural checks. Defaults to a_answer.
+        #a_metrics limits the evaluation to some of the metrics, the others are left empty. Not used by the combined judge.
         t_evaluation_data = QuestionEvaluationData()
 
         t_start_time = time.time()
 
+        t_local_results: dict[str, EvaluationData] = {}
+        if (a_tiered == True):
+            t_local_results = QuestionEvaluationData._score_locally(a_text, a_ground_truth, a_question, a_answer if a_raw_answer == None else a_raw_answer, a_question_type)
+
         #The EvaluationAPI returns a dict of EvaluationData object, not a EvaluationData object
+        if (a_combined_judge == True):
+            return QuestionEvaluationData._evaluate_question_combined(a_text, a_ground_truth, a_question, a_answer, a_do_context_utilisation, t_local_results)
+
+        t_metric_requests = {
+            QuestionEvaluationData.relevance_dict_key(): (EvaluationAPI.evaluate_relevance, a_question, a_text),
+            QuestionEvaluationData.reading_comprehension_dict_key(): (EvaluationAPI.evaluate_reading_comprehension, a_question),
+            QuestionEvaluationData.question_difficulty_dict_key(): (EvaluationAPI.evaluate_question_difficulty, a_question, a_text),
+            QuestionEvaluationData.question_clarity_dict_key(): (EvaluationAPI.evaluate_question_clarity, a_question),
+            QuestionEvaluationData.answer_relevance_dict_key(): (EvaluationAPI.evaluate_answer_relevancy, a_answer, a_ground_truth),
+            QuestionEvaluationData.answer_correctness_dict_key(): (EvaluationAPI.evaluate_answer_correctness, a_text, a_question, a_answer),
+        }
+
+        #Left out when ragas is run for the whole project at once, see EvaluationAPI.evaluate_context_utilisation_batch.
+        if (a_do_context_utilisation == True):
+            t_metric_requests[QuestionEvaluationData.context_utilisation_dict_key()] = (EvaluationAPI.evaluate_context_utilisation, a_text, a_question, a_answer)
+
+        if (a_metrics != None):
+            t_metric_requests = {t_metric_name: t_metric_request for t_metric_name, t_metric_request in t_metric_requests.items() if t_metric_name in a_metrics}
+
+        for t_metric_name, t_local_result in t_local_results.items():
+            setattr(t_evaluation_data, t_metric_name, t_local_result)
+            t_metric_requests.pop(t_metric_name, None)
+
+        #Metrics with a cached result for the same inputs, judge and prompt are not requested again.
+        t_metric_futures = {}
+        for t_metric_name, t_metric_request in t_metric_requests.items():
+            t_cache_key = QuestionEvaluationData._get_cache_key(t_metric_name, a_text, a_ground_truth, a_question, a_answer)
+            t_cached_result = evaluation_cache.get_result(t_cache_key)
+
+            if (t_cached_result != None):
+                setattr(t_evaluation_data, t_metric_name, EvaluationData.dict_to_object(t_cached_result))
+            else:
+                t_metric_futures[t_metric_name] = (t_cache_key, _submit_evaluation(*t_metric_request))
+
+        for t_metric_name, (t_cache_key, t_metric_future) in t_metric_futures.items():
+            t_metric_result = QuestionEvaluationData._get_metric_result(t_metric_name, t_metric_future, m_metric_timeout_seconds)
+            setattr(t_evaluation_data, t_metric_name, t_metric_result)
+            QuestionEvaluationData._cache_result(t_cache_key, t_metric_result)
         
-        t_evaluation_data.relevance = EvaluationData.dict_to_object(EvaluationAPI.evaluate_relevance(a_question, a_text))
-        t_evaluation_data.reading_comprehension = EvaluationData.dict_to_object(EvaluationAPI.evaluate_reading_comprehension(a_question))
-        t_evaluation_data.question_difficulty = EvaluationData.dict_to_object(EvaluationAPI.evaluate_question_difficulty(a_question, a_text))
-        t_evaluation_data.question_clarity = EvaluationData.dict_to_object(EvaluationAPI.evaluate_question_clarity(a_question))
-        t_evaluation_data.answer_relevance = EvaluationData.dict_to_object(EvaluationAPI.evaluate_answer_relevancy(a_answer, a_ground_truth))
-        t_evaluation_data.answer_correctness = EvaluationData.dict_to_object(EvaluationAPI.evaluate_answer_correctness(a_text, a_question, a_answer))
-
-        t_evaluation_data.context_utilisation = EvaluationData.dict_to_object(EvaluationAPI.evaluate_context_utilisation(a_text, a_question, a_answer))
-        
+        #Wall time of the slowest metric, not the sum of all of them.
+        t_end_time = time.time()
+        t_evaluation_data.generation_time = round(t_end_time - t_start_time, 3)
+
+        QuestionEvaluationData._print_scores(t_evaluation_data)
+        return t_evaluation_data
+
+    @staticmethod
+    def _evaluate_question_combined(
+        a_text: str,
+        a_ground_truth: list[str],
+        a_question: str,
+        a_answer: str,
+        a_do_context_utilisation: bool = True,
+        a_local_results: dict[str, EvaluationData] = None,
+    ):
+        #One judge request for the six custom criteria, ragas still runs on its own next to it.
+        #The request is only left out if the local scorers settled all six criteria, otherwise their results replace the judge's.
+        if (a_local_results == None):
+            a_local_results = {}
+
+        t_evaluation_data = QuestionEvaluationData()
+
+        t_start_time = time.time()
+
+        t_combined_cache_key = QuestionEvaluationData._get_cache_key("combined", a_text, a_ground_truth, a_question, a_answer)
+        t_combined_results: dict[str, dict] | None = evaluation_cache.get_result(t_combined_cache_key)
+        t_combined_future = None
+        t_is_settled_locally = all(t_criterion in a_local_results for t_criterion in EvaluationAPI.m_combined_evaluation_criteria)
+        if (t_combined_results == None and t_is_settled_locally == False):
+            t_combined_future = _submit_evaluation(EvaluationAPI.evaluate_combined, a_text, a_question, a_answer, a_ground_truth)
+
+        t_context_utilisation_cache_key = None
+        t_context_utilisation_future = None
+        if (a_do_context_utilisation == True):
+            t_context_utilisation_cache_key = QuestionEvaluationData._get_cache_key(QuestionEvaluationData.context_utilisation_dict_key(), a_text, a_ground_truth, a_question, a_answer)
+            t_cached_result = evaluation_cache.get_result(t_context_utilisation_cache_key)
+            if (t_cached_result != None):
+                t_evaluation_data.context_utilisation = EvaluationData.dict_to_object(t_cached_result)
+            else:
+                t_context_utilisation_future = _submit_evaluation(EvaluationAPI.evaluate_context_utilisation, a_text, a_question, a_answer)
+
+        if (t_combined_future != None):
+            try:
+                t_combined_results = _get_evaluation_result(t_combined_future, m_metric_timeout_seconds)
+            except TimeoutError:
+                print(f"The combined evaluation timed out after {m_metric_timeout_seconds} seconds. Returning empty EvaluationData.")
+            except Exception as e:
+                print(f"The combined evaluation failed: {e}. Returning empty EvaluationData.")
+
+        if (t_combined_results != None):
+            for t_metric_name, t_metric_result in t_combined_results.items():
+                setattr(t_evaluation_data, t_metric_name, EvaluationData.dict_to_object(t_metric_result))
+
+            #Only cached if every criterion came back.
+            if (t_combined_future != None and all(float(t_metric_result.get(EvaluationData.score_dict_key(), -1)) != -1 for t_metric_result in t_combined_results.values())):
+                evaluation_cache.set_result(t_combined_cache_key, t_combined_results)
+
+        if (t_context_utilisation_future != None):
+            t_evaluation_data.context_utilisation = QuestionEvaluationData._get_metric_result(
+                QuestionEvaluationData.context_utilisation_dict_key(), 
+                t_context_utilisation_future, 
+                m_metric_timeout_seconds
+            )
+            QuestionEvaluationData._cache_result(t_context_utilisation_cache_key, t_evaluation_data.context_utilisation)
+
+        for t_metric_name, t_local_result in a_local_results.items():
+            setattr(t_evaluation_data, t_metric_name, t_local_result)
+
         t_end_time = time.time()
         t_evaluation_data.generation_time = round(t_end_time - t_start_time, 3)
 
+        QuestionEvaluationData._print_scores(t_evaluation_data)
+        return t_evaluation_data
+
+    @staticmethod
+    def evaluate_questions_batch(
+        a_text: str,
+        a_items: list[dict],
+        a_do_context_utilisation: bool = True,
+        a_tiered: bool = False,
+        a_question_type: str = "",
+    ) -> list:
+        #a_items are dicts with "question", "answer" and "ground_truth", and "raw_answer", the answer as stored in the segment data.
+        #Like evaluate_question, the local scorers (with a_tiered) and the evaluation cache are checked first. Each criterion then
+        #scores the items left in one request, ragas still runs per question.
+        t_evaluations_data = [QuestionEvaluationData() for t_item in a_items]
+        if (len(a_items) == 0):
+            return t_evaluations_data
+
+        t_start_time = time.time()
+
+        #Criterion -> (item index, cache key) of the items the judge has to score.
+        t_criteria_items: dict[str, list[tuple[int, str]]] = {t_criterion: [] for t_criterion in EvaluationAPI.m_batch_evaluation_few_shots}
+        for i, t_item in enumerate(a_items):
+            t_local_results: dict[str, EvaluationData] = {}
+            if (a_tiered == True):
+                t_local_results = QuestionEvaluationData._score_locally(
+                    a_text, t_item["ground_truth"], t_item["question"], t_item.get("raw_answer", t_item["answer"]), a_question_type
+                )
+
+            for t_criterion in EvaluationAPI.m_batch_evaluation_few_shots:
+                if (t_criterion in t_local_results):
+                    setattr(t_evaluations_data[i], t_criterion, t_local_results[t_criterion])
+                    continue
+
+                #Keyed on the batch prompt as well, so batched results are not shared with the single question prompts.
+                t_cache_key = QuestionEvaluationData._get_cache_key(t_criterion, a_text, t_item["ground_truth"], t_item["question"], t_item["answer"], a_batched = True)
+                t_cached_result = evaluation_cache.get_result(t_cache_key)
+                if (t_cached_result != None):
+                    setattr(t_evaluations_data[i], t_criterion, EvaluationData.dict_to_object(t_cached_result))
+                else:
+                    t_criteria_items[t_criterion].append((i, t_cache_key))
+
+        t_batch_items = [{t_name: t_item[t_name] for t_name in ["question", "answer", "ground_truth"]} for t_item in a_items]
+        t_criteria_futures = {
+            t_criterion: _submit_evaluation(EvaluationAPI.evaluate_batch, t_criterion, a_text, [t_batch_items[i] for i, t_cache_key in t_criterion_items])
+            for t_criterion, t_criterion_items in t_criteria_items.items() if len(t_criterion_items) > 0
+        }
+
+        t_context_utilisation_futures = {}
+        if (a_do_context_utilisation == True):
+            for i, t_item in enumerate(a_items):
+                t_cache_key = QuestionEvaluationData._get_cache_key(QuestionEvaluationData.context_utilisation_dict_key(), a_text, t_item["ground_truth"], t_item["question"], t_item["answer"])
+                t_cached_result = evaluation_cache.get_result(t_cache_key)
+                if (t_cached_result != None):
+                    t_evaluations_data[i].context_utilisation = EvaluationData.dict_to_object(t_cached_result)
+                else:
+                    t_context_utilisation_futures[i] = (t_cache_key, _submit_evaluation(EvaluationAPI.evaluate_context_utilisation, a_text, t_item["question"], t_item["answer"]))
+
+        #A batch may be split into several requests, so it gets the same time as all of its questions together.
+        for t_criterion, t_criterion_future in t_criteria_futures.items():
+            t_criterion_items = t_criteria_items[t_criterion]
+            try:
+                t_criterion_results: list[dict] = _get_evaluation_result(t_criterion_future, m_metric_timeout_seconds * len(t_criterion_items))
+            except TimeoutError:
+                print(f"The batched {t_criterion} evaluation timed out. Returning empty EvaluationData.")
+                continue
+            except Exception as e:
+                print(f"The batched {t_criterion} evaluation failed: {e}. Returning empty EvaluationData.")
+                continue
+
+            for (i, t_cache_key), t_criterion_result in zip(t_criterion_items, t_criterion_results):
+                t_metric_result = EvaluationData.dict_to_object(t_criterion_result)
+                setattr(t_evaluations_data[i], t_criterion, t_metric_result)
+                QuestionEvaluationData._cache_result(t_cache_key, t_metric_result)
+
+        for i, (t_cache_key, t_context_utilisation_future) in t_context_utilisation_futures.items():
+            t_evaluations_data[i].context_utilisation = QuestionEvaluationData._get_metric_result(
+                QuestionEvaluationData.context_utilisation_dict_key(), 
+                t_context_utilisation_future, 
+                m_metric_timeout_seconds
+            )
+            QuestionEvaluationData._cache_result(t_cache_key, t_evaluations_data[i].context_utilisation)
+
+        #The requests are shared, so every question gets its share of the batch's wall time.
+        t_end_time = time.time()
+        for t_evaluation_data in t_evaluations_data:
+            t_evaluation_data.generation_time = round((t_end_time - t_start_time) / len(a_items), 3)
+            QuestionEvaluationData._print_scores(t_evaluation_data)
+
+        return t_evaluations_data
+
+    @staticmethod
+    def _score_locally(a_text: str, a_ground_truth, a_question: str, a_answer, a_question_type: str) -> dict[str, EvaluationData]:
+        #Returns the metrics the local scorers are confident about.
+        t_local_results = {}
+
+        for t_metric_name in EvaluationAPI.m_combined_evaluation_criteria:
+            t_local_result = local_scorers.score_locally(t_metric_name, a_question_type, a_text, a_ground_truth, a_question, a_answer)
+            if (t_local_result != None):
+                t_local_results[t_metric_name] = t_local_result
+
+        return t_local_results
+
+    @staticmethod
+    def _print_scores(a_evaluation_data) -> None:
         #Debug
         t_scores = [
-            t_evaluation_data.relevance.score,
-            t_evaluation_data.reading_comprehension.score,
-            t_evaluation_data.question_difficulty.score,
-            t_evaluation_data.question_clarity.score,
-            t_evaluation_data.answer_relevance.score,
-            t_evaluation_data.answer_correctness.score,
-            t_evaluation_data.context_utilisation.score
+            a_evaluation_data.relevance.score,
+            a_evaluation_data.reading_comprehension.score,
+            a_evaluation_data.question_difficulty.score,
+            a_evaluation_data.question_clarity.score,
+            a_evaluation_data.answer_relevance.score,
+            a_evaluation_data.answer_correctness.score,
+            a_evaluation_data.context_utilisation.score
         ]
         print(f"Generated Evaluation Score: [{', '.join(map(str, t_scores))}]")
-        
-        return  t_evaluation_data
+
+    @staticmethod
+    def _get_cache_key(a_metric_name: str, a_text: str, a_ground_truth, a_question: str, a_answer, a_batched: bool = False) -> str:
+        t_judge_model_name, t_prompt_fingerprint = EvaluationAPI.get_metric_cache_identity(a_metric_name, a_batched)
+        return evaluation_cache.get_key(a_metric_name, t_judge_model_name, t_prompt_fingerprint, a_question, a_answer, a_text, a_ground_truth)
+
+    @staticmethod
+    def _cache_result(a_cache_key: str, a_metric_result: EvaluationData) -> None:
+        #Failed metrics are left out so they are retried next time.
+        if (float(a_metric_result.score) == -1):
+            return
+
+        evaluation_cache.set_result(a_cache_key, asdict(a_metric_result))
+
+    @staticmethod
+    def _get_metric_result(a_metric_name: str, a_metric_future, a_timeout_seconds: float) -> EvaluationData:
+        #A failed or timed out metric is left empty so it does not hold back or break the others.
+        try:
+            return EvaluationData.dict_to_object(_get_evaluation_result(a_metric_future, a_timeout_seconds))
+        except TimeoutError:
+            print(f"The {a_metric_name} evaluation timed out after {a_timeout_seconds} seconds. Returning an empty EvaluationData.")
+        except Exception as e:
+            print(f"The {a_metric_name} evaluation failed: {e}. Returning an empty EvaluationData.")
+
+        return EvaluationData()
 
     @classmethod
     def relevance_dict_key(cls) -> str:
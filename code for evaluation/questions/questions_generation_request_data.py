@@ -48,6 +48,7 @@ class QuestionsGenerationRequestData:
             a_llm_name: str,
             a_prefix_index: int,
             a_suffix_index: int,
+            a_structured_output: bool = False,
         ):
         
         if (SegmentData.does_question_type_exist(a_question_type) == False):
@@ -59,6 +60,7 @@ class QuestionsGenerationRequestData:
         self.prefix_index = a_prefix_index
         self.suffix_index = a_suffix_index
         self.question_type = a_question_type
+        self.structured_output = a_structured_output
 
         #I REALLY do not like the if statements, but it will do for now. Too much repetition.
         t_answer_formatter = None
@@ -1,7 +1,6 @@
 #Python Imports
 from dataclasses import asdict
 from pathlib import Path
-import json
 
 from segment_data import SegmentData
 
@@ -11,6 +10,8 @@ from questions.questions_generation_request_data import QuestionsGenerationReque
 
 #Utility Imports
 from utilities import langchain_llm
+from utilities import json_repair
+from utilities import structured_output
 from utilities.few_shot_request_data import FewShotRequestData
 
 
@@ -25,56 +26,159 @@ def generate(
 ) -> list[QuestionData]:
     if (SegmentData.does_question_type_exist(a_generation_request_data.question_type) == False):
         return None
-    pass
 
+    t_generation_response = a_generation_request_data.few_shot_request_data.send_request(
+        a_prefix_index = a_generation_request_data.prefix_index,
+        a_suffix = _get_generation_suffix(a_generation_request_data),
+        a_llm = _get_generation_llm(a_generation_request_data)
+    )
+
+    #Single pass, the formatting request is only the fallback.
+    if (a_generation_request_data.structured_output == True):
+        t_questions_and_answers_list = _get_questions_from_structured_response(a_generation_request_data, t_generation_response)
+        if (t_questions_and_answers_list != None):
+            return t_questions_and_answers_list
+
+    #Only re-send the formatting request if the local repair could not recover its output.
+    t_number_of_formatting_tries = 2
+    for i in range(t_number_of_formatting_tries):
+        t_formatting_response = m_questions_format_few_shot_request.send_request(
+            a_prefix_index = 0,
+            a_suffix = _get_formatting_suffix(t_generation_response),
+            a_llm = langchain_llm.questions_formatting_llm,
+            a_bypass_cache = i > 0
+        )
+
+        t_questions_and_answers_list = _get_questions_from_formatting_response(a_generation_request_data, t_formatting_response)
+        if (t_questions_and_answers_list != None):
+            return t_questions_and_answers_list
+
+    print("Returning no questions!")
+    return []
+
+
+async def agenerate(
+        a_generation_request_data: QuestionsGenerationRequestData
+) -> list[QuestionData]:
+    if (SegmentData.does_question_type_exist(a_generation_request_data.question_type) == False):
+        return None
+
+    t_generation_response = await a_generation_request_data.few_shot_request_data.asend_request(
+        a_prefix_index = a_generation_request_data.prefix_index,
+        a_suffix = _get_generation_suffix(a_generation_request_data),
+        a_llm = _get_generation_llm(a_generation_request_data)
+    )
+
+    if (a_generation_request_data.structured_output == True):
+        t_questions_and_answers_list = _get_questions_from_structured_response(a_generation_request_data, t_generation_response)
+        if (t_questions_and_answers_list != None):
+            return t_questions_and_answers_list
+
+    #Only re-send the formatting request if the local repair could not recover its output.
+    t_number_of_formatting_tries = 2
+    for i in range(t_number_of_formatting_tries):
+        t_formatting_response = await m_questions_format_few_shot_request.asend_request(
+            a_prefix_index = 0,
+            a_suffix = _get_formatting_suffix(t_generation_response),
+            a_llm = langchain_llm.questions_formatting_llm,
+            a_bypass_cache = i > 0
+        )
+
+        t_questions_and_answers_list = _get_questions_from_formatting_response(a_generation_request_data, t_formatting_response)
+        if (t_questions_and_answers_list != None):
+            return t_questions_and_answers_list
+
+    print("Returning no questions!")
+    return []
+
+
+def _get_generation_suffix(a_generation_request_data: QuestionsGenerationRequestData) -> str:
     t_generation_suffix = a_generation_request_data.few_shot_request_data.suffix_templates[a_generation_request_data.suffix_index].format(
         text = a_generation_request_data.text,
         keywords = ", ".join(a_generation_request_data.keywords),
         number_of_questions = a_generation_request_data.number_of_question
     )
-    t_generation_response = a_generation_request_data.few_shot_request_data.send_request(
-        a_prefix_index = a_generation_request_data.prefix_index,
-        a_suffix = t_generation_suffix,
-        a_llm = a_generation_request_data.llm
-    ).replace("\"", "'").replace("{", "{{").replace("}", "}}")
+
+    if (a_generation_request_data.structured_output == True):
+        t_generation_suffix += structured_output.m_questions_json_instruction
+
+    return t_generation_suffix
+
+
+def _get_generation_llm(a_generation_request_data: QuestionsGenerationRequestData):
+    if (a_generation_request_data.structured_output == True):
+        return structured_output.get_structured_llm(a_generation_request_data.llm, langchain_llm.get_llm_provider(a_generation_request_data.llm))
+
+    return a_generation_request_data.llm
+
+
+def _get_questions_from_structured_response(
+        a_generation_request_data: QuestionsGenerationRequestData,
+        a_generation_response: str
+    ) -> list[QuestionData] | None:
+
+    t_questions_and_answers = structured_output.parse_questions(a_generation_response)
+    structured_output.record_result(
+        a_model_name = structured_output.get_model_name(a_generation_request_data.llm),
+        a_stage = "questions",
+        a_used_fallback = t_questions_and_answers == None
+    )
+
+    if (t_questions_and_answers == None):
+        return None
+
+    return _get_questions_from_response_dict(a_generation_request_data, {"response" : t_questions_and_answers})
+
+
+def _get_formatting_suffix(a_generation_response: str) -> str:
+    t_generation_response = a_generation_response.replace("\"", "'").replace("{", "{{").replace("}", "}}")
 
     print("\nRaw Questions Response:")
     print(t_generation_response)
 
-    t_formatting_suffix = m_questions_format_few_shot_request.suffix_templates[0].format(text = t_generation_response)
-    t_formatting_response = m_questions_format_few_shot_request.send_request(
-        a_prefix_index = 0,
-        a_suffix = t_formatting_suffix,
-        a_llm = langchain_llm.questions_formatting_llm
-    )
+    return m_questions_format_few_shot_request.suffix_templates[0].format(text = t_generation_response)
 
-    #dict to list[class]
-    t_number_of_formatting_tries = 2
-    for i in range(t_number_of_formatting_tries):
-        try: 
-            print("Converting LLM output to JSON")
-            t_response_dict = json.loads(t_formatting_response)
-            break #Will only break is json.loads worked.
-        except Exception as e: 
-            print("\n**Error converting Json into QuestionData**")
 
-            if (i == t_number_of_formatting_tries - 1):
-                return []
+def _get_questions_from_formatting_response(
+        a_generation_request_data: QuestionsGenerationRequestData,
+        a_formatting_response: str
+    ) -> list[QuestionData] | None:
 
+    #dict to list[class]
+    print("Converting LLM output to JSON")
+    t_response_dict = json_repair.parse_json_object(a_formatting_response)
+    if (t_response_dict == None):
+        print("\n**Error converting Json into QuestionData**")
+        print(f"The formatting response:\n{a_formatting_response}")
+        return None
     
     print("Formatted Questions:")
     print(t_response_dict)
+
+    return _get_questions_from_response_dict(a_generation_request_data, t_response_dict)
+
+
+def _get_questions_from_response_dict(
+        a_generation_request_data: QuestionsGenerationRequestData,
+        a_response_dict: dict
+    ) -> list[QuestionData]:
     
     t_questions_and_answers_list = []
     t_number_of_questions: int = 0
 
 
     #If empty.
-    if t_response_dict == {}:
+    if a_response_dict == {}:
         return t_questions_and_answers_list #Empty list.
     
 
-    for t_question_and_answer in t_response_dict["response"]:
+    #The formatter returned some other object, e.g. {"questions": [...]}.
+    if (isinstance(a_response_dict.get("response", None), list) == False):
+        print("\n**Error converting Json into QuestionData, no \"response\" list**")
+        print(a_response_dict)
+        return t_questions_and_answers_list #Empty list.
+
+    for t_question_and_answer in a_response_dict["response"]:
         t_question = t_question_and_answer[QuestionData.question_dict_key()]
         t_answer = t_question_and_answer[QuestionData.answer_dict_key()]
 
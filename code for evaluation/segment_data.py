@@ -41,6 +41,16 @@ class SegmentData:
     def question_keyword_types(cls) -> list[str]:
         return [cls.saqs_keywords_dict_key(), cls.mcqs_keywords_dict_key(), cls.blqs_keywords_dict_key(), cls.gfqs_keywords_dict_key()]
     
+    @classmethod
+    def question_type_keywords_dict_key(cls, a_question_type: str) -> str:
+        #The keywords a question type is generated from, and evaluated against.
+        return {
+            cls.saqs_dict_key() : cls.saqs_keywords_dict_key(),
+            cls.gfqs_dict_key() : cls.gfqs_keywords_dict_key(),
+            cls.blqs_dict_key() : cls.blqs_keywords_dict_key(),
+            cls.mcqs_dict_key() : cls.mcqs_keywords_dict_key(),
+        }[a_question_type]
+    
     @classmethod
     def does_question_keyword_type_exist(cls, a_question_keyword_type: str) -> bool:
         if (a_question_keyword_type not in cls.question_keyword_types()):
@@ -7,6 +7,7 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 #Custom Imports
 from segment_data import SegmentData
 from utilities import langchain_llm
+from utilities import structured_output
 from utilities.few_shot_request_data import FewShotRequestData
 
 
@@ -41,33 +42,37 @@ def segment_transcript(a_transcript: str, a_segment_size: int) -> list[str]:
     return t_transcript_segments
 
 
-def generate_segment_summary(a_transcript: str, a_word_limit: int, a_llm_name: str) -> str:
+def generate_segment_summary(a_transcript: str, a_word_limit: int, a_llm_name: str, a_structured_output: bool = False) -> str:
 
     if (isinstance(a_transcript, str) == False):
         a_transcript = str(a_transcript)
 
     #If its already small enough, no point summarizing 
-    if (len(a_transcript.strip().split(" ")) <= a_word_limit):
-        print("\nThe transcript was already smaller than the word limit.")
-
+    if (_is_within_word_limit(a_transcript, a_word_limit) == True):
         #Return back the transcript
         return a_transcript.strip()
     else:
-        t_summary_prompt: str = m_transcript_summary_prompt.format(text = a_transcript, word_limit = a_word_limit)
+        t_generation_llm = langchain_llm.get_generation_llm(a_llm_name, a_llm_type = langchain_llm.LLmType.Transcript)
         t_generated_summary = langchain_llm.simple_request(
-            a_llm = langchain_llm.get_generation_llm(a_llm_name, a_llm_type = langchain_llm.LLmType.Transcript),
-            a_prompt = t_summary_prompt
+            a_llm = _get_summary_llm(t_generation_llm, a_structured_output),
+            a_prompt = _get_summary_prompt(a_transcript, a_word_limit, a_structured_output),
+            a_request_name = "Summary"
         ).strip()
 
         #Debugging
         #print(f"\nOriginal Transcript: {a_transcript}")
         #print(f"\nSummary Generated: {t_generated_summary}")
 
+        #Single pass, the formatting request is only the fallback.
+        if (a_structured_output == True):
+            t_summary = _get_summary_from_structured_response(t_generation_llm, t_generated_summary)
+            if (t_summary != None):
+                return t_summary
+
         #Format the summary generation
-        t_summary_formatting_suffix = m_summary_formatting_few_shot_request_data.suffix_templates[0].format(previous_llm_output = t_generated_summary)
         t_formatted_summary = m_summary_formatting_few_shot_request_data.send_request(
             a_prefix_index = 0,
-            a_suffix = t_summary_formatting_suffix,
+            a_suffix = _get_summary_formatting_suffix(t_generated_summary),
             a_llm = langchain_llm.summary_formatting_llm
         ).strip()
 
@@ -77,6 +82,78 @@ def generate_segment_summary(a_transcript: str, a_word_limit: int, a_llm_name: s
         return t_formatted_summary
     
 
+async def agenerate_segment_summary(a_transcript: str, a_word_limit: int, a_llm_name: str, a_structured_output: bool = False) -> str:
+
+    if (isinstance(a_transcript, str) == False):
+        a_transcript = str(a_transcript)
+
+    if (_is_within_word_limit(a_transcript, a_word_limit) == True):
+        return a_transcript.strip()
+
+    t_generation_llm = langchain_llm.get_generation_llm(a_llm_name, a_llm_type = langchain_llm.LLmType.Transcript)
+    t_generated_summary = (await langchain_llm.asimple_request(
+        a_llm = _get_summary_llm(t_generation_llm, a_structured_output),
+        a_prompt = _get_summary_prompt(a_transcript, a_word_limit, a_structured_output),
+        a_request_name = "Summary"
+    )).strip()
+
+    if (a_structured_output == True):
+        t_summary = _get_summary_from_structured_response(t_generation_llm, t_generated_summary)
+        if (t_summary != None):
+            return t_summary
+
+    t_formatted_summary = (await m_summary_formatting_few_shot_request_data.asend_request(
+        a_prefix_index = 0,
+        a_suffix = _get_summary_formatting_suffix(t_generated_summary),
+        a_llm = langchain_llm.summary_formatting_llm
+    )).strip()
+
+    #Debugging
+    print(f"\nFormatted Summary: {t_formatted_summary}")
+
+    return t_formatted_summary
+
+
+def _is_within_word_limit(a_transcript: str, a_word_limit: int) -> bool:
+    if (len(a_transcript.strip().split(" ")) <= a_word_limit):
+        print("\nThe transcript was already smaller than the word limit.")
+        return True
+
+    return False
+
+
+def _get_summary_prompt(a_transcript: str, a_word_limit: int, a_structured_output: bool = False) -> str:
+    t_summary_prompt = m_transcript_summary_prompt.format(text = a_transcript, word_limit = a_word_limit)
+
+    if (a_structured_output == True):
+        #The prompt is not formatted again, so the doubled braces of the instruction are undone here.
+        t_summary_prompt += structured_output.m_summary_json_instruction.replace("{{", "{").replace("}}", "}")
+
+    return t_summary_prompt
+
+
+def _get_summary_llm(a_generation_llm, a_structured_output: bool):
+    if (a_structured_output == True):
+        return structured_output.get_structured_llm(a_generation_llm, langchain_llm.get_llm_provider(a_generation_llm))
+
+    return a_generation_llm
+
+
+def _get_summary_from_structured_response(a_generation_llm, a_generated_summary: str) -> str | None:
+    t_summary = structured_output.parse_summary(a_generated_summary)
+    structured_output.record_result(
+        a_model_name = structured_output.get_model_name(a_generation_llm),
+        a_stage = "summary",
+        a_used_fallback = t_summary == None
+    )
+
+    return t_summary
+
+
+def _get_summary_formatting_suffix(a_generated_summary: str) -> str:
+    return m_summary_formatting_few_shot_request_data.suffix_templates[0].format(previous_llm_output = a_generated_summary)
+    
+
 def get_full_transcript(a_all_segments_data: list[dict]) -> str:
     t_full_transcript: str = ""
 
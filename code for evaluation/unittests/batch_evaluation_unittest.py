@@ -0,0 +1,126 @@
+import re
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import evaluation_api
+from utilities import evaluation_cache
+from utilities.llm_cache import LLMCache, DiskCacheBackend
+from questions.question_evaluation_data import QuestionEvaluationData
+
+#Description
+"""
+Objection: To test if batched evaluation only sends the judge the items that have no local or cached result.
+Expected Result:
+- With tiered evaluation, the metrics the local scorers settle are not in the batches.
+- The judged results are cached, evaluating the same items again sends no batch.
+"""
+
+m_text = "Photosynthesis converts light energy into chemical energy. Plants store the chemical energy as glucose in their leaves."
+
+class TestBatchEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        self.m_temporary_folder = tempfile.TemporaryDirectory()
+        self.m_evaluate_batch = evaluation_api.evaluate_batch
+        self.m_evaluation_cache = evaluation_cache.m_evaluation_cache
+
+        self.batches: list[tuple[str, list[str]]] = []
+        def _evaluate_batch(a_criterion: str, a_text: str, a_items: list[dict]) -> list[dict]:
+            self.batches.append((a_criterion, [t_item["question"] for t_item in a_items]))
+            return [{"score" : 0.6, "reasoning" : a_criterion} for t_item in a_items]
+
+        evaluation_api.evaluate_batch = _evaluate_batch
+        evaluation_cache.m_evaluation_cache = LLMCache(DiskCacheBackend(Path(self.m_temporary_folder.name)))
+
+    def tearDown(self):
+        evaluation_api.evaluate_batch = self.m_evaluate_batch
+        evaluation_cache.m_evaluation_cache = self.m_evaluation_cache
+        self.m_temporary_folder.cleanup()
+
+    def _evaluate(self, a_items: list[dict]) -> list[QuestionEvaluationData]:
+        return QuestionEvaluationData.evaluate_questions_batch(m_text, a_items, a_do_context_utilisation = False, a_tiered = True, a_question_type = "saqs")
+
+    def test_local_and_cached_results_are_not_batched(self):
+        t_items = [
+            {"question" : "Why do some plants grow taller than others in shade?", "answer" : "To reach light", "ground_truth" : "light"},
+            {"question" : "What do plants do with the energy?", "answer" : "", "ground_truth" : "glucose"},
+        ]
+        t_evaluations_data = self._evaluate(t_items)
+
+        t_batches = dict(self.batches)
+        self.assertEqual(t_batches["answer_correctness"], [t_items[0]["question"]])
+        self.assertEqual(t_batches["relevance"], [t_items[0]["question"]])
+        self.assertEqual(t_batches["question_clarity"], [t_item["question"] for t_item in t_items])
+        self.assertTrue(t_evaluations_data[1].relevance.reasoning.startswith("Local check"))
+        self.assertEqual(float(t_evaluations_data[1].answer_correctness.score), 0.2)
+        self.assertEqual(t_evaluations_data[0].answer_correctness.reasoning, "answer_correctness")
+
+        self.batches.clear()
+        t_evaluations_data = self._evaluate(t_items)
+        self.assertEqual(self.batches, [])
+        self.assertEqual(t_evaluations_data[0].relevance.reasoning, "relevance")
+        self.assertEqual(float(t_evaluations_data[1].answer_correctness.score), 0.2)
+
+
+#Description
+"""
+Objection: To test if evaluate_batch splits large batches and evaluates the items a batch response has no result for one by one.
+Expected Result:
+- A batch with more than m_batch_evaluation_max_items items is sent as halves, every item is in exactly one batch.
+- An item missing from the batch response is evaluated with the single question prompt, the others keep their batched results.
+"""
+
+class TestEvaluateBatch(unittest.TestCase):
+
+    def setUp(self):
+        if (len(evaluation_api.m_batch_evaluation_suffix_templates) == 0):
+            self.skipTest("The batch evaluation prompt is not in ../Guidance-Data.")
+
+        self.m_few_shot_request = evaluation_api.m_batch_evaluation_few_shots["relevance"]
+        self.m_max_items = evaluation_api.m_batch_evaluation_max_items
+        self.items = [{"question" : f"Question {i}?", "answer" : "", "ground_truth" : "glucose"} for i in range(1, 6)]
+
+        #Item numbers of the batched requests, the questions of the single ones.
+        self.batches: list[list[int]] = []
+        self.singles: list[str] = []
+        self.missing_items: set[int] = set()
+        def _send_request(a_prefix_index: int, a_suffix: str, a_llm, a_bypass_cache: bool = False, a_suffix_index: int = 0, a_request_name: str = "") -> str:
+            if (a_request_name.endswith("-Batch") == False):
+                self.singles.append(next(t_item["question"] for t_item in self.items if t_item["question"] in a_suffix))
+                return json.dumps({"response" : {"score" : 2, "reasoning" : "single"}})
+
+            t_item_numbers = [int(t_item_number) for t_item_number in re.findall(r"Item (\d+):", a_suffix)]
+            self.batches.append([int(t_question_number) for t_question_number in re.findall(r"Question (\d+)\?", a_suffix)])
+            return json.dumps({"response" : [
+                {"item" : t_item_number, "score" : 4, "reasoning" : "batch"} for t_item_number in t_item_numbers if t_item_number not in self.missing_items
+            ]})
+
+        #An instance attribute, so only this criterion's requests are replaced.
+        self.m_few_shot_request.send_request = _send_request
+
+    def tearDown(self):
+        del self.m_few_shot_request.send_request
+        evaluation_api.m_batch_evaluation_max_items = self.m_max_items
+
+    def test_large_batches_are_split(self):
+        evaluation_api.m_batch_evaluation_max_items = 2
+        t_results = evaluation_api.evaluate_batch("relevance", m_text, self.items)
+
+        #5 items are split into 2 and 3, the 3 into 1 and 2, and the single item uses the normal prompt.
+        self.assertEqual(self.batches, [[1, 2], [4, 5]])
+        self.assertEqual(self.singles, ["Question 3?"])
+        self.assertEqual([t_result["score"] for t_result in t_results], [0.8, 0.8, 0.4, 0.8, 0.8])
+
+    def test_missing_items_are_evaluated_one_by_one(self):
+        self.missing_items = {2, 5}
+        t_results = evaluation_api.evaluate_batch("relevance", m_text, self.items)
+
+        self.assertEqual(self.batches, [[1, 2, 3, 4, 5]])
+        self.assertEqual(self.singles, ["Question 2?", "Question 5?"])
+        self.assertEqual([t_result["reasoning"] for t_result in t_results], ["batch", "single", "batch", "batch", "single"])
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,66 @@
+import shutil
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+import bulk_ingestion
+
+#Description
+"""
+Objection: To test if a folder or archive of transcripts is turned into one project per transcript, with a report of every project.
+Expected Result:
+- Every .txt file is found, sub folders are part of the project name, other files are ignored.
+- Zip and tar archives are extracted, other files and stages missing their dependencies are rejected.
+- A failing transcript is reported as failed, the other projects are still created.
+- Transcripts that would get the same name are numbered, a name taken by an existing project is refused unless resumed.
+"""
+
+class TestBulkIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.transcripts_folder_path = Path(self.folder.name) / "Transcripts"
+        (self.transcripts_folder_path / "week-1").mkdir(parents = True)
+        (self.transcripts_folder_path / "week-1" / "intro.txt").write_text("Photosynthesis turns light into chemical energy. " * 20, encoding = "utf8")
+        (self.transcripts_folder_path / "outro.txt").write_text("Plants store the energy as sugar. " * 20, encoding = "utf8")
+        (self.transcripts_folder_path / "empty.txt").write_text("", encoding = "utf8")
+        (self.transcripts_folder_path / "notes.pdf").write_text("not a transcript", encoding = "utf8")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_transcript_files(self):
+        t_archive_path = Path(shutil.make_archive(str(Path(self.folder.name) / "course"), "gztar", self.transcripts_folder_path))
+        t_extract_folder_path = Path(self.folder.name) / "Extracted"
+        bulk_ingestion.extract_archive(t_archive_path, t_extract_folder_path)
+
+        self.assertEqual(list(bulk_ingestion.get_transcript_files(t_extract_folder_path)), ["empty", "outro", "week-1-intro"])
+        self.assertTrue(bulk_ingestion.is_archive(Path("course.zip")))
+        self.assertFalse(bulk_ingestion.is_archive(Path("course.txt")))
+        self.assertTrue(bulk_ingestion.is_valid_stages(["summaries", "summary_keywords"]))
+        self.assertFalse(bulk_ingestion.is_valid_stages(["summary_keywords"]))
+
+    def test_ingestion_report(self):
+        t_projects_folder_path = Path(self.folder.name) / "Projects"
+        t_report = asyncio.run(bulk_ingestion.aingest_transcripts(self.transcripts_folder_path, t_projects_folder_path, a_max_concurrent_projects = 2))
+
+        self.assertEqual((t_report["projects"], t_report["completed"], t_report["failed"]), (3, 2, 1))
+        self.assertIn("empty", t_report["failures"]["empty"])
+        self.assertTrue((t_projects_folder_path / "week-1-intro" / "Segments").exists())
+        self.assertGreater(t_report["project_reports"][2]["segments"], 0)
+
+    def test_project_names(self):
+        (self.transcripts_folder_path / "week-1-intro.txt").write_text("Sugar is stored as starch. " * 20, encoding = "utf8")
+        self.assertEqual(
+            {t_name: t_path.relative_to(self.transcripts_folder_path).as_posix() for t_name, t_path in bulk_ingestion.get_transcript_files(self.transcripts_folder_path).items()},
+            {"empty" : "empty.txt", "outro" : "outro.txt", "week-1-intro" : "week-1/intro.txt", "week-1-intro-2" : "week-1-intro.txt"}
+        )
+
+        t_projects_folder_path = Path(self.folder.name) / "Projects"
+        (t_projects_folder_path / "outro").mkdir(parents = True)
+        t_report = asyncio.run(bulk_ingestion.aingest_transcripts(self.transcripts_folder_path, t_projects_folder_path))
+        self.assertIn("already exists", t_report["failures"]["outro"])
+        self.assertIn("week-1-intro-2", [t_project_report["project"] for t_project_report in t_report["project_reports"] if t_project_report["status"] == "completed"])
+
+        self.assertIsNone(asyncio.run(bulk_ingestion.aingest_transcripts(self.transcripts_folder_path, t_projects_folder_path, a_max_concurrent_projects = 0)))
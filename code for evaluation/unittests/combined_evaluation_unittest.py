@@ -0,0 +1,57 @@
+import json
+import unittest
+
+import evaluation_api
+
+#Description
+"""
+Objection: To test if the combined judge's response is only accepted with a score and a reasoning for all six criteria.
+Expected Result:
+- A response with every criterion is parsed, also inside a code fence, and gives normalised EvaluationData dicts.
+- A response missing a criterion, a score or a reasoning is rejected, so the request is sent again.
+- A rejected response gives empty EvaluationData dicts for every criterion.
+"""
+
+def _get_response(a_skipped_criterion: str = "", a_skipped_field: str = "") -> dict:
+    t_response = {}
+    for i, t_criterion in enumerate(evaluation_api.m_combined_evaluation_criteria):
+        if (t_criterion == a_skipped_criterion and a_skipped_field == ""):
+            continue
+
+        t_response[t_criterion] = {"score" : str(i % 5 + 1), "reasoning" : t_criterion}
+        if (t_criterion == a_skipped_criterion):
+            del t_response[t_criterion][a_skipped_field]
+
+    return {"response" : t_response}
+
+
+class TestCombinedEvaluation(unittest.TestCase):
+
+    def test_complete_response(self):
+        t_generation_result = evaluation_api._parse_combined_evaluation_response("```json\n" + json.dumps(_get_response()) + "\n```", 0, 2)
+        self.assertIsNotNone(t_generation_result)
+
+        t_results = evaluation_api._get_combined_evaluation_data_dicts(t_generation_result)
+        self.assertEqual(list(t_results), evaluation_api.m_combined_evaluation_criteria)
+        self.assertEqual(t_results["relevance"], {"score" : 0.2, "reasoning" : "relevance"})
+        self.assertEqual(t_results["answer_correctness"], {"score" : 0.2, "reasoning" : "answer_correctness"})
+        self.assertEqual(t_results["question_clarity"], {"score" : 0.8, "reasoning" : "question_clarity"})
+
+    def test_incomplete_responses(self):
+        t_generation_results = [
+            json.dumps(_get_response(a_skipped_criterion = "answer_correctness")),
+            json.dumps(_get_response(a_skipped_criterion = "relevance", a_skipped_field = "score")),
+            json.dumps(_get_response(a_skipped_criterion = "question_clarity", a_skipped_field = "reasoning")),
+            json.dumps({"response" : [_get_response()["response"]]}),
+            "The question is relevant to the text.",
+        ]
+        for t_generation_result in t_generation_results:
+            self.assertIsNone(evaluation_api._parse_combined_evaluation_response(t_generation_result, 1, 2))
+
+        t_results = evaluation_api._get_combined_evaluation_data_dicts(None)
+        self.assertEqual(list(t_results), evaluation_api.m_combined_evaluation_criteria)
+        self.assertTrue(all(float(t_result["score"]) == -1 for t_result in t_results.values()))
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import asyncio
+import unittest
+
+from fastapi import HTTPException
+
+import evaluation_api
+
+#Description
+"""
+Objection: To test if the evaluate-items route streams one NDJSON line per item and rejects oversized bodies.
+Expected Result:
+- Every item gets a line with its index and the requested metrics, followed by a line with the totals.
+- An item missing a field gets an error line and is counted as failed, the other items are still evaluated.
+- A metric that fails is returned as an empty EvaluationData dict.
+- A body over the size limit is rejected from its Content-Length or while it is read, before it is parsed.
+"""
+
+class ItemsRequest:
+    def __init__(self, a_body: bytes, a_headers: dict = None):
+        self.headers = a_headers or {}
+        self.m_body = a_body
+        self.read_bytes = 0
+
+    async def stream(self):
+        for i in range(0, len(self.m_body), 100):
+            self.read_bytes += len(self.m_body[i:i + 100])
+            yield self.m_body[i:i + 100]
+
+
+def _evaluate_relevance(a_question: str, a_text: str) -> dict:
+    return {"score" : 0.8, "reasoning" : a_question}
+
+def _evaluate_question_clarity(a_question: str) -> dict:
+    raise RuntimeError("The judge is down.")
+
+
+class TestEvaluationItems(unittest.TestCase):
+
+    def setUp(self):
+        self.m_evaluate_relevance = evaluation_api.evaluate_relevance
+        self.m_evaluate_question_clarity = evaluation_api.evaluate_question_clarity
+        self.m_items_max_request_bytes = evaluation_api.m_items_max_request_bytes
+        evaluation_api.evaluate_relevance = _evaluate_relevance
+        evaluation_api.evaluate_question_clarity = _evaluate_question_clarity
+
+    def tearDown(self):
+        evaluation_api.evaluate_relevance = self.m_evaluate_relevance
+        evaluation_api.evaluate_question_clarity = self.m_evaluate_question_clarity
+        evaluation_api.m_items_max_request_bytes = self.m_items_max_request_bytes
+
+    def _get_lines(self, a_body: dict) -> list[dict]:
+        async def _run() -> list[str]:
+            t_response = await evaluation_api.evaluate_items(ItemsRequest(json.dumps(a_body).encode("utf8")))
+            return [t_line async for t_line in t_response.body_iterator]
+
+        return [json.loads(t_line) for t_line in asyncio.run(_run())]
+
+    def test_stream_lines(self):
+        t_item = {"text" : "Plants store glucose.", "question" : "What do plants store?", "answer" : "Glucose", "ground_truth" : "glucose"}
+        t_lines = self._get_lines({
+            "a_items" : [t_item, {"question" : "Missing the other fields?"}, {**t_item, "question" : "Where is glucose stored?"}],
+            "a_metrics" : ["relevance", "question_clarity"]
+        })
+
+        self.assertEqual(t_lines[-1], {"done" : True, "items" : 3, "failed" : 1})
+
+        t_item_lines = {t_line["index"]: t_line for t_line in t_lines[:-1]}
+        self.assertEqual(sorted(t_item_lines), [0, 1, 2])
+        self.assertIn("text", t_item_lines[1]["error"])
+
+        for i, t_question in [(0, "What do plants store?"), (2, "Where is glucose stored?")]:
+            self.assertEqual(t_item_lines[i]["results"]["relevance"], {"score" : 0.8, "reasoning" : t_question})
+            self.assertEqual(float(t_item_lines[i]["results"]["question_clarity"]["score"]), -1)
+
+    def test_unknown_metric(self):
+        with self.assertRaises(HTTPException) as t_context:
+            self._get_lines({"a_items" : [], "a_metrics" : ["spelling"]})
+        self.assertEqual(t_context.exception.status_code, 422)
+
+    def test_body_limit(self):
+        evaluation_api.m_items_max_request_bytes = 1000
+        t_body = json.dumps({"a_items" : [{"text" : "x" * 5000}]}).encode("utf8")
+
+        t_request = ItemsRequest(t_body, {"content-length" : str(len(t_body))})
+        with self.assertRaises(HTTPException) as t_context:
+            asyncio.run(evaluation_api.evaluate_items(t_request))
+        self.assertEqual(t_context.exception.status_code, 413)
+        self.assertEqual(t_request.read_bytes, 0)
+
+        #Without a Content-Length, reading stops once the limit is passed.
+        t_request = ItemsRequest(t_body)
+        with self.assertRaises(HTTPException) as t_context:
+            asyncio.run(evaluation_api.evaluate_items(t_request))
+        self.assertEqual(t_context.exception.status_code, 413)
+        self.assertLessEqual(t_request.read_bytes, 1100)
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from questions import question_evaluation_data
+from questions.question_evaluation_data import QuestionEvaluationData
+
+#Description
+"""
+Objection: To test if a metric is only timed out once it has run for the timeout, and a metric raising TimeoutError fails right away.
+Expected Result:
+- A metric that takes longer than the timeout is left empty.
+- A metric that raises TimeoutError itself is left empty without waiting for the timeout.
+"""
+
+def _slow_metric() -> dict:
+    time.sleep(0.5)
+    return {"score" : 0.8, "reasoning" : ""}
+
+def _timed_out_metric() -> dict:
+    raise TimeoutError("The judge request timed out.")
+
+
+class TestEvaluationTimeout(unittest.TestCase):
+
+    def setUp(self):
+        #The metric has to start within the first wait for the timeout to be counted from then.
+        self.m_queue_poll_seconds = question_evaluation_data.m_queue_poll_seconds
+        question_evaluation_data.m_queue_poll_seconds = 0.01
+
+    def tearDown(self):
+        question_evaluation_data.m_queue_poll_seconds = self.m_queue_poll_seconds
+
+    def test_slow_metric_times_out(self):
+        t_future = question_evaluation_data._submit_evaluation(_slow_metric)
+        t_metric_result = QuestionEvaluationData._get_metric_result("relevance", t_future, 0.05)
+        self.assertEqual(float(t_metric_result.score), -1)
+
+    def test_metric_raising_timeout_error_fails_right_away(self):
+        t_start_time = time.time()
+        t_future = question_evaluation_data._submit_evaluation(_timed_out_metric)
+        t_metric_result = QuestionEvaluationData._get_metric_result("relevance", t_future, 2)
+
+        self.assertEqual(float(t_metric_result.score), -1)
+        self.assertLess(time.time() - t_start_time, 1)
+
+
+if (__name__ == "__main__"):
+    unittest.main()
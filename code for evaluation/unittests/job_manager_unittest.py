@@ -0,0 +1,143 @@
+import time
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from jobs.job_manager import JobManager
+from jobs.job_data import JobData
+from jobs import job_data
+
+#Description
+"""
+Objection: To test if long operations run as background jobs with progress, cancellation and a queue that survives a restart.
+Expected Result:
+- A submitted job reports its progress per segment and stores its result once completed.
+- A failing operation marks the job as failed with its error.
+- A queued job is cancelled straight away, a running job stops at its next progress report.
+- Unfinished jobs saved to disk are started again by a new manager, resuming from their run journal, in the order they were submitted.
+- Jobs of the same project run one after the other, jobs of different projects side by side.
+- Finished jobs older than the retention are deleted with their files.
+"""
+
+def _wait_until_finished(a_job_manager: JobManager, a_job_id: str) -> JobData:
+    for i in range(200):
+        t_job = a_job_manager.get_job(a_job_id)
+        if (t_job.is_finished() == True):
+            return t_job
+        time.sleep(0.01)
+
+    raise TimeoutError(a_job_id)
+
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs_folder = tempfile.TemporaryDirectory()
+        self.release_event = threading.Event()
+        self.operations = {
+            "count" : self._count_segments,
+            "fail" : lambda a_job, a_report_progress: 1 / 0,
+            "wait" : self._wait_for_release,
+            "record" : lambda a_job, a_report_progress: self.run_job_ids.append(a_job.id),
+        }
+        self.run_job_ids: list[str] = []
+
+    def tearDown(self):
+        self.release_event.set()
+        self.jobs_folder.cleanup()
+
+    def _count_segments(self, a_job: JobData, a_report_progress) -> dict:
+        for i in range(a_job.arguments["segments"]):
+            a_report_progress(i + 1, a_job.arguments["segments"])
+        return {"segments" : a_job.arguments["segments"]}
+
+    def _wait_for_release(self, a_job: JobData, a_report_progress) -> None:
+        a_report_progress(0, 2)
+        self.release_event.wait(2)
+        a_report_progress(1, 2)
+
+    def _get_job_manager(self, a_max_workers: int = 1, a_retention_seconds: float = 60) -> JobManager:
+        return JobManager(Path(self.jobs_folder.name), self.operations, a_max_workers = a_max_workers, a_retention_seconds = a_retention_seconds)
+
+    def test_completed_and_failed_jobs(self):
+        t_job_manager = self._get_job_manager(2)
+
+        t_job = _wait_until_finished(t_job_manager, t_job_manager.submit("count", "project", {"segments" : 3}).id)
+        self.assertEqual(t_job.status, job_data.m_completed_status)
+        self.assertEqual((t_job.segments_done, t_job.segments_total), (3, 3))
+        self.assertEqual(t_job.result, {"segments" : 3})
+
+        t_job = _wait_until_finished(t_job_manager, t_job_manager.submit("fail", "project").id)
+        self.assertEqual(t_job.status, job_data.m_failed_status)
+        self.assertIn("division", t_job.error)
+
+        self.assertIsNone(t_job_manager.submit("unknown", "project"))
+
+    def test_cancel(self):
+        t_job_manager = self._get_job_manager(1)
+        t_running_job = t_job_manager.submit("wait", "project")
+        t_queued_job = t_job_manager.submit("count", "project", {"segments" : 1})
+
+        self.assertTrue(t_job_manager.cancel(t_queued_job.id))
+        self.assertEqual(t_job_manager.get_job(t_queued_job.id).status, job_data.m_cancelled_status)
+
+        self.assertTrue(t_job_manager.cancel(t_running_job.id))
+        self.release_event.set()
+        self.assertEqual(_wait_until_finished(t_job_manager, t_running_job.id).status, job_data.m_cancelled_status)
+        self.assertFalse(t_job_manager.cancel(t_running_job.id))
+
+    def test_resume(self):
+        #Saved as if the server stopped while the job was running.
+        t_job = JobData(id = "saved-job", operation = "count", project_name = "project", arguments = {"segments" : 2}, status = job_data.m_running_status)
+        t_job_manager = self._get_job_manager()
+        t_job_manager._save(t_job)
+
+        t_new_job_manager = self._get_job_manager()
+        self.assertEqual(t_new_job_manager.resume(), 1)
+        self.assertEqual(_wait_until_finished(t_new_job_manager, "saved-job").result, {"segments" : 2})
+        self.assertTrue(t_new_job_manager.get_job("saved-job").arguments["a_resume"])
+        self.assertEqual(self._get_job_manager().resume(), 0)
+
+    def test_resume_keeps_the_order_of_a_project(self):
+        #The ids sort the other way round to the order the jobs were submitted in.
+        t_job_manager = self._get_job_manager()
+        t_job_manager._save(JobData(id = "b-first-job", operation = "record", project_name = "project", status = job_data.m_queued_status, created_time = 1))
+        t_job_manager._save(JobData(id = "a-second-job", operation = "record", project_name = "project", status = job_data.m_queued_status, created_time = 2))
+
+        t_new_job_manager = self._get_job_manager()
+        self.assertEqual(t_new_job_manager.resume(), 2)
+        _wait_until_finished(t_new_job_manager, "a-second-job")
+        self.assertEqual(self.run_job_ids, ["b-first-job", "a-second-job"])
+
+    def test_jobs_of_a_project_run_in_order(self):
+        t_job_manager = self._get_job_manager(3)
+        t_first_job = t_job_manager.submit("wait", "project")
+        t_second_job = t_job_manager.submit("count", "project", {"segments" : 1})
+        t_cancelled_job = t_job_manager.submit("count", "project", {"segments" : 1})
+        t_other_project_job = t_job_manager.submit("count", "other project", {"segments" : 1})
+
+        #The other project's job does not wait, the second job of the project waits for the first although there are free workers.
+        self.assertEqual(_wait_until_finished(t_job_manager, t_other_project_job.id).status, job_data.m_completed_status)
+        self.assertEqual(t_job_manager.get_job(t_second_job.id).status, job_data.m_queued_status)
+        self.assertTrue(t_job_manager.cancel(t_cancelled_job.id))
+        self.assertEqual(t_job_manager.get_job(t_cancelled_job.id).status, job_data.m_cancelled_status)
+
+        self.release_event.set()
+        t_second_job = _wait_until_finished(t_job_manager, t_second_job.id)
+        self.assertEqual(t_second_job.status, job_data.m_completed_status)
+        self.assertGreaterEqual(t_second_job.started_time, t_job_manager.get_job(t_first_job.id).finished_time)
+
+        #The project takes new jobs again once its queue is empty.
+        self.assertEqual(_wait_until_finished(t_job_manager, t_job_manager.submit("count", "project", {"segments" : 1}).id).status, job_data.m_completed_status)
+
+    def test_retention(self):
+        t_job_manager = self._get_job_manager(a_retention_seconds = 0)
+        t_job = _wait_until_finished(t_job_manager, t_job_manager.submit("count", "project", {"segments" : 1}).id)
+        t_job_file_path = Path(self.jobs_folder.name) / (t_job.id + ".json")
+        self.assertTrue(t_job_file_path.exists())
+
+        time.sleep(0.01)
+        self.assertEqual(t_job_manager.prune(), 1)
+        self.assertIsNone(t_job_manager.get_job(t_job.id))
+        self.assertFalse(t_job_file_path.exists())
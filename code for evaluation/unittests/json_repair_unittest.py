@@ -0,0 +1,48 @@
+import unittest
+
+from utilities.json_repair import parse_json_object
+
+#Description
+"""
+Objection: To test if malformed LLM json responses are repaired locally instead of re-sending the request.
+Expected Result:
+- Text and code fences around the json object are ignored, including braces in the text before it.
+- The {{ }} escaping of the prompt templates, trailing commas, single quotes and Python literals are repaired.
+- Cut off responses have their open strings and brackets closed.
+- Text without a json object returns None.
+"""
+
+class TestJsonRepair(unittest.TestCase):
+
+    def test_valid_json(self):
+        self.assertEqual(parse_json_object('{"response": {"a": {"b": 1}}}'), {"response" : {"a" : {"b" : 1}}})
+
+    def test_surrounding_text(self):
+        t_response = 'Here is the evaluation:\n```json\n{"response": {"score": "4", "reasoning": "Clear."}}\n```\nLet me know!'
+        self.assertEqual(parse_json_object(t_response), {"response" : {"score" : "4", "reasoning" : "Clear."}})
+
+    def test_escaped_braces(self):
+        t_response = '{{"response": [{{"question": "What is a {{cell}}?", "answer": "A unit."}}]}}'
+        self.assertEqual(parse_json_object(t_response)["response"][0]["answer"], "A unit.")
+
+    def test_trailing_commas_and_quotes(self):
+        t_response = "{'response': [{'question': 'Why don't cells burst?', 'answer': 'The \"wall\".',},], 'valid': True}"
+        self.assertEqual(parse_json_object(t_response), {
+            "response" : [{"question" : "Why don't cells burst?", "answer" : "The \"wall\"."}],
+            "valid" : True
+        })
+
+    def test_truncated_response(self):
+        self.assertEqual(parse_json_object('{"response": {"score": 3, "reasoning": "The question is'), {"response" : {"score" : 3, "reasoning" : "The question is"}})
+
+    def test_no_json(self):
+        self.assertIsNone(parse_json_object("I am unable to evaluate this question."))
+        self.assertIsNone(parse_json_object('["not", "an", "object"]'))
+
+    def test_brace_before_object(self):
+        t_response = 'Fill in the {score} and {reasoning} fields:\n{"response": {"score": "3", "reasoning": "Fine."}}'
+        self.assertEqual(parse_json_object(t_response), {"response" : {"score" : "3", "reasoning" : "Fine."}})
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import unittest
+import contextvars
+import tempfile
+import time
+from pathlib import Path
+
+from utilities.llm_cache import LLMCache, LLMCacheBackend, DiskCacheBackend, SQLiteCacheBackend
+from utilities import llm_cache
+from utilities import evaluation_cache
+
+#Description
+"""
+Objection: To test if the LLM response cache stores, expires and evicts responses correctly.
+Expected Result:
+- The same model settings and prompt give a hit, any change gives a miss.
+- Entries past their TTL are not returned.
+- The least recently used entries are evicted once the size limit is passed.
+- Caching is off unless a backend is configured, for the LLM responses and the evaluation results.
+- Keys made in different cache scopes differ, the shared scope keeps the keys made before scopes existed.
+"""
+
+class TestLLMCache(unittest.TestCase):
+
+    def setUp(self):
+        self.m_temporary_folder = tempfile.TemporaryDirectory()
+        self.m_folder_path = Path(self.m_temporary_folder.name)
+
+    def tearDown(self):
+        self.m_temporary_folder.cleanup()
+
+    def _get_backends(self, a_max_size_bytes: int = 1024 * 1024) -> list:
+        return [
+            DiskCacheBackend(self.m_folder_path / "Disk", a_max_size_bytes),
+            SQLiteCacheBackend(self.m_folder_path / "cache.sqlite3", a_max_size_bytes)
+        ]
+
+    def test_key_changes_with_every_setting(self):
+        t_key = LLMCache.get_key("gpt-4o-mini", 0.6, 2048, "prompt")
+
+        self.assertEqual(t_key, LLMCache.get_key("gpt-4o-mini", 0.6, 2048, "prompt"))
+        self.assertNotEqual(t_key, LLMCache.get_key("claude", 0.6, 2048, "prompt"))
+        self.assertNotEqual(t_key, LLMCache.get_key("gpt-4o-mini", 0.15, 2048, "prompt"))
+        self.assertNotEqual(t_key, LLMCache.get_key("gpt-4o-mini", 0.6, 1024, "prompt"))
+        self.assertNotEqual(t_key, LLMCache.get_key("gpt-4o-mini", 0.6, 2048, "prompt "))
+
+    def test_hit_and_miss_counters(self):
+        for t_backend in self._get_backends():
+            t_cache = LLMCache(t_backend)
+            t_key = LLMCache.get_key("gpt-4o-mini", 0.6, 2048, "prompt")
+
+            self.assertIsNone(t_cache.get(t_key))
+            t_cache.set(t_key, "response")
+            self.assertEqual(t_cache.get(t_key), "response")
+
+            t_stats = t_cache.get_stats()
+            self.assertEqual(t_stats["hits"], 1)
+            self.assertEqual(t_stats["misses"], 1)
+            self.assertEqual(t_stats["writes"], 1)
+
+    def test_ttl_expiry(self):
+        for t_backend in self._get_backends():
+            t_cache = LLMCache(t_backend, a_ttl_seconds = 0.05)
+            t_cache.set("key", "response")
+            self.assertEqual(t_cache.get("key"), "response")
+
+            time.sleep(0.1)
+            self.assertIsNone(t_cache.get("key"))
+
+    def test_lru_eviction(self):
+        for t_backend in self._get_backends(a_max_size_bytes = 500):
+            t_cache = LLMCache(t_backend)
+            t_cache.set("first", "a" * 200)
+            time.sleep(0.02)
+            t_cache.set("second", "b" * 200)
+            time.sleep(0.02)
+
+            #Using the first entry makes the second one the least recently used.
+            self.assertIsNotNone(t_cache.get("first"))
+            time.sleep(0.02)
+            t_cache.set("third", "c" * 200)
+
+            self.assertIsNotNone(t_cache.get("first"))
+            self.assertIsNone(t_cache.get("second"))
+            self.assertIsNotNone(t_cache.get("third"))
+            self.assertLessEqual(t_backend.get_size_bytes(), 500)
+
+    def test_caching_is_opt_in(self):
+        self.assertNotIn("UNITTEST_CACHE_BACKEND", os.environ)
+        self.assertIsNone(llm_cache.create_llm_cache_from_environment(a_environment_prefix = "UNITTEST_CACHE"))
+
+        os.environ["UNITTEST_CACHE_BACKEND"] = "disk"
+        os.environ["UNITTEST_CACHE_LOCATION"] = str(self.m_folder_path / "Opted-In")
+        try:
+            self.assertIsInstance(llm_cache.create_llm_cache_from_environment(a_environment_prefix = "UNITTEST_CACHE").backend, DiskCacheBackend)
+        finally:
+            del os.environ["UNITTEST_CACHE_BACKEND"]
+            del os.environ["UNITTEST_CACHE_LOCATION"]
+
+        with self.assertRaises(TypeError):
+            LLMCacheBackend()
+
+    def test_evaluation_cache_is_opt_in(self):
+        if ("EVALUATION_CACHE_BACKEND" in os.environ):
+            self.skipTest("EVALUATION_CACHE_BACKEND is set.")
+
+        self.assertIsNone(evaluation_cache.m_evaluation_cache)
+        evaluation_cache.set_result("key", {"score" : 1, "reasoning" : ""})
+        self.assertIsNone(evaluation_cache.get_result("key"))
+
+    def test_cache_scopes(self):
+        t_key = LLMCache.get_key("gpt-4o-mini", 0.6, 2048, "prompt")
+        t_evaluation_key = evaluation_cache.get_key("relevance", "gpt-4o-mini", "fingerprint", "question", "answer", "text")
+
+        def _get_keys(a_scope: str) -> tuple[str, str]:
+            llm_cache.set_cache_scope(a_scope)
+            return LLMCache.get_key("gpt-4o-mini", 0.6, 2048, "prompt"), evaluation_cache.get_key("relevance", "gpt-4o-mini", "fingerprint", "question", "answer", "text")
+
+        #Each scope is set in its own context, like the tasks of the model matrix cells.
+        t_first_run_keys = contextvars.copy_context().run(_get_keys, "model-matrix/ChatGPT-1")
+        t_second_run_keys = contextvars.copy_context().run(_get_keys, "model-matrix/ChatGPT-2")
+
+        self.assertEqual(llm_cache.get_cache_scope(), "")
+        self.assertEqual(contextvars.copy_context().run(_get_keys, ""), (t_key, t_evaluation_key))
+        self.assertEqual(contextvars.copy_context().run(_get_keys, "model-matrix/ChatGPT-1"), t_first_run_keys)
+        self.assertEqual(len({t_key, t_first_run_keys[0], t_second_run_keys[0]}), 3)
+        self.assertEqual(len({t_evaluation_key, t_first_run_keys[1], t_second_run_keys[1]}), 3)
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,101 @@
+import time
+import asyncio
+import unittest
+import threading
+
+from utilities import llm_concurrency
+
+#Description
+"""
+Objection: To test if the LLM concurrency limits hold for the whole process.
+Expected Result:
+- Sync requests from several threads and async requests from several event loops share the same slots.
+- No more requests than the provider limit are in flight at once.
+- A cancelled request does not keep its slot.
+"""
+
+class InFlightCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    def enter(self) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def exit(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+class TestLLMConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.m_limits = llm_concurrency.get_limits()
+        llm_concurrency.set_limits(a_global_limit = 16, a_provider_limits = {"unittest" : 2})
+
+    def tearDown(self):
+        llm_concurrency.set_limits(a_global_limit = self.m_limits["global"], a_provider_limits = {"unittest" : llm_concurrency.m_default_provider_limit})
+
+    def test_limit_is_shared_by_threads_and_event_loops(self):
+        t_counter = InFlightCounter()
+
+        def _request() -> None:
+            with llm_concurrency.limit("unittest"):
+                t_counter.enter()
+                time.sleep(0.02)
+                t_counter.exit()
+
+        async def _arequest() -> None:
+            async with llm_concurrency.alimit("unittest"):
+                t_counter.enter()
+                await asyncio.sleep(0.02)
+                t_counter.exit()
+
+        async def _arequests() -> None:
+            await asyncio.gather(*[_arequest() for i in range(4)])
+
+        #Two sync threads and two threads that each run their own event loop, like concurrent jobs do.
+        t_threads = [threading.Thread(target = lambda: [_request() for i in range(4)]) for i in range(2)]
+        t_threads += [threading.Thread(target = lambda: asyncio.run(_arequests())) for i in range(2)]
+        for t_thread in t_threads:
+            t_thread.start()
+        for t_thread in t_threads:
+            t_thread.join()
+
+        self.assertEqual(t_counter.max_in_flight, 2)
+        self.assertEqual(t_counter.in_flight, 0)
+
+    def test_cancelled_request_gives_its_slot_back(self):
+        async def _run() -> None:
+            t_release = asyncio.Event()
+
+            async def _hold() -> None:
+                async with llm_concurrency.alimit("unittest"):
+                    await t_release.wait()
+
+            t_holders = [asyncio.create_task(_hold()) for i in range(2)]
+            await asyncio.sleep(0.01)
+
+            #Waits for a slot, then gets cancelled.
+            t_waiting = asyncio.create_task(_hold())
+            await asyncio.sleep(0.01)
+            t_waiting.cancel()
+
+            t_release.set()
+            await asyncio.gather(*t_holders)
+            with self.assertRaises(asyncio.CancelledError):
+                await t_waiting
+
+            #Both slots have to be free again.
+            async with llm_concurrency.alimit("unittest"):
+                async with llm_concurrency.alimit("unittest"):
+                    pass
+
+        asyncio.run(asyncio.wait_for(_run(), 5))
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import contextvars
+from pathlib import Path
+from collections import Counter
+
+from questions import local_scorers
+
+#Description
+"""
+Objection: To test if the local scorers settle obviously good or broken questions and escalate the rest to the LLM judge.
+Expected Result:
+- Empty questions, MCQs with fewer than 4 options and GFQs without a blank get the lowest score on the affected metrics.
+- Questions sharing the key terms of the text are settled as relevant, unrelated questions as irrelevant.
+- Short, well formed questions are settled as readable, long or malformed ones are escalated.
+- The tier report counts how many metrics each tier settled and escalated.
+- A run's tier report only counts the results of its own context.
+- Every settle rule gives the score the judge gave most often to the questions of data/ the rule settles.
+"""
+
+m_text = "Photosynthesis converts light energy into chemical energy. Plants store the chemical energy as glucose in their leaves."
+
+class TestLocalScorers(unittest.TestCase):
+
+    def setUp(self):
+        local_scorers.reset_tier_report()
+
+    def test_structural_checks(self):
+        t_result = local_scorers.score_locally("answer_correctness", "saqs", m_text, "", "   ", "Glucose")
+        self.assertEqual(t_result.score, 0.2)
+
+        t_result = local_scorers.score_locally("question_clarity", "mcqs", m_text, "", "What do plants store?", "Glucose, Water, Salt")
+        self.assertEqual(t_result.score, 0.2)
+        self.assertIn("3 options", t_result.reasoning)
+
+        t_result = local_scorers.score_locally("question_difficulty", "gfqs", m_text, "", "Plants store chemical energy as glucose.", ["glucose"])
+        self.assertEqual(t_result.score, 0.2)
+
+        t_result = local_scorers.score_locally("answer_relevance", "saqs", m_text, "glucose", "What do plants store?", "Glucose")
+        self.assertIsNone(t_result)
+
+    def test_relevance(self):
+        t_result = local_scorers.score_locally("relevance", "saqs", m_text, "", "How does photosynthesis convert light energy into chemical energy?", "")
+        self.assertEqual(t_result.score, 0.8)
+
+        t_result = local_scorers.score_locally("relevance", "saqs", m_text, "", "Which river flows through Egypt towards the Mediterranean?", "The Nile")
+        self.assertEqual(t_result.score, 0.2)
+
+        self.assertIsNone(local_scorers.score_locally("relevance", "saqs", m_text, "", "Which river supplies water to plants in Egypt?", "The Nile"))
+
+    def test_reading_comprehension(self):
+        t_result = local_scorers.score_locally("reading_comprehension", "saqs", m_text, "", "What do plants store in their leaves?", "Glucose")
+        self.assertEqual(t_result.score, 1.0)
+
+        self.assertIsNone(local_scorers.score_locally("reading_comprehension", "saqs", m_text, "", "what plants store in in leaves", "Glucose"))
+
+    def test_tier_report(self):
+        local_scorers.score_locally("relevance", "saqs", m_text, "", "", "Glucose")
+        local_scorers.score_locally("relevance", "saqs", m_text, "", "Which river supplies water to plants in Egypt?", "The Nile")
+
+        t_report = local_scorers.get_tier_report()["relevance"]
+        self.assertEqual(t_report["local"], {"checked" : 2, "settled" : 1, "escalated" : 1, "settle_rate" : 0.5, "escalate_rate" : 0.5})
+        self.assertEqual(t_report["structure"]["settled"], 1)
+        self.assertEqual(t_report["tf_idf"]["checked"], 1)
+        self.assertEqual(t_report["llm_judge"], {"settled" : 1})
+
+    def test_run_tier_report(self):
+        def _run(a_questions_count: int) -> dict:
+            t_tier_counts = local_scorers.start_run_tier_counts()
+            for i in range(a_questions_count):
+                local_scorers.score_locally("relevance", "saqs", m_text, "", "", "Glucose")
+            return local_scorers.get_tier_report(t_tier_counts)
+
+        #Each run has its own context, like concurrent project jobs.
+        t_first_report = contextvars.copy_context().run(_run, 2)
+        t_second_report = contextvars.copy_context().run(_run, 1)
+
+        self.assertEqual(t_first_report["relevance"]["local"]["checked"], 2)
+        self.assertEqual(t_second_report["relevance"]["local"]["checked"], 1)
+        self.assertEqual(local_scorers.get_tier_report()["relevance"]["local"]["checked"], 3)
+
+    def test_settle_scores_match_the_judge(self):
+        try:
+            import pandas
+            t_data_frames = [pandas.read_excel(t_file_path) for t_file_path in sorted((Path(__file__).parents[2] / "data").glob("*/*.xlsx"))]
+        except ImportError:
+            self.skipTest("Reading data/ needs pandas and openpyxl.")
+
+        #Judge score out of 5 -> how often the judge gave it, per settle rule.
+        t_judge_scores: dict[str, Counter] = {"relevance_settle" : Counter(), "relevance_unrelated" : Counter(), "reading_comprehension_settle" : Counter()}
+        for t_data in t_data_frames:
+            if ("relevance" not in t_data.columns):
+                continue
+
+            for t_row in t_data.itertuples():
+                #Failed evaluations are saved as -1.
+                if (float(t_row.relevance) < 0 or float(t_row.reading_comprehension) < 0):
+                    continue
+
+                t_answer = t_row.answer if isinstance(t_row.answer, str) == True else ""
+                t_result = local_scorers.score_relevance("relevance", t_row.questions_type, str(t_row.text_used), "", str(t_row.question), t_answer)
+                if (t_result != None):
+                    t_rule = "relevance_settle" if t_result.score == local_scorers.m_relevance_settle_score / 5 else "relevance_unrelated"
+                    t_judge_scores[t_rule][round(float(t_row.relevance) * 5)] += 1
+
+                t_result = local_scorers.score_reading_comprehension("reading_comprehension", t_row.questions_type, str(t_row.text_used), "", str(t_row.question), t_answer)
+                if (t_result != None):
+                    t_judge_scores["reading_comprehension_settle"][round(float(t_row.reading_comprehension) * 5)] += 1
+
+        self.assertEqual(t_judge_scores["relevance_settle"].most_common(1)[0][0], local_scorers.m_relevance_settle_score)
+        self.assertEqual(t_judge_scores["relevance_unrelated"].most_common(1)[0][0], local_scorers.m_relevance_unrelated_score)
+        self.assertEqual(t_judge_scores["reading_comprehension_settle"].most_common(1)[0][0], local_scorers.m_reading_comprehension_settle_score)
@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import tempfile
+import unittest
+import threading
+from pathlib import Path
+from dataclasses import replace
+
+#Every client has to be simulated, including the formatting and evaluation clients created when langchain_llm is imported.
+os.environ["LLM_SIMULATION"] = "true"
+os.environ["LLM_SIMULATION_ERROR_RATE"] = "0"
+os.environ["LLM_SIMULATION_LATENCY_DISTRIBUTION"] = "constant"
+os.environ["LLM_SIMULATION_LATENCY_MU"] = "0.01"
+os.environ["LLM_SIMULATION_SECONDS_PER_OUTPUT_TOKEN"] = "0"
+
+import model_matrix_runner
+import evaluation_api
+import project_settings
+from project import Project
+from utilities import langchain_llm
+from utilities import evaluation_cache
+from utilities import llm_cache
+from utilities import llm_concurrency
+from utilities.llm_cache import LLMCache, DiskCacheBackend
+from utilities.simulated_llm import SimulatedChatModel
+
+#Description
+"""
+Objection: To test if the model matrix runs every (model, run) cell within its limits and writes the comparison table.
+Expected Result:
+- Every cell writes its spreadsheet, and the comparison table has every model, question type and metric.
+- No more cells than a_max_concurrent_cells and no more LLM requests than the provider limit run at once.
+- Every LLM response and evaluation score is cached in its cell's scope, a run only uses the entries of its own cell.
+- Running a cell again uses its cached entries.
+"""
+
+class InFlightCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    def enter(self) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def exit(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+class ScopeRecordingCache(LLMCache):
+    #Records the cache scope of every lookup and write.
+    def __init__(self, a_backend: DiskCacheBackend):
+        super().__init__(a_backend)
+        self.lookups: list[tuple[str, str, bool]] = []
+        self.write_scopes: dict[str, str] = {}
+
+    def get(self, a_key: str) -> str | None:
+        t_value = super().get(a_key)
+        self.lookups.append((llm_cache.get_cache_scope(), a_key, t_value != None))
+        return t_value
+
+    def set(self, a_key: str, a_value: str) -> None:
+        self.write_scopes[a_key] = llm_cache.get_cache_scope()
+        super().set(a_key, a_value)
+
+
+def _evaluate_context_utilisation(a_text: str, a_question: str, a_answer: str) -> dict:
+    #Ragas has no simulated judge.
+    return {"score" : 0.5, "reasoning" : ""}
+
+
+class TestModelMatrixRunner(unittest.TestCase):
+
+    def setUp(self):
+        if (langchain_llm.m_simulate_all_llms == False):
+            self.skipTest("langchain_llm was imported before LLM_SIMULATION was set.")
+
+        self.m_temporary_folder = tempfile.TemporaryDirectory()
+        self.m_folder_path = Path(self.m_temporary_folder.name)
+        self.m_transcript = " ".join(f"Plants turn light into sugar in step {i}, and store it as starch." for i in range(40))
+        self.m_settings = replace(project_settings.default, llm_name = "simulated")
+
+        self.m_llm_cache = langchain_llm.m_llm_cache
+        self.m_evaluation_cache = evaluation_cache.m_evaluation_cache
+        self.m_evaluate_context_utilisation = evaluation_api.evaluate_context_utilisation
+        self.m_arun_all = Project.arun_all
+        self.m_invoke = SimulatedChatModel.invoke
+        self.m_ainvoke = SimulatedChatModel.ainvoke
+        self.m_limits = llm_concurrency.get_limits()
+
+        langchain_llm.m_llm_cache = ScopeRecordingCache(DiskCacheBackend(self.m_folder_path / "LLM-Cache"))
+        evaluation_cache.m_evaluation_cache = ScopeRecordingCache(DiskCacheBackend(self.m_folder_path / "Evaluation-Cache"))
+        evaluation_api.evaluate_context_utilisation = _evaluate_context_utilisation
+        #Simulated responses are cached like a provider's, so the test sees what a cell would replay.
+        SimulatedChatModel.is_simulated = False
+
+    def tearDown(self):
+        langchain_llm.m_llm_cache = self.m_llm_cache
+        evaluation_cache.m_evaluation_cache = self.m_evaluation_cache
+        evaluation_api.evaluate_context_utilisation = self.m_evaluate_context_utilisation
+        Project.arun_all = self.m_arun_all
+        SimulatedChatModel.invoke = self.m_invoke
+        SimulatedChatModel.ainvoke = self.m_ainvoke
+        SimulatedChatModel.is_simulated = True
+        llm_concurrency.set_limits(a_provider_limits = {"simulated" : self.m_limits["providers"].get("simulated", llm_concurrency.m_default_provider_limit)})
+        self.m_temporary_folder.cleanup()
+
+    def _run_matrix(self, a_cells: list[tuple[str, int]], a_max_concurrent_cells: int):
+        return asyncio.run(model_matrix_runner.arun_matrix(
+            a_transcript = self.m_transcript,
+            a_output_folder_path = self.m_folder_path / "Matrix",
+            a_cells = a_cells,
+            a_settings = self.m_settings,
+            a_shared_model_name = "simulated",
+            a_max_concurrent_cells = a_max_concurrent_cells
+        ))
+
+    def test_cells_limits_and_comparison_table(self):
+        t_cells_counter = InFlightCounter()
+        t_requests_counter = InFlightCounter()
+        t_arun_all = Project.arun_all
+        t_invoke = SimulatedChatModel.invoke
+        t_ainvoke = SimulatedChatModel.ainvoke
+
+        async def _arun_all(self, *args, **kwargs):
+            t_cells_counter.enter()
+            try:
+                return await t_arun_all(self, *args, **kwargs)
+            finally:
+                t_cells_counter.exit()
+
+        #The evaluation requests are sync requests on worker threads, the generation requests are async.
+        def _invoke(self, *args, **kwargs):
+            t_requests_counter.enter()
+            try:
+                time.sleep(0.002)
+                return t_invoke(self, *args, **kwargs)
+            finally:
+                t_requests_counter.exit()
+
+        async def _ainvoke(self, *args, **kwargs):
+            t_requests_counter.enter()
+            try:
+                await asyncio.sleep(0.002)
+                return await t_ainvoke(self, *args, **kwargs)
+            finally:
+                t_requests_counter.exit()
+
+        Project.arun_all = _arun_all
+        SimulatedChatModel.invoke = _invoke
+        SimulatedChatModel.ainvoke = _ainvoke
+        llm_concurrency.set_limits(a_provider_limits = {"simulated" : 3})
+
+        t_cells = model_matrix_runner.get_cells(["simulated", "simulated-together"], 2)
+        t_comparison_table = self._run_matrix(t_cells, 2)
+
+        self.assertEqual(t_cells_counter.max_in_flight, 2)
+        self.assertLessEqual(t_requests_counter.max_in_flight, 3)
+        self.assertGreater(t_requests_counter.max_in_flight, 1)
+
+        for t_model_name, t_run in t_cells:
+            t_display_name = model_matrix_runner.get_model_display_name(t_model_name)
+            t_spreadsheet_path = self.m_folder_path / "Matrix" / t_display_name / f"{t_display_name}-{t_run}.xlsx"
+            self.assertTrue(t_spreadsheet_path.exists() or t_spreadsheet_path.with_suffix(".csv").exists())
+
+        self.assertTrue((self.m_folder_path / "Matrix" / "comparison_table.csv").exists())
+        self.assertEqual(list(t_comparison_table.columns), ["LLM", "Question Type", "Metrics", "Average"])
+        self.assertEqual(sorted(t_comparison_table["LLM"].unique()), ["Simulated", "Simulated-Together"])
+        self.assertEqual(len(t_comparison_table), 2 * 4 * len(model_matrix_runner.m_comparison_metrics))
+        self.assertTrue(t_comparison_table[t_comparison_table["Metrics"] == "relevance"]["Average"].notna().all())
+
+    def test_runs_do_not_share_the_caches(self):
+        #One cell at a time, so the second run would find all of the first run's entries.
+        self._run_matrix(model_matrix_runner.get_cells(["simulated"], 2), 1)
+
+        #Including the evaluation requests, which run on worker threads.
+        for t_cache in [langchain_llm.m_llm_cache, evaluation_cache.m_evaluation_cache]:
+            self.assertEqual({t_scope for t_scope, t_key, t_hit in t_cache.lookups}, {"model-matrix/Simulated-1", "model-matrix/Simulated-2"})
+            self.assertEqual(set(t_cache.write_scopes.values()), {"model-matrix/Simulated-1", "model-matrix/Simulated-2"})
+            for t_scope, t_key, t_hit in t_cache.lookups:
+                if (t_hit == True):
+                    self.assertEqual(t_cache.write_scopes[t_key], t_scope)
+
+        #The same cell run again uses its own entries.
+        t_first_run_keys = {t_key for t_key, t_scope in langchain_llm.m_llm_cache.write_scopes.items() if t_scope == "model-matrix/Simulated-1"}
+        langchain_llm.m_llm_cache.lookups.clear()
+        self._run_matrix([("simulated", 1)], 1)
+        self.assertIn(True, [t_hit for t_scope, t_key, t_hit in langchain_llm.m_llm_cache.lookups if t_key in t_first_run_keys])
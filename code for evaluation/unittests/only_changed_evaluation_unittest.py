@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from dataclasses import asdict, replace
+
+#Every client has to be simulated, including the formatting and evaluation clients created when langchain_llm is imported.
+os.environ["LLM_SIMULATION"] = "true"
+os.environ["LLM_SIMULATION_ERROR_RATE"] = "0"
+os.environ["LLM_SIMULATION_LATENCY_DISTRIBUTION"] = "constant"
+os.environ["LLM_SIMULATION_LATENCY_MU"] = "0.001"
+os.environ["LLM_SIMULATION_SECONDS_PER_OUTPUT_TOKEN"] = "0"
+
+import project_settings
+import evaluation_api
+from project import Project
+from questions.question_data import QuestionData
+from segment_data import SegmentData
+from questions.evaluation_data import EvaluationData
+from questions.question_evaluation_data import QuestionEvaluationData
+from utilities import file_manager
+from utilities import langchain_llm
+
+#Description
+"""
+Objection: To test if evaluate_segment with a_only_changed only scores the questions that changed since they were last evaluated.
+Expected Result:
+- The first run scores every question.
+- After a question is edited, only that question is scored again, the others are skipped.
+- A question with a failed criterion is scored again on every run until its evaluation is complete.
+"""
+
+class TestOnlyChangedEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        if (langchain_llm.m_simulate_all_llms == False):
+            self.skipTest("langchain_llm was imported before LLM_SIMULATION was set.")
+
+        self.m_temporary_folder = tempfile.TemporaryDirectory()
+        self.m_evaluate_questions = Project._evaluate_questions
+
+        #The judge is replaced, so the test sees which questions each run sends it. The questions in failing_questions get a failed relevance score.
+        self.evaluated_questions: list[str] = []
+        self.failing_questions: set[str] = set()
+        def _evaluate_questions(a_project, a_questions: list[dict], a_answers: list, a_text: str, a_ground_truth: str, a_question_type: str = "") -> None:
+            for t_question_data in a_questions:
+                t_question = t_question_data[QuestionData.question_dict_key()]
+                self.evaluated_questions.append(t_question)
+
+                t_evaluation_data = QuestionEvaluationData(**{t_criterion: EvaluationData(score = 0.8, reasoning = "") for t_criterion in evaluation_api.m_combined_evaluation_criteria})
+                if (t_question in self.failing_questions):
+                    t_evaluation_data.relevance = EvaluationData()
+                t_question_data[QuestionData.question_evaluation_dict_key()] = asdict(t_evaluation_data)
+
+        Project._evaluate_questions = _evaluate_questions
+
+        t_transcript = " ".join(f"Plants turn light into sugar in step {i}, and store it as starch." for i in range(40))
+        self.m_project = Project("only-changed", t_transcript, replace(project_settings.default, llm_name = "simulated"), Path(self.m_temporary_folder.name))
+        self.m_project.run_all(a_stages = ["summaries", "transcript_keywords", "summary_keywords", "questions"])
+
+    def tearDown(self):
+        Project._evaluate_questions = self.m_evaluate_questions
+        self.m_temporary_folder.cleanup()
+
+    def _evaluate_saqs(self) -> dict:
+        self.evaluated_questions.clear()
+        return self.m_project.evaluate_segment(0, a_do_mcqs = False, a_do_gfqs = False, a_do_blqs = False, a_do_context_utilisation_batch = False, a_only_changed = True)
+
+    def test_only_changed_questions_are_scored_again(self):
+        t_questions = [t_question_data[QuestionData.question_dict_key()] for t_question_data in self.m_project.get_segment_data(0)[SegmentData.saqs_dict_key()]]
+        self.assertGreaterEqual(len(t_questions), 3)
+
+        self.failing_questions = {t_questions[1]}
+        t_evaluation_report = self._evaluate_saqs()
+        self.assertEqual(self.evaluated_questions, t_questions)
+        self.assertEqual((t_evaluation_report["evaluated"], t_evaluation_report["skipped"]), (len(t_questions), 0))
+
+        #Edit the first question, the second one's evaluation is still incomplete.
+        t_segment_file_path = self.m_project._get_all_segment_file_paths()[0]
+        t_segment_data = file_manager.load_json_file_data(t_segment_file_path)
+        t_segment_data[SegmentData.saqs_dict_key()][0][QuestionData.question_dict_key()] = "Where do plants store the sugar they make?"
+        file_manager.create_segment_file(t_segment_file_path, t_segment_data)
+
+        self.failing_questions = set()
+        t_evaluation_report = self._evaluate_saqs()
+        self.assertEqual(self.evaluated_questions, ["Where do plants store the sugar they make?", t_questions[1]])
+        self.assertEqual((t_evaluation_report["evaluated"], t_evaluation_report["skipped"]), (2, len(t_questions) - 2))
+
+        #Both are complete now, nothing is scored again.
+        t_evaluation_report = self._evaluate_saqs()
+        self.assertEqual(self.evaluated_questions, [])
+        self.assertEqual((t_evaluation_report["evaluated"], t_evaluation_report["skipped"]), (0, len(t_questions)))
+
+        t_segment_data = self.m_project.get_segment_data(0)
+        for t_question_data in t_segment_data[SegmentData.saqs_dict_key()]:
+            self.assertEqual(t_question_data[QuestionData.evaluated_fingerprint_dict_key()], t_question_data[QuestionData.fingerprint_dict_key()])
+
+
+if (__name__ == "__main__"):
+    unittest.main()
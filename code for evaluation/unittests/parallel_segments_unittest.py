@@ -0,0 +1,166 @@
+import os
+import time
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from dataclasses import replace
+
+#Every client has to be simulated, including the formatting and evaluation clients created when langchain_llm is imported.
+os.environ["LLM_SIMULATION"] = "true"
+os.environ["LLM_SIMULATION_ERROR_RATE"] = "0"
+os.environ["LLM_SIMULATION_LATENCY_DISTRIBUTION"] = "constant"
+os.environ["LLM_SIMULATION_LATENCY_MU"] = "0.001"
+os.environ["LLM_SIMULATION_SECONDS_PER_OUTPUT_TOKEN"] = "0"
+
+import project_settings
+from project import Project
+from segment_data import SegmentData
+from utilities import langchain_llm
+
+#Description
+"""
+Objection: To test if the summaries and keywords of the segments are generated side by side with more than one worker.
+Expected Result:
+- With summaries_workers > 1, more than one and at most summaries_workers segments are summarised at once, sync and async.
+- With keywords_workers > 1, every segment file gets both its transcript and its summary keywords.
+- A failing segment does not stop the others, its error is raised once the other segments are saved.
+"""
+
+m_workers: int = 3
+
+class InFlightCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    def enter(self) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def exit(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+class TestParallelSegments(unittest.TestCase):
+
+    def setUp(self):
+        if (langchain_llm.m_simulate_all_llms == False):
+            self.skipTest("langchain_llm was imported before LLM_SIMULATION was set.")
+
+        self.m_temporary_folder = tempfile.TemporaryDirectory()
+        self.m_generate_segment_summary = Project.generate_segment_summary
+        self.m_agenerate_segment_summary = Project.agenerate_segment_summary
+        self.m_agenerate_segment_keywords = Project._agenerate_segment_keywords
+
+        #The segments in failing_summaries and failing_transcript_keywords raise straight away, the others take a while, so they
+        #are still running when it raises.
+        self.counter = InFlightCounter()
+        self.failing_summaries: set[int] = set()
+        self.failing_transcript_keywords: set[int] = set()
+        t_generate_segment_summary = Project.generate_segment_summary
+        t_agenerate_segment_summary = Project.agenerate_segment_summary
+        t_agenerate_segment_keywords = Project._agenerate_segment_keywords
+
+        def _generate_segment_summary(a_project, a_segment_index: int) -> None:
+            self.counter.enter()
+            try:
+                self._raise_if_failing(a_segment_index, self.failing_summaries)
+                time.sleep(0.02)
+                t_generate_segment_summary(a_project, a_segment_index)
+            finally:
+                self.counter.exit()
+
+        async def _agenerate_segment_summary(a_project, a_segment_index: int) -> None:
+            self.counter.enter()
+            try:
+                self._raise_if_failing(a_segment_index, self.failing_summaries)
+                await asyncio.sleep(0.02)
+                await t_agenerate_segment_summary(a_project, a_segment_index)
+            finally:
+                self.counter.exit()
+
+        async def _agenerate_segment_keywords(a_project, a_segment_index: int, a_text_dict_key: str, *args) -> None:
+            self.counter.enter()
+            try:
+                if (a_text_dict_key == SegmentData.transcript_dict_key()):
+                    self._raise_if_failing(a_segment_index, self.failing_transcript_keywords)
+                await asyncio.sleep(0.02)
+                await t_agenerate_segment_keywords(a_project, a_segment_index, a_text_dict_key, *args)
+            finally:
+                self.counter.exit()
+
+        Project.generate_segment_summary = _generate_segment_summary
+        Project.agenerate_segment_summary = _agenerate_segment_summary
+        Project._agenerate_segment_keywords = _agenerate_segment_keywords
+
+        t_transcript = " ".join(f"Plants turn light into sugar in step {i}, and store it as starch." for i in range(120))
+        t_settings = replace(project_settings.default, llm_name = "simulated", summaries_workers = m_workers, keywords_workers = m_workers)
+        self.m_project = Project("parallel-segments", t_transcript, t_settings, Path(self.m_temporary_folder.name))
+        self.m_project.initialise()
+        self.m_segments_count = self.m_project.get_number_of_segments()
+
+    def tearDown(self):
+        Project.generate_segment_summary = self.m_generate_segment_summary
+        Project.agenerate_segment_summary = self.m_agenerate_segment_summary
+        Project._agenerate_segment_keywords = self.m_agenerate_segment_keywords
+        self.m_temporary_folder.cleanup()
+
+    def _raise_if_failing(self, a_segment_index: int, a_failing_segments: set[int]) -> None:
+        if (a_segment_index in a_failing_segments):
+            raise RuntimeError(f"Segment {a_segment_index} failed.")
+
+    def _get_segments_data(self) -> list[dict]:
+        return [self.m_project.get_segment_data(i) for i in range(self.m_segments_count)]
+
+    def test_summaries(self):
+        self.assertGreater(self.m_segments_count, m_workers)
+
+        for t_generate_summaries in [self.m_project.generate_segments_summaries, lambda: asyncio.run(self.m_project.agenerate_segments_summaries())]:
+            self.counter.max_in_flight = 0
+            t_generate_summaries()
+
+            self.assertGreater(self.counter.max_in_flight, 1)
+            self.assertLessEqual(self.counter.max_in_flight, m_workers)
+            for t_segment_data in self._get_segments_data():
+                self.assertNotEqual(t_segment_data[SegmentData.summary_dict_key()], "")
+
+    def test_summaries_errors(self):
+        self.failing_summaries = {0, 2}
+
+        for t_generate_summaries in [self.m_project.generate_segments_summaries, lambda: asyncio.run(self.m_project.agenerate_segments_summaries())]:
+            with self.assertRaisesRegex(RuntimeError, r"Segment [02] failed\."):
+                t_generate_summaries()
+
+            for i, t_segment_data in enumerate(self._get_segments_data()):
+                self.assertEqual(t_segment_data[SegmentData.summary_dict_key()] == "", i in self.failing_summaries)
+
+    def test_all_keywords(self):
+        asyncio.run(self.m_project.agenerate_all_keywords())
+
+        #Both kinds of every segment, m_workers segments at a time.
+        self.assertGreater(self.counter.max_in_flight, m_workers)
+        self.assertLessEqual(self.counter.max_in_flight, 2 * m_workers)
+        for t_segment_data in self._get_segments_data():
+            self.assertNotEqual(t_segment_data[SegmentData.summary_dict_key()], "")
+            self.assertGreater(len(t_segment_data[SegmentData.generated_transcript_keywords_dict_key()]), 0)
+            self.assertGreater(len(t_segment_data[SegmentData.generated_summary_keywords_dict_key()]), 0)
+
+    def test_all_keywords_errors(self):
+        self.failing_transcript_keywords = {1}
+
+        with self.assertRaisesRegex(RuntimeError, r"Segment 1 failed\."):
+            asyncio.run(self.m_project.agenerate_all_keywords())
+
+        #The failing segment still gets its summary keywords.
+        for i, t_segment_data in enumerate(self._get_segments_data()):
+            self.assertEqual(len(t_segment_data[SegmentData.generated_transcript_keywords_dict_key()]) == 0, i == 1)
+            self.assertGreater(len(t_segment_data[SegmentData.generated_summary_keywords_dict_key()]), 0)
+
+
+if (__name__ == "__main__"):
+    unittest.main()
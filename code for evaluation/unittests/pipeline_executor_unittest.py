@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+from utilities.pipeline_executor import PipelineExecutor, PipelineDependencyError
+from utilities import pipeline_executor
+
+#Description
+"""
+Objection: To test if the pipeline runs each task as soon as its own dependencies are done, under the concurrency limit.
+Expected Result:
+- A segment's later stage starts before another segment's earlier stage has finished.
+- No more tasks than the limit run at the same time.
+- A failed task skips the tasks depending on it, the other tasks still complete.
+- Unknown dependencies and cycles are rejected before anything runs.
+- The report has the status counts and utilisation of every stage.
+"""
+
+class TestPipelineExecutor(unittest.TestCase):
+
+    def _get_segments_pipeline(self, a_slow_segment_index: int, a_failing_segment_index: int = -1) -> tuple[PipelineExecutor, list[str]]:
+        t_order = []
+
+        async def _run(a_name: str, a_seconds: float) -> None:
+            await asyncio.sleep(a_seconds)
+            if (a_name == f"summary:{a_failing_segment_index}"):
+                raise ValueError("LLM failed")
+            t_order.append(a_name)
+
+        t_pipeline = PipelineExecutor(a_max_concurrent_tasks = 2)
+        for i in range(2):
+            t_seconds = 0.2 if i == a_slow_segment_index else 0.01
+            t_pipeline.add_task(f"summary:{i}", "summaries", lambda a_name = f"summary:{i}", a_seconds = t_seconds: _run(a_name, a_seconds))
+            t_pipeline.add_task(f"questions:{i}", "questions", lambda a_name = f"questions:{i}": _run(a_name, 0.01), [f"summary:{i}"])
+
+        return t_pipeline, t_order
+
+    def test_segments_overlap(self):
+        t_pipeline, t_order = self._get_segments_pipeline(a_slow_segment_index = 0)
+        t_report = asyncio.run(t_pipeline.run())
+
+        self.assertLess(t_order.index("questions:1"), t_order.index("summary:0"))
+        self.assertEqual(t_report["peak_concurrent_tasks"], 2)
+        self.assertEqual(t_report["stages"]["questions"]["completed"], 2)
+        self.assertEqual(t_report["failures"], {})
+        self.assertGreater(t_report["stages"]["summaries"]["utilisation"], 0)
+        self.assertLessEqual(t_report["utilisation"], 1)
+
+    def test_failed_task(self):
+        t_pipeline, t_order = self._get_segments_pipeline(a_slow_segment_index = -1, a_failing_segment_index = 0)
+        t_done_tasks = []
+        t_report = asyncio.run(t_pipeline.run(t_done_tasks.append))
+
+        self.assertEqual(sorted(t_order), ["questions:1", "summary:1"])
+        self.assertEqual(len(t_done_tasks), 4)
+        self.assertEqual(t_pipeline.tasks["questions:0"].status, pipeline_executor.m_skipped_status)
+        self.assertEqual((t_report["stages"]["summaries"]["failed"], t_report["stages"]["questions"]["skipped"]), (1, 1))
+        self.assertIn("LLM failed", t_report["failures"]["summary:0"])
+
+    def test_invalid_graph(self):
+        async def _run() -> None:
+            pass
+
+        t_pipeline = PipelineExecutor()
+        t_pipeline.add_task("a", "stage", _run, ["b"])
+        with self.assertRaises(PipelineDependencyError):
+            asyncio.run(t_pipeline.run())
+
+        t_pipeline.add_task("b", "stage", _run, ["a"])
+        with self.assertRaises(PipelineDependencyError):
+            asyncio.run(t_pipeline.run())
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from utilities import progress_events
+
+#Description
+"""
+Objection: To test if project stages publish their stage, segment and LLM call events to the project's progress stream.
+Expected Result:
+- A stage publishes stage_started and stage_finished, its progress reports publish segment_started and segment_finished.
+- LLM calls inside a stage are tagged with the stage and the running segment, calls outside of a stage are not published.
+- A failing stage publishes segment_failed for the running segment and stage_failed.
+- A subscriber gets the events after its last event id, then the new events as they are published.
+"""
+
+class _Project:
+
+    def __init__(self, a_name: str):
+        self.name = a_name
+
+    @progress_events.stage("summaries")
+    def generate(self, a_segments_total: int, a_fail_at: int = -1) -> str:
+        for i in range(a_segments_total + 1):
+            progress_events.report_segments_progress(i, a_segments_total)
+            if (i == a_fail_at):
+                raise ValueError("LLM failed")
+            if (i < a_segments_total):
+                progress_events.report_llm_call("Summary", "simulated")
+                self.generate_nested()
+
+        return "done"
+
+    @progress_events.stage("nested")
+    def generate_nested(self) -> None:
+        pass
+
+    @progress_events.stage("questions")
+    async def agenerate(self) -> None:
+        progress_events.report_segments_progress(0, 1)
+        progress_events.report_segments_progress(1, 1)
+
+
+def _get_event_types(a_project_name: str) -> list[str]:
+    return [t_event["event"] for t_event in progress_events.get_history(a_project_name)]
+
+
+class TestProgressEvents(unittest.TestCase):
+
+    def test_stage_events(self):
+        progress_events.report_llm_call("Summary", "simulated")
+        self.assertEqual(_Project("stages").generate(2), "done")
+
+        self.assertEqual(_get_event_types("stages"), [
+            "stage_started",
+            "segment_started", "llm_call", "segment_finished",
+            "segment_started", "llm_call", "segment_finished",
+            "stage_finished"
+        ])
+        t_events = progress_events.get_history("stages")
+        self.assertEqual(t_events[0]["arguments"], [2])
+        self.assertEqual((t_events[5]["stage"], t_events[5]["segment_index"], t_events[5]["request_name"]), ("summaries", 1, "Summary"))
+        self.assertEqual((t_events[6]["segments_done"], t_events[6]["segments_total"]), (2, 2))
+        self.assertIsNone(progress_events.m_current_stage.get())
+
+    def test_failed_stage(self):
+        with self.assertRaises(ValueError):
+            _Project("failures").generate(3, a_fail_at = 1)
+
+        t_events = progress_events.get_history("failures")
+        self.assertEqual([t_event["event"] for t_event in t_events[-3:]], ["segment_started", "segment_failed", "stage_failed"])
+        self.assertEqual(t_events[-2]["segment_index"], 1)
+        self.assertIn("LLM failed", t_events[-1]["error"])
+
+    def test_subscribe(self):
+        async def _run() -> list[dict]:
+            progress_events.publish("subscribers", "stage_started")
+            t_missed_event = progress_events.publish("subscribers", "stage_finished")
+
+            t_events = []
+            t_subscription = progress_events.subscribe("subscribers", t_missed_event["id"] - 1)
+            t_events.append(await t_subscription.__anext__())
+
+            await _Project("subscribers").agenerate()
+            for i in range(4):
+                t_events.append(await t_subscription.__anext__())
+            await t_subscription.aclose()
+            return t_events
+
+        t_events = asyncio.run(_run())
+        self.assertEqual([t_event["event"] for t_event in t_events], ["stage_finished", "stage_started", "segment_started", "segment_finished", "stage_finished"])
+        self.assertEqual(progress_events.m_subscribers["subscribers"], [])
+        self.assertTrue(progress_events.to_server_sent_event(t_events[0]).startswith(f"id: {t_events[0]['id']}\nevent: stage_finished\ndata: "))
@@ -0,0 +1,102 @@
+import unittest
+
+from utilities.rate_limiter import ProviderRateLimiter, is_rate_limit_error, is_server_error
+
+#Description
+"""
+Objection: To test if the per provider token bucket rate limiter paces requests correctly.
+Expected Result:
+- Requests pass while both the request and token buckets have capacity, then have to wait.
+- A 429 halves the effective rate and blocks for the retry-after time.
+- Rate limit headers from the provider update the limits.
+- Rate limit and server errors are told apart from other errors.
+"""
+
+class FakeClock:
+    def __init__(self):
+        self.now: float = 1000
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.m_clock = FakeClock()
+        self.m_rate_limiter = ProviderRateLimiter("openai", a_requests_per_minute = 60, a_tokens_per_minute = 6000, a_clock = self.m_clock)
+
+    def test_requests_bucket(self):
+        for i in range(60):
+            self.assertEqual(self.m_rate_limiter.reserve(10), 0)
+
+        #Bucket empty, one request refills every second.
+        self.assertAlmostEqual(self.m_rate_limiter.reserve(10), 1)
+        self.m_clock.now += 1
+        self.assertEqual(self.m_rate_limiter.reserve(10), 0)
+
+    def test_tokens_bucket(self):
+        self.assertEqual(self.m_rate_limiter.reserve(6000), 0)
+
+        #100 tokens refill every second.
+        self.assertAlmostEqual(self.m_rate_limiter.reserve(500), 5)
+
+    def test_usage_correction(self):
+        self.assertEqual(self.m_rate_limiter.reserve(3000), 0)
+
+        #Only 1000 of the reserved 3000 tokens were used, so 2000 are returned to the bucket.
+        self.m_rate_limiter.on_response(a_reserved_tokens = 3000, a_used_tokens = 1000)
+        self.assertEqual(self.m_rate_limiter.reserve(5000), 0)
+
+    def test_rate_limited_adapts(self):
+        self.m_rate_limiter.on_rate_limited(a_retry_after_seconds = 2)
+
+        self.assertAlmostEqual(self.m_rate_limiter.reserve(10), 2)
+        self.assertEqual(self.m_rate_limiter.get_metrics()["effective_requests_per_minute"], 30)
+        self.assertEqual(self.m_rate_limiter.get_metrics()["rate_limited_responses"], 1)
+
+        self.m_clock.now += 2
+        self.assertEqual(self.m_rate_limiter.reserve(10), 0)
+
+        #Successful responses slowly bring the rate back up.
+        self.m_rate_limiter.on_response(a_reserved_tokens = 10)
+        self.assertGreater(self.m_rate_limiter.get_metrics()["effective_requests_per_minute"], 30)
+
+    def test_headers_update_limits(self):
+        self.m_rate_limiter.update_from_headers({
+            "x-ratelimit-limit-requests" : "120",
+            "x-ratelimit-remaining-tokens" : "0",
+        })
+
+        self.assertEqual(self.m_rate_limiter.get_metrics()["effective_requests_per_minute"], 120)
+        self.assertGreater(self.m_rate_limiter.reserve(100), 0)
+
+    def test_queue_wait_metric(self):
+        self.m_rate_limiter.acquire(10)
+
+        t_metrics = self.m_rate_limiter.get_metrics()
+        self.assertEqual(t_metrics["requests"], 1)
+        self.assertEqual(t_metrics["total_queue_wait_seconds"], 0)
+
+    def test_rate_limit_error_detection(self):
+        class FakeRateLimitError(Exception):
+            status_code = 429
+
+        self.assertTrue(is_rate_limit_error(FakeRateLimitError()))
+        self.assertTrue(is_rate_limit_error(Exception("Error code: 429 - Rate limit reached")))
+        self.assertFalse(is_rate_limit_error(Exception("Invalid api key")))
+
+    def test_server_error_detection(self):
+        class FakeServerError(Exception):
+            status_code = 503
+
+        class APIConnectionError(Exception):
+            pass
+
+        self.assertTrue(is_server_error(FakeServerError()))
+        self.assertTrue(is_server_error(APIConnectionError("Connection error.")))
+        self.assertFalse(is_server_error(Exception("Invalid api key")))
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from utilities.run_journal import RunJournal
+from utilities import run_journal
+
+#Description
+"""
+Objection: To test if the run journal keeps the units a run completed across a crash, so a resumed run can skip them.
+Expected Result:
+- Recorded units are loaded again by a new journal, a line cut off by a crash is ignored.
+- A resumed run keeps the stage's completed units and reports how many there are.
+- A new run forgets the completed units of its stage and question types only.
+"""
+
+class TestRunJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.journal_folder = tempfile.TemporaryDirectory()
+        self.journal_file_path = Path(self.journal_folder.name) / "run-journal.jsonl"
+
+    def tearDown(self):
+        self.journal_folder.cleanup()
+
+    def test_reload_after_crash(self):
+        t_journal = RunJournal(self.journal_file_path)
+        t_journal.record("questions", 0, "saqs", run_journal.get_fingerprint(["transcript", "questions"]))
+        t_journal.record("questions", 1, "saqs", "second")
+        with open(self.journal_file_path, "a", encoding = "utf8") as t_journal_file:
+            t_journal_file.write('{"stage" : "questions", "segment_in')
+
+        t_reloaded_journal = RunJournal(self.journal_file_path)
+        self.assertEqual(t_reloaded_journal.get_recorded_fingerprint("questions", 0, "saqs"), run_journal.get_fingerprint(["transcript", "questions"]))
+        self.assertEqual(t_reloaded_journal.start("questions", ["saqs"], a_resume = True), 2)
+        self.assertIsNone(t_reloaded_journal.get_recorded_fingerprint("questions", 2, "saqs"))
+
+    def test_new_run(self):
+        t_journal = RunJournal(self.journal_file_path)
+        t_journal.record("questions", 0, "saqs", "saqs")
+        t_journal.record("questions", 0, "mcqs", "mcqs")
+        t_journal.record("summaries", 0, "", "summary")
+
+        self.assertEqual(t_journal.start("questions", ["saqs"], a_resume = False), 0)
+        self.assertIsNone(t_journal.get_recorded_fingerprint("questions", 0, "saqs"))
+
+        t_reloaded_journal = RunJournal(self.journal_file_path)
+        self.assertEqual(t_reloaded_journal.completed_units, {("questions", 0, "mcqs") : "mcqs", ("summaries", 0, "") : "summary"})
@@ -0,0 +1,69 @@
+import json
+import asyncio
+import unittest
+
+from utilities import rate_limiter
+from questions import evaluation_data
+from utilities.simulated_llm import SimulatedChatModel, SimulatedLLMProfile, SimulatedLLMError, m_question_marker
+
+#Description
+"""
+Objection: To test if the simulated LLM returns output each pipeline stage can parse, and fails like a provider does.
+Expected Result:
+- Summaries keep to the word limit and keywords to the requested number.
+- Formatted questions and evaluation scores are valid JSON of the expected shape.
+- The same seed gives the same responses.
+- Injected 429 and 500 errors are classified as rate limit and server errors, so they are retried.
+"""
+
+class TestSimulatedLLM(unittest.TestCase):
+
+    def setUp(self):
+        self.m_profile = SimulatedLLMProfile(latency_distribution = "constant", latency_mu = 0)
+        self.m_llm = SimulatedChatModel(self.m_profile, a_seed = 1)
+
+    def _invoke(self, a_llm: SimulatedChatModel, a_request_name: str, a_prompt: str) -> str:
+        return a_llm.invoke(a_prompt, config = {"metadata" : {"request_name" : a_request_name}}).content
+
+    def test_summary_and_keywords(self):
+        t_summary = self._invoke(self.m_llm, "Summary", "Summarise with a word limit of 5. The text: one two three four five six seven")
+        self.assertEqual(len(t_summary.split()), 5)
+
+        t_keywords = self._invoke(self.m_llm, "Keywords", "Give 3 keywords for: photosynthesis chlorophyll sunlight water glucose")
+        self.assertEqual(len(t_keywords.split(", ")), 3)
+
+    def test_questions_and_evaluation_are_valid_json(self):
+        t_questions = self._invoke(self.m_llm, "SAQs", "Write 2 questions about mitochondria energy")
+        self.assertEqual(t_questions.count(m_question_marker), 2)
+
+        t_formatted_questions = json.loads(self._invoke(self.m_llm, "Questions-Formatting", t_questions))
+        self.assertEqual(len(t_formatted_questions["response"]), 2)
+        self.assertIn("question", t_formatted_questions["response"][0])
+        self.assertIn("answer", t_formatted_questions["response"][0])
+
+        t_evaluation = json.loads(self._invoke(self.m_llm, "Question-Clarity", "Rate the question."))
+        self.assertIn(int(t_evaluation["response"]["score"]), range(1, 6))
+
+        t_combined_evaluation = json.loads(self._invoke(self.m_llm, "Combined-Evaluation", "Rate the question and answer."))
+        self.assertEqual(list(t_combined_evaluation["response"]), evaluation_data.m_custom_criteria)
+
+    def test_seed_gives_the_same_responses(self):
+        t_other_llm = SimulatedChatModel(self.m_profile, a_seed = 1)
+        for i in range(5):
+            self.assertEqual(self._invoke(self.m_llm, "Relevance", "Rate."), self._invoke(t_other_llm, "Relevance", "Rate."))
+
+    def test_errors_are_retryable(self):
+        t_rate_limited_llm = SimulatedChatModel(SimulatedLLMProfile(latency_distribution = "constant", latency_mu = 0, error_rate = 1, rate_limit_error_share = 1))
+        with self.assertRaises(SimulatedLLMError) as t_context:
+            self._invoke(t_rate_limited_llm, "Relevance", "Rate.")
+        self.assertTrue(rate_limiter.is_rate_limit_error(t_context.exception))
+
+        t_failing_llm = SimulatedChatModel(SimulatedLLMProfile(latency_distribution = "constant", latency_mu = 0, error_rate = 1, rate_limit_error_share = 0))
+        with self.assertRaises(SimulatedLLMError) as t_context:
+            asyncio.run(t_failing_llm.ainvoke("Rate.", config = {"metadata" : {"request_name" : "Relevance"}}))
+        self.assertFalse(rate_limiter.is_rate_limit_error(t_context.exception))
+        self.assertTrue(rate_limiter.is_server_error(t_context.exception))
+
+
+if (__name__ == "__main__"):
+    unittest.main()
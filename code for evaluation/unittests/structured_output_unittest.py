@@ -0,0 +1,42 @@
+import unittest
+
+from utilities import structured_output
+
+#Description
+"""
+Objection: To test if single pass structured generation output is validated before the formatting request is skipped.
+Expected Result:
+- Valid JSON, with or without code fences, is parsed into questions, keywords and summaries.
+- Anything that does not match the expected schema returns None so the formatting request is used.
+- Fallbacks are counted per model and stage.
+"""
+
+class TestStructuredOutput(unittest.TestCase):
+
+    def test_parse_questions(self):
+        t_response = '```json\n{"response": [{"question": "What is a cell?", "answer": "The basic unit of life."}]}\n```'
+        self.assertEqual(structured_output.parse_questions(t_response), [{"question" : "What is a cell?", "answer" : "The basic unit of life."}])
+
+        self.assertIsNone(structured_output.parse_questions('{"response": [{"question": "What is a cell?"}]}'))
+        self.assertIsNone(structured_output.parse_questions("1. What is a cell? The basic unit of life."))
+
+    def test_parse_keywords(self):
+        self.assertEqual(structured_output.parse_keywords('{"keywords": ["cell", " membrane ", ""]}'), ["cell", "membrane"])
+        self.assertIsNone(structured_output.parse_keywords('{"keywords": []}'))
+        self.assertIsNone(structured_output.parse_keywords("cell, membrane"))
+
+    def test_parse_summary(self):
+        self.assertEqual(structured_output.parse_summary('{"summary": " Cells are small. "}'), "Cells are small.")
+        self.assertIsNone(structured_output.parse_summary('{"summary": 5}'))
+
+    def test_fallback_rates(self):
+        structured_output.record_result("unittest-model", "questions", a_used_fallback = False)
+        structured_output.record_result("unittest-model", "questions", a_used_fallback = True)
+
+        t_rates = structured_output.get_fallback_rates()["unittest-model"]["questions"]
+        self.assertEqual(t_rates["requests"], 2)
+        self.assertEqual(t_rates["fallback_rate"], 0.5)
+
+
+if (__name__ == "__main__"):
+    unittest.main()
@@ -0,0 +1,77 @@
+#Python Imports
+import json
+import hashlib
+
+#Custom Imports
+from utilities import llm_cache
+
+
+#Persistent store of evaluation results, so unchanged questions are not scored again.
+#Uses the same backends as the LLM response cache, configured with EVALUATION_CACHE_BACKEND, EVALUATION_CACHE_LOCATION,
+#EVALUATION_CACHE_MAX_SIZE_MB and EVALUATION_CACHE_TTL_SECONDS. Off unless EVALUATION_CACHE_BACKEND is set, a cached
+#score would otherwise hide the judge's run to run variance.
+m_evaluation_cache: llm_cache.LLMCache | None = llm_cache.create_llm_cache_from_environment(
+    a_environment_prefix = "EVALUATION_CACHE",
+    a_default_locations = {
+        "disk" : "../LLM-Cache/Evaluations",
+        "sqlite" : "../LLM-Cache/evaluations.sqlite3",
+        "redis" : "redis://localhost:6379/0"
+    },
+    a_default_max_size_mb = 256,
+    a_namespace = "evaluation-cache",
+    a_default_backend_name = "none"
+)
+
+
+def get_key(
+        a_metric_name: str,
+        a_judge_model_name: str,
+        a_prompt_fingerprint: str,
+        a_question: str,
+        a_answer,
+        a_text: str,
+        a_ground_truth = ""
+    ) -> str:
+    #The prompt fingerprint is per metric, so editing one metric's guidance data only invalidates that metric's entries.
+    #Outside the shared scope the key includes the scope, see llm_cache.m_cache_scope.
+    t_key_values = [
+        a_metric_name,
+        a_judge_model_name,
+        a_prompt_fingerprint,
+        a_question,
+        a_answer,
+        a_text,
+        a_ground_truth
+    ]
+    if (llm_cache.get_cache_scope() != ""):
+        t_key_values.append(llm_cache.get_cache_scope())
+    t_key_text = json.dumps(t_key_values, default = str)
+    return hashlib.sha256(t_key_text.encode("utf8")).hexdigest()
+
+
+def get_result(a_key: str) -> dict | None:
+    if (m_evaluation_cache == None):
+        return None
+
+    t_value = m_evaluation_cache.get(a_key)
+    if (t_value == None):
+        return None
+
+    try:
+        return json.loads(t_value)
+    except Exception:
+        return None
+
+
+def set_result(a_key: str, a_result: dict) -> None:
+    if (m_evaluation_cache == None):
+        return
+
+    m_evaluation_cache.set(a_key, json.dumps(a_result))
+
+
+def get_stats() -> dict | None:
+    if (m_evaluation_cache == None):
+        return None
+
+    return m_evaluation_cache.get_stats()
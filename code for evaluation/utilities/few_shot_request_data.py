@@ -1,13 +1,14 @@
 #Python imports
+import json
+import hashlib
 from pathlib import Path
-import time
 
 #External Imports
-from langchain.prompts import FewShotPromptTemplate
 from langchain.prompts import PromptTemplate
 
 #Custom Imports
 from utilities import file_manager
+from utilities import langchain_llm
 
 class FewShotRequestData:
     #Example data dict keys
@@ -16,6 +17,9 @@ class FewShotRequestData:
 
     examples_prompt = PromptTemplate.from_template("user: {" + input_key + "}\nai-response: {" + output_key + "}") 
 
+    #Same separator FewShotPromptTemplate puts between the prefix, the examples and the suffix.
+    example_separator = "\n\n"
+
     def __init__(
             self, 
             a_guidance_data_folder_path: Path,
@@ -50,6 +54,17 @@ class FewShotRequestData:
 
         #A list. An input variable per line.
         self.raw_examples = file_manager.load_text_file_into_list(t_raw_examples_file_path)
+
+        #Rendered prefix + examples text, keyed by (prefix index, suffix index). These never change after loading.
+        self.static_prompt_blocks: dict[tuple[int, int], str] = {}
+
+        #Changes whenever one of the guidance data files does, used to invalidate cached results of this prompt.
+        self.fingerprint: str = hashlib.sha256(json.dumps([
+            self.prefix_strings,
+            self.raw_examples,
+            self.suffix_templates,
+            self.suffix_variables_names
+        ]).encode("utf8")).hexdigest()
         
         #Debug
         #print(f"\nCollected Guidance data from {str(a_guidance_data_folder_path)}...")
@@ -86,12 +101,64 @@ class FewShotRequestData:
         return t_formatted_examples_list
     
 
+    def get_static_prompt_block(self, a_prefix_index: int, a_suffix_index: int = 0) -> str:
+        t_block_key = (a_prefix_index, a_suffix_index)
+
+        if (t_block_key not in self.static_prompt_blocks):
+            t_example_strings = [FewShotRequestData.examples_prompt.format(**t_example) for t_example in self.get_formatted_examples(a_suffix_index)]
+            t_pieces = [self.prefix_strings[a_prefix_index], *t_example_strings]
+
+            #Mirrors FewShotPromptTemplate.format(), empty pieces are dropped and the escaped braces are resolved.
+            self.static_prompt_blocks[t_block_key] = FewShotRequestData.example_separator.join([t_piece for t_piece in t_pieces if t_piece]).format()
+
+        return self.static_prompt_blocks[t_block_key]
+    
+
+    def get_prompt(self, a_prefix_index: int, a_suffix: str, a_suffix_index: int = 0) -> str:
+        t_static_prompt_block = self.get_static_prompt_block(a_prefix_index, a_suffix_index)
+        if (a_suffix == ""):
+            return t_static_prompt_block
+
+        return t_static_prompt_block + FewShotRequestData.example_separator + a_suffix.format()
+    
+
     def send_request(
             self,
             a_prefix_index: int,
             a_suffix: str,
-            a_llm
+            a_llm,
+            a_bypass_cache: bool = False,
+            a_suffix_index: int = 0,
+            a_request_name: str = ""
         ) -> str:
+        t_request = self._prepare_request(a_prefix_index, a_suffix, a_llm, a_suffix_index)
+        t_response = langchain_llm.invoke_llm(a_llm, t_request, a_bypass_cache, a_request_name or self.name)
+        
+        #Debug
+        print(f"\nLLM Raw Response: {t_response}")
+        
+        return t_response
+    
+
+    async def asend_request(
+            self,
+            a_prefix_index: int,
+            a_suffix: str,
+            a_llm,
+            a_bypass_cache: bool = False,
+            a_suffix_index: int = 0,
+            a_request_name: str = ""
+        ) -> str:
+        t_request = self._prepare_request(a_prefix_index, a_suffix, a_llm, a_suffix_index)
+        t_response = await langchain_llm.ainvoke_llm(a_llm, t_request, a_bypass_cache, a_request_name or self.name)
+        
+        #Debug
+        print(f"\nLLM Raw Response: {t_response}")
+        
+        return t_response
+    
+
+    def _prepare_request(self, a_prefix_index: int, a_suffix: str, a_llm, a_suffix_index: int) -> str:
         try: 
             print(f"\nUsing'{a_llm.model_name}'.")
         except:
@@ -99,21 +166,10 @@ class FewShotRequestData:
 
         print(f"Sending few shot request for {self.name}.")
 
-        t_request = FewShotPromptTemplate(
-            prefix = self.prefix_strings[a_prefix_index],
-            example_prompt = FewShotRequestData.examples_prompt,
-            examples = self.get_formatted_examples(),
-            suffix = a_suffix,
-            input_variables = []
-        )
+        #a_suffix_index only selects the suffix template the examples are rendered with.
+        t_request = self.get_prompt(a_prefix_index, a_suffix, a_suffix_index)
 
         #Debug
-        #print(f"\nFormatted response before sending: {t_request.format()}")
+        #print(f"\nFormatted response before sending: {t_request}")
 
-        time.sleep(0.25) #Artificially add delay to prevent reaching the token limit easily.
-        t_response = a_llm.invoke(t_request.format())
-        
-        #Debug
-        print(f"\nLLM Raw Response: {t_response}")
-        
-        return t_response.content
\ No newline at end of file
+        return t_request
@@ -6,11 +6,16 @@ import shutil
 
 
 def create_json_file(a_file_path: Path, a_dictionary: dict):
+    #Written to a temporary file that then replaces the old one, so a request reading the file never sees it half written.
+    t_temporary_file_path = str(a_file_path) + ".tmp"
     try: 
-        with open(str(a_file_path), "w", encoding = "utf8") as t_json_file:
+        with open(t_temporary_file_path, "w", encoding = "utf8") as t_json_file:
             json.dump(a_dictionary, t_json_file, indent = 4)
+        os.replace(t_temporary_file_path, str(a_file_path))
     except Exception as e:
         print(f"Error in creating the json file at path {a_file_path}. Error: {e}")
+        if (os.path.exists(t_temporary_file_path) == True):
+            os.remove(t_temporary_file_path)
 
 
 def load_json_file_data(a_file_path: Path) -> dict:
@@ -110,6 +115,10 @@ def create_segment_file(a_file_path: Path, a_data: dict) -> bool:
 
     t_versions_in_folder: list[str] = os.listdir(a_file_path.parent)
     for i in range(len(t_versions_in_folder)):
+        #Skips the temporary files of writes in progress.
+        if (t_versions_in_folder[i].endswith(".json") == False):
+            continue
+
         with open(str(a_file_path.parent / t_versions_in_folder[i]), "r", encoding = "utf8") as t_version_file:
             t_data = json.load(t_version_file)
             if (t_data == a_data):
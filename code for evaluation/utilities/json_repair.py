@@ -0,0 +1,185 @@
+#Python Imports
+import ast
+import json
+
+
+#Tolerant parsing of the JSON objects the LLMs return, so malformed responses are repaired locally before a request is re-sent.
+#Handles text around the object, code fences, the {{ }} escaping of the prompt templates, trailing commas, single quoted strings,
+#Python literals and missing closing brackets.
+
+m_closing_brackets: dict[str, str] = {"{" : "}", "[" : "]"}
+m_python_literals: dict[str, str] = {"True" : "true", "False" : "false", "None" : "null"}
+
+
+def parse_json_object(a_text: str) -> dict | None:
+    if (isinstance(a_text, str) == False):
+        return None
+
+    #Fast path, most responses are already valid.
+    t_result = _loads_object(a_text)
+    if (t_result != None):
+        return t_result
+
+    t_text = a_text.replace("```json", "").replace("```", "").strip()
+
+    #The escaped braces are only undone if the text does not parse with them, as "}}" is also valid closing of nested objects.
+    t_candidates = [t_text, t_text.replace("{{", "{").replace("}}", "}")]
+    for t_candidate in t_candidates:
+        t_result = _parse_object_text(extract_outermost_object(t_candidate))
+        if (t_result != None):
+            return t_result
+
+    #A "{" in the text before the object (e.g. "the {score} field") does not start it, so each following "{" is tried in turn.
+    #Only after the first ones, as a later "{" can also start an object nested in the real one.
+    for t_candidate in t_candidates:
+        t_start_index = t_candidate.find("{", t_candidate.find("{") + 1)
+        while (t_start_index > 0):
+            t_result = _parse_object_text(extract_outermost_object(t_candidate, t_start_index))
+            if (t_result != None):
+                return t_result
+
+            t_start_index = t_candidate.find("{", t_start_index + 1)
+
+    return None
+
+
+def _parse_object_text(a_object_text: str | None) -> dict | None:
+    if (a_object_text == None):
+        return None
+
+    t_result = _loads_object(a_object_text)
+    if (t_result != None):
+        return t_result
+
+    t_result = _loads_object(repair_json(a_object_text))
+    if (t_result != None):
+        return t_result
+
+    try:
+        t_result = ast.literal_eval(a_object_text)
+    except Exception:
+        return None
+
+    if (isinstance(t_result, dict) == True):
+        return t_result
+
+    return None
+
+
+def extract_outermost_object(a_text: str, a_start_index: int = 0) -> str | None:
+    #Returns the text from the first "{" at or after a_start_index to its matching "}", closing any brackets left open if the response was cut off.
+    t_start_index = a_text.find("{", a_start_index)
+    if (t_start_index == -1):
+        return None
+
+    t_open_brackets = []
+    t_quote = None
+    t_is_escaped = False
+
+    for i in range(t_start_index, len(a_text)):
+        t_char = a_text[i]
+
+        if (t_quote != None):
+            if (t_is_escaped == True):
+                t_is_escaped = False
+            elif (t_char == "\\"):
+                t_is_escaped = True
+            elif (t_char == t_quote and _is_closing_quote(a_text, i, t_quote)):
+                t_quote = None
+            continue
+
+        if (t_char == "\"" or t_char == "'"):
+            t_quote = t_char
+        elif (t_char in m_closing_brackets):
+            t_open_brackets.append(t_char)
+        elif (t_char == "}" or t_char == "]"):
+            if (len(t_open_brackets) > 0):
+                t_open_brackets.pop()
+            if (len(t_open_brackets) == 0):
+                return a_text[t_start_index:i + 1]
+
+    #Truncated response.
+    t_object_text = a_text[t_start_index:].rstrip().rstrip(",")
+    if (t_quote != None):
+        t_object_text += t_quote
+
+    return t_object_text + "".join(m_closing_brackets[t_bracket] for t_bracket in reversed(t_open_brackets))
+
+
+def repair_json(a_text: str) -> str:
+    #Single quoted strings become double quoted, trailing commas are dropped and Python literals are converted.
+    t_repaired = []
+    i = 0
+
+    while (i < len(a_text)):
+        t_char = a_text[i]
+
+        if (t_char == "\"" or t_char == "'"):
+            t_end_index = _find_string_end(a_text, i, t_char)
+            t_repaired.append(_to_double_quoted(a_text[i + 1:t_end_index], t_char))
+            i = t_end_index + 1
+            continue
+
+        if (t_char == ","):
+            t_next_char = a_text[i + 1:].lstrip()[:1]
+            if (t_next_char == "}" or t_next_char == "]"):
+                i += 1
+                continue
+
+        if (t_char.isalpha() == True):
+            t_word_end_index = i
+            while (t_word_end_index < len(a_text) and a_text[t_word_end_index].isalpha() == True):
+                t_word_end_index += 1
+
+            t_word = a_text[i:t_word_end_index]
+            t_repaired.append(m_python_literals.get(t_word, t_word))
+            i = t_word_end_index
+            continue
+
+        t_repaired.append(t_char)
+        i += 1
+
+    return "".join(t_repaired)
+
+
+def _loads_object(a_text: str) -> dict | None:
+    try:
+        t_result = json.loads(a_text)
+    except Exception:
+        return None
+
+    if (isinstance(t_result, dict) == False):
+        return None
+
+    return t_result
+
+
+def _is_closing_quote(a_text: str, a_index: int, a_quote: str) -> bool:
+    #A single quote only closes a string if it is followed by a structural character, otherwise it is an apostrophe as in "don't".
+    if (a_quote == "\""):
+        return True
+
+    t_next_char = a_text[a_index + 1:].lstrip()[:1]
+    return t_next_char in ["", ",", ":", "}", "]"]
+
+
+def _find_string_end(a_text: str, a_start_index: int, a_quote: str) -> int:
+    t_is_escaped = False
+
+    for i in range(a_start_index + 1, len(a_text)):
+        if (t_is_escaped == True):
+            t_is_escaped = False
+        elif (a_text[i] == "\\"):
+            t_is_escaped = True
+        elif (a_text[i] == a_quote and _is_closing_quote(a_text, i, a_quote)):
+            return i
+
+    return len(a_text)
+
+
+def _to_double_quoted(a_string_content: str, a_quote: str) -> str:
+    if (a_quote == "'"):
+        a_string_content = a_string_content.replace("\\'", "'").replace("\"", "\\\"")
+
+    #Raw new lines are not valid inside JSON strings.
+    return "\"" + a_string_content.replace("\n", "\\n") + "\""
@@ -1,7 +1,12 @@
+#Python Imports
+import os
 import time
+import asyncio
+import threading
 from enum import Enum
 
 #External Imports
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_mistralai import ChatMistralAI
@@ -10,6 +15,13 @@ from langchain_together import ChatTogether
 from dotenv import load_dotenv
 load_dotenv()
 
+#Custom Imports
+from utilities import llm_cache
+from utilities import llm_concurrency
+from utilities import progress_events
+from utilities import rate_limiter
+from utilities import simulated_llm
+
 chatGPT_model_name = "gpt-4o-mini"
 claude_model_name = "claude-3-5-sonnet-20240620"
 gemma_model_name = "google/gemma-2-27b-it"
@@ -23,9 +35,27 @@ qwen_model_name = "Qwen/Qwen2.5-72B-Instruct-Turbo"
 deep_seek_model_name = "deepseek-ai/deepseek-llm-67b-chat"
 
 
+#Model name given in the project settings -> (provider, provider model name)
+m_generation_models: dict[str, tuple[str, str]] = {
+    "chatgpt" : ("openai", chatGPT_model_name),
+    "claude" : ("anthropic", claude_model_name),
+    "gemma" : ("together", gemma_model_name),
+    "mistral" : ("mistral", mistral_model_name),
+    "llama" : ("together", llama_model_name),
+    "wizard" : ("together", wizard_model_name),
+    "databricks" : ("together", databricks_model_name),
+    "gryphe" : ("together", gryphe_model_name),
+    "upstage" : ("together", upstage_model_name),
+    "qwen" : ("together", qwen_model_name),
+    "deep_seek" : ("together", deep_seek_model_name),
+}
+
+
 class LLmType(Enum):
     Question = 1
     Transcript = 2
+    Formatting = 3
+    Evaluation = 4
 
 
 def get_generation_llm(a_model_name: str, a_llm_type: LLmType):
@@ -45,53 +75,335 @@ def get_generation_llm(a_model_name: str, a_llm_type: LLmType):
         t_context_size = 2048
         t_temp = 0.15
 
-    if (a_model_name == "chatgpt"):
-        return ChatOpenAI(model = chatGPT_model_name, max_tokens = t_context_size, temperature = t_temp)
+    #Offline stand in, see utilities/simulated_llm.py.
+    if (simulated_llm.is_simulated_model_name(a_model_name) == True):
+        return get_llm("simulated", a_model_name, a_llm_type, t_temp, t_context_size)
 
-    elif (a_model_name == "claude"):
-        return ChatAnthropic(model = claude_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif (a_model_name == "gemma"):
-        return ChatTogether(model = gemma_model_name, max_tokens = t_context_size, temperature = t_temp)
-
-    elif (a_model_name == "mistral"):
-        return ChatMistralAI(model = mistral_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif (a_model_name == "llama"):
-        return ChatTogether(model = llama_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif (a_model_name == 'wizard'):
-        return ChatTogether(model = wizard_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif(a_model_name == "databricks"):
-        return ChatTogether(model = databricks_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif (a_model_name == "gryphe"):
-        return ChatTogether(model = gryphe_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif (a_model_name == "upstage"):
-        return ChatTogether(model = upstage_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif (a_model_name == "qwen"):
-        return ChatTogether(model = qwen_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    elif (a_model_name == "deep_seek"):
-        return ChatTogether(model = deep_seek_model_name, max_tokens = t_context_size, temperature = t_temp)
-    
-    else:
+    if (a_model_name not in m_generation_models):
         print("Not a valid model name.")
         return
 
-#Questions Formatting
-questions_formatting_llm = ChatOpenAI(model = chatGPT_model_name, max_tokens = 2048, temperature = 0.5)
+    t_provider, t_provider_model_name = m_generation_models[a_model_name]
+    return get_llm(t_provider, t_provider_model_name, a_llm_type, t_temp, t_context_size)
+
+
+
+#Client registry*
+#Clients are shared process wide, keyed by (model, LLmType, temperature, max_tokens), so their connections are reused.
+m_llm_clients: dict[tuple, object] = {}
+m_llm_clients_lock = threading.Lock()
+
+#One keep-alive HTTP connection pool per provider, shared by every client of that provider that accepts one.
+m_http_max_connections: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "64"))
+m_http_max_keepalive_connections: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "32"))
+m_http_keepalive_expiry_seconds: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", "90"))
+m_http_timeout_seconds: float = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "600"))
+m_http_clients: dict[str, httpx.Client] = {}
+#ainvoke goes through a separate async pool with the same limits.
+m_http_async_clients: dict[str, httpx.AsyncClient] = {}
+
+#LLM_SIMULATION=true makes every client simulated, including the formatting and evaluation ones, so a whole project can run offline.
+m_simulate_all_llms: bool = os.getenv("LLM_SIMULATION", "false").strip().lower() == "true"
+
+
+def get_llm(a_provider: str, a_model: str, a_llm_type: LLmType, a_temperature: float, a_max_tokens: int, a_timeout_seconds: float | None = None):
+    #a_timeout_seconds bounds each request to the provider, None keeps m_http_timeout_seconds.
+    if (m_simulate_all_llms == True and a_provider != "simulated"):
+        a_provider = "simulated"
+        a_model = "simulated"
+
+    t_client_key = (a_model, a_llm_type, a_temperature, a_max_tokens, a_timeout_seconds)
+
+    with m_llm_clients_lock:
+        if (t_client_key not in m_llm_clients):
+            t_llm = _create_llm(a_provider, a_model, a_temperature, a_max_tokens, a_timeout_seconds or m_http_timeout_seconds)
+            if (t_llm == None):
+                return None
+            m_llm_clients[t_client_key] = t_llm
+
+        return m_llm_clients[t_client_key]
+
+
+def _create_llm(a_provider: str, a_model: str, a_temperature: float, a_max_tokens: int, a_timeout_seconds: float):
+    if (a_provider == "openai"):
+        #The rate limit headers are passed on in response_metadata["headers"] for rate_limiter.update_from_headers.
+        return ChatOpenAI(model = a_model, max_tokens = a_max_tokens, temperature = a_temperature, timeout = a_timeout_seconds, max_retries = 0, include_response_headers = True, http_client = _get_http_client(a_provider), http_async_client = _get_http_async_client(a_provider))
+    elif (a_provider == "together"):
+        return ChatTogether(model = a_model, max_tokens = a_max_tokens, temperature = a_temperature, timeout = a_timeout_seconds, max_retries = 0, include_response_headers = True, http_client = _get_http_client(a_provider), http_async_client = _get_http_async_client(a_provider))
+    elif (a_provider == "anthropic"):
+        #Keeps its own connection pool per client, which the registry makes long lived.
+        return ChatAnthropic(model = a_model, max_tokens = a_max_tokens, temperature = a_temperature, timeout = a_timeout_seconds, max_retries = 0)
+    elif (a_provider == "mistral"):
+        return ChatMistralAI(model = a_model, max_tokens = a_max_tokens, temperature = a_temperature, timeout = a_timeout_seconds, max_retries = 0)
+    elif (a_provider == "simulated"):
+        return simulated_llm.create_simulated_llm(a_model, a_temperature, a_max_tokens)
+
+    print(f"Not a valid LLM provider: {a_provider}.")
+    return None
+
+
+def _get_http_client(a_provider: str) -> httpx.Client:
+    #Only called while holding m_llm_clients_lock.
+    if (a_provider not in m_http_clients):
+        m_http_clients[a_provider] = httpx.Client(limits = _get_http_limits(), timeout = m_http_timeout_seconds)
+
+    return m_http_clients[a_provider]
+
+
+def _get_http_async_client(a_provider: str) -> httpx.AsyncClient:
+    #Only called while holding m_llm_clients_lock.
+    if (a_provider not in m_http_async_clients):
+        m_http_async_clients[a_provider] = httpx.AsyncClient(limits = _get_http_limits(), timeout = m_http_timeout_seconds)
+
+    return m_http_async_clients[a_provider]
+
+
+def _get_http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections = m_http_max_connections,
+        max_keepalive_connections = m_http_max_keepalive_connections,
+        keepalive_expiry = m_http_keepalive_expiry_seconds
+    )
+
+
+def get_llm_clients_info() -> dict:
+    with m_llm_clients_lock:
+        t_llm_clients = dict(m_llm_clients)
+        t_http_clients = dict(m_http_clients)
+        t_http_async_clients = dict(m_http_async_clients)
+
+    t_clients_info = []
+    for (t_model, t_llm_type, t_temperature, t_max_tokens, t_timeout_seconds), t_llm in t_llm_clients.items():
+        t_clients_info.append({
+            "model" : t_model,
+            "llm_type" : t_llm_type.name,
+            "temperature" : t_temperature,
+            "max_tokens" : t_max_tokens,
+            "timeout_seconds" : t_timeout_seconds,
+            "provider" : get_llm_provider(t_llm),
+            "connections" : _get_connection_counts(_find_http_client(t_llm))
+        })
+
+    return {
+        "clients" : t_clients_info,
+        "shared_pools" : {t_provider: _get_connection_counts(t_http_client) for t_provider, t_http_client in t_http_clients.items()},
+        "shared_async_pools" : {t_provider: _get_connection_counts(t_http_client) for t_provider, t_http_client in t_http_async_clients.items()}
+    }
+
+
+def _find_http_client(a_llm) -> httpx.Client | None:
+    #Where each integration keeps its httpx client.
+    for t_attribute_path in [["http_client"], ["client"], ["_client", "_client"], ["client", "_client", "_client"]]:
+        t_object = a_llm
+        for t_attribute in t_attribute_path:
+            t_object = getattr(t_object, t_attribute, None)
+
+        if (isinstance(t_object, httpx.Client) == True):
+            return t_object
+
+    return None
+
+
+def _get_connection_counts(a_http_client: httpx.Client | httpx.AsyncClient | None) -> dict:
+    #httpx has no public API for its pool, the counts are read from httpcore's internals when they look as expected and are unknown otherwise.
+    t_unknown_counts = {"total" : None, "idle" : None, "active" : None}
+
+    t_connections = getattr(getattr(getattr(a_http_client, "_transport", None), "_pool", None), "connections", None)
+    if (isinstance(t_connections, list) == False):
+        return t_unknown_counts
+
+    try:
+        t_number_of_idle_connections = sum(1 for t_connection in list(t_connections) if t_connection.is_idle() == True)
+    except Exception as e:
+        print(f"Could not read the HTTP connection pool: {e}")
+        return t_unknown_counts
+
+    return {
+        "total" : len(t_connections),
+        "idle" : t_number_of_idle_connections,
+        "active" : len(t_connections) - t_number_of_idle_connections
+    }
+
+
+#Questions, Keywords and Summary Formatting share the same client.
+questions_formatting_llm = get_llm("openai", chatGPT_model_name, LLmType.Formatting, 0.5, 2048)
+keywords_formatting_llm = get_llm("openai", chatGPT_model_name, LLmType.Formatting, 0.5, 2048)
+summary_formatting_llm = get_llm("openai", chatGPT_model_name, LLmType.Formatting, 0.5, 2048)
+
+
+#Response cache, configured through the LLM_CACHE_* environment variables. None unless LLM_CACHE_BACKEND is set.
+m_llm_cache: llm_cache.LLMCache | None = llm_cache.create_llm_cache_from_environment()
+
+
+def get_llm_cache_key(a_llm, a_prompt: str) -> str:
+    #Bound runnables (e.g. llm.bind(response_format = ...)) are keyed on the wrapped model plus the bound options.
+    t_llm = getattr(a_llm, "bound", a_llm)
+
+    return llm_cache.LLMCache.get_key(
+        a_model_name = getattr(t_llm, "model_name", None) or getattr(t_llm, "model", ""),
+        a_temperature = getattr(t_llm, "temperature", None),
+        a_max_tokens = getattr(t_llm, "max_tokens", None),
+        a_prompt = a_prompt,
+        a_extra = getattr(a_llm, "kwargs", None) if t_llm is not a_llm else None
+    )
+
+
+#Attempts per request when the provider answers with a rate limit or server error.
+#The clients are created with max_retries = 0, so these are the only retries.
+m_number_of_tries: int = 3
+m_server_error_backoff_seconds: float = 1.0
+
+
+def invoke_llm(a_llm, a_prompt: str, a_bypass_cache: bool = False, a_request_name: str = "") -> str:
+    #With a_bypass_cache the cached response is ignored and replaced by a fresh sample.
+    #a_request_name names the pipeline stage, it is passed to the model as run metadata.
+    t_cache_key, t_cached_response = _get_cached_response(a_llm, a_prompt, a_bypass_cache)
+    if (t_cached_response != None):
+        return t_cached_response
+
+    t_rate_limiter = rate_limiter.get_rate_limiter(get_llm_provider(a_llm))
+    t_reserved_tokens = _get_reserved_tokens(a_llm, a_prompt)
+    progress_events.report_llm_call(a_request_name, t_rate_limiter.provider)
+
+    with llm_concurrency.limit(t_rate_limiter.provider):
+        for i in range(m_number_of_tries):
+            t_rate_limiter.acquire(t_reserved_tokens)
+            try:
+                t_response = a_llm.invoke(a_prompt, config = _get_run_config(a_request_name))
+                break
+            except Exception as e:
+                t_retry_wait_seconds = _get_retry_wait_seconds(t_rate_limiter, e, i)
+                if (t_retry_wait_seconds == None):
+                    raise
+                time.sleep(t_retry_wait_seconds)
+
+    t_response = _handle_response(t_rate_limiter, t_reserved_tokens, t_response)
+    _store_response(t_cache_key, t_response)
+
+    return t_response
+
+
+async def ainvoke_llm(a_llm, a_prompt: str, a_bypass_cache: bool = False, a_request_name: str = "") -> str:
+    #The cache backends do blocking disk and network I/O, so they are used off the event loop.
+    t_cache_key, t_cached_response = await asyncio.to_thread(_get_cached_response, a_llm, a_prompt, a_bypass_cache)
+    if (t_cached_response != None):
+        return t_cached_response
+
+    t_provider = get_llm_provider(a_llm)
+    t_rate_limiter = rate_limiter.get_rate_limiter(t_provider)
+    t_reserved_tokens = _get_reserved_tokens(a_llm, a_prompt)
+    progress_events.report_llm_call(a_request_name, t_provider)
+
+    async with llm_concurrency.alimit(t_provider):
+        for i in range(m_number_of_tries):
+            await t_rate_limiter.aacquire(t_reserved_tokens)
+            try:
+                t_response = await a_llm.ainvoke(a_prompt, config = _get_run_config(a_request_name))
+                break
+            except Exception as e:
+                t_retry_wait_seconds = _get_retry_wait_seconds(t_rate_limiter, e, i)
+                if (t_retry_wait_seconds == None):
+                    raise
+                await asyncio.sleep(t_retry_wait_seconds)
+
+    t_response = _handle_response(t_rate_limiter, t_reserved_tokens, t_response)
+    await asyncio.to_thread(_store_response, t_cache_key, t_response)
+
+    return t_response
+
+
+def _get_retry_wait_seconds(a_rate_limiter: rate_limiter.ProviderRateLimiter, a_exception: Exception, a_try_index: int) -> float | None:
+    #None when the request should not be tried again.
+    if (a_try_index == m_number_of_tries - 1):
+        return None
+
+    if (rate_limiter.is_rate_limit_error(a_exception) == True):
+        print(f"Rate limited by {a_rate_limiter.provider}. Retrying...")
+        #The limiter blocks the next acquire until the retry-after time has passed.
+        a_rate_limiter.on_rate_limited(rate_limiter.get_retry_after_seconds(a_exception))
+        return 0
+    elif (rate_limiter.is_server_error(a_exception) == True):
+        print(f"Server error from {a_rate_limiter.provider}. Retrying...")
+        return m_server_error_backoff_seconds * 2 ** a_try_index
+
+    return None
+
+
+def _get_run_config(a_request_name: str) -> dict:
+    return {"metadata" : {"request_name" : a_request_name}}
+
+
+def _get_cached_response(a_llm, a_prompt: str, a_bypass_cache: bool) -> tuple[str | None, str | None]:
+    #Simulated responses are never cached, their latency is the point.
+    if (m_llm_cache == None or getattr(a_llm, "is_simulated", False) == True):
+        return None, None
+
+    t_cache_key = get_llm_cache_key(a_llm, a_prompt)
+    if (a_bypass_cache == True):
+        return t_cache_key, None
+
+    t_cached_response = m_llm_cache.get(t_cache_key)
+    if (t_cached_response != None):
+        print("Using cached LLM response.")
+
+    return t_cache_key, t_cached_response
+
+
+def _get_reserved_tokens(a_llm, a_prompt: str) -> int:
+    #Providers count the requested completion size against the token limit up front.
+    return rate_limiter.estimate_tokens(a_prompt) + int(getattr(getattr(a_llm, "bound", a_llm), "max_tokens", None) or 0)
+
+
+def _handle_response(a_rate_limiter: rate_limiter.ProviderRateLimiter, a_reserved_tokens: int, a_response) -> str:
+    t_usage_metadata = getattr(a_response, "usage_metadata", None) or {}
+    t_response_metadata = getattr(a_response, "response_metadata", None) or {}
+
+    a_rate_limiter.on_response(
+        a_reserved_tokens = a_reserved_tokens,
+        a_used_tokens = t_usage_metadata.get("total_tokens", None),
+        a_headers = t_response_metadata.get("headers", None)
+    )
+
+    return a_response.content
+
+
+def _store_response(a_cache_key: str | None, a_response: str) -> None:
+    if (a_cache_key != None):
+        m_llm_cache.set(a_cache_key, a_response)
+
+
+def get_llm_provider(a_llm) -> str:
+    #Bound runnables (e.g. llm.bind(...)) wrap the chat model.
+    a_llm = getattr(a_llm, "bound", a_llm)
+
+    if (isinstance(a_llm, ChatTogether) == True):
+        return "together"
+    elif (isinstance(a_llm, ChatOpenAI) == True):
+        return "openai"
+    elif (isinstance(a_llm, ChatAnthropic) == True):
+        return "anthropic"
+    elif (isinstance(a_llm, ChatMistralAI) == True):
+        return "mistral"
+    elif (isinstance(a_llm, simulated_llm.SimulatedChatModel) == True):
+        return "simulated"
+
+    return type(a_llm).__name__.lower()
+
+
+def get_llm_cache_stats() -> dict:
+    if (m_llm_cache == None):
+        return {}
+
+    return m_llm_cache.get_stats()
+
+
+def get_rate_limiter_metrics() -> dict:
+    return rate_limiter.get_metrics()
 
-#Keywords Formatting
-keywords_formatting_llm = ChatOpenAI(model = chatGPT_model_name, max_tokens = 2048, temperature = 0.5)
 
-#Summary Formatting
-summary_formatting_llm = ChatOpenAI(model = chatGPT_model_name, max_tokens = 2048, temperature = 0.5)
+def simple_request(a_llm, a_prompt: str, a_bypass_cache: bool = False, a_request_name: str = "") -> str:
+    return invoke_llm(a_llm, a_prompt, a_bypass_cache, a_request_name)
 
 
-def simple_request(a_llm, a_prompt: str) -> str:
-    time.sleep(0.25) #Artificially add delay to prevent reaching the token limit too easily.
-    return a_llm.invoke(a_prompt).content
+async def asimple_request(a_llm, a_prompt: str, a_bypass_cache: bool = False, a_request_name: str = "") -> str:
+    return await ainvoke_llm(a_llm, a_prompt, a_bypass_cache, a_request_name)
@@ -0,0 +1,408 @@
+#Python Imports
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+#Custom Imports
+from utilities import file_manager
+
+
+#Keys made in one scope never match keys made in another, e.g. every run of model_matrix_runner.py has its own scope so it
+#samples its own responses and scores. A context variable, so tasks and threads started with the context keep the scope.
+m_cache_scope: contextvars.ContextVar[str] = contextvars.ContextVar("llm_cache_scope", default = "")
+
+
+def set_cache_scope(a_scope: str) -> contextvars.Token:
+    #"" is the shared scope every key is made in by default.
+    return m_cache_scope.set(a_scope)
+
+
+def get_cache_scope() -> str:
+    return m_cache_scope.get()
+
+
+#Backends*
+class LLMCacheBackend(ABC):
+    #Every backend stores plain strings against a hex key and evicts the least recently used entries once the size limit is passed.
+
+    @abstractmethod
+    def get(self, a_key: str) -> str | None:
+        pass
+
+    @abstractmethod
+    def set(self, a_key: str, a_value: str, a_ttl_seconds: float | None = None) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, a_key: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_size_bytes(self) -> int:
+        pass
+
+
+class DiskCacheBackend(LLMCacheBackend):
+    #One json file per entry. The file modification time is used as the last access time for the LRU eviction.
+
+    m_entry_file_suffix: str = ".json"
+
+    def __init__(self, a_folder_path: Path, a_max_size_bytes: int = 512 * 1024 * 1024):
+        self.folder_path: Path = Path(a_folder_path)
+        self.max_size_bytes: int = a_max_size_bytes
+        self.lock = threading.Lock()
+
+        file_manager.create_folder_if_not_exist(self.folder_path)
+        self.size_bytes: int = sum(t_path.stat().st_size for t_path in self._get_entry_file_paths())
+
+    def get(self, a_key: str) -> str | None:
+        t_entry_file_path = self._get_entry_file_path(a_key)
+
+        with self.lock:
+            try:
+                with open(str(t_entry_file_path), "r", encoding = "utf8") as t_entry_file:
+                    t_entry: dict = json.load(t_entry_file)
+            except Exception:
+                return None
+
+            if (t_entry["expires_at"] != None and t_entry["expires_at"] < time.time()):
+                self._delete_entry_file(t_entry_file_path)
+                return None
+
+            #Touch the file so it counts as recently used.
+            os.utime(t_entry_file_path)
+            return t_entry["value"]
+
+    def set(self, a_key: str, a_value: str, a_ttl_seconds: float | None = None) -> None:
+        t_entry = {
+            "value" : a_value,
+            "expires_at" : None if a_ttl_seconds == None else time.time() + a_ttl_seconds
+        }
+        t_entry_file_path = self._get_entry_file_path(a_key)
+        t_temporary_file_path = t_entry_file_path.with_suffix(".tmp")
+
+        with self.lock:
+            if (t_entry_file_path.exists() == True):
+                self._delete_entry_file(t_entry_file_path)
+
+            with open(str(t_temporary_file_path), "w", encoding = "utf8") as t_entry_file:
+                json.dump(t_entry, t_entry_file)
+            os.replace(t_temporary_file_path, t_entry_file_path)
+
+            self.size_bytes += t_entry_file_path.stat().st_size
+            self._evict()
+
+    def delete(self, a_key: str) -> None:
+        with self.lock:
+            self._delete_entry_file(self._get_entry_file_path(a_key))
+
+    def clear(self) -> None:
+        with self.lock:
+            for t_entry_file_path in self._get_entry_file_paths():
+                self._delete_entry_file(t_entry_file_path)
+            self.size_bytes = 0
+
+    def get_size_bytes(self) -> int:
+        return self.size_bytes
+
+    def _evict(self) -> None:
+        if (self.size_bytes <= self.max_size_bytes):
+            return
+
+        t_entry_file_paths = sorted(self._get_entry_file_paths(), key = lambda t_path: t_path.stat().st_mtime)
+        for t_entry_file_path in t_entry_file_paths:
+            if (self.size_bytes <= self.max_size_bytes):
+                break
+            self._delete_entry_file(t_entry_file_path)
+
+    def _delete_entry_file(self, a_entry_file_path: Path) -> None:
+        try:
+            t_file_size = a_entry_file_path.stat().st_size
+            os.remove(a_entry_file_path)
+            self.size_bytes = max(0, self.size_bytes - t_file_size)
+        except FileNotFoundError:
+            pass
+
+    def _get_entry_file_path(self, a_key: str) -> Path:
+        return self.folder_path / (a_key + DiskCacheBackend.m_entry_file_suffix)
+
+    def _get_entry_file_paths(self) -> list[Path]:
+        return [t_path for t_path in self.folder_path.iterdir() if t_path.suffix == DiskCacheBackend.m_entry_file_suffix]
+
+
+class SQLiteCacheBackend(LLMCacheBackend):
+
+    def __init__(self, a_database_path: Path, a_max_size_bytes: int = 512 * 1024 * 1024):
+        self.database_path: Path = Path(a_database_path)
+        self.max_size_bytes: int = a_max_size_bytes
+        self.lock = threading.Lock()
+
+        file_manager.create_folder_if_not_exist(self.database_path.parent)
+        self.connection = sqlite3.connect(str(self.database_path), check_same_thread = False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                + "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, expires_at REAL, last_access REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+
+    def get(self, a_key: str) -> str | None:
+        with self.lock, self.connection:
+            t_row = self.connection.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (a_key,)).fetchone()
+            if (t_row == None):
+                return None
+
+            t_value, t_expires_at = t_row
+            if (t_expires_at != None and t_expires_at < time.time()):
+                self.connection.execute("DELETE FROM llm_cache WHERE key = ?", (a_key,))
+                return None
+
+            self.connection.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), a_key))
+            return t_value
+
+    def set(self, a_key: str, a_value: str, a_ttl_seconds: float | None = None) -> None:
+        t_expires_at = None if a_ttl_seconds == None else time.time() + a_ttl_seconds
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (a_key, a_value, len(a_value.encode("utf8")), t_expires_at, time.time())
+            )
+            self._evict()
+
+    def delete(self, a_key: str) -> None:
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM llm_cache WHERE key = ?", (a_key,))
+
+    def clear(self) -> None:
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM llm_cache")
+
+    def get_size_bytes(self) -> int:
+        with self.lock:
+            return self._get_size_bytes()
+
+    def _get_size_bytes(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def _evict(self) -> None:
+        self.connection.execute("DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+
+        t_size_bytes = self._get_size_bytes()
+        if (t_size_bytes <= self.max_size_bytes):
+            return
+
+        for t_key, t_size in self.connection.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall():
+            if (t_size_bytes <= self.max_size_bytes):
+                break
+            self.connection.execute("DELETE FROM llm_cache WHERE key = ?", (t_key,))
+            t_size_bytes -= t_size
+
+
+class RedisCacheBackend(LLMCacheBackend):
+    #Works with any server speaking the Redis protocol, so several nodes can share one cache.
+    #Entry values are plain keys with a native TTL, a sorted set tracks last access and a hash tracks entry sizes.
+
+    def __init__(self, a_url: str, a_max_size_bytes: int = 512 * 1024 * 1024, a_namespace: str = "llm-cache"):
+        #Optional dependency, only needed when this backend is chosen.
+        import redis
+
+        self.client = redis.Redis.from_url(a_url, decode_responses = True)
+        self.max_size_bytes: int = a_max_size_bytes
+        self.namespace: str = a_namespace
+
+        self.access_times_key: str = a_namespace + ":access-times"
+        self.sizes_key: str = a_namespace + ":sizes"
+
+    def get(self, a_key: str) -> str | None:
+        t_value = self.client.get(self._get_entry_key(a_key))
+        if (t_value == None):
+            #Only a key that was stored has bookkeeping, if it is there the entry expired in redis and it is dropped too.
+            if (self.client.zscore(self.access_times_key, a_key) != None):
+                self._forget(a_key)
+            return None
+
+        self.client.zadd(self.access_times_key, {a_key: time.time()})
+        return t_value
+
+    def set(self, a_key: str, a_value: str, a_ttl_seconds: float | None = None) -> None:
+        t_pipeline = self.client.pipeline()
+        if (a_ttl_seconds == None):
+            t_pipeline.set(self._get_entry_key(a_key), a_value)
+        else:
+            t_pipeline.set(self._get_entry_key(a_key), a_value, px = int(a_ttl_seconds * 1000))
+        t_pipeline.zadd(self.access_times_key, {a_key: time.time()})
+        t_pipeline.hset(self.sizes_key, a_key, len(a_value.encode("utf8")))
+        t_pipeline.execute()
+
+        self._evict()
+
+    def delete(self, a_key: str) -> None:
+        self.client.delete(self._get_entry_key(a_key))
+        self._forget(a_key)
+
+    def clear(self) -> None:
+        t_keys = self.client.zrange(self.access_times_key, 0, -1)
+        if (len(t_keys) > 0):
+            self.client.delete(*[self._get_entry_key(t_key) for t_key in t_keys])
+        self.client.delete(self.access_times_key, self.sizes_key)
+
+    def get_size_bytes(self) -> int:
+        return sum(int(t_size) for t_size in self.client.hvals(self.sizes_key))
+
+    def _evict(self) -> None:
+        t_size_bytes = self.get_size_bytes()
+        while (t_size_bytes > self.max_size_bytes):
+            t_oldest = self.client.zpopmin(self.access_times_key)
+            if (len(t_oldest) == 0):
+                break
+
+            t_key = t_oldest[0][0]
+            t_size_bytes -= int(self.client.hget(self.sizes_key, t_key) or 0)
+            self.client.delete(self._get_entry_key(t_key))
+            self.client.hdel(self.sizes_key, t_key)
+
+    def _forget(self, a_key: str) -> None:
+        self.client.zrem(self.access_times_key, a_key)
+        self.client.hdel(self.sizes_key, a_key)
+
+    def _get_entry_key(self, a_key: str) -> str:
+        return self.namespace + ":entry:" + a_key
+
+
+
+#Cache*
+class LLMCache:
+
+    def __init__(self, a_backend: LLMCacheBackend, a_ttl_seconds: float | None = None):
+        self.backend: LLMCacheBackend = a_backend
+        self.ttl_seconds: float | None = a_ttl_seconds
+
+        self.lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.writes: int = 0
+
+    @staticmethod
+    def get_key(a_model_name: str, a_temperature: float, a_max_tokens: int, a_prompt: str, a_extra: dict = None) -> str:
+        t_key_data = {
+            "model_name" : str(a_model_name),
+            "temperature" : a_temperature,
+            "max_tokens" : a_max_tokens,
+            "prompt" : a_prompt,
+            "extra" : a_extra or {}
+        }
+        #Left out in the shared scope, so the keys made before scopes existed still match.
+        if (get_cache_scope() != ""):
+            t_key_data["scope"] = get_cache_scope()
+        t_key_text = json.dumps(t_key_data, sort_keys = True, default = str)
+        return hashlib.sha256(t_key_text.encode("utf8")).hexdigest()
+
+    def get(self, a_key: str) -> str | None:
+        try:
+            t_value = self.backend.get(a_key)
+        except Exception as e:
+            print(f"Could not read from the LLM cache. Treating as a miss. Error: {e}")
+            t_value = None
+
+        with self.lock:
+            if (t_value == None):
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return t_value
+
+    def set(self, a_key: str, a_value: str) -> None:
+        try:
+            self.backend.set(a_key, a_value, self.ttl_seconds)
+        except Exception as e:
+            print(f"Could not write to the LLM cache. Error: {e}")
+            return
+
+        with self.lock:
+            self.writes += 1
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            t_lookups = self.hits + self.misses
+            return {
+                "backend" : type(self.backend).__name__,
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "writes" : self.writes,
+                "hit_rate" : round(self.hits / t_lookups, 3) if t_lookups > 0 else 0,
+                "size_bytes" : self.backend.get_size_bytes()
+            }
+
+
+def create_llm_cache(
+        a_backend_name: str,
+        a_location: str,
+        a_max_size_bytes: int,
+        a_ttl_seconds: float | None = None,
+        a_namespace: str = "llm-cache"
+    ) -> LLMCache | None:
+
+    if (a_backend_name == "none" or a_backend_name == ""):
+        return None
+    elif (a_backend_name == "disk"):
+        t_backend = DiskCacheBackend(Path(a_location), a_max_size_bytes)
+    elif (a_backend_name == "sqlite"):
+        t_backend = SQLiteCacheBackend(Path(a_location), a_max_size_bytes)
+    elif (a_backend_name == "redis"):
+        t_backend = RedisCacheBackend(a_location, a_max_size_bytes, a_namespace)
+    else:
+        print(f"Not a valid LLM cache backend: {a_backend_name}. Valid backends: none, disk, sqlite, redis. Caching is disabled.")
+        return None
+
+    return LLMCache(t_backend, a_ttl_seconds)
+
+
+m_default_locations: dict[str, str] = {
+    "disk" : "../LLM-Cache/Responses",
+    "sqlite" : "../LLM-Cache/responses.sqlite3",
+    "redis" : "redis://localhost:6379/0"
+}
+
+
+def create_llm_cache_from_environment(
+        a_environment_prefix: str = "LLM_CACHE",
+        a_default_locations: dict[str, str] = m_default_locations,
+        a_default_max_size_mb: float = 512,
+        a_namespace: str = "llm-cache",
+        a_default_backend_name: str = "none"
+    ) -> LLMCache | None:
+    #<PREFIX>_BACKEND: none, disk, sqlite or redis. Caching is opt in, sampled generations would otherwise repeat the same
+    #output on every run.
+    #<PREFIX>_LOCATION: folder for disk, database file for sqlite, url for redis.
+    t_backend_name = os.getenv(a_environment_prefix + "_BACKEND", a_default_backend_name).strip().lower()
+
+    t_location = os.getenv(a_environment_prefix + "_LOCATION", a_default_locations.get(t_backend_name, ""))
+    t_max_size_bytes = int(float(os.getenv(a_environment_prefix + "_MAX_SIZE_MB", str(a_default_max_size_mb))) * 1024 * 1024)
+    t_ttl_seconds = os.getenv(a_environment_prefix + "_TTL_SECONDS", "")
+
+    try:
+        return create_llm_cache(
+            a_backend_name = t_backend_name,
+            a_location = t_location,
+            a_max_size_bytes = t_max_size_bytes,
+            a_ttl_seconds = float(t_ttl_seconds) if t_ttl_seconds != "" else None,
+            a_namespace = a_namespace
+        )
+    except Exception as e:
+        print(f"Could not create the LLM cache. Caching is disabled. Error: {e}")
+        return None
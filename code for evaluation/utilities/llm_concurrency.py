@@ -0,0 +1,106 @@
+#Python Imports
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+
+#Maximum number of LLM requests in flight, over all providers and per provider.
+#The limits hold for the whole process: the sync path, every job thread and every event loop started with asyncio.run take the same slots.
+m_global_limit: int = int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "16"))
+m_provider_limits: dict[str, int] = {
+    "openai" : int(os.getenv("OPENAI_MAX_CONCURRENT_REQUESTS", "8")),
+    "anthropic" : int(os.getenv("ANTHROPIC_MAX_CONCURRENT_REQUESTS", "4")),
+    "mistral" : int(os.getenv("MISTRAL_MAX_CONCURRENT_REQUESTS", "4")),
+    "together" : int(os.getenv("TOGETHER_MAX_CONCURRENT_REQUESTS", "8")),
+    "simulated" : int(os.getenv("SIMULATED_MAX_CONCURRENT_REQUESTS", "8")),
+}
+m_default_provider_limit: int = 4
+
+m_semaphores: dict[str, threading.BoundedSemaphore] = {"global" : threading.BoundedSemaphore(m_global_limit)}
+m_semaphores_lock = threading.Lock()
+
+#Coroutines wait for a slot on these threads instead of asyncio's default pool, so waiting requests never hold up other to_thread work.
+m_waiting_executor = ThreadPoolExecutor(max_workers = int(os.getenv("LLM_MAX_WAITING_REQUESTS", "256")), thread_name_prefix = "llm-slot")
+
+
+def set_limits(a_global_limit: int | None = None, a_provider_limits: dict[str, int] | None = None) -> None:
+    #Applies to requests started afterwards, the ones in flight give their slot back to the limit they took it from.
+    global m_global_limit
+
+    with m_semaphores_lock:
+        if (a_global_limit != None):
+            m_global_limit = a_global_limit
+            m_semaphores["global"] = threading.BoundedSemaphore(m_global_limit)
+        if (a_provider_limits != None):
+            m_provider_limits.update(a_provider_limits)
+            for t_provider in a_provider_limits:
+                m_semaphores.pop(t_provider, None)
+
+
+def get_provider_limits_from_text(a_provider_limits_text: str) -> dict[str, int]:
+    #"openai=8,together=4", as given to the command line runners.
+    t_provider_limits = {}
+    for t_provider_limit in a_provider_limits_text.split(","):
+        if (t_provider_limit.strip() == ""):
+            continue
+        t_provider, t_limit = t_provider_limit.split("=")
+        t_provider_limits[t_provider.strip()] = int(t_limit)
+
+    return t_provider_limits
+
+
+def get_limits() -> dict:
+    return {
+        "global" : m_global_limit,
+        "providers" : dict(m_provider_limits)
+    }
+
+
+def _get_semaphores(a_provider: str) -> list[threading.BoundedSemaphore]:
+    #The provider slot is taken first so a busy provider does not hold global slots while it waits.
+    with m_semaphores_lock:
+        if (a_provider not in m_semaphores):
+            m_semaphores[a_provider] = threading.BoundedSemaphore(m_provider_limits.get(a_provider, m_default_provider_limit))
+
+        return [m_semaphores[a_provider], m_semaphores["global"]]
+
+
+@contextmanager
+def limit(a_provider: str):
+    t_acquired_semaphores = []
+    try:
+        for t_semaphore in _get_semaphores(a_provider):
+            t_semaphore.acquire()
+            t_acquired_semaphores.append(t_semaphore)
+        yield
+    finally:
+        for t_semaphore in reversed(t_acquired_semaphores):
+            t_semaphore.release()
+
+
+@asynccontextmanager
+async def alimit(a_provider: str):
+    t_acquired_semaphores = []
+    try:
+        for t_semaphore in _get_semaphores(a_provider):
+            await _aacquire(t_semaphore)
+            t_acquired_semaphores.append(t_semaphore)
+        yield
+    finally:
+        for t_semaphore in reversed(t_acquired_semaphores):
+            t_semaphore.release()
+
+
+async def _aacquire(a_semaphore: threading.BoundedSemaphore) -> None:
+    if (a_semaphore.acquire(blocking = False) == True):
+        return
+
+    t_future = asyncio.get_running_loop().run_in_executor(m_waiting_executor, a_semaphore.acquire)
+    try:
+        await asyncio.shield(t_future)
+    except asyncio.CancelledError:
+        #The waiting thread still gets the slot, it is given back as soon as it does.
+        t_future.add_done_callback(lambda a_future: a_semaphore.release() if (a_future.cancelled() == False and a_future.exception() == None) else None)
+        raise
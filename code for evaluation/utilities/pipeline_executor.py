@@ -0,0 +1,168 @@
+#Python Imports
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+
+#Runs a graph of async tasks, each task starts as soon as the tasks it depends on have completed instead of waiting for
+#the whole previous stage. At most a_max_concurrent_tasks run at the same time.
+#A failed task skips every task that depends on it, the rest of the graph still runs.
+
+m_completed_status: str = "completed"
+m_failed_status: str = "failed"
+m_skipped_status: str = "skipped"
+
+
+@dataclass
+class PipelineTask:
+    name: str
+    stage: str
+    run: Callable[[], Awaitable]
+    dependencies: list[str] = field(default_factory=list)
+
+    status: str = ""
+    error: str = ""
+    start_time: float = -1
+    finish_time: float = -1
+
+
+class PipelineDependencyError(Exception):
+    pass
+
+
+class PipelineExecutor:
+
+    def __init__(self, a_max_concurrent_tasks: int = 8):
+        self.max_concurrent_tasks: int = a_max_concurrent_tasks
+        self.tasks: dict[str, PipelineTask] = {}
+
+        self.running_tasks_count: int = 0
+        self.peak_running_tasks_count: int = 0
+
+    def add_task(self, a_name: str, a_stage: str, a_run: Callable[[], Awaitable], a_dependencies: list[str] = None) -> None:
+        #a_run is called once the dependencies have completed and returns the awaitable to run.
+        self.tasks[a_name] = PipelineTask(name = a_name, stage = a_stage, run = a_run, dependencies = list(a_dependencies or []))
+
+    async def run(self, a_on_task_done: Callable[[PipelineTask], None] = None) -> dict:
+        #a_on_task_done is called with every task that completed, failed or was skipped. If it raises, the tasks still
+        #running are cancelled and the error is raised, e.g. to cancel the pipeline's job.
+        self._check_graph()
+
+        t_semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        t_start_time = time.time()
+
+        #All asyncio tasks exist before any of them runs, so each one can wait for its dependencies by name.
+        t_asyncio_tasks: dict[str, asyncio.Task] = {}
+        for t_task in self.tasks.values():
+            t_asyncio_tasks[t_task.name] = asyncio.ensure_future(self._run_task(t_task, t_asyncio_tasks, t_semaphore))
+
+        try:
+            for t_done_asyncio_task in asyncio.as_completed(list(t_asyncio_tasks.values())):
+                t_task = await t_done_asyncio_task
+                if (a_on_task_done != None):
+                    a_on_task_done(t_task)
+        except BaseException:
+            for t_asyncio_task in t_asyncio_tasks.values():
+                t_asyncio_task.cancel()
+            await asyncio.gather(*t_asyncio_tasks.values(), return_exceptions = True)
+            raise
+
+        return self.get_report(time.time() - t_start_time)
+
+    async def _run_task(self, a_task: PipelineTask, a_asyncio_tasks: dict[str, asyncio.Task], a_semaphore: asyncio.Semaphore) -> PipelineTask:
+        for t_dependency_name in a_task.dependencies:
+            t_dependency: PipelineTask = await a_asyncio_tasks[t_dependency_name]
+            if (t_dependency.status != m_completed_status):
+                a_task.status = m_skipped_status
+                a_task.error = f"The {t_dependency_name} task it depends on was {t_dependency.status}."
+                return a_task
+
+        async with a_semaphore:
+            self.running_tasks_count += 1
+            self.peak_running_tasks_count = max(self.peak_running_tasks_count, self.running_tasks_count)
+            a_task.start_time = time.time()
+
+            try:
+                await a_task.run()
+                a_task.status = m_completed_status
+            except Exception as e:
+                print(f"The pipeline task {a_task.name} failed: {e}")
+                a_task.status = m_failed_status
+                a_task.error = repr(e)
+            finally:
+                a_task.finish_time = time.time()
+                self.running_tasks_count -= 1
+
+        return a_task
+
+    def _check_graph(self) -> None:
+        #Unknown dependencies and cycles would leave tasks waiting forever.
+        for t_task in self.tasks.values():
+            t_unknown_dependencies = [t_name for t_name in t_task.dependencies if t_name not in self.tasks]
+            if (len(t_unknown_dependencies) > 0):
+                raise PipelineDependencyError(f"The {t_task.name} task depends on unknown tasks: {', '.join(t_unknown_dependencies)}")
+
+        t_remaining_dependencies_counts = {t_task.name: len(set(t_task.dependencies)) for t_task in self.tasks.values()}
+        t_ready_task_names = [t_name for t_name, t_count in t_remaining_dependencies_counts.items() if t_count == 0]
+        t_ordered_tasks_count = 0
+        while (len(t_ready_task_names) > 0):
+            t_ready_task_name = t_ready_task_names.pop()
+            t_ordered_tasks_count += 1
+            for t_task in self.tasks.values():
+                if (t_ready_task_name in t_task.dependencies):
+                    t_remaining_dependencies_counts[t_task.name] -= 1
+                    if (t_remaining_dependencies_counts[t_task.name] == 0):
+                        t_ready_task_names.append(t_task.name)
+
+        if (t_ordered_tasks_count < len(self.tasks)):
+            raise PipelineDependencyError("The pipeline tasks depend on each other in a cycle.")
+
+    def get_report(self, a_wall_seconds: float) -> dict:
+        #Per stage: how its tasks ended, how long they ran and how much of the pipeline's task slots they used.
+        #utilisation is the share of all slots over the whole run, concurrency the mean number of the stage's tasks running
+        #while the stage was active, from its first task starting to its last task finishing.
+        t_slot_seconds = max(a_wall_seconds, 1e-9) * self.max_concurrent_tasks
+
+        t_stages_reports = {}
+        for t_task in self.tasks.values():
+            t_stage_report = t_stages_reports.setdefault(t_task.stage, {
+                "tasks" : 0,
+                m_completed_status : 0,
+                m_failed_status : 0,
+                m_skipped_status : 0,
+                "busy_seconds" : 0,
+                "first_start_time" : None,
+                "last_finish_time" : None
+            })
+            t_stage_report["tasks"] += 1
+            t_stage_report[t_task.status] += 1
+
+            if (t_task.start_time == -1):
+                continue
+            t_stage_report["busy_seconds"] += t_task.finish_time - t_task.start_time
+            t_stage_report["first_start_time"] = min(t_stage_report["first_start_time"] or t_task.start_time, t_task.start_time)
+            t_stage_report["last_finish_time"] = max(t_stage_report["last_finish_time"] or t_task.finish_time, t_task.finish_time)
+
+        t_busy_seconds = 0
+        for t_stage_report in t_stages_reports.values():
+            t_first_start_time = t_stage_report.pop("first_start_time")
+            t_last_finish_time = t_stage_report.pop("last_finish_time")
+            t_active_seconds = 0 if t_first_start_time == None else t_last_finish_time - t_first_start_time
+            t_ran_tasks_count = t_stage_report[m_completed_status] + t_stage_report[m_failed_status]
+            t_busy_seconds += t_stage_report["busy_seconds"]
+
+            t_stage_report["mean_task_seconds"] = round(t_stage_report["busy_seconds"] / t_ran_tasks_count, 3) if t_ran_tasks_count > 0 else 0
+            t_stage_report["active_seconds"] = round(t_active_seconds, 3)
+            t_stage_report["concurrency"] = round(t_stage_report["busy_seconds"] / t_active_seconds, 3) if t_active_seconds > 0 else 0
+            t_stage_report["utilisation"] = round(t_stage_report["busy_seconds"] / t_slot_seconds, 3)
+            t_stage_report["busy_seconds"] = round(t_stage_report["busy_seconds"], 3)
+
+        return {
+            "wall_seconds" : round(a_wall_seconds, 3),
+            "max_concurrent_tasks" : self.max_concurrent_tasks,
+            "peak_concurrent_tasks" : self.peak_running_tasks_count,
+            "utilisation" : round(t_busy_seconds / t_slot_seconds, 3),
+            "stages" : t_stages_reports,
+            "failures" : {t_task.name: t_task.error for t_task in self.tasks.values() if t_task.status != m_completed_status}
+        }
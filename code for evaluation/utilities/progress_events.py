@@ -0,0 +1,249 @@
+#Python Imports
+import os
+import time
+import json
+import asyncio
+import inspect
+import functools
+import threading
+import contextvars
+from collections import deque
+from typing import AsyncIterator, Callable
+
+
+#Per project stream of progress events, read by the project API's Server-Sent Events route.
+#Project operations are wrapped in a stage with the stage decorator. Inside a stage, the project's progress reports become
+#segment events and every LLM request that is sent becomes an llm_call event, all tagged with the project, stage and segment.
+#Events: stage_started, stage_finished, stage_failed, segment_started, segment_finished, segment_failed and llm_call.
+#Project.run_all runs segments out of order and publishes task_completed, task_failed and task_skipped per task instead.
+
+#Each project keeps its latest events, so a client that reconnects with Last-Event-ID gets the ones it missed.
+m_history_size: int = int(os.getenv("PROGRESS_EVENTS_HISTORY_SIZE", "500"))
+#Events waiting for a slow client, newer events are dropped for it once it is this far behind.
+m_subscriber_queue_size: int = int(os.getenv("PROGRESS_EVENTS_SUBSCRIBER_QUEUE_SIZE", "1000"))
+#Seconds without events after which a comment is sent, so proxies keep the connection open.
+m_keep_alive_seconds: float = float(os.getenv("PROGRESS_EVENTS_KEEP_ALIVE_SECONDS", "15"))
+
+m_histories: dict[str, deque] = {}
+#Per project: (event loop, queue) of every connected client.
+m_subscribers: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+m_last_event_id: int = 0
+m_lock = threading.Lock()
+
+#The running stage: {"project", "stage", "start_time", "segment_index", "segment_start_time"}.
+#Context variables follow asyncio tasks and asyncio.to_thread, pool submits have to copy the context, see QuestionEvaluationData.
+m_current_stage: contextvars.ContextVar[dict | None] = contextvars.ContextVar("progress_stage", default = None)
+
+
+def publish(a_project_name: str, a_event_type: str, a_data: dict = None) -> dict:
+    global m_last_event_id
+
+    with m_lock:
+        m_last_event_id += 1
+        t_event = {
+            "id" : m_last_event_id,
+            "event" : a_event_type,
+            "project" : a_project_name,
+            "time" : time.time(),
+            **(a_data or {})
+        }
+        m_histories.setdefault(a_project_name, deque(maxlen = m_history_size)).append(t_event)
+        t_subscribers = list(m_subscribers.get(a_project_name, []))
+
+    for t_loop, t_queue in t_subscribers:
+        try:
+            t_loop.call_soon_threadsafe(_put_event, t_queue, t_event)
+        except RuntimeError:
+            #The client's event loop is closed, it is removed when its stream ends.
+            pass
+
+    return t_event
+
+
+def _put_event(a_queue: asyncio.Queue, a_event: dict) -> None:
+    try:
+        a_queue.put_nowait(a_event)
+    except asyncio.QueueFull:
+        pass
+
+
+def get_history(a_project_name: str, a_after_event_id: int = 0) -> list[dict]:
+    with m_lock:
+        return [t_event for t_event in m_histories.get(a_project_name, []) if t_event["id"] > a_after_event_id]
+
+
+async def subscribe(a_project_name: str, a_after_event_id: int = 0) -> AsyncIterator[dict | None]:
+    #Yields the missed events after a_after_event_id, then the new ones as they are published.
+    #Yields None when there were no events for m_keep_alive_seconds.
+    t_subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize = m_subscriber_queue_size))
+
+    #Registered before reading the history, an event published in between is skipped by its id.
+    with m_lock:
+        m_subscribers.setdefault(a_project_name, []).append(t_subscriber)
+
+    try:
+        t_last_event_id = a_after_event_id
+        for t_event in get_history(a_project_name, a_after_event_id):
+            t_last_event_id = t_event["id"]
+            yield t_event
+
+        while True:
+            try:
+                t_event = await asyncio.wait_for(t_subscriber[1].get(), m_keep_alive_seconds)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            if (t_event["id"] <= t_last_event_id):
+                continue
+            t_last_event_id = t_event["id"]
+            yield t_event
+    finally:
+        with m_lock:
+            m_subscribers[a_project_name].remove(t_subscriber)
+
+
+def to_server_sent_event(a_event: dict | None) -> str:
+    if (a_event == None):
+        return ": keep-alive\n\n"
+
+    return f"id: {a_event['id']}\nevent: {a_event['event']}\ndata: {json.dumps(a_event, default = str)}\n\n"
+
+
+
+#Stages*
+def stage(a_stage_name: str) -> Callable:
+    #Decorates a Project method, sync or async. The project is the method's self, the method's simple arguments are added
+    #to the stage_started event. Stages started inside another stage are part of it and publish nothing.
+
+    def _decorator(a_function: Callable) -> Callable:
+        if (inspect.iscoroutinefunction(a_function) == True):
+            @functools.wraps(a_function)
+            async def _async_wrapper(a_project, *args, **kwargs):
+                if (m_current_stage.get() != None):
+                    return await a_function(a_project, *args, **kwargs)
+
+                t_stage, t_token = _start_stage(a_project.name, a_stage_name, args, kwargs)
+                try:
+                    t_result = await a_function(a_project, *args, **kwargs)
+                except BaseException as e:
+                    _fail_stage(t_stage, e)
+                    raise
+                finally:
+                    m_current_stage.reset(t_token)
+
+                _finish_stage(t_stage)
+                return t_result
+
+            return _async_wrapper
+
+        @functools.wraps(a_function)
+        def _wrapper(a_project, *args, **kwargs):
+            if (m_current_stage.get() != None):
+                return a_function(a_project, *args, **kwargs)
+
+            t_stage, t_token = _start_stage(a_project.name, a_stage_name, args, kwargs)
+            try:
+                t_result = a_function(a_project, *args, **kwargs)
+            except BaseException as e:
+                _fail_stage(t_stage, e)
+                raise
+            finally:
+                m_current_stage.reset(t_token)
+
+            _finish_stage(t_stage)
+            return t_result
+
+        return _wrapper
+
+    return _decorator
+
+
+def _start_stage(a_project_name: str, a_stage_name: str, a_args: tuple, a_kwargs: dict) -> tuple[dict, contextvars.Token]:
+    t_stage = {
+        "project" : a_project_name,
+        "stage" : a_stage_name,
+        "start_time" : time.time(),
+        "segment_index" : None,
+        "segment_start_time" : None
+    }
+    t_token = m_current_stage.set(t_stage)
+
+    t_arguments = [t_arg for t_arg in list(a_args) + list(a_kwargs.values()) if isinstance(t_arg, (str, int, float, bool)) == True]
+    publish(a_project_name, "stage_started", {"stage" : a_stage_name, "arguments" : t_arguments})
+    return t_stage, t_token
+
+
+def _finish_stage(a_stage: dict) -> None:
+    publish(a_stage["project"], "stage_finished", {"stage" : a_stage["stage"], "seconds" : _get_elapsed_seconds(a_stage["start_time"])})
+
+
+def _fail_stage(a_stage: dict, a_error: BaseException) -> None:
+    #The segment that was running failed with the stage.
+    if (a_stage["segment_index"] != None):
+        publish(a_stage["project"], "segment_failed", {
+            "stage" : a_stage["stage"],
+            "segment_index" : a_stage["segment_index"],
+            "error" : repr(a_error),
+            "seconds" : _get_elapsed_seconds(a_stage["segment_start_time"])
+        })
+
+    publish(a_stage["project"], "stage_failed", {
+        "stage" : a_stage["stage"],
+        "error" : repr(a_error),
+        "seconds" : _get_elapsed_seconds(a_stage["start_time"])
+    })
+
+
+def report_segments_progress(a_segments_done: int, a_segments_total: int) -> None:
+    #Called by the project after each segment with (segments done, segments total), starting at 0 done. The segment at
+    #index a_segments_done - 1 has finished and, unless all are done, the one at index a_segments_done has started.
+    t_stage = m_current_stage.get()
+    if (t_stage == None):
+        return
+
+    if (t_stage["segment_index"] != None and t_stage["segment_index"] == a_segments_done - 1):
+        publish(t_stage["project"], "segment_finished", {
+            "stage" : t_stage["stage"],
+            "segment_index" : t_stage["segment_index"],
+            "segments_done" : a_segments_done,
+            "segments_total" : a_segments_total,
+            "seconds" : _get_elapsed_seconds(t_stage["segment_start_time"])
+        })
+
+    t_stage["segment_index"] = None
+    if (a_segments_done < a_segments_total):
+        t_stage["segment_index"] = a_segments_done
+        t_stage["segment_start_time"] = time.time()
+        publish(t_stage["project"], "segment_started", {
+            "stage" : t_stage["stage"],
+            "segment_index" : a_segments_done,
+            "segments_total" : a_segments_total
+        })
+
+
+def report_segment_event(a_event_type: str, a_segment_index: int, a_data: dict = None) -> None:
+    #For segments that run side by side, report_segments_progress can not tell which of them started or finished.
+    t_stage = m_current_stage.get()
+    if (t_stage == None):
+        return
+
+    publish(t_stage["project"], a_event_type, {"stage" : t_stage["stage"], "segment_index" : a_segment_index, **(a_data or {})})
+
+
+def report_llm_call(a_request_name: str, a_provider: str) -> None:
+    #Called by langchain_llm for every request sent to a provider, cached responses are not reported.
+    t_stage = m_current_stage.get()
+    if (t_stage == None):
+        return
+
+    publish(t_stage["project"], "llm_call", {
+        "stage" : t_stage["stage"],
+        "segment_index" : t_stage["segment_index"],
+        "request_name" : a_request_name,
+        "provider" : a_provider
+    })
+
+
+def _get_elapsed_seconds(a_start_time: float) -> float:
+    return round(time.time() - a_start_time, 3)
@@ -0,0 +1,262 @@
+#Python Imports
+import os
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    #Refills continuously up to its capacity. Taking more than is available is allowed through debt, see force_take.
+
+    def __init__(self, a_capacity: float, a_refill_per_second: float, a_clock = time.monotonic):
+        self.capacity: float = a_capacity
+        self.refill_per_second: float = a_refill_per_second
+        self.clock = a_clock
+
+        self.level: float = a_capacity
+        self.last_refill_time: float = a_clock()
+
+    def refill(self) -> None:
+        t_now = self.clock()
+        self.level = min(self.capacity, self.level + (t_now - self.last_refill_time) * self.refill_per_second)
+        self.last_refill_time = t_now
+
+    def get_wait_seconds(self, a_amount: float) -> float:
+        #A request bigger than the whole bucket only waits for a full bucket.
+        t_amount = min(a_amount, self.capacity)
+        if (self.level >= t_amount):
+            return 0
+
+        return (t_amount - self.level) / self.refill_per_second
+
+    def force_take(self, a_amount: float) -> None:
+        self.level -= a_amount
+
+    def set_rate(self, a_capacity: float, a_refill_per_second: float) -> None:
+        self.refill()
+        self.capacity = a_capacity
+        self.refill_per_second = a_refill_per_second
+        self.level = min(self.level, a_capacity)
+
+
+class ProviderRateLimiter:
+    #Requests-per-minute and tokens-per-minute buckets for one provider.
+    #The effective rate is scaled down on every 429 and slowly recovers on successful responses.
+
+    m_minimum_rate_scale: float = 0.1
+    m_rate_scale_recovery_step: float = 0.05
+
+    def __init__(self, a_provider: str, a_requests_per_minute: float, a_tokens_per_minute: float, a_clock = time.monotonic):
+        self.provider: str = a_provider
+        self.requests_per_minute: float = a_requests_per_minute
+        self.tokens_per_minute: float = a_tokens_per_minute
+        self.clock = a_clock
+
+        self.lock = threading.Lock()
+        self.rate_scale: float = 1
+        self.blocked_until: float = 0
+
+        self.requests_bucket = TokenBucket(a_requests_per_minute, a_requests_per_minute / 60, a_clock)
+        self.tokens_bucket = TokenBucket(a_tokens_per_minute, a_tokens_per_minute / 60, a_clock)
+
+        #Metrics
+        self.number_of_requests: int = 0
+        self.number_of_rate_limited_responses: int = 0
+        self.total_wait_seconds: float = 0
+        self.max_wait_seconds: float = 0
+
+    def reserve(self, a_tokens: float) -> float:
+        #Takes a request slot and the tokens if both are available and returns 0, otherwise returns how long to wait before trying again.
+        with self.lock:
+            t_blocked_seconds = self.blocked_until - self.clock()
+            if (t_blocked_seconds > 0):
+                return t_blocked_seconds
+
+            self.requests_bucket.refill()
+            self.tokens_bucket.refill()
+
+            t_wait_seconds = max(self.requests_bucket.get_wait_seconds(1), self.tokens_bucket.get_wait_seconds(a_tokens))
+            if (t_wait_seconds > 0):
+                return t_wait_seconds
+
+            self.requests_bucket.force_take(1)
+            self.tokens_bucket.force_take(a_tokens)
+            return 0
+
+    def acquire(self, a_tokens: float) -> float:
+        t_start_time = self.clock()
+
+        t_wait_seconds = self.reserve(a_tokens)
+        while (t_wait_seconds > 0):
+            time.sleep(t_wait_seconds)
+            t_wait_seconds = self.reserve(a_tokens)
+
+        return self._record_wait(self.clock() - t_start_time)
+
+    async def aacquire(self, a_tokens: float) -> float:
+        t_start_time = self.clock()
+
+        t_wait_seconds = self.reserve(a_tokens)
+        while (t_wait_seconds > 0):
+            await asyncio.sleep(t_wait_seconds)
+            t_wait_seconds = self.reserve(a_tokens)
+
+        return self._record_wait(self.clock() - t_start_time)
+
+    def on_response(self, a_reserved_tokens: float, a_used_tokens: float | None = None, a_headers: dict | None = None) -> None:
+        with self.lock:
+            #Settle the difference between the estimate and the real usage.
+            if (a_used_tokens != None):
+                self.tokens_bucket.force_take(a_used_tokens - a_reserved_tokens)
+
+            self.rate_scale = min(1, self.rate_scale + ProviderRateLimiter.m_rate_scale_recovery_step)
+            self._apply_rate_scale()
+
+        if (a_headers):
+            self.update_from_headers(a_headers)
+
+    def on_rate_limited(self, a_retry_after_seconds: float | None = None) -> None:
+        with self.lock:
+            self.number_of_rate_limited_responses += 1
+            self.rate_scale = max(ProviderRateLimiter.m_minimum_rate_scale, self.rate_scale / 2)
+            self._apply_rate_scale()
+
+            #Without a retry-after, wait for one request slot at the reduced rate.
+            if (a_retry_after_seconds == None):
+                a_retry_after_seconds = 60 / self.requests_bucket.capacity
+            self.blocked_until = max(self.blocked_until, self.clock() + a_retry_after_seconds)
+
+    def update_from_headers(self, a_headers: dict) -> None:
+        t_headers = {str(t_key).lower(): t_value for t_key, t_value in a_headers.items()}
+
+        t_requests_limit = _get_first_number(t_headers, ["x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit", "x-ratelimit-limit-req-minute"])
+        t_tokens_limit = _get_first_number(t_headers, ["x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit", "x-ratelimit-limit-tokens-minute"])
+        t_requests_remaining = _get_first_number(t_headers, ["x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining", "x-ratelimit-remaining-req-minute"])
+        t_tokens_remaining = _get_first_number(t_headers, ["x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining", "x-ratelimit-remaining-tokens-minute"])
+        t_retry_after = _get_first_number(t_headers, ["retry-after"])
+
+        with self.lock:
+            if (t_requests_limit != None and t_requests_limit > 0):
+                self.requests_per_minute = t_requests_limit
+            if (t_tokens_limit != None and t_tokens_limit > 0):
+                self.tokens_per_minute = t_tokens_limit
+            self._apply_rate_scale()
+
+            #The provider knows better than our estimate how much is left.
+            self.requests_bucket.refill()
+            self.tokens_bucket.refill()
+            if (t_requests_remaining != None):
+                self.requests_bucket.level = min(self.requests_bucket.level, t_requests_remaining)
+            if (t_tokens_remaining != None):
+                self.tokens_bucket.level = min(self.tokens_bucket.level, t_tokens_remaining)
+
+            if (t_retry_after != None):
+                self.blocked_until = max(self.blocked_until, self.clock() + t_retry_after)
+
+    def get_metrics(self) -> dict:
+        with self.lock:
+            return {
+                "requests" : self.number_of_requests,
+                "rate_limited_responses" : self.number_of_rate_limited_responses,
+                "total_queue_wait_seconds" : round(self.total_wait_seconds, 3),
+                "average_queue_wait_seconds" : round(self.total_wait_seconds / self.number_of_requests, 3) if self.number_of_requests > 0 else 0,
+                "max_queue_wait_seconds" : round(self.max_wait_seconds, 3),
+                "effective_requests_per_minute" : round(self.requests_bucket.capacity, 2),
+                "effective_tokens_per_minute" : round(self.tokens_bucket.capacity, 2)
+            }
+
+    def _apply_rate_scale(self) -> None:
+        t_requests_per_minute = max(1, self.requests_per_minute * self.rate_scale)
+        t_tokens_per_minute = max(1, self.tokens_per_minute * self.rate_scale)
+        self.requests_bucket.set_rate(t_requests_per_minute, t_requests_per_minute / 60)
+        self.tokens_bucket.set_rate(t_tokens_per_minute, t_tokens_per_minute / 60)
+
+    def _record_wait(self, a_wait_seconds: float) -> float:
+        with self.lock:
+            self.number_of_requests += 1
+            self.total_wait_seconds += a_wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, a_wait_seconds)
+
+        return a_wait_seconds
+
+
+
+#Provider limits*
+#Overridable with <PROVIDER>_REQUESTS_PER_MINUTE and <PROVIDER>_TOKENS_PER_MINUTE environment variables.
+m_default_provider_limits: dict[str, tuple[float, float]] = {
+    "openai" : (500, 200000),
+    "anthropic" : (50, 40000),
+    "mistral" : (60, 500000),
+    "together" : (600, 1000000),
+    "simulated" : (100000, 100000000),
+}
+m_fallback_provider_limits: tuple[float, float] = (60, 100000)
+
+m_rate_limiters: dict[str, ProviderRateLimiter] = {}
+m_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(a_provider: str) -> ProviderRateLimiter:
+    with m_rate_limiters_lock:
+        if (a_provider not in m_rate_limiters):
+            t_requests_per_minute, t_tokens_per_minute = m_default_provider_limits.get(a_provider, m_fallback_provider_limits)
+            t_environment_prefix = a_provider.upper()
+
+            m_rate_limiters[a_provider] = ProviderRateLimiter(
+                a_provider = a_provider,
+                a_requests_per_minute = float(os.getenv(t_environment_prefix + "_REQUESTS_PER_MINUTE", t_requests_per_minute)),
+                a_tokens_per_minute = float(os.getenv(t_environment_prefix + "_TOKENS_PER_MINUTE", t_tokens_per_minute))
+            )
+
+        return m_rate_limiters[a_provider]
+
+
+def get_metrics() -> dict:
+    with m_rate_limiters_lock:
+        t_rate_limiters = dict(m_rate_limiters)
+
+    return {t_provider: t_rate_limiter.get_metrics() for t_provider, t_rate_limiter in t_rate_limiters.items()}
+
+
+def estimate_tokens(a_text: str) -> int:
+    #Roughly four characters per token for English text.
+    return max(1, len(a_text) // 4)
+
+
+def is_rate_limit_error(a_exception: Exception) -> bool:
+    t_status_code = getattr(a_exception, "status_code", None) or getattr(getattr(a_exception, "response", None), "status_code", None)
+    if (t_status_code == 429):
+        return True
+
+    t_message = str(a_exception).lower()
+    return "429" in t_message or "rate limit" in t_message or "rate_limit" in t_message
+
+
+def is_server_error(a_exception: Exception) -> bool:
+    #5xx answers, and connections that failed or timed out before there was an answer.
+    t_status_code = getattr(a_exception, "status_code", None) or getattr(getattr(a_exception, "response", None), "status_code", None)
+    if (isinstance(t_status_code, int) == True and t_status_code >= 500):
+        return True
+
+    return any(t_type.__name__ in ["APIConnectionError", "TransportError", "TimeoutError", "ConnectionError"] for t_type in type(a_exception).__mro__)
+
+
+def get_retry_after_seconds(a_exception: Exception) -> float | None:
+    t_headers = getattr(getattr(a_exception, "response", None), "headers", None)
+    if (t_headers == None):
+        return None
+
+    return _get_first_number({str(t_key).lower(): t_value for t_key, t_value in dict(t_headers).items()}, ["retry-after"])
+
+
+def _get_first_number(a_headers: dict, a_header_names: list[str]) -> float | None:
+    for t_header_name in a_header_names:
+        if (t_header_name not in a_headers):
+            continue
+
+        try:
+            return float(a_headers[t_header_name])
+        except (TypeError, ValueError):
+            continue
+
+    return None
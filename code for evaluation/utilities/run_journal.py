@@ -0,0 +1,108 @@
+#Python Imports
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+
+#Per project journal of the (stage, segment, question type) units a run has completed, with a fingerprint of each unit's output.
+#After a crash, a resumed run skips the units the journal has, as long as the segment file still holds the output the journal
+#recorded, so a unit whose write was lost, or whose output was changed since, is done again.
+#Every completed unit is appended and synced as its own json line. A line cut off by a crash is ignored when loading.
+
+m_journals: dict[Path, "RunJournal"] = {}
+m_journals_lock = threading.Lock()
+
+
+def get_run_journal(a_journal_file_path: Path) -> "RunJournal":
+    #One journal object per file, the API opens a new Project per request.
+    with m_journals_lock:
+        if (a_journal_file_path not in m_journals):
+            m_journals[a_journal_file_path] = RunJournal(a_journal_file_path)
+
+        return m_journals[a_journal_file_path]
+
+
+def get_fingerprint(a_value) -> str:
+    return hashlib.sha256(json.dumps(a_value, sort_keys = True, default = str).encode("utf8")).hexdigest()
+
+
+class RunJournal:
+
+    def __init__(self, a_journal_file_path: Path):
+        self.journal_file_path: Path = a_journal_file_path
+        self.lock = threading.Lock()
+
+        #(stage, segment index, question type) -> output fingerprint. Stages without question types use "".
+        self.completed_units: dict[tuple[str, int, str], str] = self._load()
+
+    def start(self, a_stage: str, a_question_types: list[str], a_resume: bool) -> int:
+        #A new run of the stage forgets its completed units of the given question types, a resumed run keeps them.
+        #Returns how many completed units the run resumes from.
+        with self.lock:
+            t_stage_units = [
+                t_unit for t_unit in self.completed_units
+                if (t_unit[0] == a_stage and t_unit[2] in a_question_types)
+            ]
+
+            if (a_resume == True):
+                return len(t_stage_units)
+
+            if (len(t_stage_units) > 0):
+                for t_unit in t_stage_units:
+                    del self.completed_units[t_unit]
+                self._rewrite()
+
+            return 0
+
+    def get_recorded_fingerprint(self, a_stage: str, a_segment_index: int, a_question_type: str = "") -> str | None:
+        with self.lock:
+            return self.completed_units.get((a_stage, a_segment_index, a_question_type), None)
+
+    def record(self, a_stage: str, a_segment_index: int, a_question_type: str, a_fingerprint: str) -> None:
+        with self.lock:
+            self.completed_units[(a_stage, a_segment_index, a_question_type)] = a_fingerprint
+            self._append(self._get_line(a_stage, a_segment_index, a_question_type, a_fingerprint))
+
+    def _load(self) -> dict[tuple[str, int, str], str]:
+        t_completed_units = {}
+        if (self.journal_file_path.exists() == False):
+            return t_completed_units
+
+        with open(self.journal_file_path, "r", encoding = "utf8") as t_journal_file:
+            for t_line in t_journal_file:
+                try:
+                    t_entry = json.loads(t_line)
+                    t_completed_units[(t_entry["stage"], t_entry["segment_index"], t_entry["question_type"])] = t_entry["fingerprint"]
+                except (ValueError, KeyError, TypeError):
+                    print(f"Skipping an incomplete line of the run journal {self.journal_file_path}.")
+
+        return t_completed_units
+
+    def _append(self, a_line: str) -> None:
+        with open(self.journal_file_path, "a", encoding = "utf8") as t_journal_file:
+            t_journal_file.write(a_line)
+            t_journal_file.flush()
+            os.fsync(t_journal_file.fileno())
+
+    def _rewrite(self) -> None:
+        #Replaces the journal with the units that are still completed, in one step like file_manager.create_json_file.
+        t_temporary_file_path = self.journal_file_path.with_name(self.journal_file_path.name + ".tmp")
+        with open(t_temporary_file_path, "w", encoding = "utf8") as t_journal_file:
+            for (t_stage, t_segment_index, t_question_type), t_fingerprint in self.completed_units.items():
+                t_journal_file.write(self._get_line(t_stage, t_segment_index, t_question_type, t_fingerprint))
+            t_journal_file.flush()
+            os.fsync(t_journal_file.fileno())
+
+        os.replace(t_temporary_file_path, self.journal_file_path)
+
+    def _get_line(self, a_stage: str, a_segment_index: int, a_question_type: str, a_fingerprint: str) -> str:
+        return json.dumps({
+            "stage" : a_stage,
+            "segment_index" : a_segment_index,
+            "question_type" : a_question_type,
+            "fingerprint" : a_fingerprint,
+            "time" : time.time()
+        }) + "\n"
@@ -0,0 +1,279 @@
+#Python Imports
+import os
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import threading
+from dataclasses import dataclass
+
+#Custom Imports
+from questions import evaluation_data
+
+
+@dataclass
+class SimulatedLLMProfile:
+    #Latency in seconds. For "lognormal" mu and sigma are of the log of the latency, for "normal" they are the mean and standard deviation.
+    latency_distribution: str = "lognormal"
+    latency_mu: float = math.log(1.5)
+    latency_sigma: float = 0.5
+    seconds_per_output_token: float = 0.0
+
+    #Share of requests that fail, and the share of those failures that are 429 rate limit errors.
+    error_rate: float = 0.0
+    rate_limit_error_share: float = 0.5
+
+
+#Rough fits of observed request latencies, per provider.
+m_provider_profiles: dict[str, SimulatedLLMProfile] = {
+    "openai" : SimulatedLLMProfile(latency_mu = math.log(1.8), latency_sigma = 0.45, seconds_per_output_token = 0.01, error_rate = 0.005),
+    "anthropic" : SimulatedLLMProfile(latency_mu = math.log(3.0), latency_sigma = 0.5, seconds_per_output_token = 0.015, error_rate = 0.01),
+    "mistral" : SimulatedLLMProfile(latency_mu = math.log(2.5), latency_sigma = 0.55, seconds_per_output_token = 0.012, error_rate = 0.01),
+    "together" : SimulatedLLMProfile(latency_mu = math.log(2.2), latency_sigma = 0.7, seconds_per_output_token = 0.008, error_rate = 0.02),
+}
+
+m_evaluation_request_names: list[str] = [
+    "Relevance",
+    "Reading-Comprehension",
+    "Question-Difficulty",
+    "Question-Clarity",
+    "Answer-Relevancy",
+    "Answer-Correctness",
+]
+m_question_generation_request_names: list[str] = ["SAQs", "GFQs", "BLQs", "MCQs"]
+
+#Marks the questions the simulated generation step writes, so the formatting step can count them.
+m_question_marker: str = "SIMULATED-QUESTION"
+m_default_number_of_questions: int = 3
+
+m_structured_output_instruction: str = "Respond ONLY with a JSON object"
+
+
+class SimulatedLLMError(Exception):
+    #Carries the status code like the provider SDK errors do, so rate_limiter.is_rate_limit_error and is_server_error
+    #classify it and langchain_llm retries it the same way.
+
+    def __init__(self, a_message: str, a_status_code: int):
+        super().__init__(a_message)
+        self.status_code: int = a_status_code
+
+
+class SimulatedMessage:
+    #Has the parts of a langchain AIMessage the pipeline reads.
+
+    def __init__(self, a_content: str, a_model_name: str, a_input_tokens: int, a_output_tokens: int):
+        self.content: str = a_content
+        self.response_metadata: dict = {"model_name" : a_model_name}
+        self.usage_metadata: dict = {
+            "input_tokens" : a_input_tokens,
+            "output_tokens" : a_output_tokens,
+            "total_tokens" : a_input_tokens + a_output_tokens
+        }
+
+
+class SimulatedChatModel:
+    #Stand in for a chat model that returns schema valid synthetic output for each pipeline stage, without any network access.
+    #The stage is read from config["metadata"]["request_name"], which langchain_llm.invoke_llm passes with every request.
+
+    is_simulated: bool = True
+
+    def __init__(
+            self,
+            a_profile: SimulatedLLMProfile,
+            a_model_name: str = "simulated",
+            a_temperature: float = 0.6,
+            a_max_tokens: int = 2048,
+            a_seed: int | None = None
+        ):
+        self.profile: SimulatedLLMProfile = a_profile
+        self.model_name: str = a_model_name
+        self.temperature: float = a_temperature
+        self.max_tokens: int = a_max_tokens
+
+        self.random = random.Random(a_seed)
+        self.random_lock = threading.Lock()
+
+    def invoke(self, a_prompt: str, config: dict | None = None, **kwargs) -> SimulatedMessage:
+        t_latency_seconds, t_response = self._simulate(a_prompt, config)
+        time.sleep(t_latency_seconds)
+        return self._get_response(t_response)
+
+    async def ainvoke(self, a_prompt: str, config: dict | None = None, **kwargs) -> SimulatedMessage:
+        t_latency_seconds, t_response = self._simulate(a_prompt, config)
+        await asyncio.sleep(t_latency_seconds)
+        return self._get_response(t_response)
+
+    def bind(self, **kwargs):
+        #Structured output options do not change the simulated output.
+        return self
+
+    def _simulate(self, a_prompt: str, a_config: dict | None) -> tuple[float, SimulatedMessage | SimulatedLLMError]:
+        t_request_name = ((a_config or {}).get("metadata", {}) or {}).get("request_name", "")
+        t_content = self._get_content(t_request_name, a_prompt)
+
+        with self.random_lock:
+            t_latency_seconds = self._sample_latency() + _estimate_tokens(t_content) * self.profile.seconds_per_output_token
+
+            if (self.random.random() < self.profile.error_rate):
+                if (self.random.random() < self.profile.rate_limit_error_share):
+                    return t_latency_seconds, SimulatedLLMError("Simulated error code: 429 - Rate limit reached.", 429)
+                return t_latency_seconds, SimulatedLLMError("Simulated error code: 500 - Internal server error.", 500)
+
+        return t_latency_seconds, SimulatedMessage(t_content, self.model_name, _estimate_tokens(a_prompt), _estimate_tokens(t_content))
+
+    def _get_response(self, a_response: SimulatedMessage | SimulatedLLMError) -> SimulatedMessage:
+        if (isinstance(a_response, SimulatedLLMError) == True):
+            raise a_response
+
+        return a_response
+
+    def _sample_latency(self) -> float:
+        t_profile = self.profile
+
+        if (t_profile.latency_distribution == "lognormal"):
+            return self.random.lognormvariate(t_profile.latency_mu, t_profile.latency_sigma)
+        elif (t_profile.latency_distribution == "normal"):
+            return max(0, self.random.gauss(t_profile.latency_mu, t_profile.latency_sigma))
+        elif (t_profile.latency_distribution == "uniform"):
+            return self.random.uniform(t_profile.latency_mu, t_profile.latency_sigma)
+
+        #constant
+        return t_profile.latency_mu
+
+    def _get_content(self, a_request_name: str, a_prompt: str) -> str:
+        #Structured generation asks for the JSON directly at the end of the prompt, see utilities/structured_output.py.
+        t_instruction_index = a_prompt.rfind(m_structured_output_instruction)
+        if (t_instruction_index != -1):
+            return _get_structured_content(a_request_name, self._get_stage_content(a_request_name, a_prompt[:t_instruction_index]))
+
+        return self._get_stage_content(a_request_name, a_prompt)
+
+    def _get_stage_content(self, a_request_name: str, a_prompt: str) -> str:
+        t_words = _get_prompt_words(a_prompt)
+
+        if (a_request_name == "Summary" or a_request_name == "Summary-Formatting"):
+            t_word_limit_match = re.search(r"word limit of (\d+)", a_prompt)
+            t_word_limit = int(t_word_limit_match.group(1)) if t_word_limit_match != None else 50
+
+            #The summary prompt ends with the text to summarise.
+            t_text_match = re.search(r"The text:(.*)$", a_prompt, re.DOTALL)
+            if (t_text_match != None):
+                t_words = _get_prompt_words(t_text_match.group(1))
+            return " ".join(t_words[:t_word_limit]) + "."
+
+        elif (a_request_name == "Keywords" or a_request_name == "Keywords-Formatting"):
+            t_number_match = re.search(r"(\d+)\s+keywords", a_prompt)
+            t_number_of_keywords = int(t_number_match.group(1)) if t_number_match != None else 5
+            return ", ".join(_get_keywords(t_words, t_number_of_keywords))
+
+        elif (a_request_name in m_question_generation_request_names):
+            t_number_match = re.search(r"(\d+)\s+questions", a_prompt)
+            t_number_of_questions = int(t_number_match.group(1)) if t_number_match != None else m_default_number_of_questions
+            t_keywords = _get_keywords(t_words, 4)
+            return "\n".join(
+                f"{m_question_marker} {i + 1}: What does the text say about {t_keywords[i % len(t_keywords)]}? Answer: {', '.join(t_keywords)}"
+                for i in range(t_number_of_questions)
+            )
+
+        elif (a_request_name == "Questions-Formatting"):
+            t_number_of_questions = a_prompt.count(m_question_marker) or m_default_number_of_questions
+            t_keywords = _get_keywords(t_words, 4)
+            #The answer works for every question type, it is a 4 option list, a comma separated gap fill answer and contains a 't' for booleans.
+            return json.dumps({"response" : [
+                {
+                    "question" : f"What does the text say about {t_keywords[i % len(t_keywords)]}?",
+                    "answer" : ", ".join(t_keywords)
+                }
+                for i in range(t_number_of_questions)
+            ]})
+
+        elif (a_request_name in m_evaluation_request_names):
+            with self.random_lock:
+                t_score = self.random.randint(1, 5)
+            return json.dumps({"response" : {"score" : str(t_score), "reasoning" : f"Simulated {a_request_name} reasoning."}})
+
+        elif (a_request_name.endswith("-Batch") == True and a_request_name[:-len("-Batch")] in m_evaluation_request_names):
+            t_number_of_items = len(re.findall(r"^Item \d+:", a_prompt, re.MULTILINE)) or 1
+            with self.random_lock:
+                t_scores = [self.random.randint(1, 5) for i in range(t_number_of_items)]
+            return json.dumps({"response" : [
+                {"item" : i + 1, "score" : t_score, "reasoning" : f"Simulated {a_request_name} reasoning."}
+                for i, t_score in enumerate(t_scores)
+            ]})
+
+        elif (a_request_name == "Combined-Evaluation"):
+            with self.random_lock:
+                t_scores = [self.random.randint(1, 5) for t_criterion in evaluation_data.m_custom_criteria]
+            return json.dumps({"response" : {
+                t_criterion : {"score" : t_score, "reasoning" : f"Simulated {t_criterion} reasoning."}
+                for t_criterion, t_score in zip(evaluation_data.m_custom_criteria, t_scores)
+            }})
+
+        return " ".join(t_words[:50])
+
+
+def create_simulated_llm(a_model_name: str, a_temperature: float, a_max_tokens: int) -> SimulatedChatModel:
+    #"simulated" uses LLM_SIMULATION_PROFILE (default openai), "simulated-<provider>" uses that provider's profile.
+    t_profile_name = os.getenv("LLM_SIMULATION_PROFILE", "openai")
+    if (a_model_name.startswith("simulated-") == True):
+        t_profile_name = a_model_name[len("simulated-"):]
+
+    t_base_profile = m_provider_profiles.get(t_profile_name, m_provider_profiles["openai"])
+    t_profile = SimulatedLLMProfile(
+        latency_distribution = os.getenv("LLM_SIMULATION_LATENCY_DISTRIBUTION", t_base_profile.latency_distribution),
+        latency_mu = float(os.getenv("LLM_SIMULATION_LATENCY_MU", t_base_profile.latency_mu)),
+        latency_sigma = float(os.getenv("LLM_SIMULATION_LATENCY_SIGMA", t_base_profile.latency_sigma)),
+        seconds_per_output_token = float(os.getenv("LLM_SIMULATION_SECONDS_PER_OUTPUT_TOKEN", t_base_profile.seconds_per_output_token)),
+        error_rate = float(os.getenv("LLM_SIMULATION_ERROR_RATE", t_base_profile.error_rate)),
+        rate_limit_error_share = float(os.getenv("LLM_SIMULATION_RATE_LIMIT_ERROR_SHARE", t_base_profile.rate_limit_error_share))
+    )
+
+    t_seed = os.getenv("LLM_SIMULATION_SEED", "")
+    return SimulatedChatModel(
+        a_profile = t_profile,
+        a_model_name = a_model_name,
+        a_temperature = a_temperature,
+        a_max_tokens = a_max_tokens,
+        a_seed = int(t_seed) if t_seed != "" else None
+    )
+
+
+def is_simulated_model_name(a_model_name: str) -> bool:
+    return a_model_name == "simulated" or a_model_name.startswith("simulated-")
+
+
+def _get_structured_content(a_request_name: str, a_content: str) -> str:
+    if (a_request_name == "Summary"):
+        return json.dumps({"summary" : a_content})
+    elif (a_request_name == "Keywords"):
+        return json.dumps({"keywords" : a_content.split(", ")})
+    elif (a_request_name in m_question_generation_request_names):
+        t_questions = []
+        for t_line in a_content.split("\n"):
+            t_question, t_answer = t_line.split(": ", 1)[1].split(" Answer: ", 1)
+            t_questions.append({"question" : t_question, "answer" : t_answer})
+        return json.dumps({"response" : t_questions})
+
+    return a_content
+
+
+def _get_prompt_words(a_prompt: str) -> list[str]:
+    #The end of the prompt holds the request specific text, the start the shared instructions and examples.
+    t_words = re.findall(r"[A-Za-z][A-Za-z\-']+", a_prompt[-2000:])
+    return t_words if len(t_words) > 0 else ["simulated"]
+
+
+def _get_keywords(a_words: list[str], a_number_of_keywords: int) -> list[str]:
+    t_keywords = []
+    for t_word in sorted(set(a_words), key = lambda t_word: (-len(t_word), t_word)):
+        t_keywords.append(t_word)
+        if (len(t_keywords) >= a_number_of_keywords):
+            break
+
+    return t_keywords
+
+
+def _estimate_tokens(a_text: str) -> int:
+    return max(1, len(a_text) // 4)
@@ -0,0 +1,106 @@
+#Python Imports
+import threading
+
+#Custom Imports
+from utilities import json_repair
+
+
+#Appended to the generation suffix in structured mode. Braces are doubled because the suffix is formatted once more when the prompt is assembled.
+m_questions_json_instruction: str = """
+Respond ONLY with a JSON object of the form {{"response": [{{"question": "<question>", "answer": "<answer>"}}]}} and nothing else."""
+
+m_keywords_json_instruction: str = """
+Respond ONLY with a JSON object of the form {{"keywords": ["<keyword>", "<keyword>"]}} and nothing else."""
+
+m_summary_json_instruction: str = """
+Respond ONLY with a JSON object of the form {{"summary": "<summary>"}} and nothing else."""
+
+#Providers whose chat models accept an enforced JSON response format. The others only get the prompt instruction.
+m_json_mode_providers: list[str] = ["openai", "mistral"]
+
+
+def get_structured_llm(a_llm, a_provider: str):
+    if (a_provider in m_json_mode_providers):
+        return a_llm.bind(response_format = {"type" : "json_object"})
+
+    return a_llm
+
+
+def parse_questions(a_response: str) -> list[dict] | None:
+    t_response_dict = _load_json_object(a_response)
+    if (t_response_dict == None or isinstance(t_response_dict.get("response", None), list) == False):
+        return None
+
+    for t_question_and_answer in t_response_dict["response"]:
+        if (isinstance(t_question_and_answer, dict) == False):
+            return None
+        if ("question" not in t_question_and_answer or "answer" not in t_question_and_answer):
+            return None
+
+    return t_response_dict["response"]
+
+
+def parse_keywords(a_response: str) -> list[str] | None:
+    t_response_dict = _load_json_object(a_response)
+    if (t_response_dict == None or isinstance(t_response_dict.get("keywords", None), list) == False):
+        return None
+
+    t_keywords = [str(t_keyword).strip() for t_keyword in t_response_dict["keywords"] if str(t_keyword).strip() != ""]
+    if (len(t_keywords) == 0):
+        return None
+
+    return t_keywords
+
+
+def parse_summary(a_response: str) -> str | None:
+    t_response_dict = _load_json_object(a_response)
+    if (t_response_dict == None or isinstance(t_response_dict.get("summary", None), str) == False):
+        return None
+
+    t_summary = t_response_dict["summary"].strip()
+    if (t_summary == ""):
+        return None
+
+    return t_summary
+
+
+def _load_json_object(a_response: str) -> dict | None:
+    return json_repair.parse_json_object(a_response)
+
+
+
+#Fallback tracking*
+m_fallback_counts: dict[str, dict[str, dict[str, int]]] = {}
+m_fallback_counts_lock = threading.Lock()
+
+
+def record_result(a_model_name: str, a_stage: str, a_used_fallback: bool) -> None:
+    with m_fallback_counts_lock:
+        t_stage_counts = m_fallback_counts.setdefault(a_model_name, {}).setdefault(a_stage, {"requests" : 0, "fallbacks" : 0})
+        t_stage_counts["requests"] += 1
+        if (a_used_fallback == True):
+            t_stage_counts["fallbacks"] += 1
+
+    if (a_used_fallback == True):
+        print(f"Structured {a_stage} output from {a_model_name} did not validate, using the formatting request.")
+
+
+def get_fallback_rates() -> dict:
+    t_fallback_rates = {}
+
+    with m_fallback_counts_lock:
+        for t_model_name, t_stages in m_fallback_counts.items():
+            t_fallback_rates[t_model_name] = {}
+            for t_stage, t_counts in t_stages.items():
+                t_fallback_rates[t_model_name][t_stage] = {
+                    "requests" : t_counts["requests"],
+                    "fallbacks" : t_counts["fallbacks"],
+                    "fallback_rate" : round(t_counts["fallbacks"] / t_counts["requests"], 3)
+                }
+
+    return t_fallback_rates
+
+
+def get_model_name(a_llm) -> str:
+    a_llm = getattr(a_llm, "bound", a_llm)
+    return str(getattr(a_llm, "model_name", None) or getattr(a_llm, "model", "unknown"))